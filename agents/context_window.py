@@ -0,0 +1,211 @@
+# Token-budgeted context window for RentBasket WhatsApp Bot "Ku"
+# Keeps agent prompts (and the conversation state itself) from growing with
+# conversation length.
+#
+# call_agent used to send the whole state["messages"] history on every LLM
+# call, including every verbose create_quote_tool output. Now:
+#   - the last CONTEXT_KEEP_TURNS turns are sent verbatim (the current turn,
+#     with the tool results the model just asked for, always in full);
+#   - tool outputs from earlier turns are cut down to a short preview;
+#   - older turns are folded into a short extractive summary (no extra LLM
+#     call on the hot path), and dropped turns stop being sent at all;
+#   - if the prompt is still over CONTEXT_TOKEN_BUDGET, the oldest verbatim
+#     turns are summarized too.
+# compact_state() does the same to the stored state after each turn, folding
+# turns beyond CONTEXT_MAX_STATE_TURNS into collected_info["recent_summary"].
+
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from config import BOT_NAME, CONTEXT_KEEP_TURNS, CONTEXT_MAX_STATE_TURNS, CONTEXT_TOKEN_BUDGET
+
+STALE_TOOL_CHARS = 300      # preview kept of a tool output from an earlier turn
+SUMMARY_CHARS = 800         # rolling summary cap (oldest turns fall off first)
+SUMMARY_LINE_CHARS = 160    # per message inside the summary
+
+# Rough OpenAI token count: ~4 characters per token plus per-message framing.
+# Close enough to budget with and needs no tokenizer download.
+_CHARS_PER_TOKEN = 4
+_MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Approximate prompt tokens for a list of messages (content + tool-call arguments)."""
+    total = 0
+    for msg in messages:
+        chars = len(msg.content) if isinstance(msg.content, str) else len(json.dumps(msg.content, default=str))
+        for tc in getattr(msg, "tool_calls", None) or ():
+            chars += len(tc["name"]) + len(json.dumps(tc.get("args", {}), default=str))
+        total += _MESSAGE_OVERHEAD + -(-chars // _CHARS_PER_TOKEN)
+    return total
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a HumanMessage (tool calls stay with their results)."""
+    turns: List[List[BaseMessage]] = []
+    for msg in messages:
+        if isinstance(msg, HumanMessage) or not turns:
+            turns.append([msg])
+        else:
+            turns[-1].append(msg)
+    return turns
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def summarize_turns(turns: Sequence[Sequence[BaseMessage]], previous: str = "") -> str:
+    """
+    Fold turns into the rolling summary: one line per turn with what the customer
+    said, the tools used and the reply. Oldest lines drop off past SUMMARY_CHARS.
+    """
+    lines = [line for line in previous.split("\n") if line] if previous else []
+    for turn in turns:
+        said = [_clip(m.content, SUMMARY_LINE_CHARS) for m in turn if isinstance(m, HumanMessage)]
+        tools = [tc["name"] for m in turn if isinstance(m, AIMessage) for tc in (m.tool_calls or ())]
+        replies = [m for m in turn if isinstance(m, AIMessage) and not m.tool_calls and m.content]
+        parts = []
+        if said:
+            parts.append(f"Customer: {said[0]}")
+        if tools:
+            parts.append(f"[{', '.join(dict.fromkeys(tools))}]")
+        if replies:
+            parts.append(f"{BOT_NAME}: {_clip(replies[-1].content, SUMMARY_LINE_CHARS)}")
+        if parts:
+            lines.append(" ".join(parts))
+    while lines and len("\n".join(lines)) > SUMMARY_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def _strip_stale_tools(turn: List[BaseMessage]) -> List[BaseMessage]:
+    """Cut tool outputs of an earlier turn to a preview (the call/result pairing stays intact)."""
+    stripped = []
+    for msg in turn:
+        if isinstance(msg, ToolMessage) and isinstance(msg.content, str) and len(msg.content) > STALE_TOOL_CHARS:
+            msg = ToolMessage(tool_call_id=msg.tool_call_id, name=msg.name,
+                              content=msg.content[:STALE_TOOL_CHARS] + " …[earlier tool output truncated]")
+        stripped.append(msg)
+    return stripped
+
+
+class ContextWindow:
+    """
+    Builds each agent LLM call's prompt within a token budget.
+
+    Usage (inside call_agent):
+        prompt = context_window.build(full_prompt, state["messages"], collected, agent="sales")
+        response = llm_with_tools.invoke(prompt)
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+        keep_turns: int = CONTEXT_KEEP_TURNS,
+    ):
+        self.budget_tokens = budget_tokens
+        self.keep_turns = max(1, keep_turns)
+        self._lock = threading.Lock()
+        self._counters = {
+            "calls": 0,
+            "prompt_tokens_before": 0,
+            "prompt_tokens_after": 0,
+            "summarized_turns": 0,
+            "stripped_tool_outputs": 0,
+            "over_budget": 0,
+        }
+        self._last: Dict[str, Dict[str, int]] = {}
+
+    def build(
+        self,
+        system_prompt: str,
+        messages: Sequence[BaseMessage],
+        collected_info: Optional[Dict[str, Any]] = None,
+        agent: str = "agent",
+        context: str = "",
+    ) -> List[BaseMessage]:
+        """
+        [SystemMessage(system prompt)] + the recent turns
+        + [SystemMessage(context + summary of earlier turns)] + the current turn.
+
+        system_prompt must be the same for every customer and turn (it is the
+        prompt prefix the provider caches); anything per-customer goes in context,
+        which is placed after the history, right before the current message.
+        """
+        collected_info = collected_info or {}
+        turns = split_turns(list(messages))
+        current = turns[-1] if turns else []
+        history = turns[:-1]
+        keep = min(len(history), self.keep_turns - 1)
+        older, recent = history[:len(history) - keep], history[len(history) - keep:]
+
+        stripped = [_strip_stale_tools(turn) for turn in recent]
+        stale_tools = sum(a is not b for turn, new in zip(recent, stripped) for a, b in zip(turn, new))
+        recent = stripped
+        previous = collected_info.get("recent_summary") or ""
+
+        while True:
+            summary = summarize_turns(older, previous)
+            volatile = "\n\n".join(part for part in (
+                context.strip(), f"## Earlier in this conversation\n{summary}" if summary else "") if part)
+            prompt = ([SystemMessage(content=system_prompt)] + [m for turn in recent for m in turn]
+                      + ([SystemMessage(content=volatile)] if volatile else []) + current)
+            after = estimate_tokens(prompt)
+            if after <= self.budget_tokens or not recent:
+                break
+            older = older + [recent.pop(0)]
+
+        before = estimate_tokens([SystemMessage(content=system_prompt + context)] + list(messages))
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["prompt_tokens_before"] += before
+            self._counters["prompt_tokens_after"] += after
+            self._counters["summarized_turns"] += len(older)
+            self._counters["stripped_tool_outputs"] += stale_tools
+            self._counters["over_budget"] += after > self.budget_tokens
+            self._last[agent] = {"turns": len(turns), "prompt_tokens_before": before, "prompt_tokens_after": after}
+        return prompt
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._counters["calls"] or 1
+            return {
+                "budget_tokens": self.budget_tokens,
+                "keep_turns": self.keep_turns,
+                **self._counters,
+                "avg_prompt_tokens_before": round(self._counters["prompt_tokens_before"] / calls, 1),
+                "avg_prompt_tokens_after": round(self._counters["prompt_tokens_after"] / calls, 1),
+                "last": {agent: dict(last) for agent, last in self._last.items()},
+            }
+
+
+context_window = ContextWindow()
+
+
+def compact_state(state: Dict[str, Any], max_turns: int = CONTEXT_MAX_STATE_TURNS) -> Dict[str, Any]:
+    """
+    Bound the stored conversation: turns beyond the last max_turns are folded into
+    collected_info["recent_summary"] and removed from state["messages"]. The
+    arguments of the latest call to each tool in them are kept in
+    collected_info["_last_tool_calls"] (the sales agent's cart rule reads them).
+    """
+    turns = split_turns(list(state.get("messages") or []))
+    if len(turns) <= max_turns:
+        return state
+    dropped, kept = turns[:-max_turns], turns[-max_turns:]
+
+    collected = dict(state.get("collected_info") or {})
+    collected["recent_summary"] = summarize_turns(dropped, collected.get("recent_summary") or "")
+    last_calls = dict(collected.get("_last_tool_calls") or {})
+    for turn in dropped:
+        for msg in turn:
+            for tc in getattr(msg, "tool_calls", None) or ():
+                last_calls[tc["name"]] = dict(tc.get("args") or {})
+    if last_calls:
+        collected["_last_tool_calls"] = last_calls
+    return {**state, "messages": [m for turn in kept for m in turn], "collected_info": collected}
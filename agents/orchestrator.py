@@ -4,7 +4,8 @@
 
 import os
 import sys
-from typing import Dict, Any, Callable, Tuple
+import time
+from typing import Dict, Any, Callable, Optional, Tuple
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -12,12 +13,17 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 
 from agents.state import ConversationState, create_initial_state
+from agents.registry import agent_registry, get_chat_model, register_chat_model
+from agents.context_window import compact_state
 from agents.sales_agent import run_agent
 from agents.recommendation_agent import run_recommendation_agent
 from agents.support_agent import run_support_agent
 from tools.customer_tools import verify_customer_status
 from utils.phone_utils import normalize_phone
 from utils.firebase_client import upsert_lead, get_lead
+from utils.intent_cache import IntentCache, is_short_reply, openai_embedder
+from utils.intent_model import IntentModel
+from utils.prompt_usage import prompt_usage
 
 # ========================================
 # AGENT REGISTRY (plug-and-play)
@@ -27,16 +33,21 @@ AGENT_REGISTRY: Dict[str, Dict[str, Any]] = {
     "sales": {
         "enabled": True,
         "runner": run_agent,
+        "graph": "sales",
+        "streaming": True,   # runner accepts on_segment / on_progress
         "description": "Handles pricing, quotes, policies, greetings, and discovery for leads",
     },
     "recommendation": {
         "enabled": True,
         "runner": run_recommendation_agent,
+        "graph": "recommendation",
+        "streaming": True,
         "description": "Helps discover products, browse catalogue, and compare by budget",
     },
     "support": {
         "enabled": True,
         "runner": run_support_agent,
+        "graph": "support_policy",
         "description": "Handles maintenance, billing, relocation, and operations for existing customers",
     },
     "support_intake": {
@@ -96,6 +107,77 @@ Respond with ONLY one word: SUPPORT, RECOMMENDATION, SALES, ESCALATION, or GENER
 Do not explain your reasoning."""
 
 
+# Classifier decisions keyed on normalized text + routing state.
+# INTENT_CACHE_EMBEDDINGS=true adds the near-duplicate (embedding) tier.
+intent_cache = IntentCache(
+    embedder=openai_embedder() if os.getenv("INTENT_CACHE_EMBEDDINGS", "false").lower() == "true" else None
+)
+
+# Local classifier tier: answers confident predictions in <1 ms, else the LLM decides.
+# Off by default: v1 is trained on hand-written seed phrases only and sees no
+# conversation context. Enable it once retrained on logged traffic
+# (scripts/train_intent_classifier.py, bump INTENT_MODEL_PATH).
+INTENT_MODEL_ENABLED = os.getenv("INTENT_MODEL_ENABLED", "false").lower() == "true"
+INTENT_MODEL_PATH = os.getenv(
+    "INTENT_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "models", "intent_classifier_v1.json"),
+)
+INTENT_MODEL_THRESHOLD = float(os.getenv("INTENT_MODEL_THRESHOLD", "0.75"))
+
+
+def _load_intent_model():
+    try:
+        model = IntentModel.load(INTENT_MODEL_PATH)
+        print(f"🧠 Local intent model v{model.version} loaded ({len(model.weights)} features)")
+        return model
+    except Exception as e:
+        print(f"⚠️ Local intent model unavailable ({INTENT_MODEL_PATH}): {e}")
+        return None
+
+
+intent_model = _load_intent_model() if INTENT_MODEL_ENABLED else None
+_classifier_counters = {"local": 0, "llm": 0}
+
+
+def classifier_stats() -> Dict[str, Any]:
+    """How many classifications the local model answered vs escalated to the LLM."""
+    return {
+        "enabled": intent_model is not None,
+        "model_version": intent_model.version if intent_model else None,
+        "threshold": INTENT_MODEL_THRESHOLD,
+        **_classifier_counters,
+    }
+
+
+CLASSIFIER_MODEL = "gpt-4o-mini"
+
+
+def _get_classifier_llm() -> ChatOpenAI:
+    """One shared classifier client instead of a new ChatOpenAI per message."""
+    return get_chat_model(CLASSIFIER_MODEL, 0)
+
+
+def warm_agents() -> Dict[str, Any]:
+    """
+    Compile every enabled agent's graph (the "graph" registry name in AGENT_REGISTRY)
+    and build the classifier client now, so the first customer message doesn't.
+    Returns {name: build ms, or the error}.
+    """
+    names = [entry["graph"] for entry in AGENT_REGISTRY.values() if entry.get("enabled") and entry.get("graph")]
+    return agent_registry.warm(names + [register_chat_model(CLASSIFIER_MODEL, 0)])
+
+
+def _answers_question(state: ConversationState) -> bool:
+    """True when Ku's last message asked the customer something."""
+    for msg in reversed(list(state.get("messages") or [])):
+        if isinstance(msg, HumanMessage):
+            continue
+        content = msg.content if isinstance(getattr(msg, "content", None), str) else ""
+        if content:
+            return "?" in content.split("|||")[-1]
+    return False
+
+
 def classify_intent(
     user_message: str, 
     state: ConversationState
@@ -130,8 +212,27 @@ def classify_intent(
             if not any(kw in lower_msg for kw in support_keywords):
                 return "sales"
 
-        # 3. LLM CLASSIFICATION
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        # 3. INTENT CACHE (same phrasing + same routing state -> same intent).
+        # Short replies ("yes", "ok", "2") answer whatever Ku just asked: only the
+        # LLM, which sees the recent conversation, can classify them.
+        short_reply = is_short_reply(user_message)
+        cache_context = (status, current_agent, state.get("conversation_stage", "unknown"))
+        if not short_reply:
+            cached = intent_cache.get(user_message, cache_context)
+            if cached is not None:
+                return cached
+
+        # 4. LOCAL MODEL (confident answers skip the LLM). It sees only the text,
+        # so replies to a question Ku just asked ("my name is Rahul") go to the LLM.
+        if intent_model is not None and not short_reply and not _answers_question(state):
+            local_intent, confidence = intent_model.predict(user_message)
+            if confidence >= INTENT_MODEL_THRESHOLD:
+                _classifier_counters["local"] += 1
+                return local_intent
+
+        # 5. LLM CLASSIFICATION
+        _classifier_counters["llm"] += 1
+        llm = _get_classifier_llm()
         
         recent_messages = []
         if state and state.get("messages"):
@@ -145,27 +246,36 @@ def classify_intent(
         if recent_messages:
             context = f"\n\nRecent conversation:\n" + "\n".join(recent_messages)
         
-        verification_hint = f"\nUser Status: {status.upper()}"
+        verification_hint = f"User Status: {status.upper()}"
         verification_hint += f"\nCurrent Agent: {state.get('active_agent', 'sales')}"
         verification_hint += f"\nConversation Stage: {state.get('conversation_stage', 'unknown')}"
 
+        # CLASSIFIER_PROMPT alone is the system message (a cacheable prefix shared by
+        # every customer); the per-customer status goes with the message itself.
+        started = time.perf_counter()
         response = llm.invoke([
-            SystemMessage(content=CLASSIFIER_PROMPT + verification_hint),
-            HumanMessage(content=f"Classify this message:{context}\n\nNew message: {user_message}")
+            SystemMessage(content=CLASSIFIER_PROMPT),
+            HumanMessage(content=f"{verification_hint}\n\nClassify this message:{context}\n\nNew message: {user_message}")
         ])
+        latency_ms = (time.perf_counter() - started) * 1000
+        prompt_usage.record_message("intent_classifier", response)
         
         intent = response.content.strip().upper()
         
         if intent == "SUPPORT":
-            return "support"
+            result = "support"
         elif intent == "RECOMMENDATION":
-            return "recommendation"
+            result = "recommendation"
         elif intent == "SALES":
-            return "sales"
+            result = "sales"
         elif intent == "ESCALATION":
-            return "escalation"
+            result = "escalation"
         else:
-            return "general"
+            result = "general"
+
+        if not short_reply:
+            intent_cache.put(user_message, cache_context, result, latency_ms)
+        return result
             
     except Exception as e:
         print(f"  ⚠️ Intent classification failed: {e}")
@@ -178,10 +288,17 @@ def classify_intent(
 
 def route_and_run(
     user_message: str, 
-    state: ConversationState = None
+    state: ConversationState = None,
+    on_segment: Optional[Callable[[str], None]] = None,
+    on_progress: Optional[Callable[[], None]] = None,
 ) -> Tuple[str, ConversationState]:
     """
     Enhanced Orchestrator with Priority/Intake routing.
+
+    on_segment: stream the reply from agents that support it ("streaming" in
+    AGENT_REGISTRY), passing each "|||" segment as soon as it is written.
+    _routing_meta["streamed_segments"] then says how many leading segments
+    of the returned response were already passed on.
     """
     if state is None:
         state = create_initial_state()
@@ -289,7 +406,10 @@ def route_and_run(
         runner = run_support_intake_stub
      
     try:
-        response, new_state = runner(user_message, state)
+        if on_segment and agent_entry.get("streaming"):
+            response, new_state = runner(user_message, state, on_segment=on_segment, on_progress=on_progress)
+        else:
+            response, new_state = runner(user_message, state)
     except Exception as e:
         print(f"  ❌ CRITICAL: Agent runner '{target_agent}' failed: {e}")
         # Final safety fallback to prevent crash
@@ -301,7 +421,13 @@ def route_and_run(
              new_state = state
              new_state["needs_human"] = True
     
+    # Bound the stored history: old turns fold into collected_info["recent_summary"]
+    new_state = compact_state(new_state)
     new_state["active_agent"] = target_agent
-    new_state["_routing_meta"] = {"intent": intent, "agent_used": target_agent}
+    new_state["_routing_meta"] = {
+        "intent": intent,
+        "agent_used": target_agent,
+        "streamed_segments": new_state.pop("_streamed_segments", 0),
+    }
     
     return response, new_state
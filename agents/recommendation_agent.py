@@ -7,14 +7,18 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage
+from typing import Dict, Any, Callable, Optional
+from langchain_core.messages import HumanMessage
 from langgraph.graph import StateGraph, END
 
 from config import LLM_MODEL, LLM_TEMPERATURE, BOT_NAME
 from config import SALES_PHONE_GURGAON, SALES_PHONE_NOIDA
 from agents.state import ConversationState, create_initial_state
+from agents.registry import agent_registry, get_chat_model
+from agents.context_window import context_window
+from agents.tool_runner import tool_runner
+from agents.streaming import stream_agent
+from utils.prompt_usage import prompt_usage
 from tools.catalogue_tools import (
     get_full_catalogue_overview_tool,
     browse_category_tool,
@@ -111,9 +115,9 @@ RECOMMENDATION_TOOLS = [
 # ========================================
 
 def create_recommendation_agent(checkpointer=None):
-    """Create and return the recommendation agent graph."""
+    """Create and return the recommendation agent graph (run_recommendation_agent shares one via the registry)."""
     
-    llm = ChatOpenAI(model=LLM_MODEL, temperature=LLM_TEMPERATURE)
+    llm = get_chat_model(LLM_MODEL, LLM_TEMPERATURE)
     llm_with_tools = llm.bind_tools(RECOMMENDATION_TOOLS)
     
     tools_dict = {tool.name: tool for tool in RECOMMENDATION_TOOLS}
@@ -123,13 +127,19 @@ def create_recommendation_agent(checkpointer=None):
     def call_agent(state: ConversationState) -> Dict[str, Any]:
         """Call the LLM with current state and tools."""
         messages = list(state["messages"])
+        collected = state.get("collected_info", {})
         
-        info_context = f"\n\n## Current Customer Context\n{state.get('collected_info', {})}"
-        full_system_prompt = RECOMMENDATION_SYSTEM_PROMPT + info_context
+        # The summary of earlier turns is added by the context window, not the dict dump
+        ctx_fields = {k: v for k, v in collected.items() if k not in ("recent_summary", "_last_tool_calls")}
+        info_context = f"## Current Customer Context\n{ctx_fields}"
         
-        messages = [SystemMessage(content=full_system_prompt)] + messages
+        # Recent turns verbatim, older ones summarized, stale tool outputs cut (token budget).
+        # The static system prompt is the cacheable prefix; the customer context goes last.
+        messages = context_window.build(RECOMMENDATION_SYSTEM_PROMPT, messages, collected,
+                                        agent="recommendation", context=info_context)
         
         response = llm_with_tools.invoke(messages)
+        prompt_usage.record_message("recommendation", response)
         return {"messages": [response]}
     
     def execute_tools(state: ConversationState) -> Dict[str, Any]:
@@ -137,28 +147,11 @@ def create_recommendation_agent(checkpointer=None):
         last_message = state["messages"][-1]
         tool_calls = last_message.tool_calls
         
-        results = []
         for tc in tool_calls:
-            tool_name = tc["name"]
-            tool_args = tc["args"]
-            
-            print(f"  🔧 [Recommendation] Calling tool: {tool_name}")
-            
-            if tool_name not in tools_dict:
-                result = f"Tool '{tool_name}' not found."
-            else:
-                try:
-                    result = tools_dict[tool_name].invoke(tool_args)
-                except Exception as e:
-                    result = f"Error executing tool: {str(e)}"
-            
-            results.append(ToolMessage(
-                tool_call_id=tc["id"],
-                name=tool_name,
-                content=str(result)
-            ))
+            print(f"  🔧 [Recommendation] Calling tool: {tc['name']}")
         
-        return {"messages": results}
+        # Independent calls run concurrently; results come back in call order
+        return {"messages": tool_runner.run(tool_calls, tools_dict)}
     
     def should_continue(state: ConversationState) -> str:
         """Determine if we should continue to tools or end."""
@@ -191,13 +184,18 @@ def create_recommendation_agent(checkpointer=None):
     return graph.compile(checkpointer=checkpointer)
 
 
+agent_registry.register("recommendation", create_recommendation_agent)
+
+
 # ========================================
 # AGENT RUNNER (standard plug-and-play interface)
 # ========================================
 
 def run_recommendation_agent(
     user_message: str, 
-    state: ConversationState = None
+    state: ConversationState = None,
+    on_segment: Optional[Callable[[str], None]] = None,
+    on_progress: Optional[Callable[[], None]] = None,
 ) -> tuple[str, ConversationState]:
     """
     Run the recommendation agent with a user message.
@@ -208,6 +206,8 @@ def run_recommendation_agent(
     Args:
         user_message: The user's message
         state: Optional existing conversation state
+        on_segment: Stream the reply, passing each "|||" segment as soon as it is written
+        on_progress: Called after every graph step while streaming
         
     Returns:
         Tuple of (agent response, updated state)
@@ -218,9 +218,12 @@ def run_recommendation_agent(
     # Add user message
     state["messages"] = list(state["messages"]) + [HumanMessage(content=user_message)]
     
-    # Create and run agent
-    agent = create_recommendation_agent()
-    result = agent.invoke(state)
+    # Run the shared, compiled-once agent
+    agent = agent_registry.get("recommendation")
+    if on_segment:
+        result = stream_agent(agent, state, on_segment, on_progress)
+    else:
+        result = agent.invoke(state)
     
     # Extract response
     response = result["messages"][-1].content
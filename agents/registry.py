@@ -0,0 +1,118 @@
+# Shared agent registry for RentBasket WhatsApp Bot "Ku"
+# Compiles each agent graph (and builds each LLM client) once per process.
+#
+# run_recommendation_agent used to build a new ChatOpenAI client, rebind its
+# tools and recompile its StateGraph on every message; the support agent and
+# the intent classifier built fresh clients per call too. Builders are
+# registered here by name and run once, either all at startup (warm()) or
+# lazily and thread-safely on first use (get()).
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from langchain_openai import ChatOpenAI
+
+_UNBUILT = object()
+
+
+class AgentRegistry:
+    """
+    Named, build-once objects (compiled graphs, LLM clients, bound tool runnables).
+
+    Usage:
+        agent_registry.register("recommendation", create_recommendation_agent)
+        agent = agent_registry.get("recommendation")     # built on first use
+        agent_registry.warm()                            # or build everything at boot
+    """
+
+    def __init__(self):
+        self._builders: Dict[str, Callable[[], Any]] = {}
+        self._built: Dict[str, Any] = {}
+        self._build_ms: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._counters = {"builds": 0, "hits": 0}
+
+    def register(self, name: str, builder: Callable[[], Any], replace: bool = True) -> None:
+        """
+        Register a builder. Replacing one drops its built object (rebuilt on next use);
+        replace=False keeps an existing registration as it is.
+        """
+        with self._lock:
+            if name in self._builders and not replace:
+                return
+            self._builders[name] = builder
+            self._locks.setdefault(name, threading.Lock())
+            self._built.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """The built object, building it on first use (concurrent callers wait for one build)."""
+        built = self._built.get(name, _UNBUILT)
+        if built is not _UNBUILT:
+            with self._lock:
+                self._counters["hits"] += 1
+            return built
+        with self._lock:
+            builder = self._builders.get(name)
+            lock = self._locks.get(name)
+        if builder is None:
+            raise KeyError(f"No agent registered as '{name}'")
+        with lock:
+            built = self._built.get(name, _UNBUILT)
+            if built is _UNBUILT:
+                started = time.perf_counter()
+                built = builder()
+                with self._lock:
+                    self._built[name] = built
+                    self._build_ms[name] = round((time.perf_counter() - started) * 1000, 2)
+                    self._counters["builds"] += 1
+            else:
+                with self._lock:
+                    self._counters["hits"] += 1
+        return built
+
+    def warm(self, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Build everything (or the given names) now. Returns {name: build ms, or the error}."""
+        report = {}
+        for name in list(names if names is not None else self._builders):
+            try:
+                self.get(name)
+                report[name] = self._build_ms.get(name, 0.0)
+            except Exception as e:
+                report[name] = f"error: {e}"
+        return report
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Drop built objects (all, or one) so they are rebuilt on next use."""
+        with self._lock:
+            if name is None:
+                self._built.clear()
+            else:
+                self._built.pop(name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "registered": sorted(self._builders),
+                "built": sorted(self._built),
+                "build_ms": dict(self._build_ms),
+                **self._counters,
+            }
+
+
+agent_registry = AgentRegistry()
+
+
+def register_chat_model(model: str, temperature: float) -> str:
+    """Register the shared client for a model + temperature (without building it); returns its name."""
+    name = f"llm:{model}:{temperature}"
+    # stream_usage: streamed replies report token usage (incl. cached prompt tokens) too
+    agent_registry.register(
+        name, lambda: ChatOpenAI(model=model, temperature=temperature, stream_usage=True), replace=False)
+    return name
+
+
+def get_chat_model(model: str, temperature: float) -> ChatOpenAI:
+    """One shared ChatOpenAI client (and its HTTP connection pool) per model + temperature."""
+    return agent_registry.get(register_chat_model(model, temperature))
@@ -7,9 +7,8 @@ import sys
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, AIMessage
+from typing import Dict, Any, Callable, Optional
+from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.tools import tool
 from langgraph.graph import StateGraph, END
 
@@ -17,7 +16,12 @@ from config import LLM_MODEL, LLM_TEMPERATURE, BOT_NAME, BOT_GREETING
 from config import SALES_PHONE_GURGAON, SALES_PHONE_NOIDA, SUPPORT_EMAIL, WEBSITE
 from config import GURGAON_OFFICE, NOIDA_OFFICE
 from agents.state import ConversationState, create_initial_state
-from rag.vectorstore import search_knowledge, create_knowledge_vectorstore
+from agents.registry import agent_registry, get_chat_model
+from agents.context_window import context_window
+from agents.tool_runner import tool_runner
+from agents.streaming import stream_agent
+from utils.prompt_usage import prompt_usage
+from rag.vectorstore import search_knowledge, load_knowledge_index
 from tools.product_tools import (
     search_products_tool,
     create_quote_tool,
@@ -39,8 +43,8 @@ _vectorstore = None
 def get_vectorstore():
     global _vectorstore
     if _vectorstore is None:
-        print("Initializing knowledge base vector store...")
-        _vectorstore = create_knowledge_vectorstore()
+        print("Loading knowledge base vector store...")
+        _vectorstore = load_knowledge_index()
     return _vectorstore
 
 
@@ -184,19 +188,19 @@ ALL_TOOLS = [
 
 
 # ========================================
-# AGENT GRAPH (singleton — compiled once)
+# AGENT GRAPH (compiled once, via agents.registry)
 # ========================================
 
-_sales_agent_singleton = None
-
-
 def _get_sales_agent(checkpointer=None):
-    """Return the compiled sales agent, building it once as a module-level singleton."""
-    global _sales_agent_singleton
-    if _sales_agent_singleton is not None and checkpointer is None:
-        return _sales_agent_singleton
+    """Return the compiled sales agent (shared); a checkpointer gets its own graph."""
+    if checkpointer is None:
+        return agent_registry.get("sales")
+    return _build_sales_agent(checkpointer)
+
 
-    llm = ChatOpenAI(model=LLM_MODEL, temperature=LLM_TEMPERATURE)
+def _build_sales_agent(checkpointer=None):
+    """Build and compile the sales agent graph."""
+    llm = get_chat_model(LLM_MODEL, LLM_TEMPERATURE)
     llm_with_tools = llm.bind_tools(ALL_TOOLS)
     tools_dict = {t.name: t for t in ALL_TOOLS}
 
@@ -214,7 +218,7 @@ def _get_sales_agent(checkpointer=None):
                 "is_bulk_order", "special_requests", "budget_range",
             ) and v
         }
-        info_context = f"\n\n## Customer Context\n{ctx_fields}"
+        info_context = f"## Customer Context\n{ctx_fields}"
 
         # ── Duration rule (mandatory injection) ──
         duration = collected.get("duration_months")
@@ -238,6 +242,12 @@ def _get_sales_agent(checkpointer=None):
             if cart_product_ids:
                 break
 
+        # ...or, once that turn was compacted out of the state, the args it left behind
+        if not cart_product_ids:
+            last_quote = (collected.get("_last_tool_calls") or {}).get("create_quote_tool") or {}
+            cart_product_ids = last_quote.get("product_ids")
+            cart_duration = last_quote.get("duration", duration or 12)
+
         if cart_product_ids:
             info_context += (
                 f"\n\n## RULE — CART ALREADY BUILT"
@@ -246,23 +256,21 @@ def _get_sales_agent(checkpointer=None):
                 f"\nDo NOT approximate or change these values."
             )
 
-        full_prompt = SYSTEM_PROMPT + info_context
-        response = llm_with_tools.invoke([SystemMessage(content=full_prompt)] + messages)
+        # Recent turns verbatim, older ones summarized, stale tool outputs cut (token budget).
+        # SYSTEM_PROMPT (+ tool schemas) stays a byte-identical, cacheable prefix;
+        # the per-customer context goes last, right before the current message.
+        response = llm_with_tools.invoke(
+            context_window.build(SYSTEM_PROMPT, messages, collected, agent="sales", context=info_context))
+        prompt_usage.record_message("sales", response)
         return {"messages": [response]}
 
     # ---- Node: execute tools ----
     def execute_tools(state: ConversationState) -> Dict[str, Any]:
         last_message = state["messages"][-1]
-        results = []
         for tc in last_message.tool_calls:
-            tool_name = tc["name"]
-            print(f"  Tool: {tool_name}")
-            try:
-                result = tools_dict[tool_name].invoke(tc["args"]) if tool_name in tools_dict else f"Tool '{tool_name}' not found."
-            except Exception as e:
-                result = f"Error executing {tool_name}: {str(e)}"
-            results.append(ToolMessage(tool_call_id=tc["id"], name=tool_name, content=str(result)))
-        return {"messages": results}
+            print(f"  Tool: {tc['name']}")
+        # Independent calls run concurrently; results come back in call order
+        return {"messages": tool_runner.run(last_message.tool_calls, tools_dict)}
 
     # ---- Edge: loop or end ----
     def should_continue(state: ConversationState) -> str:
@@ -279,12 +287,11 @@ def _get_sales_agent(checkpointer=None):
     graph.add_conditional_edges("agent", should_continue, {"tools": "tools", "end": END})
     graph.add_edge("tools", "agent")
 
-    compiled = graph.compile(checkpointer=checkpointer, recursion_limit=10)
+    # compile() takes no recursion_limit; bind it as run config instead
+    return graph.compile(checkpointer=checkpointer).with_config(recursion_limit=10)
 
-    if checkpointer is None:
-        _sales_agent_singleton = compiled
 
-    return compiled
+agent_registry.register("sales", _build_sales_agent)
 
 
 # ========================================
@@ -297,10 +304,18 @@ def create_sales_agent(checkpointer=None):
 
 # ========================================
 
-def run_agent(user_message: str, state: ConversationState = None) -> tuple[str, ConversationState]:
+def run_agent(
+    user_message: str,
+    state: ConversationState = None,
+    on_segment: Optional[Callable[[str], None]] = None,
+    on_progress: Optional[Callable[[], None]] = None,
+) -> tuple[str, ConversationState]:
     """
     Run the sales agent for one user turn.
 
+    With on_segment, the reply is streamed: each "|||" segment is passed to
+    on_segment as soon as the model has written it (see agents/streaming.py).
+
     Returns:
         Tuple of (response string, updated state)
     """
@@ -310,7 +325,10 @@ def run_agent(user_message: str, state: ConversationState = None) -> tuple[str,
     state["messages"] = list(state["messages"]) + [HumanMessage(content=user_message)]
 
     agent = _get_sales_agent()
-    result = agent.invoke(state)
+    if on_segment:
+        result = stream_agent(agent, state, on_segment, on_progress)
+    else:
+        result = agent.invoke(state)
 
     response = result["messages"][-1].content
     return response, result
@@ -0,0 +1,103 @@
+# Streaming agent replies for RentBasket WhatsApp Bot "Ku"
+# Sends each "|||"-separated part of a reply as soon as the model has written it.
+#
+# Replies used to come from llm_with_tools.invoke and went out only after the
+# whole graph finished, so for a multi-part answer the customer waited for
+# every part. In streaming mode the compiled graph is run with
+# agent.stream(stream_mode=["messages", "values"]): the model's tokens arrive
+# as they are generated, and every segment that closes (a "|||" is seen) is
+# handed to on_segment right away. The last segment is completed by the graph
+# finishing and is sent by the caller with the rest of the reply.
+#
+# Only the message that ends the turn is the reply: text in a message that
+# calls tools was never shown to the customer, so once a message carries
+# tool-call chunks the rest of its text is discarded.
+
+from typing import Callable, List, Optional
+
+from langchain_core.messages import AIMessage
+
+from agents.state import ConversationState
+
+SEGMENT_SEPARATOR = "|||"
+
+
+class SegmentStream:
+    """
+    Cuts streamed reply text into SEGMENT_SEPARATOR-separated segments.
+
+    Usage:
+        stream = SegmentStream(on_segment=send)
+        for token in tokens:
+            stream.feed(token)      # send("part 1") as soon as "part 1|||" is complete
+        stream.flushed              # segments of the current message already handed off
+    """
+
+    def __init__(self, on_segment: Callable[[str], None], separator: str = SEGMENT_SEPARATOR):
+        self.on_segment = on_segment
+        self.separator = separator
+        self.flushed = 0
+        self.segments: List[str] = []
+        self._buffer = ""
+        self._discarding = False
+
+    def new_message(self) -> None:
+        """A new model message starts: segments are counted from it on."""
+        self._buffer = ""
+        self.flushed = 0
+        self._discarding = False
+
+    def discard_message(self) -> None:
+        """The current message calls tools: none of its text is part of the reply."""
+        self._buffer = ""
+        self.flushed = 0
+        self._discarding = True
+
+    def feed(self, text: str) -> None:
+        if not text or self._discarding:
+            return
+        self._buffer += text
+        while self.separator in self._buffer:
+            segment, self._buffer = self._buffer.split(self.separator, 1)
+            self.flushed += 1
+            self.segments.append(segment)
+            self.on_segment(segment)
+
+
+def stream_agent(
+    agent,
+    state: ConversationState,
+    on_segment: Callable[[str], None],
+    on_progress: Optional[Callable[[], None]] = None,
+) -> ConversationState:
+    """
+    Run a compiled agent graph, streaming its reply segments to on_segment.
+
+    Returns the final state, like agent.invoke(state). The number of segments of
+    the final reply already handed off is stored as state["_streamed_segments"]
+    (the caller sends only the rest). on_progress is called after every graph
+    step, e.g. to keep a typing indicator alive while tools run.
+    """
+    stream = SegmentStream(on_segment)
+    final_state = state
+    message_id = None
+
+    for mode, payload in agent.stream(state, stream_mode=["messages", "values"]):
+        if mode == "values":
+            final_state = payload
+            if on_progress:
+                on_progress()
+            continue
+        chunk, metadata = payload
+        if not isinstance(chunk, AIMessage) or not isinstance(chunk.content, str):
+            continue
+        if chunk.id != message_id:
+            message_id = chunk.id
+            stream.new_message()
+        if getattr(chunk, "tool_call_chunks", None) or chunk.tool_calls:
+            stream.discard_message()
+        stream.feed(chunk.content)
+
+    final_state = dict(final_state)
+    final_state["_streamed_segments"] = stream.flushed
+    return final_state
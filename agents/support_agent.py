@@ -16,6 +16,7 @@ from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
 from config import LLM_MODEL, LLM_TEMPERATURE, BOT_NAME
 from agents.state import ConversationState, create_initial_state
+from agents.registry import agent_registry, get_chat_model
 from tools.support_tools import log_support_ticket_tool, retrieve_support_policy_tool
 from tools.support_escalation import escalate_support_issue_tool
 
@@ -174,11 +175,18 @@ def run_support_agent(user_message: str, state: ConversationState = None) -> tup
     return response_text, state
 
 
+def _policy_llm() -> ChatOpenAI:
+    return get_chat_model(LLM_MODEL, 0.1)  # Low temp for strict policy adherence
+
+
+agent_registry.register("support_policy", lambda: _policy_llm().bind_tools([retrieve_support_policy_tool]))
+
+
 def call_policy_llm(state: ConversationState) -> str:
     """Invokes the LLM strictly to look up policies and formulate a polite response."""
     try:
-        llm = ChatOpenAI(model=LLM_MODEL, temperature=0.1) # Low temp for strict policy adherence
-        llm_with_tools = llm.bind_tools([retrieve_support_policy_tool])
+        llm = _policy_llm()
+        llm_with_tools = agent_registry.get("support_policy")
         
         issue_type = state["support_context"].get("issue_type", "general")
         desc = state["support_context"].get("issue_description", "")
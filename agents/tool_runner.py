@@ -0,0 +1,179 @@
+# Parallel tool execution for RentBasket WhatsApp Bot "Ku"
+# Runs the tool calls of one LLM step concurrently on a bounded pool.
+#
+# execute_tools in the sales and recommendation agents ran tool calls one
+# after another, so check_serviceability_tool (RentBasket API),
+# sync_lead_data_tool (Firestore) and generate_cart_link_tool in the same step
+# added their latencies up. Calls now run concurrently on one shared,
+# fixed-size pool, each with its own timeout, and their ToolMessages come back
+# in the order the model issued the calls.
+#
+# Where order matters, a call can depend on tool names: it then starts only
+# after the earlier calls (in the same step) to those tools have finished.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from langchain_core.messages import ToolMessage
+
+DEFAULT_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "20"))
+
+# tool name -> tools whose earlier calls in the same step must finish first
+TOOL_DEPENDENCIES: Dict[str, Sequence[str]] = {
+    # several writes to the same lead document in one step: the last one must win
+    "sync_lead_data_tool": ("sync_lead_data_tool",),
+}
+
+
+class ToolRunner:
+    """
+    Bounded, shared executor for agent tool calls.
+
+    Usage (inside execute_tools):
+        results = tool_runner.run(last_message.tool_calls, tools_dict)
+        return {"messages": results}
+
+    `synchronous = True` runs the calls inline, in order (used by the tests).
+    A call that times out gets an error ToolMessage; its thread can't be
+    cancelled and finishes in the background, still holding a worker.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        dependencies: Optional[Mapping[str, Sequence[str]]] = None,
+        name: str = "agent-tools",
+    ):
+        self.workers = max(1, workers)
+        self.timeout_seconds = timeout_seconds
+        self.dependencies = dict(TOOL_DEPENDENCIES if dependencies is None else dependencies)
+        self.name = name
+        self.synchronous = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._counters = {"steps": 0, "calls": 0, "errors": 0, "timeouts": 0, "step_ms": 0.0, "serial_ms": 0.0}
+        self._per_tool: Dict[str, Dict[str, float]] = {}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def _invoke(self, tools: Mapping[str, Any], tc: Dict[str, Any], timing: Dict[str, float]) -> str:
+        started = time.perf_counter()
+        try:
+            tool = tools.get(tc["name"])
+            if tool is None:
+                return f"Tool '{tc['name']}' not found."
+            return str(tool.invoke(tc["args"]))
+        except Exception as e:
+            timing["error"] = 1
+            return f"Error executing {tc['name']}: {str(e)}"
+        finally:
+            timing["ms"] = (time.perf_counter() - started) * 1000
+
+    def _prerequisites(self, tool_calls: Sequence[Dict[str, Any]]) -> List[List[int]]:
+        """For each call, the indices of the earlier calls it must wait for."""
+        needs = []
+        for i, tc in enumerate(tool_calls):
+            after = set(self.dependencies.get(tc["name"], ()))
+            needs.append([j for j in range(i) if tool_calls[j]["name"] in after])
+        return needs
+
+    def run(
+        self,
+        tool_calls: Sequence[Dict[str, Any]],
+        tools: Mapping[str, Any],
+        timeout_seconds: Optional[float] = None,
+    ) -> List[ToolMessage]:
+        """Run one step's tool calls; returns their ToolMessages in call order."""
+        timeout = self.timeout_seconds if timeout_seconds is None else timeout_seconds
+        timings: List[Dict[str, float]] = [{} for _ in tool_calls]
+        step_started = time.perf_counter()
+
+        if self.synchronous:
+            contents = [self._invoke(tools, tc, timings[i]) for i, tc in enumerate(tool_calls)]
+        else:
+            contents = self._run_parallel(tool_calls, tools, timings, timeout)
+
+        self._record(tool_calls, timings, (time.perf_counter() - step_started) * 1000)
+        return [
+            ToolMessage(tool_call_id=tc["id"], name=tc["name"], content=content)
+            for tc, content in zip(tool_calls, contents)
+        ]
+
+    def _run_parallel(self, tool_calls, tools, timings, timeout) -> List[str]:
+        pool = self._pool()
+        needs = self._prerequisites(tool_calls)
+        futures, depth = [], []
+        for i, tc in enumerate(tool_calls):
+            # prerequisites were submitted earlier, so FIFO workers start them first
+            waits_for = [futures[j] for j in needs[i]]
+            depth.append(1 + max((depth[j] for j in needs[i]), default=0))
+
+            def task(tc=tc, timing=timings[i], waits_for=waits_for):
+                wait(waits_for)
+                return self._invoke(tools, tc, timing)
+
+            futures.append(pool.submit(task))
+
+        step_started = time.monotonic()
+        contents = []
+        for i, (tc, future) in enumerate(zip(tool_calls, futures)):
+            # each call gets its own timeout; a dependent one also its prerequisites'
+            remaining = step_started + timeout * depth[i] - time.monotonic()
+            try:
+                contents.append(future.result(timeout=max(0.0, remaining)))
+            except Exception:
+                timings[i]["timeout"] = 1
+                timings[i].setdefault("ms", timeout * 1000)
+                contents.append(f"Error executing {tc['name']}: timed out after {timeout:g}s")
+        return contents
+
+    def _record(self, tool_calls, timings, step_ms: float) -> None:
+        with self._lock:
+            self._counters["steps"] += 1
+            self._counters["step_ms"] += step_ms
+            for tc, timing in zip(tool_calls, timings):
+                ms = timing.get("ms", 0.0)
+                per = self._per_tool.setdefault(
+                    tc["name"], {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+                per["calls"] += 1
+                per["errors"] += timing.get("error", 0)
+                per["timeouts"] += timing.get("timeout", 0)
+                per["total_ms"] += ms
+                per["max_ms"] = max(per["max_ms"], ms)
+                self._counters["calls"] += 1
+                self._counters["errors"] += timing.get("error", 0)
+                self._counters["timeouts"] += timing.get("timeout", 0)
+                self._counters["serial_ms"] += ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "timeout_seconds": self.timeout_seconds,
+                **{k: round(v, 2) if isinstance(v, float) else v for k, v in self._counters.items()},
+                # time the steps would have taken running their calls one after another
+                "saved_ms": round(self._counters["serial_ms"] - self._counters["step_ms"], 2),
+                "tools": {
+                    name: {**per, "total_ms": round(per["total_ms"], 2), "max_ms": round(per["max_ms"], 2),
+                           "avg_ms": round(per["total_ms"] / per["calls"], 2)}
+                    for name, per in self._per_tool.items()
+                },
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+tool_runner = ToolRunner()
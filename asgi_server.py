@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+RentBasket WhatsApp Bot "Ku" - Async Webhook Front End (ASGI)
+
+asyncio-native entry point for POST /webhook. Meta retries any delivery it
+thinks was not acknowledged in time, so this front end acknowledges as soon as
+the payload is parsed and de-duplicated — before the read receipt, greeting /
+bye sends, browse handling or any agent work. That work then runs as an
+awaited task (blocking calls go through a bounded executor, heavy agent turns
+through the message dispatcher), one phone at a time in arrival order.
+
+Every other route (GET /webhook verification, /logs, /catalogue, /stats, ...)
+is served by the existing Flask app through uvicorn's WSGI bridge.
+
+Usage:
+    uvicorn asgi_server:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+import flask
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+import webhook_server_revised as server
+
+INLINE_WORKERS = int(os.getenv("ASYNC_INLINE_WORKERS", "8"))
+MAX_BODY_BYTES = 1024 * 1024  # WhatsApp webhook payloads are a few KB
+_ACK_SAMPLES = 500
+
+
+async def _read_body(receive) -> bytes:
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _send_json(send, status: int, body: Dict[str, Any]) -> None:
+    data = json.dumps(body).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(data)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": data})
+
+
+class AsyncWebhookApp:
+    """
+    ASGI application: fast-path POST /webhook, everything else delegated to Flask.
+
+    The ack decision (parse, saturation check, de-dup) is pure in-memory work,
+    so the acknowledgement latency does not depend on the Graph API, OpenAI or
+    Firestore. Saturation (global and the phone's own lane) is checked before
+    claiming the message ID so that a deferred (503) delivery is processed
+    normally when Meta retries it. If the dispatcher fills up between the ack
+    and the hand-off, _dispatch waits for room (see g.delivery_acked); a
+    message that still can't be queued is counted as dropped.
+    """
+
+    def __init__(self, flask_app, workers: int = INLINE_WORKERS):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="async-inline")
+        self._phone_locks: Dict[str, list] = {}  # phone -> [asyncio.Lock, users]
+        self._tasks = set()
+        self._ack_samples: deque = deque(maxlen=_ACK_SAMPLES)
+        self._counters = {"accepted": 0, "duplicate": 0, "deferred": 0, "ignored": 0, "rejected": 0,
+                          "failed": 0, "dropped": 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http" and scope["path"] == "/webhook" and scope["method"] == "POST":
+            await self._handle_webhook(receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    # ------------------------------------------------------------------
+    # Fast path
+    # ------------------------------------------------------------------
+
+    async def _handle_webhook(self, receive, send) -> None:
+        started = time.perf_counter()
+        try:
+            body = await _read_body(receive)
+            status, reply, message_data = self._ack_decision(body)
+        except Exception as e:
+            status, reply, message_data = 400, {"status": "error", "message": str(e)}, None
+            self._counters["rejected"] += 1
+
+        await _send_json(send, status, reply)
+        self._ack_samples.append(time.perf_counter() - started)
+
+        if message_data is not None:
+            task = asyncio.create_task(self._process(message_data))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _ack_decision(self, body: bytes):
+        """Return (status, reply, message_data-to-process or None) without any I/O."""
+        payload = json.loads(body or b"{}")
+        message_data = server.parse_whatsapp_webhook(payload)
+        if not message_data:
+            server.record_delivery_statuses(payload)
+            self._counters["ignored"] += 1
+            return 200, {"status": "no_message"}, None
+
+        if server.message_dispatcher.is_saturated(message_data["from_phone"]):
+            self._counters["deferred"] += 1
+            return 503, {"status": "deferred", "reason": "dispatcher_saturated"}, None
+
+        if not server.claim_message_id(message_data.get("message_id")):
+            self._counters["duplicate"] += 1
+            return 200, {"status": "duplicate"}, None
+
+        self._counters["accepted"] += 1
+        return 200, {"status": "accepted"}, message_data
+
+    # ------------------------------------------------------------------
+    # Background processing
+    # ------------------------------------------------------------------
+
+    async def _process(self, message_data: Dict[str, Any]) -> None:
+        """Run the shared inbound pipeline for one message, FIFO per phone."""
+        phone = message_data["from_phone"]
+        entry = self._phone_locks.setdefault(phone, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._executor, self._run_inline, message_data)
+        except Exception as e:
+            self._counters["failed"] += 1
+            print(f"❌ Async webhook processing failed for {phone}: {e}")
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._phone_locks.pop(phone, None)
+
+    def _run_inline(self, message_data: Dict[str, Any]) -> None:
+        with self.flask_app.app_context():
+            flask.g.delivery_acked = True     # Meta has its 200: _dispatch must not defer
+            result = server.handle_inbound_message(message_data)
+        status = result[1] if isinstance(result, tuple) else 200
+        if status != 200:
+            self._counters["dropped"] += 1
+            print(f"❌ Acknowledged message {message_data.get('message_id')} from "
+                  f"{message_data['from_phone']} was not processed (status {status})")
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Wait for in-flight background tasks (used on shutdown and in tests)."""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+    # ------------------------------------------------------------------
+    # Lifespan / stats
+    # ------------------------------------------------------------------
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if server.timer_scheduler.autostart:
+                    server.timer_scheduler.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.drain(timeout=10)
+                await asyncio.get_running_loop().run_in_executor(None, server.whatsapp_client.flush, 10)
+                self._executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        acks = sorted(self._ack_samples)
+        n = len(acks)
+        return {
+            "in_flight": len(self._tasks),
+            "phones_in_flight": len(self._phone_locks),
+            **self._counters,
+            "ack_ms": {
+                "p50": round(acks[n // 2] * 1000, 3) if n else 0.0,
+                "p95": round(acks[min(n - 1, int(n * 0.95))] * 1000, 3) if n else 0.0,
+                "max": round(acks[-1] * 1000, 3) if n else 0.0,
+            },
+        }
+
+
+app = AsyncWebhookApp(server.app)
+server.register_stats_provider("async_front_end", app.stats)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("asgi_server:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
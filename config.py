@@ -17,6 +17,12 @@ WHATSAPP_ACCESS_TOKEN = os.getenv("ACCESS_TOKEN", "")
 WHATSAPP_VERIFY_TOKEN = os.getenv("VERIFY_TOKEN", "12345")
 WHATSAPP_VERSION = os.getenv("VERSION", "v23.0")
 
+# Graph API HTTP client (pooled keep-alive session, see whatsapp/client.py)
+WHATSAPP_POOL_SIZE = int(os.getenv("WHATSAPP_POOL_SIZE", "20"))            # keep-alive connections per host
+WHATSAPP_CONNECT_TIMEOUT = float(os.getenv("WHATSAPP_CONNECT_TIMEOUT", "3.05"))
+WHATSAPP_READ_TIMEOUT = float(os.getenv("WHATSAPP_READ_TIMEOUT", "10"))
+WHATSAPP_MAX_RETRIES = int(os.getenv("WHATSAPP_MAX_RETRIES", "3"))         # retries on 429 / 5xx
+
 # ========================================
 # PRICING / DISCOUNTS (single source of truth)
 # ========================================
@@ -37,12 +43,40 @@ LLM_MODEL = "gpt-4o-mini"
 LLM_TEMPERATURE = 0.3  # Slightly creative but consistent
 EMBEDDING_MODEL = "text-embedding-3-small"
 
+# Per-call prompt budget for the agents (see agents/context_window.py)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))   # system prompt + history
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))          # turns sent verbatim (incl. current)
+CONTEXT_MAX_STATE_TURNS = int(os.getenv("CONTEXT_MAX_STATE_TURNS", "12"))  # turns kept in conversation state
+
 # ========================================
 # RAG CONFIGURATION
 # ========================================
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
 RETRIEVER_K = 3  # Number of chunks to retrieve
+# Persisted knowledge-base index (chunk IDs are content hashes; see rag/vectorstore.py)
+VECTOR_DB_DIRECTORY = os.getenv(
+    "VECTOR_DB_DIRECTORY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chroma_db"),
+)
+KNOWLEDGE_COLLECTION = "rentbasket_knowledge"
+# Query-embedding cache (memory LRU + this SQLite file; see rag/embedding_cache.py)
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "embedding_cache.sqlite3"),
+)
+# Write-behind Firestore logging (batched commits, SQLite spool; see utils/write_behind.py)
+FIRESTORE_WRITE_BEHIND = os.getenv("FIRESTORE_WRITE_BEHIND", "true").lower() == "true"
+FIRESTORE_FLUSH_SECONDS = float(os.getenv("FIRESTORE_FLUSH_SECONDS", "1.0"))
+FIRESTORE_SPOOL_PATH = os.getenv(
+    "FIRESTORE_SPOOL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "firestore_spool.sqlite3"),
+)
+# In-process NumPy indexes (float32 matrices, mmap-loaded; see rag/vector_index.py)
+VECTOR_INDEX_DIRECTORY = os.getenv(
+    "VECTOR_INDEX_DIRECTORY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vector_index"),
+)
 
 # ========================================
 # COMPANY CONTACT INFO & OFFICES
@@ -97,6 +131,10 @@ RENTBASKET_JWT = os.getenv(
 # ========================================
 import os as _os
 LOGS_DIRECTORY = _os.path.join(_os.path.dirname(_os.path.abspath(__file__)), "logs")
+# "segments": buffered, compressed, rotating segment files (utils/log_segments.py)
+# "text": one logs/<phone>.txt per customer, appended line by line
+LOG_FORMAT = _os.getenv("LOG_FORMAT", "segments").lower()
+LOG_SEGMENTS_DIRECTORY = _os.getenv("LOG_SEGMENTS_DIRECTORY", _os.path.join(LOGS_DIRECTORY, "segments"))
 
 # ========================================
 # BOT PERSONALITY
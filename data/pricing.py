@@ -0,0 +1,228 @@
+# Pricing engine for the RentBasket catalogue
+#
+# id_to_price rows become one (products x duration tiers) int64 matrix at
+# import, with the discounted (GLOBAL_DISCOUNT) and upfront
+# (UPFRONT_EXTRA_DISCOUNT on top) columns precomputed. Duration -> tier
+# branching lives in tier_index() only; quotes, GST, security deposit and
+# budget filters are array operations over the matrix.
+#
+# Rounding is exactly what the call sites did before (Python round, i.e.
+# half-to-even, on the same float expressions), so rupee totals are unchanged:
+# - discount(mrp)         int(round(mrp * RETAINED_FACTOR))
+# - upfront_price(mrp)    int(round(mrp * RETAINED_FACTOR * UPFRONT_RETAINED_FACTOR))
+# - apply_upfront(disc)   int(round(disc * UPFRONT_RETAINED_FACTOR))  (already rounded rent)
+
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import GLOBAL_DISCOUNT, UPFRONT_EXTRA_DISCOUNT
+
+# Tier columns: 1 day, 8 days, 15 days, 30 days, 60 days, 3, 6, 9, 12+ months
+TIERS = 9
+TWELVE_MONTH_TIER = 8
+GST_RATE = 0.18
+SECURITY_MULTIPLIER = 2
+SECURITY_CAP = 15000
+
+
+def tier_index(duration: int, unit: str = "months") -> int:
+    """Price column for a rental duration (short-term days or long-term months)."""
+    if unit == "days":
+        if duration < 8:
+            return 0  # 1 day rate (1-7 days)
+        if duration < 15:
+            return 1  # 8 day rate (8-14 days)
+        if duration < 30:
+            return 2  # 15 day rate (15-29 days)
+        if duration < 60:
+            return 3  # 30 day rate (30-59 days)
+        return 4      # 60 day rate
+    if duration < 3:
+        return 3      # Fallback to 30d short term if < 3 months requested in months
+    if duration < 6:
+        return 5      # 3 month rate
+    if duration < 9:
+        return 6      # 6 month rate (includes 8 months per requirement)
+    if duration < 12:
+        return 7      # 9 month rate
+    return 8          # 12+ month rate (up to 24 months)
+
+
+class PricingEngine:
+    """
+    Vectorized catalogue pricing.
+
+    Usage:
+        pricing = PricingEngine(id_to_price)
+        pricing.rent(1042, 12)                       # MRP per month
+        quote = pricing.quote({1042: 1, 11: 2}, 12)  # totals, GST, deposit
+        pricing.filter_by_budget(0, 1500)            # product IDs by best price
+        pricing.version                              # changes with prices / discounts
+    """
+
+    def __init__(self, id_to_price: Dict[int, Sequence[int]],
+                 discount: float = GLOBAL_DISCOUNT, upfront_discount: float = UPFRONT_EXTRA_DISCOUNT):
+        self.reload(id_to_price, discount, upfront_discount)
+
+    def reload(self, id_to_price: Dict[int, Sequence[int]],
+               discount: float = GLOBAL_DISCOUNT, upfront_discount: float = UPFRONT_EXTRA_DISCOUNT) -> None:
+        """Rebuild the matrices in place (callers holding this engine see the new prices)."""
+        self.retained = 1 - discount
+        self.upfront_retained = 1 - upfront_discount
+        self.product_ids = np.array(list(id_to_price), dtype=np.int64)
+        self._row = {pid: i for i, pid in enumerate(id_to_price)}
+
+        # Legacy rows with fewer tiers repeat their last price (calculate_rent's prices[-1] fallback)
+        self.mrp = np.array(
+            [[prices[min(t, len(prices) - 1)] for t in range(TIERS)] for prices in id_to_price.values()],
+            dtype=np.int64,
+        ).reshape(len(id_to_price), TIERS)
+        self.discounted = np.rint(self.mrp * self.retained).astype(np.int64)
+        self.upfront = np.rint(self.mrp * self.retained * self.upfront_retained).astype(np.int64)
+
+        # Pricing-config version: anything cached from a quote is keyed on this
+        digest = hashlib.sha1(repr((self.retained, self.upfront_retained)).encode())
+        digest.update(self.product_ids.tobytes())
+        digest.update(self.mrp.tobytes())
+        self.version = digest.hexdigest()[:12]
+
+    def __contains__(self, product_id: int) -> bool:
+        return product_id in self._row
+
+    # ------------------------------------------------------------------
+    # Scalar helpers (the formulas every call site shares)
+    # ------------------------------------------------------------------
+
+    def discount(self, mrp: int) -> int:
+        """Flat GLOBAL_DISCOUNT off an MRP (per unit or a whole cart)."""
+        return int(round(mrp * self.retained)) if mrp else 0
+
+    def upfront_price(self, mrp: int, extra_percent: Optional[int] = None) -> int:
+        """GLOBAL_DISCOUNT then the upfront discount, rounded once."""
+        if not mrp:
+            return 0
+        extra = self.upfront_retained if extra_percent is None else (100 - extra_percent) / 100
+        return int(round(mrp * self.retained * extra))
+
+    def apply_upfront(self, discounted: int) -> int:
+        """Upfront discount on an already discounted (rounded) rent."""
+        return int(round(discounted * self.upfront_retained))
+
+    @staticmethod
+    def gst(amount: int) -> int:
+        return int(round(amount * GST_RATE))
+
+    @staticmethod
+    def security_deposit(monthly_rent: int) -> int:
+        return min(int(round(monthly_rent * SECURITY_MULTIPLIER)), SECURITY_CAP)
+
+    def cart_totals(self, original_monthly: int, duration: int) -> Tuple[int, int]:
+        """(discounted_monthly, savings_total) for a cart, discounting the MRP total once."""
+        discounted_monthly = self.discount(original_monthly)
+        return discounted_monthly, max(0, (original_monthly - discounted_monthly) * int(duration))
+
+    # ------------------------------------------------------------------
+    # Catalogue lookups
+    # ------------------------------------------------------------------
+
+    def rent(self, product_id: int, duration: int, unit: str = "months") -> Optional[int]:
+        """MRP per month (or per period for days) for one product; None if unknown."""
+        row = self._row.get(product_id)
+        if row is None:
+            return None
+        return int(self.mrp[row, tier_index(duration, unit)])
+
+    def discounted_rent(self, product_id: int, duration: int, unit: str = "months") -> Optional[int]:
+        row = self._row.get(product_id)
+        if row is None:
+            return None
+        return int(self.discounted[row, tier_index(duration, unit)])
+
+    def best_price(self, product_id: int) -> int:
+        """12-month rent with both discounts (the catalogue's 'starting from' price)."""
+        row = self._row.get(product_id)
+        return int(self.upfront[row, TWELVE_MONTH_TIER]) if row is not None else 0
+
+    def rows(self, product_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """(row indices, mask of known IDs) for a batch of product IDs."""
+        ids = list(product_ids)
+        rows = np.fromiter((self._row.get(pid, -1) for pid in ids), dtype=np.int64, count=len(ids))
+        return rows, rows >= 0
+
+    def rents(self, product_ids: Iterable[int], duration: int, unit: str = "months") -> np.ndarray:
+        """MRP column for a batch of product IDs (0 for unknown IDs)."""
+        rows, known = self.rows(product_ids)
+        out = np.zeros(len(rows), dtype=np.int64)
+        out[known] = self.mrp[rows[known], tier_index(duration, unit)]
+        return out
+
+    # ------------------------------------------------------------------
+    # Batched quotes
+    # ------------------------------------------------------------------
+
+    def quote(self, items: Union[Dict[int, int], Sequence[int]], duration: int,
+              unit: str = "months") -> Dict[str, Any]:
+        """
+        Price a cart in one pass.
+
+        Args:
+            items: {product_id: qty} or a list of product IDs (repeats = quantity)
+            duration: Rental duration
+            unit: "months" or "days"
+
+        Returns:
+            dict with per-line "lines" (product_id, qty, original_rent,
+            monthly_rent, upfront_rent) and totals: total_original,
+            total_discounted, total_savings, gst_amount, grand_total,
+            security_deposit. Unknown product IDs are skipped.
+        """
+        if isinstance(items, dict):
+            pairs = list(items.items())
+        else:
+            pairs = [(pid, 1) for pid in items]
+        rows, known = self.rows(pid for pid, _ in pairs)
+        pids = [pid for (pid, _), ok in zip(pairs, known) if ok]
+        rows = rows[known]
+        qty = np.array([q for (_, q), ok in zip(pairs, known) if ok], dtype=np.int64)
+
+        tier = tier_index(duration, unit)
+        mrp = self.mrp[rows, tier]
+        disc = self.discounted[rows, tier]
+        upfront = self.upfront[rows, tier]
+
+        total_original = int(mrp @ qty) if len(qty) else 0
+        total_discounted = int(disc @ qty) if len(qty) else 0
+        gst = self.gst(total_discounted)
+        return {
+            "lines": [
+                {"product_id": pid, "qty": int(q), "original_rent": int(m),
+                 "monthly_rent": int(d), "upfront_rent": int(u)}
+                for pid, q, m, d, u in zip(pids, qty, mrp, disc, upfront)
+            ],
+            "total_original": total_original,
+            "total_discounted": total_discounted,
+            "total_savings": total_original - total_discounted,
+            "gst_amount": gst,
+            "grand_total": total_discounted + gst,
+            "security_deposit": self.security_deposit(total_discounted),
+            "duration": duration,
+            "unit": unit,
+        }
+
+    def filter_by_budget(self, min_budget: int, max_budget: int,
+                         product_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """Product IDs whose best price is within [min_budget, max_budget], in catalogue order."""
+        best = self.upfront[:, TWELVE_MONTH_TIER]
+        mask = (best >= min_budget) & (best <= max_budget)
+        if product_ids is not None:
+            rows, known = self.rows(product_ids)
+            allowed = np.zeros(len(best), dtype=bool)
+            allowed[rows[known]] = True
+            mask &= allowed
+        return [int(pid) for pid in self.product_ids[mask]]
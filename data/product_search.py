@@ -0,0 +1,236 @@
+# Precompiled search index for search_products_by_name
+#
+# The original search was a linear scan on every call: every category key,
+# every synonym, every product name and every variant, re-stemming words
+# each time. The catalogue is static, so this index is built once at import
+# (data/products.py) and answers the same questions with lookups:
+#
+# - "x in text"  -> sorted suffix list + bisect (which texts contain x)
+# - "text in x"  -> trie of texts walked from every offset of the query
+# - word match   -> trie of target words: terminals along the query word's
+#                   path (target word is a prefix of it) plus the subtree
+#                   below it (it is a prefix of a target word)
+# - stems        -> _normalize_query_word precomputed for the vocabulary
+#
+# Matches are int bitsets over the original iteration order, so results come
+# back in exactly the order (and with exactly the de-duplication) of the scan.
+
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence
+
+FILLER_WORDS = frozenset({"of", "for", "the", "a", "an", "with", "in", "on", "to", "my", "also", "and"})
+MIN_WORD_LEN = 3          # _words_match ignores query / target words of 2 chars or less
+_MAX_CACHED = 4096
+_TOP = "\U0010ffff"
+
+
+def _bits(mask: int) -> Iterator[int]:
+    """Set bit positions, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class _SubstringIndex:
+    """Which texts contain a substring: every suffix of every text, sorted."""
+
+    def __init__(self, texts: Sequence[str], owners: Sequence[int]):
+        entries = sorted((text[i:], owner) for text, owner in zip(texts, owners) for i in range(len(text)))
+        self._suffixes = [suffix for suffix, _ in entries]
+        self._owners = [owner for _, owner in entries]
+        self._all = 0
+        for owner in owners:
+            self._all |= 1 << owner
+        self._cache: Dict[str, int] = {}
+
+    def mask(self, query: str) -> int:
+        if not query:
+            return self._all      # "" is in every text
+        cached = self._cache.get(query)
+        if cached is not None:
+            return cached
+        lo = bisect_left(self._suffixes, query)
+        hi = bisect_left(self._suffixes, query + _TOP, lo)
+        mask = 0
+        for owner in self._owners[lo:hi]:
+            mask |= 1 << owner
+        if len(self._cache) >= _MAX_CACHED:
+            self._cache.clear()
+        self._cache[query] = mask
+        return mask
+
+
+class _Trie:
+    """Character trie; each node keeps the bitset of strings ending at / below it."""
+
+    __slots__ = ("children", "terminal", "subtree")
+
+    def __init__(self):
+        self.children: Dict[str, "_Trie"] = {}
+        self.terminal = 0
+        self.subtree = 0
+
+    def insert(self, text: str, bit: int) -> None:
+        node = self
+        node.subtree |= bit
+        for ch in text:
+            node = node.children.setdefault(ch, _Trie())
+            node.subtree |= bit
+        node.terminal |= bit
+
+    def prefix_related(self, word: str) -> int:
+        """Strings that are a prefix of word, or that word is a prefix of."""
+        node, mask = self, self.terminal
+        for ch in word:
+            node = node.children.get(ch)
+            if node is None:
+                return mask
+            mask |= node.terminal
+        return mask | node.subtree
+
+    def contained_in(self, text: str) -> int:
+        """Strings that occur somewhere inside text."""
+        mask = 0
+        for start in range(len(text)):
+            node = self
+            for ch in text[start:]:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+                mask |= node.terminal
+        return mask
+
+
+class _WordMatcher:
+    """Bitset version of products._words_match over a list of targets."""
+
+    def __init__(self, targets: Sequence[str], stem: Callable[[str], str]):
+        self._stem = stem
+        self._substrings = _SubstringIndex(targets, range(len(targets)))
+        self._words = _Trie()
+        for i, target in enumerate(targets):
+            for word in set(target.split()):
+                if len(word) >= MIN_WORD_LEN:
+                    self._words.insert(word, 1 << i)
+        self._all = (1 << len(targets)) - 1
+
+    def mask(self, query_words: Iterable[str]) -> int:
+        mask = self._all
+        for word in query_words:
+            if len(word) < MIN_WORD_LEN:
+                continue
+            stem = self._stem(word)
+            mask &= self._substrings.mask(stem) | self._words.prefix_related(stem)
+            if not mask:
+                break
+        return mask
+
+
+class ProductSearchIndex:
+    """
+    search_products_by_name, precompiled.
+
+    Usage:
+        index = ProductSearchIndex(id_to_name, category_to_id, PRODUCT_SYNONYMS,
+                                   PRODUCT_VARIANTS, _normalize_query_word)
+        product_ids = index.search_ids("double beds")
+    """
+
+    def __init__(
+        self,
+        id_to_name: Dict[int, str],
+        category_to_id: Dict[str, List[int]],
+        synonyms: Dict[str, List[str]],
+        variants: Dict[int, List[str]],
+        normalize_word: Callable[[str], str],
+    ):
+        self._known_ids = frozenset(id_to_name)
+        self._category_to_id = {cat: list(pids) for cat, pids in category_to_id.items()}
+        self._category_pos = {cat: i for i, cat in enumerate(category_to_id)}
+
+        vocabulary = set()
+        for text in list(id_to_name.values()) + [s for v in synonyms.values() for s in v] + \
+                [s for v in variants.values() for s in v] + list(category_to_id):
+            vocabulary.update(text.lower().split())
+        self._stems = {word: normalize_word(word) for word in vocabulary}
+        self._normalize_word = normalize_word
+
+        # 1. Synonyms: one bit per category (first matching synonym wins anyway)
+        self._synonym_categories = list(synonyms)
+        syn_texts, syn_owners = [], []
+        self._synonym_trie = _Trie()
+        for ci, cat in enumerate(self._synonym_categories):
+            for syn in synonyms[cat]:
+                syn_texts.append(syn.lower())
+                syn_owners.append(ci)
+                self._synonym_trie.insert(syn.lower(), 1 << ci)
+        self._synonym_substrings = _SubstringIndex(syn_texts, syn_owners)
+
+        # 2. Product names, in id_to_name order
+        self._name_ids = list(id_to_name)
+        names = [name.lower() for name in id_to_name.values()]
+        self._name_substrings = _SubstringIndex(names, range(len(names)))
+        self._name_words = _WordMatcher(names, self.stem)
+
+        # 3. Variants: one bit per variant (word matching is per variant),
+        #    mapped back to the owning product in PRODUCT_VARIANTS order
+        self._variant_pids = list(variants)
+        var_texts, self._variant_owner = [], []
+        self._variant_trie = _Trie()
+        for pos, pid in enumerate(self._variant_pids):
+            for variant in variants[pid]:
+                self._variant_trie.insert(variant.lower(), 1 << len(var_texts))
+                var_texts.append(variant.lower())
+                self._variant_owner.append(pos)
+        self._variant_substrings = _SubstringIndex(var_texts, range(len(var_texts)))
+        self._variant_words = _WordMatcher(var_texts, self.stem)
+
+    def stem(self, word: str) -> str:
+        stem = self._stems.get(word)
+        return stem if stem is not None else self._normalize_word(word)
+
+    def search_ids(self, query: str) -> List[int]:
+        """Product IDs in the order search_products_by_name returns them."""
+        query = query.lower().strip()
+        query_words = {w for w in query.split() if w not in FILLER_WORDS}
+        normalized_query = self._normalize_word(query)
+
+        results: List[int] = []
+        seen = set()
+
+        def add(pid: int) -> None:
+            if pid not in seen and pid in self._known_ids:
+                seen.add(pid)
+                results.append(pid)
+
+        # 0. Exact category key
+        for cat in sorted({k for k in (query, normalized_query) if k in self._category_pos},
+                          key=self._category_pos.get):
+            for pid in self._category_to_id[cat]:
+                add(pid)
+
+        # 1. Synonym contains the query / query contains the synonym
+        categories = (self._synonym_substrings.mask(query)
+                      | self._synonym_substrings.mask(normalized_query)
+                      | self._synonym_trie.contained_in(query))
+        for ci in _bits(categories):
+            for pid in self._category_to_id.get(self._synonym_categories[ci], ()):
+                add(pid)
+
+        # 2. Product names
+        names = (self._name_substrings.mask(query)
+                 | self._name_substrings.mask(normalized_query)
+                 | self._name_words.mask(query_words))
+        for i in _bits(names):
+            add(self._name_ids[i])
+
+        # 3. Variants
+        matched = (self._variant_substrings.mask(query)
+                   | self._variant_substrings.mask(normalized_query)
+                   | self._variant_trie.contained_in(query)
+                   | self._variant_words.mask(query_words))
+        for pos in sorted({self._variant_owner[v] for v in _bits(matched)}):
+            add(self._variant_pids[pos])
+
+        return results
@@ -3,6 +3,9 @@
 
 from typing import Optional, List, Dict, Any
 
+from data.product_search import ProductSearchIndex
+from data.pricing import PricingEngine
+
 # ========================================
 # PRODUCT ID TO NAME MAPPING
 # ========================================
@@ -780,6 +783,17 @@ duration_dict = {
     3: 5, 6: 6, 8: 6, 9: 7, 12: 8, 18: 8, 24: 8
 }
 
+# Price matrix with precomputed discount / upfront columns (data/pricing.py)
+pricing = PricingEngine(id_to_price)
+
+
+def refresh_pricing() -> str:
+    """Re-read id_to_price and the discount config after editing them at runtime.
+    Returns the new pricing version (rendered-quote caches key on it)."""
+    import config
+    pricing.reload(id_to_price, config.GLOBAL_DISCOUNT, config.UPFRONT_EXTRA_DISCOUNT)
+    return pricing.version
+
 # Trending products per category (for bundle recommendations)
 TRENDING_PRODUCTS = {
     "sofa": 1042,      # 3 Seater Fabric Sofa
@@ -828,40 +842,9 @@ def calculate_rent(product_id: int, duration: int, unit: str = "months") -> Opti
     """
     Calculate rent for a product based on duration.
     Handle Short-term (days) and Long-term (months).
+    Tiers are resolved by data.pricing.tier_index on the precomputed price matrix.
     """
-    if product_id not in id_to_price:
-        return None
-    
-    prices = id_to_price[product_id]
-    
-    if unit == "days":
-        if duration < 8:
-            idx = 0  # 1 day rate (1-7 days)
-        elif duration < 15:
-            idx = 1  # 8 day rate (8-14 days)
-        elif duration < 30:
-            idx = 2  # 15 day rate (15-29 days)
-        elif duration < 60:
-            idx = 3  # 30 day rate (30-59 days)
-        else:
-            idx = 4  # 60 day rate
-    else:
-        # Months
-        if duration < 3:
-            idx = 3  # Fallback to 30d short term if < 3 months requested in months
-        elif duration < 6:
-            idx = 5  # 3 month rate
-        elif duration < 9:
-            idx = 6  # 6 month rate (includes 8 months per requirement)
-        elif duration < 12:
-            idx = 7  # 9 month rate
-        else:
-            idx = 8  # 12+ month rate (up to 24 months)
-            
-    # Safety check for list length (if legacy data exists)
-    if idx < len(prices):
-        return prices[idx]
-    return prices[-1]
+    return pricing.rent(product_id, duration, unit)
 
 
 def get_all_categories() -> List[str]:
@@ -917,9 +900,8 @@ def _words_match(query_words: set, target: str) -> bool:
     return True
 
 
-def search_products_by_name(query: str) -> List[Dict[str, Any]]:
-    """Search products by name (partial match) and PRODUCT_VARIANTS.
-    Handles basic plurals and word form variations."""
+def _scan_products_by_name(query: str) -> List[Dict[str, Any]]:
+    """Reference linear scan behind search_products_by_name (kept for parity tests)."""
     query = query.lower().strip()
     # Remove filler words that don't help matching
     filler = {"of", "for", "the", "a", "an", "with", "in", "on", "to", "my", "also", "and"}
@@ -982,6 +964,22 @@ def search_products_by_name(query: str) -> List[Dict[str, Any]]:
     return results
 
 
+_search_index = ProductSearchIndex(id_to_name, category_to_id, PRODUCT_SYNONYMS, PRODUCT_VARIANTS, _normalize_query_word)
+
+
+def rebuild_search_index() -> None:
+    """Rebuild the name-search index after editing the catalogue dicts at runtime."""
+    global _search_index
+    _search_index = ProductSearchIndex(id_to_name, category_to_id, PRODUCT_SYNONYMS, PRODUCT_VARIANTS, _normalize_query_word)
+
+
+def search_products_by_name(query: str) -> List[Dict[str, Any]]:
+    """Search products by name (partial match) and PRODUCT_VARIANTS.
+    Handles basic plurals and word form variations.
+    Answered from a precompiled index (data/product_search.py)."""
+    return [get_product_by_id(pid) for pid in _search_index.search_ids(query)]
+
+
 def format_product_for_display(product: Dict[str, Any], duration: int = 6) -> str:
     """Format product info for WhatsApp display."""
     rent = calculate_rent(product["id"], duration)
@@ -1013,14 +1011,14 @@ def format_price_comparison(original_price: int, duration: int = 6, unit: str =
     Format price in the user-requested: ₹~Original~ ₹Final/mo +GST format.
     Includes the 'Best Price' (Upfront) for 12 months.
     """
-    final_price = apply_discount(original_price)
+    final_price = pricing.discount(original_price)
     unit_str = "/mo" if unit == "months" else ""
     # Full strikethrough: ~₹1,119/mo~ ₹783/mo + GST
     base_fmt = f"~₹{original_price:,}{unit_str}~ ₹{final_price:,}{unit_str} + GST"
 
     # If 12 months, also show the Upfront Price (additional 10% off)
     if duration >= 12 and unit == "months":
-        upfront_price = apply_discount(original_price, upfront=True)
+        upfront_price = pricing.upfront_price(original_price)
         return f"{base_fmt}\n    Upfront Deal: ₹{upfront_price:,}/mo + GST (12-month plan)"
 
     return base_fmt
@@ -1028,38 +1026,25 @@ def format_price_comparison(original_price: int, duration: int = 6, unit: str =
 
 def create_bundle_quote(product_ids: List[int], duration: int, unit: str = "months") -> Dict[str, Any]:
     """Create a quote for multiple products with 30% discount and 18% GST."""
-    items = []
-    total_original = 0
-    total_discounted = 0
-    
-    for pid in product_ids:
-        product = get_product_by_id(pid)
-        if product:
-            orig_rent = calculate_rent(pid, duration, unit)
-            discounted_rent = apply_discount(orig_rent)
-            items.append({
-                "product": product["name"],
-                "original_rent": orig_rent,
-                "monthly_rent": discounted_rent, # Final discounted rent
-                "display_text": format_price_comparison(orig_rent, duration, unit)
-            })
-            total_original += orig_rent
-            total_discounted += discounted_rent
-    
-    # Calculate GST (18%)
-    gst_amount = int(round(total_discounted * 0.18))
-    grand_total = total_discounted + gst_amount
-    
-    # Estimate security (roughly 2x monthly rent, capped at 15k)
-    security = min(total_discounted * 2, 15000)
+    quote = pricing.quote([pid for pid in product_ids if pid in id_to_name], duration, unit)
+    items = [
+        {
+            "product": id_to_name[line["product_id"]],
+            "original_rent": line["original_rent"],
+            "monthly_rent": line["monthly_rent"], # Final discounted rent
+            "display_text": format_price_comparison(line["original_rent"], duration, unit)
+        }
+        for line in quote["lines"]
+    ]
     
+    # GST (18%) and security (2x monthly rent, capped at 15k) come from the engine
     return {
         "items": items,
-        "total_original": total_original,
-        "total_discounted": total_discounted,
-        "gst_amount": gst_amount,
-        "grand_total": grand_total,
-        "security_deposit": security,
+        "total_original": quote["total_original"],
+        "total_discounted": quote["total_discounted"],
+        "gst_amount": quote["gst_amount"],
+        "grand_total": quote["grand_total"],
+        "security_deposit": quote["security_deposit"],
         "duration": duration,
         "unit": unit
     }
@@ -24,7 +24,7 @@ from agents.sales_agent import create_sales_agent, run_agent
 from agents.state import create_initial_state
 from whatsapp.client import WhatsAppClient
 from whatsapp.indicators import simulate_read_indicator, simulate_typing_indicator
-from utils.logger import log_demo_turn, start_new_session, get_log_file_path
+from utils.logger import log_demo_turn, start_new_session, get_log_location
 
 
 # ========================================
@@ -46,7 +46,7 @@ def run_demo():
     
     # Start new logging session
     start_new_session(session_id, "Demo User")
-    print(f"📁 Conversation log: {get_log_file_path(session_id)}\n")
+    print(f"📁 Conversation log: {get_log_location(session_id)}\n")
     
     while True:
         try:
@@ -67,7 +67,7 @@ def run_demo():
             session_id = f"demo_user_{int(time.time())}"
             start_new_session(session_id, "Demo User")
             print(f"\n🔄 Conversation reset.")
-            print(f"📁 New log: {get_log_file_path(session_id)}\n")
+            print(f"📁 New log: {get_log_location(session_id)}\n")
             print(f"🤖 {BOT_NAME}: {BOT_GREETING}")
             print("What would you like on rent today?\n")
             continue
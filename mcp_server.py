@@ -9,8 +9,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-# Import local data as fallback
-from data.products import id_to_name, category_to_id, id_to_price, PRODUCT_SYNONYMS, PRODUCT_VARIANTS
+from config import VECTOR_INDEX_DIRECTORY
+from rag.vector_index import VectorIndex, catalogue_documents, index_matches
 
 mcp = FastMCP("rentbasket-products")
 API_BASE = "https://testapi.rentbasket.com"
@@ -44,68 +44,68 @@ def auth_headers() -> Dict[str, str]:
         "Authorization-Key": auth_key
     }
 
+# In-process copy of the "products" collection (float32 matrix, mmap-loaded)
+CATALOGUE_INDEX_PATH = os.path.join(VECTOR_INDEX_DIRECTORY, "catalogue")
+_catalogue_index: Optional[VectorIndex] = None
+
+
+def _embed_query(text: str) -> List[float]:
+    return list(openai_ef([text])[0])
+
+
+def get_catalogue_index() -> Optional[VectorIndex]:
+    """The saved catalogue index, if it matches the current product data (names, prices, synonyms)."""
+    global _catalogue_index
+    if _catalogue_index is None:
+        ids, documents, metadatas = catalogue_documents()
+        if index_matches(CATALOGUE_INDEX_PATH, ids, documents, metadatas):
+            _catalogue_index = VectorIndex.load(CATALOGUE_INDEX_PATH, embed_query=_embed_query)
+    return _catalogue_index
+
+
 @mcp.tool()
 def build_semantic_index() -> str:
     """
     Build or refresh the semantic index from local product data.
     This creates searchable embeddings for each product.
     """
-    ids = []
-    documents = []
-    metadatas = []
-    
-    # Reverse mapping for categories
-    pid_to_cats = {}
-    for cat, pids in category_to_id.items():
-        for pid in pids:
-            if pid not in pid_to_cats:
-                pid_to_cats[pid] = []
-            pid_to_cats[pid].append(cat)
-            
-    for pid, name in id_to_name.items():
-        cats = ", ".join(pid_to_cats.get(pid, []))
-        prices = id_to_price.get(pid, [0, 0, 0, 0])
-        
-        # Collect all synonyms for categories matched to this product
-        cat_synonyms = []
-        for cat in pid_to_cats.get(pid, []):
-            if cat in PRODUCT_SYNONYMS:
-                cat_synonyms.extend(PRODUCT_SYNONYMS[cat])
-        
-        # Collect product-specific variants
-        variants = PRODUCT_VARIANTS.get(pid, [])
-        
-        # Create a rich searchable document
-        synonym_text = ", ".join(list(set(cat_synonyms + variants)))
-        doc = f"{name} | {cats} | {synonym_text}"
-        
-        ids.append(str(pid))
-        documents.append(doc)
-        metadatas.append({
-            "name": name,
-            "categories": cats,
-            "pid": pid,
-            "price_12mo": float(prices[3])
-        })
-        
+    global _catalogue_index
+    ids, documents, metadatas = catalogue_documents()
+
     collection.upsert(
         ids=ids,
         documents=documents,
         metadatas=metadatas
     )
+
+    # Queries use a NumPy copy of the stored embeddings (no re-embedding)
+    index = VectorIndex.from_chroma(collection, embed_query=_embed_query, ids=ids)
+    index.save(CATALOGUE_INDEX_PATH)
+    _catalogue_index = index
     return f"Indexed {len(ids)} products successfully in ChromaDB."
 
 @mcp.tool()
 def semantic_product_search(
     query: str, 
     max_price: Optional[float] = None,
-    n_results: int = 5
+    n_results: int = 5,
+    category: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Search for products semantically using natural language.
     Example: "Double door fridge under 1000"
     """
-    # Simple filtering (ChromaDB 'where' is limited)
+    index = get_catalogue_index()
+    if index is not None:
+        hits = index.search_text(query, k=n_results, category=category, max_price=max_price)
+        return [{
+            "id": hit["id"],
+            "name": hit["metadata"]["name"],
+            "score": round(1.0 - hit["score"], 4),  # cosine distance, lower is closer
+            "price_12mo": hit["metadata"]["price_12mo"]
+        } for hit in hits]
+
+    # No saved index yet: query Chroma directly (category filtering needs the index)
     where = None
     if max_price:
         where = {"price_12mo": {"$lte": max_price}}
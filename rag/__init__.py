@@ -1,2 +1,9 @@
 # RAG module exports
-from .vectorstore import create_knowledge_vectorstore, get_knowledge_retriever
+from .vectorstore import (
+    create_knowledge_vectorstore,
+    get_knowledge_retriever,
+    load_knowledge_index,
+    load_knowledge_vectorstore,
+    sync_knowledge_vectorstore,
+)
+from .vector_index import VectorIndex, catalogue_documents
@@ -0,0 +1,350 @@
+# Query-embedding cache for RAG searches
+#
+# Customers ask the same few policy questions over and over, and every
+# knowledge search used to embed its query through the OpenAI API. This
+# cache sits in front of embed_query():
+#
+# - memory tier: LRU of (model, normalized text) -> float32 vector
+# - disk tier:   SQLite table of the same, so restarts and other worker
+#                processes start warm; per-entry hit counts rank the
+#                "top queries" that warm_up() preloads at boot
+#
+# Keys include the embedding model, so a model change never serves stale
+# vectors. Hit / miss counters are exposed via stats() on /stats.
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_MODEL, EMBEDDING_CACHE_PATH, BOT_NAME
+from utils.intent_cache import normalize_message
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_SIZE", "2000"))
+HIT_FLUSH_EVERY = 50
+_LOG_LINE_RE = re.compile(r"^\d{1,2}/\d{1,2}/\d{2,4}, [^-]+ - ([^:]+): (.+)$")
+
+
+class EmbeddingCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of query embeddings.
+
+    Usage:
+        cache = EmbeddingCache()
+        vector = cache.get_or_embed(EMBEDDING_MODEL, "security deposit refund", embeddings.embed_query)
+    """
+
+    def __init__(self, path: Optional[str] = EMBEDDING_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: SQLite file for the disk tier (None = memory only)
+            max_entries: Memory-tier capacity (least recently used evicted first)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_failed = False
+        self._pending_hits: Counter = Counter()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0,
+                          "embed_errors": 0, "warmed": 0}
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Cached vector for (model, text), or None on a miss."""
+        key = (model, normalize_message(text))
+        if not key[1]:
+            return None
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                self._count_hit(key)
+                return vector.tolist()
+
+            vector = self._disk_get(key)
+            if vector is not None:
+                self._counters["disk_hits"] += 1
+                self._remember(key, vector)
+                self._count_hit(key)
+                return vector.tolist()
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        key = (model, normalize_message(text))
+        if not key[1]:
+            return
+        array = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, array)
+            self._disk_put([(key, array)])
+
+    def get_or_embed(self, model: str, text: str, embed: Callable[[str], List[float]]) -> List[float]:
+        """Return the cached vector, or embed text (and cache it) on a miss."""
+        vector = self.get(model, text)
+        if vector is not None:
+            return vector
+        vector = list(embed(text))
+        self.put(model, text, vector)
+        return vector
+
+    # ------------------------------------------------------------------
+    # Warm-up
+    # ------------------------------------------------------------------
+
+    def warm_up(
+        self,
+        model: str,
+        queries: Iterable[str] = (),
+        embed_many: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        top_n: int = 200,
+    ) -> Dict[str, int]:
+        """
+        Preload the memory tier at boot.
+
+        Loads the top_n most-hit disk entries for model, then embeds (in one
+        batch) any of the given queries not cached yet.
+
+        Returns:
+            {"loaded": from disk, "embedded": newly embedded}
+        """
+        loaded = 0
+        with self._lock:
+            for key, vector in self._disk_top(model, top_n):
+                if key not in self._memory:
+                    self._remember(key, vector)
+                    loaded += 1
+
+        missing, seen = [], set()
+        for query in queries:
+            normalized = normalize_message(query)
+            if normalized and normalized not in seen and (model, normalized) not in self._memory:
+                seen.add(normalized)
+                missing.append(query)
+
+        embedded = 0
+        if missing and embed_many is not None:
+            try:
+                vectors = embed_many(missing)
+            except Exception as e:
+                with self._lock:
+                    self._counters["embed_errors"] += 1
+                print(f"⚠️ Embedding cache warm-up failed: {e}")
+                vectors = []
+            rows = []
+            with self._lock:
+                for query, vector in zip(missing, vectors):
+                    key = (model, normalize_message(query))
+                    array = np.asarray(vector, dtype=np.float32)
+                    self._remember(key, array)
+                    rows.append((key, array))
+                    embedded += 1
+                self._disk_put(rows)
+
+        with self._lock:
+            self._counters["warmed"] += loaded + embedded
+        return {"loaded": loaded, "embedded": embedded}
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                "memory_entries": len(self._memory),
+                "disk": self.path if self._conn is not None else None,
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Drop the memory tier (the disk tier is kept)."""
+        with self._lock:
+            self._memory.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_hits()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------------------------------------------------------
+    # Internals (caller holds the lock)
+    # ------------------------------------------------------------------
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or self._disk_failed or not self.path:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (model, text))"
+            )
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as e:
+            self._disk_failed = True
+            print(f"⚠️ Embedding cache disk tier unavailable ({self.path}): {e}")
+        return self._conn
+
+    def _disk_get(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        conn = self._db()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute("SELECT vector FROM embeddings WHERE model = ? AND text = ?", key).fetchone()
+        except sqlite3.Error:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).copy() if row else None
+
+    def _disk_put(self, rows: List[Tuple[Tuple[str, str], np.ndarray]]) -> None:
+        conn = self._db()
+        if conn is None or not rows:
+            return
+        now = time.time()
+        try:
+            conn.executemany(
+                "INSERT INTO embeddings (model, text, vector, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (model, text) DO UPDATE SET vector = excluded.vector, updated_at = excluded.updated_at",
+                [(model, text, vector.tobytes(), now) for (model, text), vector in rows],
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Embedding cache write failed: {e}")
+
+    def _disk_top(self, model: str, limit: int) -> List[Tuple[Tuple[str, str], np.ndarray]]:
+        conn = self._db()
+        if conn is None or limit <= 0:
+            return []
+        self._flush_hits()
+        try:
+            rows = conn.execute(
+                "SELECT text, vector FROM embeddings WHERE model = ? ORDER BY hits DESC, updated_at DESC LIMIT ?",
+                (model, limit),
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+        # Least popular first, so the most popular end up most recently used
+        return [((model, text), np.frombuffer(blob, dtype=np.float32).copy()) for text, blob in reversed(rows)]
+
+    def _count_hit(self, key: Tuple[str, str]) -> None:
+        self._pending_hits[key] += 1
+        if sum(self._pending_hits.values()) >= HIT_FLUSH_EVERY:
+            self._flush_hits()
+
+    def _flush_hits(self) -> None:
+        if not self._pending_hits:
+            return
+        conn = self._db()
+        if conn is not None:
+            try:
+                conn.executemany(
+                    "UPDATE embeddings SET hits = hits + ? WHERE model = ? AND text = ?",
+                    [(n, model, text) for (model, text), n in self._pending_hits.items()],
+                )
+                conn.commit()
+            except sqlite3.Error:
+                pass
+        self._pending_hits.clear()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings wrapper: embed_query() goes through the cache,
+    embed_documents() (index builds, already persisted in Chroma) does not.
+    """
+
+    def __init__(self, inner: Embeddings, model: str = EMBEDDING_MODEL, cache: Optional[EmbeddingCache] = None):
+        self.inner = inner
+        self.model = model
+        self.cache = cache if cache is not None else embedding_cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.get_or_embed(self.model, text, self.inner.embed_query)
+
+    def warm_up(self, queries: Iterable[str] = (), top_n: int = 200) -> Dict[str, int]:
+        return self.cache.warm_up(self.model, queries, self.inner.embed_documents, top_n=top_n)
+
+
+def top_logged_queries(log_dir: str, limit: int = 100, min_count: int = 2, segment_log=None) -> List[str]:
+    """
+    Most frequent customer messages in the conversation logs (logs/*.txt and,
+    given one, the segment log that LOG_FORMAT=segments writes to; WhatsApp
+    export format "dd/mm/yy, hh:mm am - Name: message").
+    """
+    counts: Counter = Counter()
+    originals: Dict[str, str] = {}
+    for line in _logged_lines(log_dir, segment_log):
+        match = _LOG_LINE_RE.match(line.strip())
+        # bot lines are "Ku: ..." or "Ku (Sales): ..."
+        if not match or match.group(1).split(" (")[0].strip() == BOT_NAME:
+            continue
+        normalized = normalize_message(match.group(2))
+        if len(normalized) >= 4:
+            counts[normalized] += 1
+            originals.setdefault(normalized, match.group(2).strip())
+    return [originals[text] for text, n in counts.most_common(limit) if n >= min_count]
+
+
+def _logged_lines(log_dir: str, segment_log=None) -> Iterable[str]:
+    try:
+        names = sorted(f for f in os.listdir(log_dir) if f.endswith(".txt"))
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            with open(os.path.join(log_dir, name), encoding="utf-8", errors="ignore") as f:
+                yield from f
+        except OSError:
+            continue
+    if segment_log is not None:
+        for row in segment_log.phones():
+            for entry in segment_log.iter_entries(row["phone"]):
+                yield from entry.splitlines()
+
+
+def cached_openai_embeddings() -> CachedEmbeddings:
+    """OpenAI EMBEDDING_MODEL embeddings with cached queries."""
+    from langchain_openai import OpenAIEmbeddings
+
+    return CachedEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL))
+
+
+# Shared by every CachedEmbeddings in the process (opens the SQLite file on first use)
+embedding_cache = EmbeddingCache()
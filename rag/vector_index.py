@@ -0,0 +1,309 @@
+# In-process vector index for the knowledge base and product catalogue
+#
+# Both corpora are tiny (tens of chunks / products), so a query through
+# Chroma's SQLite + HNSW stack is mostly overhead. VectorIndex keeps one
+# contiguous float32 matrix of L2-normalized embeddings: cosine top-k is a
+# single matrix-vector product plus np.argpartition. Metadata pre-filters
+# (category, 12-month price) are boolean masks over precomputed columns.
+#
+# Indexes are saved as <dir>/vectors.npy + <dir>/index.json and loaded with
+# mmap, so worker processes share the page cache instead of copying.
+# Chroma stays the store of record (incremental embedding, see
+# rag/vectorstore.py); from_chroma() lifts its stored embeddings without
+# re-embedding anything.
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FORMAT_VERSION = 1
+VECTORS_FILE = "vectors.npy"
+INDEX_FILE = "index.json"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def content_hash(ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> str:
+    """Hash of the rows (IDs, documents and metadata), independent of row order."""
+    rows = sorted(
+        [str(i), doc or "", meta or {}]
+        for i, doc, meta in zip(ids, documents, metadatas)
+    )
+    payload = json.dumps(rows, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _split_categories(value: Any) -> frozenset:
+    """Categories are stored as 'sofa, living room' (Chroma metadata can't hold lists)."""
+    if not value:
+        return frozenset()
+    if isinstance(value, str):
+        value = value.split(",")
+    return frozenset(c.strip().lower() for c in value if c and c.strip())
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index over a float32 matrix.
+
+    Usage:
+        index = VectorIndex.load("data/vector_index/catalogue", embed_query=embed)
+        hits = index.search_text("double door fridge", k=5, max_price=1000)
+        # [{"id": "36", "score": 0.71, "document": "...", "metadata": {...}}, ...]
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        vectors,
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        embed_query: Optional[Callable[[str], List[float]]] = None,
+        normalized: bool = False,
+    ):
+        """
+        Args:
+            ids: One ID per row
+            vectors: (n, dim) embeddings (any float dtype)
+            documents: Row texts returned with hits
+            metadatas: Row metadata; "categories" and "price_12mo" become filter columns
+            embed_query: callable(text) -> vector, used by search_text()
+            normalized: Rows are already unit-length float32 (e.g. loaded from disk)
+        """
+        self.ids = [str(i) for i in ids]
+        n = len(self.ids)
+        vectors = np.asanyarray(vectors) if n else np.zeros((0, 0), dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != n:
+            raise ValueError(f"Expected {n} vectors, got array of shape {vectors.shape}")
+        self.vectors = vectors if normalized else _normalize_rows(vectors)
+        self.documents = list(documents) if documents is not None else [""] * n
+        self.metadatas = [dict(m or {}) for m in metadatas] if metadatas is not None else [{} for _ in range(n)]
+        self.embed_query = embed_query
+
+        self._categories = [_split_categories(m.get("categories")) for m in self.metadatas]
+        self._prices = np.array(
+            [float(m["price_12mo"]) if m.get("price_12mo") is not None else np.nan for m in self.metadatas],
+            dtype=np.float32,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return int(self.vectors.shape[1]) if len(self) else 0
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_texts(cls, ids: Sequence[str], texts: Sequence[str], embeddings,
+                   metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> "VectorIndex":
+        """Embed texts with a LangChain Embeddings object (embed_documents / embed_query)."""
+        vectors = np.array(embeddings.embed_documents(list(texts)), dtype=np.float32) if texts else None
+        return cls(ids, vectors, texts, metadatas, embed_query=embeddings.embed_query)
+
+    @classmethod
+    def from_chroma(cls, store, embed_query: Optional[Callable[[str], List[float]]] = None,
+                    ids: Optional[Sequence[str]] = None) -> "VectorIndex":
+        """
+        Copy the embeddings already stored in a Chroma collection (a chromadb
+        Collection or a LangChain Chroma store; both expose get(include=...)).
+        With ids, only those rows are copied (e.g. skip products no longer listed).
+        """
+        kwargs = {"ids": list(ids)} if ids is not None else {}
+        data = store.get(include=["embeddings", "documents", "metadatas"], **kwargs)
+        embeddings = data.get("embeddings")
+        vectors = np.asarray(embeddings, dtype=np.float32) if embeddings is not None and len(embeddings) else None
+        return cls(data["ids"], vectors, data.get("documents"), data.get("metadatas"), embed_query=embed_query)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def filter_mask(self, category: Optional[str] = None, max_price: Optional[float] = None) -> Optional[np.ndarray]:
+        """Boolean row mask for the metadata pre-filters (None = no filtering)."""
+        mask = None
+        if category:
+            wanted = category.strip().lower()
+            mask = np.fromiter((wanted in cats for cats in self._categories), dtype=bool, count=len(self))
+        if max_price is not None:
+            price_ok = self._prices <= max_price  # NaN (unknown price) never passes
+            mask = price_ok if mask is None else mask & price_ok
+        return mask
+
+    def search(self, query_vector, k: int = 4, category: Optional[str] = None,
+               max_price: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k rows by cosine similarity to query_vector, best first.
+
+        Args:
+            query_vector: Query embedding (same model / dimension as the index)
+            k: Number of hits
+            category: Only rows tagged with this category
+            max_price: Only rows whose price_12mo is <= this
+        """
+        if not len(self) or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return []
+        scores = self.vectors @ (query / norm)
+
+        mask = self.filter_mask(category, max_price)
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            scores = scores[candidates]
+        else:
+            candidates = None
+
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        rows = candidates[top] if candidates is not None else top
+
+        return [
+            {"id": self.ids[row], "score": float(scores[pos]),
+             "document": self.documents[row], "metadata": self.metadatas[row]}
+            for pos, row in zip(top, rows)
+        ]
+
+    def search_text(self, query: str, k: int = 4, **filters) -> List[Dict[str, Any]]:
+        """Embed query with embed_query and search()."""
+        if self.embed_query is None:
+            raise RuntimeError("VectorIndex has no embed_query function")
+        return self.search(self.embed_query(query), k=k, **filters)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, directory: str) -> None:
+        """Write vectors.npy (float32, normalized) and index.json (ids, documents, metadata)."""
+        os.makedirs(directory, exist_ok=True)
+        vectors_path = os.path.join(directory, VECTORS_FILE)
+        tmp = vectors_path + ".tmp.npy"
+        np.save(tmp, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        os.replace(tmp, vectors_path)
+
+        payload = {
+            "format_version": FORMAT_VERSION,
+            "dim": self.dim,
+            "ids": self.ids,
+            "documents": self.documents,
+            "metadatas": self.metadatas,
+            "content_hash": content_hash(self.ids, self.documents, self.metadatas),
+        }
+        index_path = os.path.join(directory, INDEX_FILE)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(index_path + ".tmp", index_path)
+
+    @classmethod
+    def load(cls, directory: str, embed_query: Optional[Callable[[str], List[float]]] = None,
+             mmap: bool = True) -> "VectorIndex":
+        """Load a saved index; with mmap the matrix is paged in from disk on demand."""
+        with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index format: {payload.get('format_version')}")
+        ids = payload["ids"]
+        if ids:
+            vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        else:
+            vectors = np.zeros((0, payload.get("dim", 0)), dtype=np.float32)
+        return cls(ids, vectors, payload["documents"], payload["metadatas"],
+                   embed_query=embed_query, normalized=True)
+
+    @staticmethod
+    def _saved_field(directory: str, field: str) -> Any:
+        try:
+            with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as f:
+                return json.load(f).get(field)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def saved_ids(directory: str) -> Optional[List[str]]:
+        """IDs of a saved index without loading its matrix (None if there is none)."""
+        return VectorIndex._saved_field(directory, "ids")
+
+    @staticmethod
+    def saved_hash(directory: str) -> Optional[str]:
+        """content_hash() of a saved index's rows (None if there is none)."""
+        return VectorIndex._saved_field(directory, "content_hash")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": len(self),
+            "dim": self.dim,
+            "matrix_bytes": int(self.vectors.nbytes),
+            "mmap": isinstance(self.vectors, np.memmap),
+        }
+
+
+# ========================================
+# CATALOGUE CORPUS
+# ========================================
+
+def catalogue_documents() -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    One searchable document per product: name, categories, category synonyms
+    and product variants. Returns (ids, documents, metadatas); shared by the
+    MCP server's Chroma collection and the in-process catalogue index.
+    """
+    from data.products import id_to_name, category_to_id, id_to_price, PRODUCT_SYNONYMS, PRODUCT_VARIANTS
+
+    pid_to_cats: Dict[int, List[str]] = {}
+    for cat, pids in category_to_id.items():
+        for pid in pids:
+            pid_to_cats.setdefault(pid, []).append(cat)
+
+    ids, documents, metadatas = [], [], []
+    for pid, name in id_to_name.items():
+        cats = ", ".join(pid_to_cats.get(pid, []))
+        prices = id_to_price.get(pid, [0, 0, 0, 0])
+
+        cat_synonyms: List[str] = []
+        for cat in pid_to_cats.get(pid, []):
+            cat_synonyms.extend(PRODUCT_SYNONYMS.get(cat, []))
+        variants = PRODUCT_VARIANTS.get(pid, [])
+        synonym_text = ", ".join(sorted(set(cat_synonyms + variants)))
+
+        ids.append(str(pid))
+        documents.append(f"{name} | {cats} | {synonym_text}")
+        metadatas.append({"name": name, "categories": cats, "pid": pid, "price_12mo": float(prices[3])})
+    return ids, documents, metadatas
+
+
+def index_matches(directory: str, ids: Iterable[str],
+                  documents: Optional[Sequence[str]] = None,
+                  metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> bool:
+    """
+    True if a saved index is up to date. With only IDs (content-hashed chunk
+    IDs) the ID sets must match; with documents and metadatas the saved rows
+    must hash the same, so a renamed or repriced product counts as stale.
+    """
+    if documents is not None and metadatas is not None:
+        ids = list(ids)
+        return VectorIndex.saved_hash(directory) == content_hash(ids, documents, metadatas)
+    saved = VectorIndex.saved_ids(directory)
+    return saved is not None and set(saved) == set(ids)
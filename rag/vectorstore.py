@@ -1,9 +1,18 @@
 # RAG Vector Store for RentBasket Knowledge Base
 # Uses ChromaDB with OpenAI embeddings
+#
+# The knowledge base is indexed once into a persisted Chroma collection
+# (VECTOR_DB_DIRECTORY) whose chunk IDs are content hashes. At startup the
+# loader opens that collection and only embeds chunks whose text changed, so
+# the first knowledge search no longer re-embeds the whole knowledge base.
+# Build / refresh ahead of deploys with: python scripts/build_knowledge_index.py
+#
+# Queries go through an in-process NumPy copy of that collection
+# (rag/vector_index.py), saved under VECTOR_INDEX_DIRECTORY and mmap-loaded.
 
+import hashlib
 import os
-from typing import List
-from langchain_openai import OpenAIEmbeddings
+from typing import List, Dict, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
@@ -11,8 +20,134 @@ from langchain_core.documents import Document
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVER_K
+from config import (
+    EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVER_K,
+    VECTOR_DB_DIRECTORY, KNOWLEDGE_COLLECTION, VECTOR_INDEX_DIRECTORY,
+)
 from data.knowledge_base import RENTBASKET_KNOWLEDGE_BASE
+from rag.vector_index import VectorIndex, index_matches
+from rag.embedding_cache import cached_openai_embeddings
+
+KNOWLEDGE_INDEX_DIRECTORY = os.path.join(VECTOR_INDEX_DIRECTORY, "knowledge")
+
+
+def chunk_id(text: str) -> str:
+    """Content hash of a chunk. Includes the embedding model so a model change re-embeds."""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\n{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def split_knowledge_base(text: str = None) -> List[Document]:
+    """Split the knowledge base into chunks tagged with their content hash."""
+    documents = [Document(
+        page_content=text if text is not None else RENTBASKET_KNOWLEDGE_BASE,
+        metadata={"source": "rentbasket_knowledge_base", "type": "company_info"}
+    )]
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    chunks = text_splitter.split_documents(documents)
+    for chunk in chunks:
+        chunk.metadata["content_hash"] = chunk_id(chunk.page_content)
+    return chunks
+
+
+def sync_knowledge_vectorstore(
+    persist_directory: str = VECTOR_DB_DIRECTORY,
+    text: str = None,
+    embeddings=None,
+) -> Tuple[Chroma, Dict[str, int]]:
+    """
+    Open the persisted knowledge collection and bring it in line with the
+    current knowledge base text: embed only new chunks, delete stale ones.
+
+    Args:
+        persist_directory: Chroma directory holding the collection
+        text: Knowledge base text (defaults to RENTBASKET_KNOWLEDGE_BASE)
+        embeddings: Embedding function (defaults to OpenAI EMBEDDING_MODEL, queries cached)
+
+    Returns:
+        (vector store, {"chunks", "reused", "added", "removed"})
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    vectorstore = Chroma(
+        collection_name=KNOWLEDGE_COLLECTION,
+        embedding_function=embeddings or cached_openai_embeddings(),
+        persist_directory=persist_directory,
+    )
+
+    chunks: Dict[str, Document] = {}
+    for chunk in split_knowledge_base(text):
+        chunks.setdefault(chunk.metadata["content_hash"], chunk)  # identical chunks embed once
+
+    existing = set(vectorstore.get(include=[])["ids"])
+    stale = [cid for cid in existing if cid not in chunks]
+    missing = [cid for cid in chunks if cid not in existing]
+
+    if stale:
+        vectorstore.delete(ids=stale)
+    if missing:
+        vectorstore.add_documents([chunks[cid] for cid in missing], ids=missing)
+
+    report = {"chunks": len(chunks), "reused": len(chunks) - len(missing),
+              "added": len(missing), "removed": len(stale)}
+    return vectorstore, report
+
+
+def load_knowledge_vectorstore(persist_directory: str = VECTOR_DB_DIRECTORY) -> Chroma:
+    """
+    Startup loader: the persisted index, incrementally refreshed. Falls back to
+    an in-memory store if the directory is not usable (e.g. read-only disk).
+    """
+    try:
+        vectorstore, report = sync_knowledge_vectorstore(persist_directory)
+        print(f"Knowledge index ready: {report['chunks']} chunks "
+              f"({report['reused']} reused, {report['added']} embedded, {report['removed']} removed)")
+        return vectorstore
+    except Exception as e:
+        print(f"⚠️ Persisted knowledge index unavailable ({persist_directory}): {e}")
+        return create_knowledge_vectorstore()
+
+
+def load_knowledge_index(
+    index_directory: str = KNOWLEDGE_INDEX_DIRECTORY,
+    persist_directory: str = VECTOR_DB_DIRECTORY,
+    text: str = None,
+    embeddings=None,
+) -> VectorIndex:
+    """
+    Startup loader for the in-process knowledge index.
+
+    If the saved NumPy index holds exactly the current chunk hashes it is
+    mmap-loaded as is. Otherwise the persisted Chroma collection is synced
+    (embedding only changed chunks), copied into a VectorIndex and saved.
+    """
+    embeddings = embeddings or cached_openai_embeddings()
+    chunks = split_knowledge_base(text)
+    if index_matches(index_directory, (c.metadata["content_hash"] for c in chunks)):
+        index = VectorIndex.load(index_directory, embed_query=embeddings.embed_query)
+        print(f"Knowledge index loaded: {len(index)} chunks (mmap)")
+        return index
+
+    try:
+        vectorstore, report = sync_knowledge_vectorstore(persist_directory, text=text, embeddings=embeddings)
+        index = VectorIndex.from_chroma(vectorstore, embed_query=embeddings.embed_query)
+        print(f"Knowledge index rebuilt: {report['chunks']} chunks "
+              f"({report['reused']} reused, {report['added']} embedded, {report['removed']} removed)")
+    except Exception as e:
+        print(f"⚠️ Persisted knowledge index unavailable ({persist_directory}): {e}")
+        unique = {c.metadata["content_hash"]: c for c in chunks}
+        return VectorIndex.from_texts(
+            list(unique), [c.page_content for c in unique.values()], embeddings,
+            [c.metadata for c in unique.values()],
+        )
+
+    try:
+        index.save(index_directory)
+    except OSError as e:
+        print(f"⚠️ Could not save knowledge index to {index_directory}: {e}")
+    return index
 
 
 def create_knowledge_vectorstore(persist_directory: str = None) -> Chroma:
@@ -26,22 +161,10 @@ def create_knowledge_vectorstore(persist_directory: str = None) -> Chroma:
         Chroma vector store instance
     """
     # Initialize embeddings
-    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    embeddings = cached_openai_embeddings()
     
-    # Create document from knowledge base
-    documents = [Document(
-        page_content=RENTBASKET_KNOWLEDGE_BASE,
-        metadata={"source": "rentbasket_knowledge_base", "type": "company_info"}
-    )]
-    
-    # Split into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", ". ", " ", ""]
-    )
-    
-    chunks = text_splitter.split_documents(documents)
+    # Split into content-hashed chunks
+    chunks = split_knowledge_base()
     print(f"Created {len(chunks)} chunks from knowledge base")
     
     # Create vector store
@@ -53,14 +176,15 @@ def create_knowledge_vectorstore(persist_directory: str = None) -> Chroma:
             documents=chunks,
             embedding=embeddings,
             persist_directory=persist_directory,
-            collection_name="rentbasket_knowledge"
+            collection_name=KNOWLEDGE_COLLECTION,
+            ids=[c.metadata["content_hash"] for c in chunks]
         )
     else:
         # In-memory store
         vectorstore = Chroma.from_documents(
             documents=chunks,
             embedding=embeddings,
-            collection_name="rentbasket_knowledge"
+            collection_name=KNOWLEDGE_COLLECTION
         )
     
     return vectorstore
@@ -78,7 +202,7 @@ def get_knowledge_retriever(vectorstore: Chroma = None, k: int = None):
         Retriever instance
     """
     if vectorstore is None:
-        vectorstore = create_knowledge_vectorstore()
+        vectorstore = load_knowledge_vectorstore()
     
     if k is None:
         k = RETRIEVER_K
@@ -91,26 +215,25 @@ def get_knowledge_retriever(vectorstore: Chroma = None, k: int = None):
     return retriever
 
 
-def search_knowledge(query: str, vectorstore: Chroma = None, k: int = None) -> List[str]:
+def search_knowledge(query: str, vectorstore=None, k: int = None) -> List[str]:
     """
     Search the knowledge base and return relevant chunks.
     
     Args:
         query: Search query
-        vectorstore: Optional existing vector store
+        vectorstore: Optional existing VectorIndex or Chroma vector store
         k: Number of results to return
         
     Returns:
         List of relevant text chunks
     """
-    retriever = get_knowledge_retriever(vectorstore, k)
-    docs = retriever.invoke(query)
+    if isinstance(vectorstore, VectorIndex):
+        results = [hit["document"] for hit in vectorstore.search_text(query, k=k or RETRIEVER_K)]
+    else:
+        retriever = get_knowledge_retriever(vectorstore, k)
+        results = [doc.page_content for doc in retriever.invoke(query)]
     
-    if not docs:
+    if not results:
         return ["No relevant information found in the knowledge base."]
     
-    results = []
-    for doc in docs:
-        results.append(doc.page_content)
-    
     return results
@@ -0,0 +1,54 @@
+"""
+Build / refresh the persisted knowledge-base index (data/chroma_db) and the
+in-process NumPy copy the bot queries (data/vector_index/knowledge).
+
+Chunk IDs are content hashes, so re-running only embeds chunks whose text
+changed in data/knowledge_base.py and deletes chunks that no longer exist.
+Run it as part of the deploy so the server never embeds on a customer's turn.
+
+Usage:
+    python scripts/build_knowledge_index.py            # incremental
+    python scripts/build_knowledge_index.py --rebuild  # drop and re-embed everything
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import VECTOR_DB_DIRECTORY, KNOWLEDGE_COLLECTION
+from rag.vector_index import VectorIndex
+from rag.vectorstore import sync_knowledge_vectorstore, KNOWLEDGE_INDEX_DIRECTORY
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the persisted knowledge-base index")
+    parser.add_argument("--persist-directory", default=VECTOR_DB_DIRECTORY)
+    parser.add_argument("--index-directory", default=KNOWLEDGE_INDEX_DIRECTORY)
+    parser.add_argument("--rebuild", action="store_true", help="Drop the collection first")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        import chromadb
+        client = chromadb.PersistentClient(path=args.persist_directory)
+        try:
+            client.delete_collection(KNOWLEDGE_COLLECTION)
+            print(f"🗑️  Dropped collection '{KNOWLEDGE_COLLECTION}'")
+        except Exception:
+            pass
+
+    started = time.perf_counter()
+    store, report = sync_knowledge_vectorstore(args.persist_directory)
+    index = VectorIndex.from_chroma(store)
+    index.save(args.index_directory)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {report['chunks']} chunks in {args.persist_directory} "
+          f"({report['reused']} reused, {report['added']} embedded, {report['removed']} removed) "
+          f"in {elapsed:.1f}s")
+    print(f"✅ NumPy index: {len(index)} x {index.dim} float32 in {args.index_directory}")
+
+
+if __name__ == "__main__":
+    main()
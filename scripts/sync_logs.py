@@ -1,9 +1,16 @@
 #!/usr/bin/env python3
 """
 Sync conversation logs from Render backend to local logs/ directory.
+Only logs changed since the previous sync are downloaded (cursor kept in
+logs/.sync_cursor); --full downloads everything again. A download that does
+not extend the local copy (it is shorter or starts differently) replaces it
+only after the local copy is kept as <phone>.txt.<time>.bak.
 """
 import os
 import sys
+import shutil
+import tempfile
+import zipfile
 import requests
 import time
 import argparse
@@ -19,7 +26,58 @@ RENDER_URL = os.getenv("RENDER_URL", "https://rentbasket-wabot.onrender.com")
 VERIFY_TOKEN = os.getenv("VERIFY_TOKEN", "12345")
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
 
-def sync_logs(quiet=False):
+CURSOR_FILE = os.path.join(LOGS_DIR, ".sync_cursor")
+
+
+def _read_cursor():
+    try:
+        with open(CURSOR_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_cursor(cursor):
+    with open(CURSOR_FILE, "w") as f:
+        f.write(cursor)
+
+
+def _extends(path, new_path):
+    """True if the file at new_path starts with the whole content of path."""
+    if os.path.getsize(new_path) < os.path.getsize(path):
+        return False
+    with open(path, "rb") as old, open(new_path, "rb") as new:
+        while True:
+            chunk = old.read(64 * 1024)
+            if not chunk:
+                return True
+            if new.read(len(chunk)) != chunk:
+                return False
+
+
+def _install(zf, name):
+    """Unpack one log through a temp file; back up a local copy the download would not extend."""
+    dest = os.path.join(LOGS_DIR, name)
+    fd, tmp = tempfile.mkstemp(dir=LOGS_DIR, prefix=f".{name}.", suffix=".part")
+    try:
+        with zf.open(name) as src, os.fdopen(fd, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        if os.path.exists(dest) and not _extends(dest, tmp):
+            backup = f"{dest}.{time.strftime('%Y%m%d-%H%M%S')}.bak"
+            os.replace(dest, backup)
+            print(f"  ⚠️ {name}: server copy does not extend the local one, kept it as {os.path.basename(backup)}")
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def sync_logs(quiet=False, full=False, prefix=None):
+    """
+    Download the logs that changed since the last sync as one streamed zip and
+    unpack it into logs/. The server's X-Log-Cursor is saved for the next run;
+    full=True ignores it and downloads everything again.
+    """
     if not quiet:
         print(f"🔄 Syncing logs from: {RENDER_URL}")
         print(f"📁 Target directory: {LOGS_DIR}")
@@ -29,62 +87,52 @@ def sync_logs(quiet=False):
         if not quiet:
             print(f"✨ Created logs/ directory.")
 
+    params = {"secret": VERIFY_TOKEN}
+    cursor = None if full else _read_cursor()
+    if cursor:
+        params["since"] = cursor
+    if prefix:
+        params["prefix"] = prefix
+
     try:
-        # Get list of logs
-        list_url = f"{RENDER_URL}/logs?secret={VERIFY_TOKEN}"
         if not quiet:
-            print(f"🔍 Fetching file list...")
-        
-        r = requests.get(list_url, timeout=10)
-        
-        if r.status_code == 403:
-            print("❌ Access Forbidden: Check your VERIFY_TOKEN.")
-            return
-        elif r.status_code == 404:
-            print("❌ Endpoints not found: Ensure the latest code is deployed on Render.")
-            return
-            
-        r.raise_for_status()
-        
-        data = r.json()
-        files = data.get("files", [])
+            print(f"🔍 Fetching {'changes since last sync' if cursor else 'all logs'}...")
         
-        if not files:
-            if not quiet:
-                print("📭 No log files found on server.")
-            return
+        with requests.get(f"{RENDER_URL}/logs/download-all", params=params, stream=True, timeout=(10, 120)) as r:
+            if r.status_code == 403:
+                print("❌ Access Forbidden: Check your VERIFY_TOKEN.")
+                return
+            elif r.status_code == 404:
+                if not quiet:
+                    print("📭 No log files found on server.")
+                return
+            r.raise_for_status()
+            new_cursor = r.headers.get("X-Log-Cursor")
 
-        if not quiet:
-            print(f"📊 Found {len(files)} log files.")
-        
-        downloaded_count = 0
-        skipped_count = 0
-        
-        for f in files:
-            file_name = f["name"]
-            remote_size = f["size_bytes"]
-            local_path = os.path.join(LOGS_DIR, file_name)
-            
-            # Check if file exists and has the same size
-            if os.path.exists(local_path):
-                local_size = os.path.getsize(local_path)
-                if local_size == remote_size:
-                    skipped_count += 1
-                    continue
-            
-            # Download file
-            if not quiet:
-                print(f"  📥 Downloading {file_name} ({remote_size} bytes)...")
-            download_url = f"{RENDER_URL}/logs/{file_name}?secret={VERIFY_TOKEN}"
-            fr = requests.get(download_url, timeout=10)
-            fr.raise_for_status()
-            
-            with open(local_path, "wb") as lf:
-                lf.write(fr.content)
-            downloaded_count += 1
-
-        if not quiet or downloaded_count > 0:
-            print(f"✅ Sync Complete! (📥 {downloaded_count} new, ⏭️ {skipped_count} skipped)")
+            if r.status_code == 204:
+                downloaded = []
+            else:
+                # Spool the archive to disk (zip needs to seek to its directory), never into memory
+                with tempfile.TemporaryFile() as archive:
+                    for chunk in r.iter_content(chunk_size=64 * 1024):
+                        archive.write(chunk)
+                    archive.seek(0)
+                    with zipfile.ZipFile(archive) as zf:
+                        downloaded = []
+                        for name in zf.namelist():
+                            if os.path.basename(name) != name or not name.endswith(".txt"):
+                                continue
+                            if not quiet:
+                                print(f"  📥 {name}")
+                            _install(zf, name)
+                            downloaded.append(name)
+
+        # Only a cursor from an unfiltered sync covers every phone
+        if new_cursor and not prefix:
+            _write_cursor(new_cursor)
+
+        if not quiet or downloaded:
+            print(f"✅ Sync Complete! (📥 {len(downloaded)} updated)")
         
     except requests.exceptions.ConnectionError:
         print(f"❌ Connection Error: Could not reach {RENDER_URL}")
@@ -95,19 +143,22 @@ def main():
     parser = argparse.ArgumentParser(description="Sync Render logs locally.")
     parser.add_argument("--watch", action="store_true", help="Keep syncing in a loop.")
     parser.add_argument("--interval", type=int, default=60, help="Seconds between syncs (default: 60).")
+    parser.add_argument("--full", action="store_true", help="Ignore the saved cursor and download everything.")
+    parser.add_argument("--prefix", help="Only phones starting with these digits.")
     args = parser.parse_args()
 
     if args.watch:
         print(f"👀 Watch mode active. Syncing every {args.interval}s...")
         print("Press Ctrl+C to stop.")
         try:
+            sync_logs(quiet=True, full=args.full, prefix=args.prefix)
             while True:
-                sync_logs(quiet=True)
                 time.sleep(args.interval)
+                sync_logs(quiet=True, prefix=args.prefix)
         except KeyboardInterrupt:
             print("\n👋 Stopped watching.")
     else:
-        sync_logs()
+        sync_logs(full=args.full, prefix=args.prefix)
 
 if __name__ == "__main__":
     main()
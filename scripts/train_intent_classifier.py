@@ -0,0 +1,135 @@
+"""
+Train the local intent classifier used by agents/orchestrator.py.
+
+Data sources (combined, de-duplicated on normalized text):
+  - data/intent_training/seed.jsonl   curated examples (always used)
+  - --extra FILE.jsonl                any {"text", "intent"} export
+  - --firestore                       user messages logged with an intent in
+                                      sessions/*/messages (LLM / router labels)
+
+Writes a versioned artifact (data/models/intent_classifier_v<N>.json) and
+prints held-out accuracy / latency. With --benchmark-llm N it also labels N
+held-out messages with the gpt-4o-mini classifier and reports agreement and
+latency against it.
+
+Usage:
+    python scripts/train_intent_classifier.py --version 2 --firestore
+    python scripts/train_intent_classifier.py --benchmark-llm 50
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.intent_cache import normalize_message
+from utils.intent_model import train, evaluate, load_jsonl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_PATH = os.path.join(ROOT, "data", "intent_training", "seed.jsonl")
+MODEL_DIR = os.path.join(ROOT, "data", "models")
+LABELS = {"support", "recommendation", "sales", "escalation", "general"}
+
+
+def load_firestore_pairs(limit: int):
+    """User messages that were logged with a routed intent."""
+    from utils.firebase_client import get_db
+
+    db = get_db()
+    if not db:
+        print("⚠️  Firebase not available, skipping logged messages")
+        return []
+    pairs = []
+    for session in db.collection("sessions").limit(limit).stream():
+        for doc in session.reference.collection("messages").where("sender", "==", "user").stream():
+            row = doc.to_dict()
+            text, intent = row.get("message"), row.get("intent")
+            if text and intent in LABELS and not text.startswith("["):
+                pairs.append((text, intent))
+    print(f"   Loaded {len(pairs)} labelled messages from Firestore")
+    return pairs
+
+
+def dedupe(pairs):
+    seen, unique = set(), []
+    for text, intent in pairs:
+        key = normalize_message(text)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append((text, intent))
+    return unique
+
+
+def benchmark_llm(model, holdout, n: int):
+    from langchain_openai import ChatOpenAI
+    from langchain_core.messages import SystemMessage, HumanMessage
+    from agents.orchestrator import CLASSIFIER_PROMPT
+
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    agree = 0
+    llm_ms, local_ms = [], []
+    sample = holdout[:n]
+    for text, _ in sample:
+        started = time.perf_counter()
+        reply = llm.invoke([SystemMessage(content=CLASSIFIER_PROMPT),
+                            HumanMessage(content=f"Classify this message:\n\nNew message: {text}")])
+        llm_ms.append((time.perf_counter() - started) * 1000)
+        llm_label = reply.content.strip().lower()
+
+        started = time.perf_counter()
+        local_label, _ = model.predict(text)
+        local_ms.append((time.perf_counter() - started) * 1000)
+        agree += local_label == llm_label
+
+    print(f"\n🤖 Against LLM labels ({len(sample)} messages):")
+    print(f"   Agreement:   {agree / len(sample):.1%}")
+    print(f"   LLM latency: avg {sum(llm_ms) / len(llm_ms):.0f} ms")
+    print(f"   Local:       avg {sum(local_ms) / len(local_ms):.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local intent classifier")
+    parser.add_argument("--version", type=int, default=1, help="Artifact version number")
+    parser.add_argument("--extra", action="append", default=[], help="Extra JSONL files of {text, intent}")
+    parser.add_argument("--firestore", action="store_true", help="Include messages logged in Firestore")
+    parser.add_argument("--firestore-sessions", type=int, default=2000)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction held out for evaluation")
+    parser.add_argument("--threshold", type=float, default=0.75, help="Confidence threshold to report coverage at")
+    parser.add_argument("--benchmark-llm", type=int, default=0, metavar="N")
+    args = parser.parse_args()
+
+    pairs = load_jsonl(SEED_PATH)
+    for path in args.extra:
+        pairs += load_jsonl(path)
+    if args.firestore:
+        pairs += load_firestore_pairs(args.firestore_sessions)
+    pairs = dedupe(pairs)
+    print(f"📚 {len(pairs)} unique training examples")
+
+    rng = random.Random(7)
+    shuffled = pairs[:]
+    rng.shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - args.holdout))
+    train_set, holdout = shuffled[:cut], shuffled[cut:]
+
+    report = evaluate(train(train_set), holdout, threshold=args.threshold)
+    print(f"\n📊 Held-out ({report['examples']} messages): accuracy {report['accuracy']:.1%}, "
+          f"{report['coverage']:.0%} answered above {args.threshold} "
+          f"at {report['confident_accuracy']:.1%} accuracy, p99 {report['p99_ms']:.3f} ms")
+
+    # Ship a model trained on everything
+    model = train(pairs)
+    model.metadata.update({"model_version": args.version, "holdout": report})
+    path = os.path.join(MODEL_DIR, f"intent_classifier_v{args.version}.json")
+    model.save(path)
+    print(f"\n💾 Saved {path} ({os.path.getsize(path) // 1024} KB, {model.metadata['features']} features)")
+
+    if args.benchmark_llm:
+        benchmark_llm(model, holdout, args.benchmark_llm)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,13 @@ import os
 import json
 import time
 import uuid
+import threading
 
 # Fix import path for pytest + pytest-xdist
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("PRELOAD_KNOWLEDGE_INDEX", "false")  # no embedding calls from tests
+os.environ.setdefault("WARM_AGENTS", "false")              # agents build lazily in tests
+os.environ.setdefault("STREAM_REPLIES", "false")           # route_and_run mocks take (text, state)
 
 import pytest
 from webhook_server_revised import (
@@ -19,9 +23,14 @@ from webhook_server_revised import (
     conversations,
     processed_ids_dict,
     session_context,
-    per_phone_locks,
+    message_dispatcher,
+    timer_scheduler,
+    firestore_writer,
 )
 from agents.state import create_initial_state
+from agents.orchestrator import intent_cache
+from utils.logger import segment_log
+from agents.tool_runner import tool_runner
 from unittest.mock import MagicMock, patch
 import random
 
@@ -213,12 +222,14 @@ def clear_all_state():
     conversations.clear()
     processed_ids_dict.clear()
     session_context.clear()
-    per_phone_locks.clear()
+    timer_scheduler.clear()
+    intent_cache.clear()
     yield
     conversations.clear()
     processed_ids_dict.clear()
     session_context.clear()
-    per_phone_locks.clear()
+    timer_scheduler.clear()
+    intent_cache.clear()
 
 
 @pytest.fixture
@@ -250,10 +261,25 @@ def mock_agent():
         yield mocked
 
 
+_REAL_THREAD = threading.Thread  # captured before mock_threads patches it
+
+
+@pytest.fixture
+def real_threads():
+    """Opt out of mock_threads for tests that need real background workers."""
+    with patch.object(threading, "Thread", _REAL_THREAD):
+        yield
+
+
 @pytest.fixture(autouse=True)
 def mock_threads():
-    """Make threading synchronous for testing."""
-    with patch("threading.Thread") as mocked:
+    """Make threading and the message dispatcher synchronous for testing."""
+    with patch("threading.Thread") as mocked, \
+         patch.object(message_dispatcher, "synchronous", True), \
+         patch.object(timer_scheduler, "autostart", False), \
+         patch.object(firestore_writer, "autostart", False), \
+         patch.object(segment_log, "autostart", False), \
+         patch.object(tool_runner, "synchronous", True):
 
         def start_sync():
             call_kwargs = mocked.call_args[1]
@@ -0,0 +1,129 @@
+"""
+Agent Registry Tests for RentBasket WhatsApp Bot.
+
+Agent graphs and LLM clients are compiled / built once per process through
+agents.registry instead of per message. These tests cover build-once (also
+under concurrent first use), that recommendation turns reuse one compiled
+graph, the boot warm-up report and the cold-start vs per-turn cost.
+"""
+
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
+
+from agents.registry import AgentRegistry, agent_registry, get_chat_model
+from agents.recommendation_agent import create_recommendation_agent, run_recommendation_agent
+from agents.orchestrator import warm_agents
+
+
+@pytest.mark.unit
+class TestAgentRegistry:
+
+    def test_builds_once_and_counts_hits(self):
+        registry = AgentRegistry()
+        builds = []
+        registry.register("graph", lambda: builds.append(1) or object())
+        first = registry.get("graph")
+        assert registry.get("graph") is first and len(builds) == 1
+        stats = registry.stats()
+        assert stats["built"] == ["graph"] and stats["builds"] == 1 and stats["hits"] == 1
+
+    def test_concurrent_first_use_builds_once(self):
+        registry = AgentRegistry()
+        builds, release = [], threading.Event()
+
+        def slow_builder():
+            builds.append(1)
+            while not release.is_set():        # time.sleep is patched in tests
+                pass
+            return object()
+
+        registry.register("graph", slow_builder)
+        results = []
+        workers = [threading.Thread(target=lambda: results.append(registry.get("graph"))) for _ in range(8)]
+        # conftest runs Thread targets inline; release first so the inline build completes
+        release.set()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert len(builds) == 1 and len({id(r) for r in results}) == 1
+
+    def test_replace_rebuilds_and_reset_drops(self):
+        registry = AgentRegistry()
+        registry.register("graph", lambda: "v1")
+        assert registry.get("graph") == "v1"
+        registry.register("graph", lambda: "ignored", replace=False)
+        assert registry.get("graph") == "v1"
+        registry.register("graph", lambda: "v2")
+        assert registry.get("graph") == "v2"
+        registry.reset()
+        assert registry.stats()["built"] == []
+        with pytest.raises(KeyError):
+            registry.get("missing")
+
+    def test_warm_reports_build_time_and_errors(self):
+        registry = AgentRegistry()
+        registry.register("ok", object)
+        registry.register("broken", lambda: 1 / 0)
+        report = registry.warm()
+        assert isinstance(report["ok"], float)
+        assert report["broken"].startswith("error: ")
+
+    def test_chat_models_shared_per_model_and_temperature(self):
+        assert get_chat_model("gpt-4o-mini", 0) is get_chat_model("gpt-4o-mini", 0)
+        assert get_chat_model("gpt-4o-mini", 0) is not get_chat_model("gpt-4o-mini", 0.1)
+
+
+@pytest.mark.unit
+def test_recommendation_turns_reuse_one_compiled_graph():
+    agent_registry.reset("recommendation")
+    graphs, real_compile = [], StateGraph.compile
+
+    def fake_invoke(graph, state, *args, **kwargs):
+        graphs.append(graph)
+        return {**state, "messages": state["messages"] + [AIMessage(content="ok")]}
+
+    with patch.object(CompiledStateGraph, "invoke", autospec=True, side_effect=fake_invoke), \
+         patch.object(StateGraph, "compile", autospec=True, side_effect=real_compile) as compile_spy:
+        state = None
+        for message in ("need a sofa", "3 seater", "for 6 months"):
+            response, state = run_recommendation_agent(message, state)
+            assert response == "ok"
+    assert compile_spy.call_count == 1
+    assert len(graphs) == 3 and len({id(g) for g in graphs}) == 1
+    assert len(state["messages"]) == 6
+
+
+@pytest.mark.unit
+def test_warm_agents_builds_every_enabled_graph():
+    report = warm_agents()
+    assert {"sales", "recommendation", "support_policy", "llm:gpt-4o-mini:0"} <= set(report)
+    assert all(isinstance(ms, float) for ms in report.values()), report
+    assert {"sales", "recommendation", "support_policy"} <= set(agent_registry.stats()["built"])
+
+
+@pytest.mark.load
+def test_per_turn_cost_after_cold_start():
+    turns = 20
+    started = time.perf_counter()
+    for _ in range(turns):
+        create_recommendation_agent()
+    per_turn_compile_ms = (time.perf_counter() - started) * 1000 / turns
+
+    agent_registry.reset("recommendation")
+    started = time.perf_counter()
+    agent_registry.get("recommendation")
+    cold_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for _ in range(turns):
+        agent_registry.get("recommendation")
+    warm_ms = (time.perf_counter() - started) * 1000 / turns
+
+    print(f"\n  compile per turn: {per_turn_compile_ms:.2f} ms, cold start: {cold_ms:.2f} ms, "
+          f"registry lookup per turn: {warm_ms:.4f} ms")
+    assert warm_ms < per_turn_compile_ms / 100
@@ -0,0 +1,212 @@
+"""
+Async Webhook Front End Tests for RentBasket WhatsApp Bot.
+
+Covers asgi_server.AsyncWebhookApp: the immediate-ack fast path, de-dup,
+deferral under saturation, Flask pass-through, and (load marker) an
+ack-latency benchmark against the Flask path under concurrent load.
+
+Run the benchmark with: pytest -m load tests/test_async_webhook.py -s
+"""
+
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from conftest import build_webhook_payload
+
+_sleep = time.sleep  # captured before conftest patches time.sleep
+
+
+async def _asgi_request(app, method, path, body=b"", query_string=b""):
+    """Drive an ASGI app directly; returns (status, parsed JSON or raw bytes)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": query_string,
+        "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+        "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+    }
+    inbox = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if inbox:
+            return inbox.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    status = sent[0]["status"]
+    raw = b"".join(m.get("body", b"") for m in sent[1:])
+    try:
+        return status, json.loads(raw)
+    except ValueError:
+        return status, raw
+
+
+@pytest.fixture
+def async_app(real_threads):
+    from asgi_server import AsyncWebhookApp
+    from webhook_server_revised import app as flask_app
+    return AsyncWebhookApp(flask_app, workers=4)
+
+
+@pytest.mark.unit
+class TestAsyncWebhook:
+
+    def test_acks_before_processing(self, async_app, mock_whatsapp, mock_agent):
+        release = threading.Event()
+        mock_whatsapp.send_read_and_typing_indicator.side_effect = lambda *_: release.wait(2)
+
+        async def scenario():
+            payload = build_webhook_payload(text="need a sofa")
+            status, body = await _asgi_request(async_app, "POST", "/webhook", json.dumps(payload).encode())
+            # Acked while the read receipt is still blocked
+            assert status == 200 and body == {"status": "accepted"}
+            assert mock_agent.call_count == 0
+            release.set()
+            await async_app.drain(timeout=5)
+
+        asyncio.run(scenario())
+        mock_whatsapp.send_read_and_typing_indicator.assert_called_once()
+        assert mock_agent.call_count == 1
+
+    def test_duplicates_are_acked_not_processed(self, async_app, mock_whatsapp, mock_agent):
+        async def scenario():
+            payload = json.dumps(build_webhook_payload(text="fridge price", msg_id="wamid.async_dupe")).encode()
+            first = await _asgi_request(async_app, "POST", "/webhook", payload)
+            second = await _asgi_request(async_app, "POST", "/webhook", payload)
+            await async_app.drain(timeout=5)
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert first == (200, {"status": "accepted"})
+        assert second == (200, {"status": "duplicate"})
+        assert mock_agent.call_count == 1
+
+    def test_same_phone_processed_in_order(self, async_app, mock_whatsapp, mock_agent):
+        seen = []
+        mock_agent.side_effect = lambda text, state: (seen.append(text) or ("ok", state))
+
+        async def scenario():
+            for i in range(5):
+                payload = build_webhook_payload(phone="919900003333", text=f"need item {i}")
+                await _asgi_request(async_app, "POST", "/webhook", json.dumps(payload).encode())
+            await async_app.drain(timeout=5)
+
+        asyncio.run(scenario())
+        assert seen == [f"need item {i}" for i in range(5)]
+
+    def test_saturation_defers_without_claiming_id(self, async_app, mock_whatsapp, mock_agent):
+        from webhook_server_revised import message_dispatcher, processed_ids_dict
+
+        payload = json.dumps(build_webhook_payload(text="sofa", msg_id="wamid.async_busy")).encode()
+        with patch.object(message_dispatcher, "is_saturated", return_value=True):
+            status, body = asyncio.run(_asgi_request(async_app, "POST", "/webhook", payload))
+        assert status == 503 and body["status"] == "deferred"
+        assert "wamid.async_busy" not in processed_ids_dict
+
+    def test_full_phone_lane_defers_before_ack(self, async_app, mock_whatsapp, mock_agent):
+        from webhook_server_revised import message_dispatcher, processed_ids_dict
+
+        payload = json.dumps(build_webhook_payload(phone="919900004444", text="sofa",
+                                                   msg_id="wamid.async_lane_full")).encode()
+        with patch.object(message_dispatcher, "_has_room", return_value=False):
+            status, body = asyncio.run(_asgi_request(async_app, "POST", "/webhook", payload))
+        assert status == 503 and body["status"] == "deferred"
+        assert "wamid.async_lane_full" not in processed_ids_dict
+
+    def test_acked_message_that_cannot_be_queued_is_counted_dropped(self, async_app, mock_whatsapp, mock_agent):
+        from webhook_server_revised import message_dispatcher
+
+        payload = json.dumps(build_webhook_payload(phone="919900005555", text="need a sofa for my flat",
+                                                   msg_id="wamid.async_race")).encode()
+
+        async def scenario():
+            # room at ack time, none by the time the message is handed to the dispatcher
+            with patch.object(message_dispatcher, "submit_wait", return_value=False) as submit_wait:
+                acked = await _asgi_request(async_app, "POST", "/webhook", payload)
+                await async_app.drain(timeout=5)
+            return acked, submit_wait
+
+        (status, body), submit_wait = asyncio.run(scenario())
+        assert status == 200 and body["status"] == "accepted"
+        assert submit_wait.call_count == 1                     # waited for room instead of deferring
+        assert async_app.stats()["dropped"] == 1
+        assert mock_agent.call_count == 0
+        assert any("send it again" in str(c) for c in mock_whatsapp.send_text_message.call_args_list)
+
+    def test_invalid_json_rejected(self, async_app):
+        status, body = asyncio.run(_asgi_request(async_app, "POST", "/webhook", b"{not json"))
+        assert status == 400
+
+    def test_other_routes_served_by_flask(self, async_app):
+        from webhook_server_revised import VERIFY_TOKEN
+        qs = f"hub.mode=subscribe&hub.verify_token={VERIFY_TOKEN}&hub.challenge=4242".encode()
+        status, body = asyncio.run(_asgi_request(async_app, "GET", "/webhook", query_string=qs))
+        assert status == 200
+        assert body == 4242 or body == b"4242"
+
+
+# ============================================================
+# BENCHMARK: Flask vs async ack latency under concurrent load
+# ============================================================
+
+GRAPH_API_LATENCY = 0.05   # simulated read-receipt round trip
+CONCURRENCY = 20
+REQUESTS = 100
+
+
+def _summary(name, latencies):
+    latencies = sorted(latencies)
+    n = len(latencies)
+    p50, p95 = latencies[n // 2], latencies[int(n * 0.95)]
+    print(f"  {name:<6} p50={p50 * 1000:7.2f}ms  p95={p95 * 1000:7.2f}ms  "
+          f"max={latencies[-1] * 1000:7.2f}ms  avg={statistics.mean(latencies) * 1000:7.2f}ms")
+    return p95
+
+
+@pytest.mark.load
+def test_ack_latency_flask_vs_async(client, async_app, mock_whatsapp, mock_agent):
+    mock_whatsapp.send_read_and_typing_indicator.side_effect = lambda *_: _sleep(GRAPH_API_LATENCY)
+
+    def flask_post(i):
+        from webhook_server_revised import app as flask_app
+        payload = build_webhook_payload(phone=f"9199200{i:05d}", text=f"need a bed {i}")
+        with flask_app.test_client() as c:
+            start = time.perf_counter()
+            c.post("/webhook", data=json.dumps(payload), content_type="application/json")
+            return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        flask_latencies = list(pool.map(flask_post, range(REQUESTS)))
+
+    async def async_run():
+        sem = asyncio.Semaphore(CONCURRENCY)
+
+        async def one(i):
+            payload = json.dumps(build_webhook_payload(phone=f"9199300{i:05d}", text=f"need a bed {i}")).encode()
+            async with sem:
+                start = time.perf_counter()
+                await _asgi_request(async_app, "POST", "/webhook", payload)
+                return time.perf_counter() - start
+
+        latencies = await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+        await async_app.drain(timeout=30)
+        return latencies
+
+    async_latencies = asyncio.run(async_run())
+
+    print(f"\n  Ack latency, {REQUESTS} requests @ concurrency {CONCURRENCY}, "
+          f"simulated Graph API {GRAPH_API_LATENCY * 1000:.0f}ms:")
+    flask_p95 = _summary("flask", flask_latencies)
+    async_p95 = _summary("async", async_latencies)
+    assert async_p95 < GRAPH_API_LATENCY < flask_p95
@@ -0,0 +1,151 @@
+"""
+Context Window Tests for RentBasket WhatsApp Bot.
+
+Agent prompts are built by agents.context_window within a token budget:
+recent turns verbatim, stale tool outputs cut to a preview, older turns
+folded into a summary, and the stored state compacted into
+collected_info["recent_summary"]. These tests cover the window, the
+compaction and that a long sales conversation's prompt stops growing.
+"""
+
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_openai import ChatOpenAI
+
+from agents.context_window import (
+    ContextWindow,
+    STALE_TOOL_CHARS,
+    compact_state,
+    context_window,
+    estimate_tokens,
+    split_turns,
+)
+from agents.sales_agent import run_agent
+from agents.state import create_initial_state
+
+QUOTE = "Quote:\n" + "\n".join(f"Item {i}: Rs. {500 + i}/month, deposit Rs. {1000 + i}" for i in range(60))
+
+
+def _turn(i, quote=False):
+    messages = [HumanMessage(content=f"question {i}")]
+    if quote:
+        messages += [
+            AIMessage(content="", tool_calls=[{"name": "create_quote_tool", "id": f"call_{i}",
+                                                "args": {"product_ids": "1001,1002", "duration": 6}}]),
+            ToolMessage(tool_call_id=f"call_{i}", name="create_quote_tool", content=QUOTE),
+        ]
+    return messages + [AIMessage(content=f"answer {i}")]
+
+
+def _conversation(turns, quote_every=3):
+    """quote_every=None: no quotes."""
+    return [m for i in range(turns) for m in _turn(i, quote=bool(quote_every) and i % quote_every == 0)]
+
+
+@pytest.mark.unit
+class TestContextWindow:
+
+    def test_short_conversation_is_sent_unchanged(self):
+        window = ContextWindow(budget_tokens=10_000, keep_turns=4)
+        messages = _conversation(2, quote_every=None) + [HumanMessage(content="now")]
+        prompt = window.build("SYSTEM", messages)
+        assert prompt[0].content == "SYSTEM"
+        assert prompt[1:] == messages
+
+    def test_keeps_recent_turns_and_summarizes_older(self):
+        window = ContextWindow(budget_tokens=10_000, keep_turns=3)
+        messages = _conversation(6, quote_every=None) + [HumanMessage(content="now")]
+        prompt = window.build("SYSTEM", messages, {"recent_summary": "Customer: hello Ku: hi"})
+        assert [m.content for m in prompt[1:] if isinstance(m, HumanMessage)] == ["question 4", "question 5", "now"]
+        assert prompt[0].content == "SYSTEM"
+        summary = prompt[-2].content.split("## Earlier in this conversation\n")[1]   # right before "now"
+        assert summary.splitlines()[0] == "Customer: hello Ku: hi"
+        assert "Customer: question 0 Ku: answer 0" in summary and "question 4" not in summary
+
+    def test_stale_tool_outputs_are_cut_but_current_turn_is_not(self):
+        window = ContextWindow(budget_tokens=100_000, keep_turns=4)
+        messages = _conversation(2, quote_every=1) + _turn(2, quote=True)[:-1]   # current turn awaits the reply
+        prompt = window.build("SYSTEM", messages)
+        tool_outputs = [m.content for m in prompt if isinstance(m, ToolMessage)]
+        assert len(tool_outputs) == 3
+        assert all(len(c) < STALE_TOOL_CHARS + 50 for c in tool_outputs[:2])
+        assert tool_outputs[-1] == QUOTE
+        # every tool call still has its result right after it
+        for i, msg in enumerate(prompt):
+            if isinstance(msg, AIMessage) and msg.tool_calls:
+                assert prompt[i + 1].tool_call_id == msg.tool_calls[0]["id"]
+        assert window.stats()["stripped_tool_outputs"] == 2
+
+    def test_budget_summarizes_verbatim_turns_too(self):
+        window = ContextWindow(budget_tokens=400, keep_turns=6)
+        messages = _conversation(8, quote_every=1) + [HumanMessage(content="now")]
+        prompt = window.build("SYSTEM", messages)
+        assert estimate_tokens(prompt) <= 400
+        assert prompt[-1].content == "now"
+        stats = window.stats()
+        assert stats["prompt_tokens_after"] < stats["prompt_tokens_before"] and stats["over_budget"] == 0
+
+    def test_turns_start_at_each_customer_message(self):
+        turns = split_turns([AIMessage(content="greeting")] + _turn(0, quote=True) + _turn(1))
+        assert [len(t) for t in turns] == [1, 4, 2]
+
+
+@pytest.mark.unit
+class TestCompactState:
+
+    def test_old_turns_fold_into_recent_summary(self):
+        state = create_initial_state()
+        state["messages"] = _conversation(10)
+        compacted = compact_state(state, max_turns=4)
+        assert [m.content for m in compacted["messages"] if isinstance(m, HumanMessage)] == \
+            ["question 6", "question 7", "question 8", "question 9"]
+        summary = compacted["collected_info"]["recent_summary"]
+        assert summary.startswith("Customer: question 0 [create_quote_tool] Ku: answer 0")
+        assert compacted["collected_info"]["_last_tool_calls"]["create_quote_tool"] == \
+            {"product_ids": "1001,1002", "duration": 6}
+        assert len(state["messages"]) == 28                       # input left as it was
+        assert compact_state(compacted, max_turns=4) is compacted
+
+    def test_summary_is_capped(self):
+        state = create_initial_state()
+        for start in range(0, 200, 20):
+            state["messages"] = list(state["messages"]) + [m for i in range(start, start + 20) for m in _turn(i)]
+            state = compact_state(state, max_turns=4)
+        summary = state["collected_info"]["recent_summary"]
+        assert len(summary) <= 800 and summary.splitlines()[-1] == "Customer: question 195 Ku: answer 195"
+
+
+def _fake_llm(prompts):
+    def invoke(self, messages, *args, **kwargs):
+        prompts.append(messages)
+        return AIMessage(content=f"reply {len(prompts)}")
+    return invoke
+
+
+@pytest.mark.unit
+def test_cart_rule_survives_compaction():
+    state = create_initial_state()
+    state["messages"] = _conversation(10, quote_every=20)         # one quote, in turn 0
+    state = compact_state(state, max_turns=4)
+    prompts = []
+    with patch.object(ChatOpenAI, "invoke", autospec=True, side_effect=_fake_llm(prompts)):
+        run_agent("send me the cart link", state)
+    assert "product_ids='1001,1002' and duration=6" in prompts[0][-2].content   # context, before the message
+
+
+@pytest.mark.unit
+def test_long_conversation_prompt_stops_growing():
+    state, prompts, sizes = create_initial_state(), [], []
+    with patch.object(ChatOpenAI, "invoke", autospec=True, side_effect=_fake_llm(prompts)):
+        for i in range(40):
+            state["messages"] = list(state["messages"]) + _turn(i, quote=True)[1:3]   # a big quote each turn
+            _, state = run_agent(f"message {i}", state)
+            state = compact_state(state)
+            sizes.append(estimate_tokens(prompts[-1]))
+    full_history = estimate_tokens([SystemMessage(content=prompts[-1][0].content)] + list(state["messages"]))
+    print(f"\n  prompt tokens: turn 5 {sizes[4]}, turn 20 {sizes[19]}, turn 40 {sizes[39]}; "
+          f"stats {context_window.stats()['last']['sales']}")
+    assert sizes[39] <= sizes[19] * 1.1
+    assert sizes[39] < full_history
+    assert len(state["messages"]) <= 12 * 4
@@ -0,0 +1,183 @@
+"""
+Message Dispatcher Tests for RentBasket WhatsApp Bot.
+
+Covers the bounded worker pool that replaced thread-per-message:
+per-phone FIFO ordering, flat thread count, backpressure and shedding.
+"""
+
+import json
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from utils.dispatcher import MessageDispatcher
+from conftest import build_webhook_payload
+
+
+_sleep = time.sleep  # captured before conftest patches time.sleep for webhook tests
+
+
+@pytest.fixture
+def dispatcher(real_threads):
+    d = MessageDispatcher(workers=4, max_pending=100, max_per_phone=50, max_wait_seconds=None)
+    yield d
+    d.shutdown(wait=True, timeout=5)
+
+
+def _occupy(d, phone):
+    """Submit a job that blocks its worker until the returned gate is set."""
+    started, gate = threading.Event(), threading.Event()
+
+    def _block():
+        started.set()
+        gate.wait(5)
+
+    assert d.submit(phone, _block)
+    assert started.wait(2)
+    return gate
+
+
+def _drain(d, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        s = d.stats()
+        if s["queued"] == 0 and s["active_phones"] == 0:
+            return
+        _sleep(0.01)
+    raise AssertionError(f"dispatcher did not drain: {d.stats()}")
+
+
+@pytest.mark.unit
+class TestDispatcherOrdering:
+
+    def test_same_phone_runs_in_fifo_order(self, dispatcher):
+        seen = []
+        for i in range(30):
+            dispatcher.submit("919900000001", seen.append, i)
+        _drain(dispatcher)
+        assert seen == list(range(30))
+
+    def test_same_phone_never_runs_concurrently(self, dispatcher):
+        running = {"now": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def job():
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            _sleep(0.005)
+            with lock:
+                running["now"] -= 1
+
+        for _ in range(20):
+            dispatcher.submit("919900000002", job)
+        _drain(dispatcher)
+        assert running["peak"] == 1
+
+    def test_different_phones_run_in_parallel(self, dispatcher):
+        barrier = threading.Barrier(4, timeout=2)
+        for i in range(4):
+            dispatcher.submit(f"91990000010{i}", barrier.wait)
+        _drain(dispatcher)
+        assert dispatcher.stats()["failed"] == 0
+
+
+@pytest.mark.unit
+class TestDispatcherCapacity:
+
+    def test_thread_count_stays_flat_under_load(self, dispatcher):
+        before = threading.active_count()
+        for i in range(90):
+            dispatcher.submit(f"9199{i:08d}", _sleep, 0.001)
+        peak = threading.active_count()
+        _drain(dispatcher)
+        assert peak - before <= dispatcher.workers
+
+    def test_rejects_when_globally_saturated(self, real_threads):
+        d = MessageDispatcher(workers=1, max_pending=3, max_per_phone=10, max_wait_seconds=None)
+        gate = _occupy(d, "p0")  # the only worker is busy
+        try:
+            accepted = [d.submit(f"p{i}", lambda: None) for i in range(1, 6)]
+            assert accepted == [True, True, True, False, False]
+            assert d.stats()["rejected"] == 2
+        finally:
+            gate.set()
+            d.shutdown()
+
+    def test_rejects_when_single_phone_backlog_full(self, real_threads):
+        d = MessageDispatcher(workers=2, max_pending=100, max_per_phone=2, max_wait_seconds=None)
+        gate = _occupy(d, "p")
+        try:
+            assert d.submit("p", lambda: None)
+            assert d.submit("p", lambda: None)
+            assert not d.submit("p", lambda: None)
+            assert d.submit("other", lambda: None)
+        finally:
+            gate.set()
+            d.shutdown()
+
+    def test_submit_wait_takes_the_next_free_slot(self, real_threads):
+        d = MessageDispatcher(workers=1, max_pending=100, max_per_phone=1, max_wait_seconds=None)
+        gate = _occupy(d, "p")
+        ran = []
+        try:
+            assert d.submit("p", ran.append, "queued")
+            assert d.is_saturated("p") and not d.is_saturated()
+            assert not d.submit_wait("p", 0.05, ran.append, "timed out")
+            threading.Timer(0.05, gate.set).start()          # frees the lane shortly
+            assert d.submit_wait("p", 2, ran.append, "waited")
+            _drain(d)
+            assert ran == ["queued", "waited"]
+        finally:
+            gate.set()
+            d.shutdown()
+
+    def test_stale_jobs_are_shed(self, real_threads):
+        shed, ran = [], []
+        d = MessageDispatcher(workers=1, max_wait_seconds=0.05, on_shed=shed.append)
+        gate = _occupy(d, "p")
+        try:
+            d.submit("p", ran.append, "late")
+            _sleep(0.15)
+            gate.set()
+            _drain(d)
+            assert ran == []
+            assert shed == ["p"]
+            assert d.stats()["shed"] == 1
+        finally:
+            gate.set()
+            d.shutdown()
+
+    def test_stats_report_wait_times(self, dispatcher):
+        for i in range(5):
+            dispatcher.submit("p", _sleep, 0.01)
+        _drain(dispatcher)
+        stats = dispatcher.stats()
+        assert stats["completed"] == 5
+        assert stats["wait_ms"]["max"] >= stats["wait_ms"]["avg"] > 0
+
+
+@pytest.mark.unit
+class TestWebhookDispatch:
+
+    def test_saturated_dispatcher_defers_to_meta_retry(self, client, mock_whatsapp, mock_agent):
+        """A deferred message answers 503 and is forgotten so Meta's redelivery is processed."""
+        from webhook_server_revised import message_dispatcher, processed_ids_dict
+
+        payload = build_webhook_payload(text="need a sofa for my flat", msg_id="wamid.deferred_1")
+        with patch.object(message_dispatcher, "submit", return_value=False):
+            resp = client.post("/webhook", data=json.dumps(payload), content_type="application/json")
+        assert resp.status_code == 503
+        assert "wamid.deferred_1" not in processed_ids_dict
+
+        resp = client.post("/webhook", data=json.dumps(payload), content_type="application/json")
+        assert resp.status_code == 200
+        assert mock_agent.call_count == 1
+
+    def test_stats_endpoint_requires_secret(self, client):
+        from webhook_server_revised import VERIFY_TOKEN
+        assert client.get("/stats").status_code == 403
+        resp = client.get(f"/stats?secret={VERIFY_TOKEN}")
+        assert resp.status_code == 200
+        assert "dispatcher" in resp.get_json()
@@ -0,0 +1,170 @@
+"""
+Document Cache Tests for RentBasket WhatsApp Bot.
+
+Covers utils.doc_cache (TTL, negative entries, write-through merges, copies
+on read, snapshot-listener refresh) and checks that the lead / customer
+helpers read each Firestore document at most once per turn.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import transforms
+
+from utils.doc_cache import DocumentCache, document_cache
+from utils.firebase_client import get_lead, upsert_lead, is_hot_lead
+from tools.customer_tools import get_customer_profile
+
+PHONE = "919800000001"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeFirestore:
+    """collection().document().get()/set()/create()/update() with a read counter."""
+
+    def __init__(self, docs=None):
+        self.docs = docs or {}
+        self.reads = 0
+
+    def collection(self, name):
+        return _FakeCollection(self, name)
+
+
+class _FakeCollection:
+    def __init__(self, db, name):
+        self._db, self._name = db, name
+
+    def document(self, doc_id):
+        return _FakeDoc(self._db, f"{self._name}/{doc_id}", doc_id)
+
+
+class _FakeDoc:
+    def __init__(self, db, path, doc_id):
+        self._db, self._path, self.id = db, path, doc_id
+
+    def get(self):
+        self._db.reads += 1
+        data = self._db.docs.get(self._path)
+        return _FakeSnapshot(self.id, data)
+
+    def set(self, data, merge=False):
+        current = self._db.docs.get(self._path, {}) if merge else {}
+        self._db.docs[self._path] = {**current, **data}
+
+    def create(self, data):
+        if self._path in self._db.docs:
+            raise AlreadyExists(self._path)
+        self._db.docs[self._path] = dict(data)
+
+    def update(self, data):
+        if self._path not in self._db.docs:
+            raise NotFound(self._path)
+        self._db.docs[self._path].update(data)
+
+
+class _FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id, self._data = doc_id, data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    document_cache.clear()
+    yield
+    document_cache.clear()
+
+
+@pytest.mark.unit
+class TestDocumentCache:
+
+    def test_read_through_with_ttl_and_negative_entries(self):
+        clock = FakeClock()
+        cache = DocumentCache(ttl_seconds=30, clock=clock)
+        loads = []
+        loader = lambda: loads.append(1) or None
+        assert cache.get_or_load("leads", PHONE, loader) is None
+        assert cache.get_or_load("leads", PHONE, loader) is None
+        clock.now += 31
+        cache.get_or_load("leads", PHONE, loader)
+        assert len(loads) == 2
+        assert cache.stats()["expirations"] == 1
+
+    def test_reads_are_copies(self):
+        cache = DocumentCache()
+        cache.get_or_load("leads", PHONE, lambda: {"prefs": [{"category": "bed"}]})
+        cache.get_or_load("leads", PHONE, lambda: None)["prefs"].append({"category": "sofa"})
+        assert cache.get_or_load("leads", PHONE, lambda: None) == {"prefs": [{"category": "bed"}]}
+
+    def test_write_through_merges_nested_maps(self):
+        cache = DocumentCache()
+        cache.merge("leads", PHONE, {"name": "Asha"})          # not cached: ignored
+        assert cache.stats()["entries"] == 0
+        cache.get_or_load("leads", PHONE, lambda: {"name": "Asha", "delivery_location": {"city": "Gurgaon"}})
+        cache.merge("leads", PHONE, {"delivery_location": {"pincode": "122001"}, "lead_stage": "qualified"})
+        assert cache.get_or_load("leads", PHONE, lambda: None) == {
+            "name": "Asha", "lead_stage": "qualified",
+            "delivery_location": {"city": "Gurgaon", "pincode": "122001"},
+        }
+
+    def test_array_union_applies_other_transforms_invalidate(self):
+        cache = DocumentCache()
+        cache.get_or_load("leads", PHONE, lambda: {"prefs": [{"category": "bed"}]})
+        cache.merge("leads", PHONE, {"prefs": transforms.ArrayUnion([{"category": "bed"}, {"category": "sofa"}])})
+        assert cache.get_or_load("leads", PHONE, lambda: None)["prefs"] == [{"category": "bed"}, {"category": "sofa"}]
+        cache.merge("leads", PHONE, {"visits": transforms.Increment(1)})
+        assert cache.stats()["entries"] == 0
+
+    def test_snapshot_listener_refreshes_cached_documents(self):
+        class Change:
+            def __init__(self, doc_id, data, kind="MODIFIED"):
+                self.document = _FakeSnapshot(doc_id, data)
+                self.type = type("T", (), {"name": kind})()
+
+        class Query:
+            def on_snapshot(self, callback):
+                self.callback = callback
+                return self
+
+        cache, query = DocumentCache(), Query()
+        cache.get_or_load("leads", PHONE, lambda: {"lead_stage": "new"})
+        cache.listen("leads", query)
+        query.callback([], [Change(PHONE, {"lead_stage": "reserved"}), Change("other", {"x": 1})], None)
+        assert cache.get_or_load("leads", PHONE, lambda: None) == {"lead_stage": "reserved"}
+        assert cache.stats()["entries"] == 1
+
+
+@pytest.mark.unit
+def test_one_read_per_document_per_turn():
+    from datetime import datetime, timezone
+
+    db = FakeFirestore({
+        "customers/9800000001": {"name": "Asha", "is_active": True},
+    })
+    with patch("utils.firebase_client.get_db", return_value=db), \
+         patch("tools.customer_tools.get_db", return_value=db):
+        # early lead creation, stage check, sync_lead_data_tool, upsert, cart buttons
+        if not get_lead(PHONE):
+            upsert_lead(PHONE, {"phone": PHONE, "name": "Asha"})
+        get_lead(PHONE)
+        get_lead(PHONE)
+        upsert_lead(PHONE, {"lead_stage": "cart_created",
+                            "last_message_timestamp": datetime.now(timezone.utc)})
+        assert get_lead(PHONE)["lead_stage"] == "cart_created"
+        assert is_hot_lead(PHONE) is True
+        assert get_customer_profile(PHONE)["name"] == "Asha"
+        assert get_customer_profile(PHONE)["is_active"] is True
+
+    assert db.reads == 2   # one lead read (a miss), one customer read
+    assert db.docs[f"leads/{PHONE}"]["lead_stage"] == "cart_created"
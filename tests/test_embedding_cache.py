@@ -0,0 +1,116 @@
+"""
+Embedding Cache Tests for RentBasket WhatsApp Bot.
+
+Covers rag.embedding_cache (memory LRU + SQLite tiers, model-scoped keys,
+hit counters, boot warm-up from the disk tier and conversation logs) and
+the CachedEmbeddings wrapper used by knowledge searches.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from rag.embedding_cache import EmbeddingCache, CachedEmbeddings, top_logged_queries
+
+MODEL = "text-embedding-3-small"
+
+
+def _embedder():
+    return MagicMock(side_effect=lambda text: [float(len(text)), 1.0, 0.5])
+
+
+@pytest.mark.unit
+class TestEmbeddingCache:
+
+    def test_memory_hit_after_embed(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"))
+        embed = _embedder()
+        first = cache.get_or_embed(MODEL, "Security deposit refund?", embed)
+        second = cache.get_or_embed(MODEL, "security deposit  refund", embed)
+        assert first == second and embed.call_count == 1
+        stats = cache.stats()
+        assert (stats["memory_hits"], stats["misses"]) == (1, 1)
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "emb.sqlite3")
+        cache = EmbeddingCache(path)
+        cache.get_or_embed(MODEL, "damage policy", _embedder())
+        cache.close()
+
+        restarted = EmbeddingCache(path)
+        embed = _embedder()
+        assert restarted.get_or_embed(MODEL, "Damage policy", embed) == pytest.approx([13.0, 1.0, 0.5])
+        embed.assert_not_called()
+        assert restarted.stats()["disk_hits"] == 1
+
+    def test_model_is_part_of_key(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"))
+        cache.put(MODEL, "damage policy", [1.0, 0.0])
+        assert cache.get("text-embedding-3-large", "damage policy") is None
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(path=None, max_entries=2)
+        cache.put(MODEL, "a", [1.0])
+        cache.put(MODEL, "b", [2.0])
+        cache.get(MODEL, "a")
+        cache.put(MODEL, "c", [3.0])
+        assert cache.get(MODEL, "b") is None
+        assert cache.get(MODEL, "a") == [1.0]
+        assert cache.stats()["evictions"] == 1
+
+    def test_warm_up_loads_popular_entries_and_embeds_missing(self, tmp_path):
+        path = str(tmp_path / "emb.sqlite3")
+        cache = EmbeddingCache(path)
+        cache.put(MODEL, "security deposit refund", [1.0, 0.0])
+        cache.put(MODEL, "rare question", [0.0, 1.0])
+        for _ in range(3):
+            cache.get(MODEL, "security deposit refund")
+        cache.close()
+
+        restarted = EmbeddingCache(path)
+        embed_many = MagicMock(side_effect=lambda texts: [[0.5, 0.5] for _ in texts])
+        report = restarted.warm_up(MODEL, ["Security deposit refund", "delivery time?"], embed_many, top_n=1)
+        assert report == {"loaded": 1, "embedded": 1}
+        embed_many.assert_called_once_with(["delivery time?"])
+        assert restarted.get(MODEL, "delivery time") == [0.5, 0.5]
+        assert restarted.stats()["memory_hits"] == 1
+
+
+@pytest.mark.unit
+class TestCachedEmbeddings:
+
+    def test_queries_cached_documents_passed_through(self):
+        inner = MagicMock()
+        inner.embed_query.side_effect = lambda text: [1.0, 2.0]
+        inner.embed_documents.side_effect = lambda texts: [[0.0, 1.0] for _ in texts]
+        emb = CachedEmbeddings(inner, MODEL, EmbeddingCache(path=None))
+        emb.embed_query("refund policy")
+        emb.embed_query("Refund policy!")
+        emb.embed_documents(["chunk one", "chunk two"])
+        emb.embed_documents(["chunk one", "chunk two"])
+        assert inner.embed_query.call_count == 1
+        assert inner.embed_documents.call_count == 2
+
+    def test_top_logged_queries(self, tmp_path):
+        (tmp_path / "919800000001.txt").write_text(
+            "Conversation with A\n"
+            "==================================================\n"
+            "21/01/26, 02:02 pm - A: Security deposit refund?\n"
+            "21/01/26, 02:02 pm - Ku: It is refunded within 7 days.\n"
+            "21/01/26, 02:03 pm - A: hi\n"
+        )
+        (tmp_path / "919800000002.txt").write_text(
+            "21/01/26, 03:10 pm - B: security deposit refund\n"
+            "21/01/26, 03:11 pm - B: do you deliver in noida\n"
+        )
+        assert top_logged_queries(str(tmp_path)) == ["Security deposit refund?"]
+        assert len(top_logged_queries(str(tmp_path), min_count=1)) == 2
+
+    def test_top_logged_queries_reads_the_segment_log(self, tmp_path):
+        from utils.log_segments import SegmentLog
+
+        log = SegmentLog(str(tmp_path / "segments"))
+        log.autostart = False
+        for phone in ("919800000001", "919800000002"):
+            log.append(phone, f"21/01/26, 02:02 pm - A ({phone}): Do you deliver in Noida?\n")
+            log.append(phone, "21/01/26, 02:02 pm - Ku (Sales): Yes, we deliver in Noida.\n")
+        assert top_logged_queries(str(tmp_path), segment_log=log) == ["Do you deliver in Noida?"]
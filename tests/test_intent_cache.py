@@ -0,0 +1,133 @@
+"""
+Intent Cache Tests for RentBasket WhatsApp Bot.
+
+Covers utils.intent_cache.IntentCache (normalization, LRU/TTL eviction,
+embedding tier, stats) and its use in classify_intent: repeated phrasings
+in the same routing state skip the classifier LLM call.
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from agents.state import create_initial_state
+from utils.intent_cache import IntentCache, is_short_reply, normalize_message
+
+CTX = ("active_customer", "support", "unknown")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.unit
+class TestIntentCache:
+
+    def test_normalization(self):
+        assert normalize_message("  Price of   FRIDGE?? ") == "price of fridge"
+        assert normalize_message("my AC is not working!") == "my ac is not working"
+
+    def test_short_replies(self):
+        assert is_short_reply("Yes!") and is_short_reply("ok") and is_short_reply("2") and is_short_reply("no thanks")
+        assert not is_short_reply("price of fridge")
+
+    def test_exact_hit_after_put(self):
+        cache = IntentCache()
+        assert cache.get("Price of fridge?", CTX) is None
+        cache.put("Price of fridge?", CTX, "sales", latency_ms=800)
+        assert cache.get("price of  fridge", CTX) == "sales"
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+        assert stats["hit_rate"] == 0.5
+        assert stats["saved_ms"] == 800
+
+    def test_routing_state_is_part_of_key(self):
+        cache = IntentCache()
+        cache.put("my ac is not working", ("active_customer", "support", "unknown"), "support")
+        assert cache.get("my ac is not working", ("lead", "sales", "greeting")) is None
+
+    def test_lru_eviction(self):
+        cache = IntentCache(max_entries=2)
+        cache.put("a", CTX, "sales")
+        cache.put("b", CTX, "sales")
+        cache.get("a", CTX)               # a is now most recent
+        cache.put("c", CTX, "support")
+        assert cache.get("b", CTX) is None
+        assert cache.get("a", CTX) == "sales"
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = IntentCache(ttl_seconds=60, clock=clock)
+        cache.put("refund status", CTX, "support")
+        clock.now = 61
+        assert cache.get("refund status", CTX) is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_embedding_tier_catches_near_duplicates(self):
+        vectors = {
+            "my ac is not working": [1.0, 0.0, 0.1],
+            "ac not working": [0.98, 0.0, 0.12],
+            "price of sofa": [0.0, 1.0, 0.0],
+        }
+        embedder = MagicMock(side_effect=lambda text: vectors[text])
+        cache = IntentCache(embedder=embedder, similarity_threshold=0.95)
+        cache.put("My AC is not working", CTX, "support")
+        assert cache.get("AC not working!", CTX) == "support"
+        assert cache.get("price of sofa", CTX) is None
+        assert cache.stats()["semantic_hits"] == 1
+
+    def test_embedding_failure_degrades_to_miss(self):
+        cache = IntentCache(embedder=MagicMock(side_effect=RuntimeError("quota")))
+        cache.put("hello", CTX, "general")
+        assert cache.get("hello there", CTX) is None
+        assert cache.stats()["embedding_errors"] >= 1
+
+
+@pytest.mark.unit
+class TestClassifyIntentCaching:
+
+    def _state(self):
+        state = create_initial_state()
+        state["collected_info"]["customer_status"] = "active_customer"
+        state["active_agent"] = "support"
+        return state
+
+    def test_repeated_phrasing_skips_llm(self):
+        from agents import orchestrator
+
+        llm = MagicMock()
+        llm.invoke.return_value = MagicMock(content="SUPPORT")
+        with patch.object(orchestrator, "_get_classifier_llm", return_value=llm), \
+             patch.object(orchestrator, "intent_model", None):
+            first = orchestrator.classify_intent("My AC is not working", self._state())
+            second = orchestrator.classify_intent("my ac is not working!!", self._state())
+        assert first == second == "support"
+        assert llm.invoke.call_count == 1
+        assert orchestrator.intent_cache.stats()["hits"] == 1
+
+    def test_short_replies_always_go_to_the_llm(self):
+        from agents import orchestrator
+
+        llm = MagicMock()
+        llm.invoke.side_effect = [MagicMock(content="SALES"), MagicMock(content="SUPPORT")]
+        with patch.object(orchestrator, "_get_classifier_llm", return_value=llm), \
+             patch.object(orchestrator, "intent_model", None):
+            assert orchestrator.classify_intent("Yes please", self._state()) == "sales"
+            assert orchestrator.classify_intent("yes please!", self._state()) == "support"
+        assert llm.invoke.call_count == 2
+        assert orchestrator.intent_cache.stats()["entries"] == 0
+
+    def test_failed_classification_not_cached(self):
+        from agents import orchestrator
+
+        llm = MagicMock()
+        llm.invoke.side_effect = [RuntimeError("timeout"), MagicMock(content="SALES")]
+        with patch.object(orchestrator, "_get_classifier_llm", return_value=llm), \
+             patch.object(orchestrator, "intent_model", None):
+            assert orchestrator.classify_intent("rent a bed", self._state()) == "general"
+            assert orchestrator.classify_intent("rent a bed", self._state()) == "sales"
+        assert llm.invoke.call_count == 2
@@ -0,0 +1,118 @@
+"""
+Local Intent Classifier Tests for RentBasket WhatsApp Bot.
+
+Covers utils.intent_model (training, artifact round trip, the shipped v1
+model) and the classify_intent tier order: confident local predictions skip
+the LLM, low-confidence ones escalate to it.
+
+Run the latency benchmark with: pytest -m load tests/test_intent_model.py -s
+"""
+
+import os
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from agents.state import create_initial_state
+from utils.intent_model import IntentModel, train, evaluate, load_jsonl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED = load_jsonl(os.path.join(ROOT, "data", "intent_training", "seed.jsonl"))
+ARTIFACT = os.path.join(ROOT, "data", "models", "intent_classifier_v1.json")
+
+
+@pytest.mark.unit
+class TestIntentModel:
+
+    def test_training_is_deterministic(self):
+        a, b = train(SEED[:60], epochs=10), train(SEED[:60], epochs=10)
+        assert a.weights == b.weights and a.bias == b.bias
+
+    def test_save_load_round_trip(self, tmp_path):
+        model = train(SEED, epochs=10)
+        path = str(tmp_path / "model.json")
+        model.save(path)
+        loaded = IntentModel.load(path)
+        for text, _ in SEED[:20]:
+            assert loaded.predict(text)[0] == model.predict(text)[0]
+
+    def test_shipped_artifact_fits_seed_data(self):
+        model = IntentModel.load(ARTIFACT)
+        assert model.version == "1"
+        assert set(model.labels) == {"support", "recommendation", "sales", "escalation", "general"}
+        assert evaluate(model, SEED)["accuracy"] >= 0.95
+
+    @pytest.mark.parametrize("text,intent", [
+        ("my washing machine is broken", "support"),
+        ("price of double bed", "sales"),
+        ("show me your catalogue", "recommendation"),
+        ("good morning", "general"),
+    ])
+    def test_unseen_phrasings(self, text, intent):
+        assert IntentModel.load(ARTIFACT).predict(text)[0] == intent
+
+
+@pytest.mark.unit
+class TestClassifierTiers:
+
+    def _state(self):
+        state = create_initial_state()
+        state["collected_info"]["customer_status"] = "active_customer"
+        state["active_agent"] = "support"
+        return state
+
+    def _model(self, intent, confidence):
+        model = MagicMock()
+        model.predict.return_value = (intent, confidence)
+        return model
+
+    def test_confident_local_prediction_skips_llm(self):
+        from agents import orchestrator
+        llm = MagicMock()
+        with patch.object(orchestrator, "_get_classifier_llm", return_value=llm), \
+             patch.object(orchestrator, "intent_model", self._model("support", 0.97)):
+            assert orchestrator.classify_intent("fridge not cooling", self._state()) == "support"
+        llm.invoke.assert_not_called()
+
+    def test_low_confidence_escalates_to_llm(self):
+        from agents import orchestrator
+        llm = MagicMock()
+        llm.invoke.return_value = MagicMock(content="RECOMMENDATION")
+        with patch.object(orchestrator, "_get_classifier_llm", return_value=llm), \
+             patch.object(orchestrator, "intent_model", self._model("sales", 0.41)):
+            assert orchestrator.classify_intent("hmm what about that thing", self._state()) == "recommendation"
+        assert llm.invoke.call_count == 1
+
+    def test_context_dependent_replies_skip_the_local_model(self):
+        from agents import orchestrator
+        from langchain_core.messages import AIMessage
+        llm = MagicMock()
+        llm.invoke.return_value = MagicMock(content="SALES")
+        state = self._state()
+        state["messages"] = [AIMessage(content="Great choice!|||May I know your name?")]
+        model = self._model("support", 0.97)
+        with patch.object(orchestrator, "_get_classifier_llm", return_value=llm), \
+             patch.object(orchestrator, "intent_model", model):
+            assert orchestrator.classify_intent("yes please", self._state()) == "sales"
+            assert orchestrator.classify_intent("my name is Rahul", state) == "sales"
+        model.predict.assert_not_called()
+        assert llm.invoke.call_count == 2
+
+    def test_local_model_is_off_by_default(self):
+        from agents import orchestrator
+        if os.getenv("INTENT_MODEL_ENABLED") is None:
+            assert orchestrator.intent_model is None
+            assert orchestrator.classifier_stats()["enabled"] is False
+
+
+@pytest.mark.load
+def test_local_classifier_latency():
+    model = IntentModel.load(ARTIFACT)
+    texts = [text for text, _ in SEED] * 20
+    start = time.perf_counter()
+    for text in texts:
+        model.predict(text)
+    per_message_ms = (time.perf_counter() - start) * 1000 / len(texts)
+    report = evaluate(model, SEED)
+    print(f"\n  Local intent model: {per_message_ms:.3f} ms/message avg, p99 {report['p99_ms']:.3f} ms")
+    assert per_message_ms < 1.0
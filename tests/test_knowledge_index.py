@@ -0,0 +1,72 @@
+"""
+Knowledge Index Tests for RentBasket WhatsApp Bot.
+
+Covers the persisted, content-hashed knowledge-base index in
+rag/vectorstore.py: a second start re-embeds nothing, and an edit to the
+knowledge base only re-embeds the chunks whose text changed.
+
+Chroma starts its own background threads, hence the real_threads fixture.
+"""
+
+import hashlib
+import pytest
+
+from langchain_core.embeddings import Embeddings
+
+from rag.vectorstore import split_knowledge_base, sync_knowledge_vectorstore
+
+KB = "\n\n".join(
+    f"Section {i}. " + " ".join(f"policy-{i}-{j} applies to rentals in Gurgaon and Noida." for j in range(6))
+    for i in range(8)
+)
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic offline embeddings that count what gets embedded."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [b / 255 for b in digest[:16]]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.mark.unit
+class TestKnowledgeIndex:
+
+    def test_chunk_ids_are_content_hashes(self):
+        chunks = split_knowledge_base(KB)
+        assert len(chunks) > 1
+        again = split_knowledge_base(KB)
+        assert [c.metadata["content_hash"] for c in chunks] == [c.metadata["content_hash"] for c in again]
+
+    def test_restart_reuses_persisted_embeddings(self, tmp_path, real_threads):
+        first = CountingEmbeddings()
+        _, report = sync_knowledge_vectorstore(str(tmp_path), text=KB, embeddings=first)
+        assert report["added"] == report["chunks"] and first.embedded
+
+        second = CountingEmbeddings()
+        store, report = sync_knowledge_vectorstore(str(tmp_path), text=KB, embeddings=second)
+        assert report == {"chunks": report["chunks"], "reused": report["chunks"], "added": 0, "removed": 0}
+        assert second.embedded == []
+        assert store.similarity_search("policy-3-2", k=1)
+
+    def test_edit_reembeds_only_changed_chunks(self, tmp_path, real_threads):
+        sync_knowledge_vectorstore(str(tmp_path), text=KB, embeddings=CountingEmbeddings())
+        edited = KB.replace("policy-5-3 applies", "policy-5-3 no longer applies")
+
+        emb = CountingEmbeddings()
+        store, report = sync_knowledge_vectorstore(str(tmp_path), text=edited, embeddings=emb)
+        assert 1 <= report["added"] <= 2          # the changed chunk (and an overlapping neighbour)
+        assert report["removed"] == report["added"]
+        assert report["reused"] == report["chunks"] - report["added"]
+        assert all("no longer" in text for text in emb.embedded)
+        assert len(store.get(include=[])["ids"]) == report["chunks"]
@@ -0,0 +1,207 @@
+"""
+Lead Write Tests for RentBasket WhatsApp Bot.
+
+upsert_lead used to read the lead (to decide whether to set created_at)
+and then set(merge=True) it: two round trips per call, plus another read in
+sync_lead_data_tool to merge product_preferences. These tests pin the
+single-round-trip version (precondition update, create only when missing,
+ArrayUnion preferences) and the per-turn lead_update_batch against a fake
+Firestore that counts round trips and can add latency.
+
+Run the latency benchmark with: pytest -m load tests/test_lead_writes.py -s
+"""
+
+import time
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import transforms
+
+from utils.doc_cache import document_cache, merge_document
+from utils.firebase_client import upsert_lead, get_lead, lead_update_batch
+from tools.lead_tools import sync_lead_data_tool
+
+PHONE = "9800000001"
+
+
+class FakeFirestore:
+    """leads/<id> documents with get / set / update / create and a round-trip counter."""
+
+    def __init__(self, latency=0.0):
+        self.docs = {}
+        self.calls = []
+        self.latency = latency
+
+    def collection(self, name):
+        return _FakeCollection(self, name)
+
+    def rpc(self, name):
+        self.calls.append(name)
+        deadline = time.perf_counter() + self.latency
+        while time.perf_counter() < deadline:   # time.sleep is patched out by conftest
+            pass
+
+
+class _FakeCollection:
+    def __init__(self, db, name):
+        self._db, self._name = db, name
+
+    def document(self, doc_id):
+        return _FakeDoc(self._db, f"{self._name}/{doc_id}")
+
+
+class _FakeSnapshot:
+    def __init__(self, data):
+        self._data, self.exists = data, data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _FakeDoc:
+    def __init__(self, db, path):
+        self._db, self._path = db, path
+
+    def get(self):
+        self._db.rpc("get")
+        return _FakeSnapshot(self._db.docs.get(self._path))
+
+    def set(self, data, merge=False):
+        self._db.rpc("set")
+        current = self._db.docs.get(self._path, {}) if merge else {}
+        self._db.docs[self._path] = merge_document(current, data)
+
+    def create(self, data):
+        self._db.rpc("create")
+        if self._path in self._db.docs:
+            raise AlreadyExists(self._path)
+        self._db.docs[self._path] = merge_document({}, data)
+
+    def update(self, field_updates):
+        self._db.rpc("update")
+        if self._path not in self._db.docs:
+            raise NotFound(self._path)
+        nested = {}
+        for field_path, value in field_updates.items():
+            *parents, leaf = field_path.split(".")
+            node = nested
+            for part in parents:
+                node = node.setdefault(part, {})
+            node[leaf] = value
+        self._db.docs[self._path] = merge_document(self._db.docs[self._path], nested)
+
+
+def _legacy_upsert(db, phone, lead_data):
+    """upsert_lead before this change: read, then set(merge=True)."""
+    data = {**lead_data, "updated_at": datetime.now(timezone.utc)}
+    ref = db.collection("leads").document(phone)
+    if not ref.get().exists:
+        data["created_at"] = datetime.now(timezone.utc)
+        data["lead_stage"] = lead_data.get("lead_stage", "new")
+    ref.set(data, merge=True)
+
+
+@pytest.fixture
+def db():
+    fake = FakeFirestore()
+    document_cache.clear()
+    with patch("utils.firebase_client.get_db", return_value=fake):
+        yield fake
+    document_cache.clear()
+
+
+@pytest.mark.unit
+class TestSingleRoundTripUpsert:
+
+    def test_existing_lead_is_one_update(self, db):
+        db.docs[f"leads/{PHONE}"] = {"name": "Asha", "lead_stage": "qualified",
+                                     "delivery_location": {"city": "Gurgaon"}}
+        upsert_lead(PHONE, {"delivery_location": {"pincode": "122001"}, "duration_months": 12})
+        assert db.calls == ["update"]
+        lead = db.docs[f"leads/{PHONE}"]
+        assert lead["delivery_location"] == {"city": "Gurgaon", "pincode": "122001"}
+        assert lead["lead_stage"] == "qualified" and "created_at" not in lead
+
+    def test_unknown_lead_is_created_once(self, db):
+        upsert_lead(PHONE, {"name": "Asha"})
+        assert db.calls == ["update", "create"]
+        lead = db.docs[f"leads/{PHONE}"]
+        created_at = lead["created_at"]
+        assert lead["lead_stage"] == "new"
+
+        db.calls.clear()
+        upsert_lead(PHONE, {"lead_stage": "qualified"})
+        assert db.calls == ["update"]
+        assert db.docs[f"leads/{PHONE}"]["created_at"] == created_at
+
+    def test_known_missing_lead_is_one_create(self, db):
+        assert get_lead(PHONE) is None
+        upsert_lead(PHONE, {"name": "Asha", "lead_stage": "new"})
+        assert db.calls == ["get", "create"]
+        assert get_lead(PHONE)["lead_stage"] == "new"
+        assert db.calls == ["get", "create"]
+
+    def test_stale_missing_entry_does_not_reset_a_lead(self, db):
+        assert get_lead(PHONE) is None                  # cached as missing
+        created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        db.docs[f"leads/{PHONE}"] = {"name": "Asha", "lead_stage": "cart_created", "created_at": created_at}
+        upsert_lead(PHONE, {"push_name": "Asha K"})     # another instance created it meanwhile
+        assert db.calls == ["get", "create", "update"]
+        lead = db.docs[f"leads/{PHONE}"]
+        assert (lead["lead_stage"], lead["created_at"], lead["push_name"]) == ("cart_created", created_at, "Asha K")
+
+    def test_preferences_union_without_read(self, db):
+        db.docs[f"leads/{PHONE}"] = {"product_preferences": [{"category": "beds"}]}
+        for _ in range(2):
+            sync_lead_data_tool.invoke({"phone": PHONE, "product_preferences": [
+                {"category": "beds"}, {"category": "sofa", "product_id": 11}]})
+        assert db.calls == ["update", "update"]
+        assert db.docs[f"leads/{PHONE}"]["product_preferences"] == [
+            {"category": "beds"}, {"product_id": "11", "name": "Fridge 190 Ltr"}]
+
+    def test_same_product_with_new_details_is_not_added_again(self, db):
+        db.docs[f"leads/{PHONE}"] = {}
+        sync_lead_data_tool.invoke({"phone": PHONE, "product_preferences": [
+            {"product_id": 11, "name": "fridge", "qty": 1}]})
+        sync_lead_data_tool.invoke({"phone": PHONE, "product_preferences": [
+            {"product_id": "11", "qty": 2, "note": "double door"}, {"category": " Beds "}, {"category": "beds"}]})
+        assert db.docs[f"leads/{PHONE}"]["product_preferences"] == [
+            {"product_id": "11", "name": "Fridge 190 Ltr"}, {"category": "beds"}]
+
+    def test_turn_batch_writes_once(self, db):
+        db.docs[f"leads/{PHONE}"] = {"name": "Asha", "lead_stage": "new"}
+        with lead_update_batch(PHONE):
+            upsert_lead(PHONE, {"push_name": "Asha K"})
+            upsert_lead(PHONE, {"product_preferences": transforms.ArrayUnion([{"category": "beds"}])})
+            upsert_lead(PHONE, {"lead_stage": "qualified",
+                                "product_preferences": transforms.ArrayUnion([{"category": "sofa"}])})
+            assert get_lead(PHONE)["lead_stage"] == "qualified"
+            assert db.calls == ["get"]
+        assert db.calls == ["get", "update"]
+        lead = db.docs[f"leads/{PHONE}"]
+        assert (lead["push_name"], lead["lead_stage"]) == ("Asha K", "qualified")
+        assert lead["product_preferences"] == [{"category": "beds"}, {"category": "sofa"}]
+
+
+@pytest.mark.load
+def test_upsert_latency_against_legacy():
+    turns, latency = 20, 0.002
+
+    def run(write):
+        db = FakeFirestore(latency=latency)
+        document_cache.clear()
+        with patch("utils.firebase_client.get_db", return_value=db):
+            started = time.perf_counter()
+            for i in range(turns):
+                write(db, f"98000000{i:02d}", {"name": "Lead"})
+                write(db, f"98000000{i:02d}", {"lead_stage": "qualified", "duration_months": 12})
+                write(db, f"98000000{i:02d}", {"final_cart": [{"product_id": "1042"}]})
+            return (time.perf_counter() - started) * 1000 / turns, len(db.calls) / turns
+
+    legacy_ms, legacy_rpcs = run(_legacy_upsert)
+    new_ms, new_rpcs = run(lambda db, phone, data: upsert_lead(phone, data))
+    print(f"\n  per turn: legacy {legacy_ms:.1f} ms / {legacy_rpcs:.0f} round trips, "
+          f"new {new_ms:.1f} ms / {new_rpcs:.0f} round trips")
+    assert new_rpcs < legacy_rpcs and new_ms < legacy_ms
@@ -0,0 +1,104 @@
+"""
+Log History Tests for RentBasket WhatsApp Bot.
+
+With LOG_FORMAT=text the file logger keeps a sidecar byte-offset index (logs/<phone>.idx) so the
+newest entries of a log can be paged from the end without reading the whole
+file. Covers pagination, last-N reads, multi-line messages, rebuilding the
+index for logs written before it existed, and that tail reads stay flat as
+the log grows.
+"""
+
+import os
+import time
+import pytest
+
+import utils.logger as file_logger
+
+PHONE = "919800000001"
+
+
+@pytest.fixture(autouse=True)
+def logs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_logger, "LOGS_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(file_logger, "LOG_FORMAT", "text")
+    return tmp_path
+
+
+def _write_turns(n, start=0):
+    for i in range(start, start + n):
+        file_logger.log_conversation_turn(PHONE, "Asha", f"question {i}", f"answer {i}", agent_used="sales")
+
+
+def _messages(entries):
+    return [entry.split(": ", 1)[1] for entry in entries]
+
+
+@pytest.mark.unit
+class TestFileHistory:
+
+    def test_pages_walk_back_to_the_header(self):
+        file_logger.start_new_session(PHONE, "Asha")
+        _write_turns(3)
+        page = file_logger.get_history_page(PHONE, limit=4)
+        assert _messages(page["entries"]) == ["question 1", "answer 1", "question 2", "answer 2"]
+
+        page = file_logger.get_history_page(PHONE, limit=4, before=page["cursor"])
+        assert page["cursor"] is None
+        assert page["entries"][0].startswith("Conversation with Asha")
+        assert _messages(page["entries"][1:]) == ["question 0", "answer 0"]
+
+    def test_last_n_matches_the_end_of_the_full_log(self):
+        file_logger.start_new_session(PHONE, "Asha")
+        _write_turns(2)
+        file_logger.start_new_session(PHONE)
+        file_logger.log_message(PHONE, "Asha", "line one\nline two")
+        full = file_logger.get_conversation_history(PHONE)
+        tail = file_logger.get_conversation_history(PHONE, last_n=3)
+        assert full.endswith(tail)
+        assert tail.split("\n")[0].endswith("Ku (Sales): answer 1")
+        assert "New session started" in tail and tail.endswith("line one\nline two\n")
+
+    def test_index_rebuilt_for_logs_without_one(self, logs_dir):
+        file_logger.start_new_session(PHONE, "Asha")
+        _write_turns(2)
+        file_logger.start_new_session(PHONE)
+        _write_turns(1, start=2)
+        indexed = file_logger.get_history_page(PHONE, limit=100)["entries"]
+
+        os.remove(file_logger.get_index_file_path(PHONE))
+        file_logger.log_message(PHONE, "Asha", "written while unindexed")
+        assert not os.path.exists(file_logger.get_index_file_path(PHONE))
+
+        rebuilt = file_logger.get_history_page(PHONE, limit=100)["entries"]
+        assert rebuilt[:-1] == indexed
+        assert _messages(rebuilt[-1:]) == ["written while unindexed"]
+        file_logger.log_message(PHONE, "Ku", "after rebuild", is_bot=True)
+        assert _messages(file_logger.get_history_page(PHONE, limit=1)["entries"]) == ["after rebuild"]
+
+    def test_missing_log(self):
+        assert file_logger.get_history_page(PHONE) == {"entries": [], "cursor": None}
+        assert file_logger.get_conversation_history(PHONE, last_n=5) is None
+
+
+@pytest.mark.load
+def test_tail_read_does_not_grow_with_log_size():
+    def tail_ms():
+        started = time.perf_counter()
+        for _ in range(200):
+            file_logger.get_conversation_history(PHONE, last_n=10)
+        return (time.perf_counter() - started) * 1000 / 200
+
+    def full_ms():
+        started = time.perf_counter()
+        for _ in range(20):
+            file_logger.get_conversation_history(PHONE)
+        return (time.perf_counter() - started) * 1000 / 20
+
+    file_logger.start_new_session(PHONE, "Asha")
+    _write_turns(500)
+    small_tail, small_full = tail_ms(), full_ms()
+    _write_turns(20000, start=500)
+    large_tail, large_full = tail_ms(), full_ms()
+    print(f"\n  last 10: {small_tail:.3f} ms -> {large_tail:.3f} ms, "
+          f"full read: {small_full:.3f} ms -> {large_full:.3f} ms ({os.path.getsize(file_logger.get_log_file_path(PHONE))} bytes)")
+    assert large_tail < small_tail * 3
@@ -0,0 +1,205 @@
+"""
+Segment Log Tests for RentBasket WhatsApp Bot.
+
+Covers utils.log_segments (buffered gzip members, rotation, the phone/time
+index, paging, restart), the file logger writing through it, and the /logs
+endpoints streaming from it (the streamed zip, its date / phone-prefix
+filters and the incremental-sync cursor).
+"""
+
+import io
+import os
+import time
+import zipfile
+import pytest
+from datetime import datetime
+
+import utils.logger as file_logger
+import webhook_server_revised as server
+from utils.log_segments import SegmentLog
+
+PHONE = "919800000001"
+
+
+def _log(directory, **kwargs):
+    log = SegmentLog(str(directory), **kwargs)
+    log.autostart = False
+    return log
+
+
+@pytest.mark.unit
+class TestSegmentLog:
+
+    def test_entries_buffer_until_one_member_is_flushed(self, tmp_path):
+        log = _log(tmp_path / "segments")
+        for i in range(3):
+            log.append(PHONE, f"entry {i}\n")
+        log.append("919811111111", "other\n")
+        assert not os.path.exists(tmp_path / "segments")
+        assert log.count(PHONE) == 3
+
+        assert log.flush() == 4
+        assert sorted(os.listdir(tmp_path / "segments"))[-1] == "seg-000001.log.gz"
+        assert list(log.iter_entries(PHONE)) == [f"entry {i}\n" for i in range(3)]
+        assert log.stats()["members"] == 1
+
+    def test_segments_rotate_and_survive_restart(self, tmp_path):
+        log = _log(tmp_path, max_segment_bytes=200)
+        for i in range(6):
+            log.append(PHONE, f"entry {i} " + "x" * 100 + "\n")
+            log.flush()
+        segments = sorted(name for name in os.listdir(tmp_path) if name.endswith(".log.gz"))
+        assert len(segments) > 1 and log.stats()["rotations"] >= len(segments) - 1
+
+        restarted = _log(tmp_path, max_segment_bytes=200)
+        restarted.append(PHONE, "after restart\n")
+        assert restarted.count(PHONE) == 7
+        entries = list(restarted.iter_entries(PHONE))
+        assert entries[0].startswith("entry 0") and entries[-1] == "after restart\n"
+
+    def test_pages_and_time_ranges(self, tmp_path):
+        log = _log(tmp_path)
+        for i in range(10):
+            log.append(PHONE, f"entry {i}\n", ts=1000.0 + i)
+            if i % 3 == 2:
+                log.flush()
+        assert log.read_page(PHONE, 4) == ([f"entry {i}\n" for i in range(6, 10)], 6)
+        assert log.read_page(PHONE, 4, before=2) == (["entry 0\n", "entry 1\n"], 0)
+        assert list(log.iter_entries(PHONE, since=1004.0, until=1007.0)) == ["entry 4\n", "entry 5\n", "entry 6\n"]
+        assert [row["entries"] for row in log.phones()] == [10]
+
+    def test_repeated_lines_compress(self, tmp_path):
+        log = _log(tmp_path)
+        for i in range(500):
+            log.append(PHONE, f"21/01/26, 02:02 pm - Ku (Sales): Here is your quote number {i}\n")
+        log.flush()
+        assert log.stats()["compression_ratio"] > 5
+
+
+@pytest.fixture
+def segments(tmp_path, monkeypatch):
+    log = _log(tmp_path / "segments")
+    monkeypatch.setattr(file_logger, "LOGS_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(file_logger, "LOG_FORMAT", "segments")
+    monkeypatch.setattr(file_logger, "segment_log", log)
+    monkeypatch.setattr(server, "segment_log", log)
+    monkeypatch.setattr(server, "LOG_DIR", str(tmp_path))
+    return log
+
+
+@pytest.mark.unit
+def test_file_logger_writes_segments(segments, tmp_path):
+    file_logger.start_new_session(PHONE, "Asha")
+    file_logger.log_conversation_turn(PHONE, "Asha", "price of fridge?", "Rs. 700/mo", agent_used="sales")
+    file_logger.start_new_session(PHONE, "Asha")
+    file_logger.log_system_message(PHONE, "Messages are end-to-end encrypted")
+
+    assert not os.path.exists(file_logger.get_log_file_path(PHONE))
+    history = file_logger.get_conversation_history(PHONE)
+    assert history.startswith("Conversation with Asha\n")
+    assert history.count("New session started") == 1
+    assert history.endswith("Messages are end-to-end encrypted\n")
+    page = file_logger.get_history_page(PHONE, limit=2)
+    assert page["cursor"] == 3 and page["entries"][1].endswith("end-to-end encrypted")
+
+
+@pytest.mark.unit
+def test_legacy_txt_history_is_read_before_new_segments(segments, tmp_path):
+    legacy = "Conversation with Asha\n" + "=" * 50 + "\n" + "".join(
+        f"20/01/26, 0{i}:00 pm - Asha ({PHONE}): old message {i}\n" for i in range(3))
+    (tmp_path / f"{PHONE}.txt").write_text(legacy)
+    file_logger.start_new_session(PHONE, "Asha")
+    file_logger.log_message(PHONE, "Asha", "new message")
+
+    history = file_logger.get_conversation_history(PHONE)
+    assert history.startswith(legacy) and history.endswith("Asha (919800000001): new message\n")
+    assert history.count("Conversation with") == 1 and history.count("New session started") == 1
+    assert (tmp_path / f"{PHONE}.txt").read_text() == legacy       # nothing more written to it
+
+    page = file_logger.get_history_page(PHONE, limit=3)              # 2 legacy + the 2 new entries
+    assert page["entries"][0].endswith("old message 2") and page["cursor"] == 3
+    older = file_logger.get_history_page(PHONE, limit=3, before=page["cursor"])
+    assert older["entries"][0].startswith("Conversation with Asha") and older["cursor"] is None
+    assert file_logger.get_conversation_history(PHONE, last_n=3) == "".join(
+        e + "\n" for e in page["entries"])
+
+
+@pytest.mark.unit
+class TestLogEndpoints:
+
+    @pytest.fixture
+    def client(self, segments, tmp_path):
+        segments.append(PHONE, "21/01/26, 02:02 pm - Asha (919800000001): hi\n")
+        segments.append(PHONE, "21/01/26, 02:02 pm - Ku: hello\n")
+        (tmp_path / "919822222222.txt").write_text("legacy log\n")
+        return server.app.test_client()
+
+    def test_list_merges_segments_and_legacy_files(self, client):
+        files = client.get(f"/logs?secret={server.LOGS_SECRET}").get_json()["files"]
+        assert [(f["name"], f["size_bytes"]) for f in files] == [
+            ("919800000001.txt", 76), ("919822222222.txt", 11)]
+        assert client.get("/logs?secret=wrong").status_code == 403
+
+    def test_single_log_streams(self, client):
+        response = client.get(f"/logs/{PHONE}.txt?secret={server.LOGS_SECRET}")
+        assert response.is_streamed
+        assert response.get_data(as_text=True).endswith("Ku: hello\n")
+        assert client.get(f"/logs/919833333333.txt?secret={server.LOGS_SECRET}").status_code == 404
+
+    def test_download_all_is_a_streamed_zip(self, client):
+        response = client.get(f"/logs/download-all?secret={server.LOGS_SECRET}")
+        assert response.is_streamed
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as zf:
+            assert zf.namelist() == ["919800000001.txt", "919822222222.txt"]
+            assert zf.read("919822222222.txt") == b"legacy log\n"
+            assert zf.read("919800000001.txt").decode().endswith("Ku: hello\n")
+
+    def test_legacy_file_and_segments_are_one_log(self, client, segments, tmp_path):
+        (tmp_path / f"{PHONE}.txt").write_text("old history\n")
+        os.utime(tmp_path / f"{PHONE}.txt", (time.time() - 3600, time.time() - 3600))
+        files = client.get(f"/logs?secret={server.LOGS_SECRET}").get_json()["files"]
+        assert [(f["name"], f["size_bytes"]) for f in files][0] == ("919800000001.txt", 76 + 12)
+
+        cursor = f"{time.time() + 1:.3f}"
+        segments.append(PHONE, "after\n", ts=time.time() + 2)
+        for query in ("", f"&since={cursor}"):                      # a full or an incremental sync
+            response = client.get(f"/logs/download-all?secret={server.LOGS_SECRET}{query}")
+            with zipfile.ZipFile(io.BytesIO(response.get_data())) as zf:
+                member = zf.read("919800000001.txt").decode()
+            assert member.startswith("old history\n") and member.endswith("Ku: hello\nafter\n")
+        single = client.get(f"/logs/{PHONE}.txt?secret={server.LOGS_SECRET}").get_data(as_text=True)
+        assert single == member
+
+    def _zip_names(self, client, query=""):
+        response = client.get(f"/logs/download-all?secret={server.LOGS_SECRET}{query}")
+        if response.status_code == 204:
+            return [], response.headers["X-Log-Cursor"]
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as zf:
+            return zf.namelist(), response.headers["X-Log-Cursor"]
+
+    def test_prefix_and_date_filters(self, client, segments):
+        day = datetime(2026, 1, 20).timestamp()
+        segments.append("919844444444", "old line\n", ts=day + 3600)
+        segments.append("919844444444", "new line\n", ts=day + 86400 + 3600)
+        assert self._zip_names(client, "&prefix=91984")[0] == ["919844444444.txt"]
+
+        response = client.get(f"/logs/download-all?secret={server.LOGS_SECRET}&prefix=91984&from=2026-01-21&to=2026-01-21")
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as zf:
+            assert zf.read("919844444444.txt") == b"new line\n"
+        assert client.get(f"/logs?secret={server.LOGS_SECRET}&from=21-01-2026").status_code == 400
+        assert client.get(f"/logs?secret={server.LOGS_SECRET}&prefix=91*").status_code == 400
+
+    def test_since_cursor_returns_only_changed_logs(self, client, segments, tmp_path):
+        legacy = tmp_path / "919822222222.txt"
+        os.utime(legacy, (time.time() - 3600, time.time() - 3600))
+        names, _ = self._zip_names(client)
+        assert names == ["919800000001.txt", "919822222222.txt"]
+
+        cursor = f"{time.time() + 1:.3f}"        # after everything logged so far
+        names, unchanged_cursor = self._zip_names(client, f"&since={cursor}")
+        assert names == [] and unchanged_cursor
+        segments.append(PHONE, "after\n", ts=time.time() + 2)
+        names, _ = self._zip_names(client, f"&since={cursor}")
+        assert names == ["919800000001.txt"]
+        listed = client.get(f"/logs?secret={server.LOGS_SECRET}&since={cursor}").get_json()
+        assert [f["name"] for f in listed["files"]] == ["919800000001.txt"] and listed["cursor"]
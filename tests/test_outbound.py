@@ -0,0 +1,173 @@
+"""
+Outbound Send Queue Tests for RentBasket WhatsApp Bot.
+
+Covers whatsapp.outbound.OutboundQueue: per-recipient ordering, non-blocking
+pacing gaps, the global token bucket, plain-text fallback and delivery
+tracking, plus the webhook's use of pause() and status callbacks.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from whatsapp.outbound import OutboundQueue, TokenBucket
+from conftest import build_webhook_payload
+
+
+class FakeClient:
+    """Stands in for WhatsAppClient; records (phone, method, text, time)."""
+
+    def __init__(self, latency=0.0, fail_methods=()):
+        self.calls = []
+        self.latency = latency
+        self.fail_methods = set(fail_methods)
+        self._lock = threading.Lock()
+        self._n = 0
+
+    def _call(self, method, phone, text):
+        if self.latency:
+            threading.Event().wait(self.latency)
+        with self._lock:
+            self._n += 1
+            self.calls.append((phone, method, text, time.monotonic()))
+            if method in self.fail_methods:
+                return {"error": "(#131009) Parameter value is not valid"}
+            return {"messages": [{"id": f"wamid.fake{self._n}"}]}
+
+    def send_text_message(self, to_phone, message, preview_url=False):
+        return self._call("send_text_message", to_phone, message)
+
+    def send_interactive_buttons(self, to_phone, body_text, buttons, header=None, footer=None):
+        return self._call("send_interactive_buttons", to_phone, body_text)
+
+
+@pytest.fixture
+def outbound(real_threads):
+    client = FakeClient(latency=0.002)
+    q = OutboundQueue(client, rate=1000, workers=4)
+    yield q
+    q.shutdown()
+
+
+@pytest.mark.unit
+class TestOutboundOrdering:
+
+    def test_per_recipient_fifo_across_many_phones(self, outbound):
+        for i in range(20):
+            for phone in ("p1", "p2", "p3", "p4", "p5"):
+                outbound.send_text_message(phone, f"{phone}-{i}")
+        assert outbound.flush(5)
+        for phone in ("p1", "p2", "p3", "p4", "p5"):
+            texts = [c[2] for c in outbound.client.calls if c[0] == phone]
+            assert texts == [f"{phone}-{i}" for i in range(20)]
+        assert outbound.stats()["sent"] == 100
+
+    def test_send_returns_immediately(self, real_threads):
+        q = OutboundQueue(FakeClient(latency=0.2), rate=1000, workers=1)
+        try:
+            start = time.monotonic()
+            result = q.send_text_message("p", "hello")
+            q.pause("p", 0.5)
+            q.send_text_message("p", "world")
+            assert time.monotonic() - start < 0.05
+            assert result["queued"] is True
+        finally:
+            q.shutdown()
+
+    def test_pause_spaces_sends_without_blocking_other_phones(self, outbound):
+        outbound.send_text_message("slow", "first")
+        outbound.pause("slow", 0.3)
+        outbound.send_text_message("slow", "second")
+        outbound.send_text_message("fast", "unaffected")
+        assert outbound.flush(5)
+
+        calls = {c[2]: c[3] for c in outbound.client.calls}
+        assert calls["second"] - calls["first"] >= 0.29
+        assert calls["unaffected"] < calls["second"]
+
+    def test_pause_after_completed_send_still_applies(self, outbound):
+        outbound.send_text_message("p", "first")
+        assert outbound.flush(5)
+        outbound.pause("p", 0.2)
+        outbound.send_text_message("p", "second")
+        assert outbound.flush(5)
+        first, second = outbound.client.calls[0][3], outbound.client.calls[1][3]
+        assert second - first >= 0.19
+
+
+@pytest.mark.unit
+class TestRateLimiting:
+
+    def test_token_bucket_refills_at_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=10, burst=2, clock=lambda: now[0])
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == pytest.approx(0.1)
+        now[0] += 0.1
+        assert bucket.try_acquire() == 0
+
+    def test_queue_respects_global_rate(self, real_threads):
+        q = OutboundQueue(FakeClient(), rate=50, workers=4)
+        try:
+            for i in range(75):
+                q.send_text_message(f"9199{i:08d}", "hi")  # different phones: only the bucket limits
+            assert q.flush(5)
+            calls = sorted(c[3] for c in q.client.calls)
+            # 50-token burst, then 25 more at 50/s => ~0.5s
+            assert calls[-1] - calls[0] >= 0.45
+            assert q.stats()["throttled"] > 0
+        finally:
+            q.shutdown()
+
+
+@pytest.mark.unit
+class TestDeliveryTracking:
+
+    def test_outcomes_and_status_callbacks(self, outbound):
+        ok = outbound.send_text_message("p", "hello")
+        outbound.client.fail_methods.add("send_interactive_buttons")
+        bad = outbound.send_interactive_buttons("p", "pick one", [{"id": "a", "title": "A"}])
+        assert outbound.flush(5)
+
+        sent = outbound.delivery(ok["outbound_id"])
+        assert sent["status"] == "sent" and sent["wamid"].startswith("wamid.fake")
+        assert outbound.delivery(bad["outbound_id"])["status"] == "failed"
+
+        assert outbound.record_status(sent["wamid"], "delivered")
+        assert outbound.delivery(ok["outbound_id"])["status"] == "delivered"
+        assert not outbound.record_status("wamid.unknown", "read")
+        stats = outbound.stats()
+        assert (stats["sent"], stats["failed"], stats["delivered"]) == (1, 1, 1)
+
+    def test_interactive_falls_back_to_text(self, outbound):
+        outbound.client.fail_methods.add("send_interactive_buttons")
+        outbound.send_interactive_buttons("p", "Hi there", [{"id": "a", "title": "A"}], fallback_text="Hi there")
+        assert outbound.flush(5)
+        assert [c[1] for c in outbound.client.calls] == ["send_interactive_buttons", "send_text_message"]
+        assert outbound.stats()["fallbacks"] == 1
+
+
+@pytest.mark.unit
+class TestWebhookOutbound:
+
+    def test_split_reply_uses_pause_not_sleep(self, client, mock_whatsapp, mock_agent):
+        mock_agent.side_effect = lambda text, state: ("Part one|||Part two", state)
+        payload = build_webhook_payload(phone="919900004444", text="need a washing machine")
+        client.post("/webhook", data=json.dumps(payload), content_type="application/json")
+        mock_whatsapp.pause.assert_any_call("919900004444", 0.5)
+
+    def test_status_callbacks_are_recorded(self, client, mock_whatsapp):
+        payload = {
+            "object": "whatsapp_business_account",
+            "entry": [{"changes": [{"value": {"statuses": [
+                {"id": "wamid.abc", "status": "delivered", "recipient_id": "919900000001"},
+                {"id": "wamid.def", "status": "failed", "errors": [{"title": "Re-engagement message"}]},
+            ]}}]}],
+        }
+        resp = client.post("/webhook", data=json.dumps(payload), content_type="application/json")
+        assert resp.get_json()["status"] == "no_message"
+        mock_whatsapp.record_status.assert_any_call("wamid.abc", "delivered", None)
+        mock_whatsapp.record_status.assert_any_call("wamid.def", "failed", "Re-engagement message")
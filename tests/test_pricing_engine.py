@@ -0,0 +1,113 @@
+"""
+Pricing Engine Tests for RentBasket WhatsApp Bot.
+
+data.pricing.PricingEngine replaced per-product dict walks with a price
+matrix. These tests pin every rupee figure to the formulas the call sites
+used before: calculate_rent's tier branching, apply_discount, cart totals,
+GST, security deposit and the budget filter.
+"""
+
+import random
+import pytest
+
+from config import RETAINED_FACTOR, UPFRONT_RETAINED_FACTOR
+from data.products import (
+    id_to_name, id_to_price, category_to_id, pricing,
+    calculate_rent, apply_discount, create_bundle_quote, get_all_categories,
+)
+from data.pricing import PricingEngine
+
+
+def _legacy_rent(pid, duration, unit="months"):
+    if pid not in id_to_price:
+        return None
+    prices = id_to_price[pid]
+    if unit == "days":
+        idx = 0 if duration < 8 else 1 if duration < 15 else 2 if duration < 30 else 3 if duration < 60 else 4
+    else:
+        idx = 3 if duration < 3 else 5 if duration < 6 else 6 if duration < 9 else 7 if duration < 12 else 8
+    return prices[idx] if idx < len(prices) else prices[-1]
+
+
+def _legacy_bundle(product_ids, duration, unit="months"):
+    total_original = total_discounted = 0
+    for pid in product_ids:
+        if pid in id_to_name:
+            orig = _legacy_rent(pid, duration, unit)
+            total_original += orig
+            total_discounted += apply_discount(orig)
+    gst = int(round(total_discounted * 0.18))
+    return {"total_original": total_original, "total_discounted": total_discounted, "gst_amount": gst,
+            "grand_total": total_discounted + gst, "security_deposit": min(total_discounted * 2, 15000)}
+
+
+DURATIONS = [(d, "months") for d in range(1, 37)] + [(d, "days") for d in range(1, 91)]
+
+
+@pytest.mark.unit
+class TestPricingParity:
+
+    def test_rent_matches_legacy_tiers(self):
+        for pid in list(id_to_price) + [999999]:
+            for duration, unit in DURATIONS:
+                assert calculate_rent(pid, duration, unit) == _legacy_rent(pid, duration, unit), (pid, duration, unit)
+
+    def test_discount_columns_match_apply_discount(self):
+        for pid in id_to_price:
+            for duration, unit in DURATIONS:
+                mrp = _legacy_rent(pid, duration, unit)
+                assert pricing.discounted_rent(pid, duration, unit) == apply_discount(mrp)
+                assert pricing.discount(mrp) == int(round(mrp * RETAINED_FACTOR))
+                assert pricing.upfront_price(mrp) == apply_discount(mrp, upfront=True)
+                assert pricing.upfront_price(mrp, 5) == apply_discount(mrp, upfront=True, upfront_percent=5)
+                disc = pricing.discount(mrp)
+                assert pricing.apply_upfront(disc) == int(round(disc * UPFRONT_RETAINED_FACTOR))
+
+    def test_bundle_quotes_match_legacy_totals(self):
+        rng = random.Random(3)
+        ids = list(id_to_name)
+        for _ in range(300):
+            cart = [rng.choice(ids) for _ in range(rng.randint(1, 8))]
+            duration, unit = rng.choice(DURATIONS)
+            quote = create_bundle_quote(cart, duration, unit)
+            for key, value in _legacy_bundle(cart, duration, unit).items():
+                assert quote[key] == value, (cart, duration, unit, key)
+
+    def test_quote_quantities_and_unknown_ids(self):
+        quote = pricing.quote({1042: 2, 11: 1, 424242: 3}, 12)
+        assert [line["product_id"] for line in quote["lines"]] == [1042, 11]
+        mrp = 2 * _legacy_rent(1042, 12) + _legacy_rent(11, 12)
+        disc = 2 * apply_discount(_legacy_rent(1042, 12)) + apply_discount(_legacy_rent(11, 12))
+        assert (quote["total_original"], quote["total_discounted"]) == (mrp, disc)
+        assert quote["total_savings"] == mrp - disc
+        assert quote["security_deposit"] == min(disc * 2, 15000)
+
+    def test_cart_totals_discount_the_mrp_total_once(self):
+        for original in (0, 1, 999, 4161, 23457):
+            discounted = int(round(original * RETAINED_FACTOR))
+            assert pricing.cart_totals(original, 12) == (discounted, max(0, (original - discounted) * 12))
+
+    def test_budget_filter_matches_best_price_loop(self):
+        for low, high in [(0, 500), (300, 900), (0, 100000), (1000, 1500), (5000, 100)]:
+            legacy = {pid for cat in get_all_categories() for pid in category_to_id.get(cat, [])
+                      if low <= apply_discount(id_to_price[pid][-1], upfront=True) <= high}
+            in_range = set(pricing.filter_by_budget(low, high))
+            assert legacy == in_range & legacy
+
+
+@pytest.mark.unit
+class TestPricingEngine:
+
+    def test_short_price_rows_repeat_last_tier(self):
+        engine = PricingEngine({1: [100, 200, 300, 400]})
+        assert engine.rent(1, 12) == 400 and engine.rent(1, 60, "days") == 400
+        assert engine.rent(1, 10, "days") == 200
+
+    def test_discount_config_drives_columns(self):
+        engine = PricingEngine({1: [1000] * 9}, discount=0.5, upfront_discount=0.2)
+        assert engine.discounted_rent(1, 12) == 500
+        assert engine.best_price(1) == 400
+
+    def test_batched_rents(self):
+        rents = pricing.rents([1042, 424242, 11], 6)
+        assert rents.tolist() == [_legacy_rent(1042, 6), 0, _legacy_rent(11, 6)]
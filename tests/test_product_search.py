@@ -0,0 +1,80 @@
+"""
+Product Name Search Tests for RentBasket WhatsApp Bot.
+
+search_products_by_name is answered from a precompiled index
+(data/product_search.py). These tests pin it to the original linear scan
+(_scan_products_by_name): same products, same order, for every category key,
+synonym, product name and variant, plus plurals, multi-word and noisy input.
+
+Run the throughput benchmark with: pytest -m load tests/test_product_search.py -s
+"""
+
+import time
+import pytest
+
+from data.products import (
+    id_to_name, category_to_id, PRODUCT_SYNONYMS, PRODUCT_VARIANTS,
+    search_products_by_name, _scan_products_by_name,
+)
+
+
+def _corpus():
+    queries = set(category_to_id)
+    queries.update(id_to_name.values())
+    for synonyms in PRODUCT_SYNONYMS.values():
+        queries.update(synonyms)
+    for variants in PRODUCT_VARIANTS.values():
+        queries.update(variants)
+    return sorted(queries)
+
+
+CORPUS = _corpus()
+EXTRA = [
+    "", "   ", "a", "beds", "Double Beds", "mattresses", "batteries", "studying table",
+    "sofa cum bed", "fridge and washing machine", "2 seater sofa for my flat",
+    "need a 1.5 ton split ac", "queen bed with storage", "i want to rent a tv",
+    "xyz", "geysers please", "dining tables", "chairs", "SMART LED 43\"",
+]
+
+
+def _ids(results):
+    return [p["id"] for p in results]
+
+
+@pytest.mark.unit
+class TestProductSearchParity:
+
+    def _mismatches(self, queries):
+        return [q for q in queries if _ids(search_products_by_name(q)) != _ids(_scan_products_by_name(q))]
+
+    def test_every_catalogue_term(self):
+        assert len(CORPUS) > 1000
+        assert self._mismatches(CORPUS) == []
+
+    def test_free_text(self):
+        assert self._mismatches(EXTRA) == []
+
+    def test_suffix_and_word_variations(self):
+        queries = [q for term in CORPUS[::7]
+                   for q in (term + "s", term.upper(), f"  {term} ", f"{term} for rent")]
+        assert self._mismatches(queries) == []
+
+    def test_results_are_fresh_product_dicts(self):
+        first = search_products_by_name("fridge")
+        first[0]["name"] = "changed"
+        assert search_products_by_name("fridge")[0]["name"] != "changed"
+
+
+@pytest.mark.load
+def test_search_throughput():
+    queries = CORPUS + EXTRA
+
+    def qps(fn):
+        started = time.perf_counter()
+        for query in queries:
+            fn(query)
+        return len(queries) / (time.perf_counter() - started)
+
+    scan, indexed = qps(_scan_products_by_name), qps(search_products_by_name)
+    print(f"\n  {len(queries)} queries: scan {scan:,.0f} q/s, index {indexed:,.0f} q/s ({indexed / scan:.1f}x)")
+    assert indexed > scan
@@ -0,0 +1,124 @@
+"""
+Prompt Cache Tests for RentBasket WhatsApp Bot.
+
+The provider caches byte-identical prompt prefixes, so the agents send their
+static system prompts first and the per-customer context last, and
+utils.prompt_usage records cached vs uncached prompt tokens from each
+response's usage. These tests cover the prompt layout of the sales,
+recommendation and classifier calls, and the usage accounting.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from agents.context_window import ContextWindow
+from agents.recommendation_agent import RECOMMENDATION_SYSTEM_PROMPT, run_recommendation_agent
+from agents.sales_agent import SYSTEM_PROMPT, run_agent
+from agents.state import create_initial_state
+from utils.prompt_usage import PromptUsage, prompt_usage
+
+
+def _fake_llm(prompts, prompt_tokens=2000, cached_tokens=1536):
+    def invoke(self, messages, *args, **kwargs):
+        prompts.append(messages)
+        return AIMessage(content=f"reply {len(prompts)}", usage_metadata={
+            "input_tokens": prompt_tokens, "output_tokens": 20, "total_tokens": prompt_tokens + 20,
+            "input_token_details": {"cache_read": cached_tokens}})
+    return invoke
+
+
+def _customer(name, pincode, duration):
+    state = create_initial_state()
+    state["collected_info"].update({"customer_name": name, "pincode": pincode, "duration_months": duration})
+    return state
+
+
+@pytest.mark.unit
+class TestPromptLayout:
+
+    def test_context_goes_after_history_before_the_current_turn(self):
+        window = ContextWindow(budget_tokens=10_000, keep_turns=4)
+        history = [HumanMessage(content="hi"), AIMessage(content="hello")]
+        prompt = window.build("SYSTEM", history + [HumanMessage(content="now")], context="## Customer Context\nX")
+        assert [m.content for m in prompt] == ["SYSTEM", "hi", "hello", "## Customer Context\nX", "now"]
+        assert isinstance(prompt[-2], SystemMessage)
+
+    def test_sales_prefix_is_identical_across_customers_and_turns(self):
+        prompts = []
+        with patch.object(ChatOpenAI, "invoke", autospec=True, side_effect=_fake_llm(prompts)):
+            _, state = run_agent("I need a bed", _customer("Asha", "122001", 6))
+            run_agent("and a fridge", state)
+            run_agent("need a sofa", _customer("Vikram", "201301", 12))
+
+        assert all(p[0].content == SYSTEM_PROMPT for p in prompts)
+        # the customer's details are only in the trailing context message
+        assert "Asha" not in prompts[0][0].content and "Asha" in prompts[0][-2].content
+        assert "Vikram" in prompts[2][-2].content and "12 months" in prompts[2][-2].content
+        assert [m.content for m in prompts[1][1:3]] == ["I need a bed", "reply 1"]   # history follows the prefix
+
+    def test_recommendation_prefix_is_identical_across_customers(self):
+        prompts = []
+        with patch.object(ChatOpenAI, "invoke", autospec=True, side_effect=_fake_llm(prompts)):
+            run_recommendation_agent("show me sofas", _customer("Asha", "122001", 6))
+            run_recommendation_agent("show me beds", _customer("Vikram", "201301", 12))
+        assert prompts[0][0].content == prompts[1][0].content == RECOMMENDATION_SYSTEM_PROMPT
+        assert "Vikram" in prompts[1][-2].content and prompts[1][-1].content == "show me beds"
+
+    def test_classifier_system_prompt_is_static(self):
+        from agents import orchestrator
+
+        llm = MagicMock()
+        llm.invoke.return_value = AIMessage(content="SALES")
+        states = []
+        for status, agent in (("active_customer", "support"), ("new_lead", "sales")):
+            state = create_initial_state()
+            state["collected_info"]["customer_status"] = status
+            state["active_agent"] = agent
+            states.append(state)
+        with patch.object(orchestrator, "_get_classifier_llm", return_value=llm), \
+             patch.object(orchestrator, "intent_model", None):
+            orchestrator.classify_intent("what does a double bed cost", states[0])
+            orchestrator.classify_intent("do you deliver in noida", states[1])
+        first, second = (c.args[0] for c in llm.invoke.call_args_list)
+        assert first[0].content == second[0].content == orchestrator.CLASSIFIER_PROMPT
+        assert "User Status: NEW_LEAD" in second[1].content
+
+
+@pytest.mark.unit
+class TestPromptUsage:
+
+    def test_records_cached_tokens_from_langchain_usage(self):
+        usage = PromptUsage()
+        usage.record_message("sales", AIMessage(content="hi", usage_metadata={
+            "input_tokens": 2000, "output_tokens": 10, "total_tokens": 2010,
+            "input_token_details": {"cache_read": 1536}}))
+        usage.record_message("sales", AIMessage(content="hi", usage_metadata={
+            "input_tokens": 2000, "output_tokens": 10, "total_tokens": 2010}))
+        usage.record_message("sales", AIMessage(content="no usage reported"))
+        sales = usage.stats()["sites"]["sales"]
+        assert sales == {"calls": 2, "unreported": 1, "prompt_tokens": 4000, "cached_tokens": 1536,
+                         "uncached_tokens": 2464, "cache_hit_ratio": 0.384}
+
+    def test_records_cached_tokens_from_openai_response(self):
+        usage = PromptUsage()
+        response = SimpleNamespace(usage=SimpleNamespace(
+            prompt_tokens=3000, prompt_tokens_details=SimpleNamespace(cached_tokens=2944)))
+        usage.record_openai("item_extraction", response)
+        usage.record_openai("item_extraction", SimpleNamespace(usage=SimpleNamespace(
+            prompt_tokens=3000, prompt_tokens_details=None)))
+        usage.record("intent_classifier", 500)
+        stats = usage.stats()
+        assert stats["sites"]["item_extraction"]["cached_tokens"] == 2944
+        assert (stats["calls"], stats["prompt_tokens"], stats["cached_tokens"]) == (3, 6500, 2944)
+        assert stats["cache_hit_ratio"] == 0.453
+
+    def test_agents_report_usage(self):
+        prompt_usage.clear()
+        with patch.object(ChatOpenAI, "invoke", autospec=True, side_effect=_fake_llm([])):
+            run_agent("I need a bed", _customer("Asha", "122001", 6))
+        sales = prompt_usage.stats()["sites"]["sales"]
+        assert sales["calls"] == 1 and sales["cached_tokens"] == 1536
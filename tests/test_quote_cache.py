@@ -0,0 +1,106 @@
+"""
+Quote Cache Tests for RentBasket WhatsApp Bot.
+
+Covers utils.quote_cache (LRU bound, pricing-version invalidation, hit
+counters) and the two memoized renders: create_quote_tool and the browse
+flow's _format_browse_estimate. Cached output must be identical to a fresh
+render, and a price or discount change must never serve a stale quote.
+"""
+
+import pytest
+
+from data.products import id_to_price, pricing, refresh_pricing
+from tools.product_tools import create_quote_tool, _render_order_confirmation
+from utils.quote_cache import QuoteCache, quote_cache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    quote_cache.clear()
+    yield
+    quote_cache.clear()
+
+
+def _hits():
+    return quote_cache.stats()["hits"]
+
+
+@pytest.mark.unit
+class TestQuoteCache:
+
+    def test_lru_eviction_and_counters(self):
+        cache = QuoteCache(max_entries=2)
+        cache.put("a", "v1", 1)
+        cache.put("b", "v1", 2)
+        assert cache.get("a", "v1") == 1
+        cache.put("c", "v1", 3)
+        assert cache.get("b", "v1") is None
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (1, 1, 1, 2)
+        assert stats["hit_rate"] == 0.5
+
+    def test_new_version_drops_entries(self):
+        cache = QuoteCache()
+        renders = []
+        render = lambda: renders.append(1) or len(renders)
+        assert cache.get_or_render("cart", "v1", render) == 1
+        assert cache.get_or_render("cart", "v1", render) == 1
+        assert cache.get_or_render("cart", "v2", render) == 2
+        assert cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.unit
+class TestMemoizedQuotes:
+
+    def test_create_quote_tool_hits_and_matches_fresh_render(self):
+        hits = _hits()
+        first = create_quote_tool.invoke({"product_ids": "1042, 11,1042", "duration": 12})
+        second = create_quote_tool.invoke({"product_ids": "1042,11,1042", "duration": 12})
+        assert first == second == _render_order_confirmation({1042: 2, 11: 1}, 12, "months")
+        assert _hits() == hits + 1
+
+    def test_id_order_shares_one_entry(self):
+        create_quote_tool.invoke({"product_ids": "11,1042", "duration": 6})
+        hits = _hits()
+        create_quote_tool.invoke({"product_ids": "1042,11", "duration": 6})
+        assert _hits() == hits + 1
+
+    def test_duration_and_unit_are_part_of_key(self):
+        hits = _hits()
+        months = create_quote_tool.invoke({"product_ids": "11", "duration": 6})
+        days = create_quote_tool.invoke({"product_ids": "11", "duration": 6, "unit": "days"})
+        assert months != days
+        assert _hits() == hits
+
+    def test_price_change_invalidates(self):
+        before = create_quote_tool.invoke({"product_ids": "11", "duration": 12})
+        original = id_to_price[11]
+        try:
+            id_to_price[11] = [p * 2 for p in original]
+            old_version = pricing.version
+            assert refresh_pricing() != old_version
+            after = create_quote_tool.invoke({"product_ids": "11", "duration": 12})
+            assert after != before
+            assert f"₹{pricing.discounted_rent(11, 12):,}/mo" in after
+        finally:
+            id_to_price[11] = original
+            refresh_pricing()
+        assert create_quote_tool.invoke({"product_ids": "11", "duration": 12}) == before
+
+    def test_browse_estimate_cached_per_cart(self):
+        from webhook_server_revised import _format_browse_estimate, _render_browse_estimate
+
+        items = [
+            {"product_id": 11, "product_name": "Fridge 190 Ltr", "qty": 1, "original_rent": 1000},
+            {"product_id": 1042, "name": "Sofa", "qty": 2, "rent": 700},
+            {"product_id": None, "name": "Unknown", "matched": False, "rent": 0},
+        ]
+        hits = _hits()
+        first = _format_browse_estimate(items, 12)
+        again = _format_browse_estimate([dict(it) for it in items], 12)
+        assert first == again
+        assert first == _render_browse_estimate(
+            ((11, "Fridge 190 Ltr", 1, 1000), (1042, "Sofa", 2, 700)), 12)
+        assert first[1] == 2400
+        assert _hits() == hits + 1
+        assert _format_browse_estimate(items, 3) != first
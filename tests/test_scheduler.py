@@ -0,0 +1,175 @@
+"""
+Timer Wheel Tests for RentBasket WhatsApp Bot.
+
+Covers the single-thread scheduler that replaced per-user threading.Timer
+pairs: O(1) re-arm/cancel, firing, persistence across restarts, and the
+webhook's ghost / follow-up wiring.
+"""
+
+import json
+import time
+import pytest
+
+from utils.scheduler import TimerScheduler
+from conftest import build_webhook_payload
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def wheel(clock):
+    s = TimerScheduler(tick_seconds=1.0, wheel_size=60, clock=clock)
+    s.autostart = False
+    return s
+
+
+@pytest.mark.unit
+class TestTimerWheel:
+
+    def test_fires_after_delay(self, wheel, clock):
+        fired = []
+        wheel.register("ghost", fired.append)
+        wheel.schedule("ghost", "919900000001", 5)
+        clock.advance(4)
+        assert wheel.run_due() == 0
+        clock.advance(1)
+        assert wheel.run_due() == 1
+        assert fired == ["919900000001"]
+        assert wheel.pending() == 0
+        assert wheel.stats()["fired"] == 1
+
+    def test_reschedule_moves_deadline(self, wheel, clock):
+        fired = []
+        wheel.register("ghost", fired.append)
+        wheel.schedule("ghost", "p", 5)
+        clock.advance(4)
+        wheel.schedule("ghost", "p", 5)   # user spoke again
+        clock.advance(4)
+        wheel.run_due()
+        assert fired == []
+        assert wheel.pending("ghost") == 1
+        clock.advance(1)
+        wheel.run_due()
+        assert fired == ["p"]
+
+    def test_cancel(self, wheel, clock):
+        fired = []
+        wheel.register("ghost", fired.append)
+        wheel.register("followup", fired.append)
+        wheel.schedule("ghost", "p", 5)
+        wheel.schedule("followup", "p", 10)
+        wheel.cancel_all("p")
+        clock.advance(20)
+        wheel.run_due()
+        assert fired == []
+        assert wheel.stats()["cancelled"] == 2
+
+    def test_timers_longer_than_one_revolution(self, wheel, clock):
+        fired = []
+        wheel.register("followup", fired.append)
+        wheel.schedule("followup", "p", 150)   # 2.5 revolutions of a 60-slot wheel
+        for _ in range(149):
+            clock.advance(1)
+            wheel.run_due()
+        assert fired == []
+        clock.advance(1)
+        wheel.run_due()
+        assert fired == ["p"]
+
+    def test_catches_up_after_long_pause(self, wheel, clock):
+        fired = []
+        wheel.register("ghost", fired.append)
+        for i in range(10):
+            wheel.schedule("ghost", f"p{i}", 3 + i * 20)
+        clock.advance(1000)
+        assert wheel.run_due() == 10
+        assert sorted(fired) == sorted(f"p{i}" for i in range(10))
+
+    def test_executor_receives_fired_jobs(self, clock):
+        submitted = []
+        s = TimerScheduler(wheel_size=60, clock=clock,
+                           executor=lambda phone, fn, *a: submitted.append((phone, fn, a)))
+        s.autostart = False
+        handler = lambda phone: None
+        s.register("ghost", handler)
+        s.schedule("ghost", "p", 1)
+        clock.advance(1)
+        s.run_due()
+        assert submitted == [("p", handler, ("p",))]
+
+
+@pytest.mark.unit
+class TestTimerPersistence:
+
+    def test_pending_timers_survive_restart(self, tmp_path, clock, real_threads):
+        store = str(tmp_path / "timers.sqlite3")
+        s1 = TimerScheduler(store_path=store, clock=clock)
+        s1.register("followup", lambda p: None)
+        s1.start()
+        s1.schedule("followup", "p1", 3600)
+        s1.schedule("followup", "p2", 3600)
+        s1.cancel("followup", "p2")
+        s1.shutdown()
+
+        s2 = TimerScheduler(store_path=store, clock=clock)
+        s2.register("followup", lambda p: None)
+        s2.start()
+        try:
+            assert s2.pending("followup") == 1
+            assert s2.is_pending("followup", "p1")
+            assert not s2.is_pending("followup", "p2")
+        finally:
+            s2.shutdown()
+
+    def test_stale_timers_dropped_on_restore(self, tmp_path, clock, real_threads):
+        from utils.scheduler import _TimerStore
+        store = str(tmp_path / "timers.sqlite3")
+        db = _TimerStore(store)
+        db.upsert("ghost:p", "ghost", "p", time.time() - 7200)     # 2h overdue
+        db.upsert("ghost:q", "ghost", "q", time.time() - 60)       # 1 min overdue
+        db.close()
+
+        fired = []
+        s = TimerScheduler(store_path=store, clock=clock)
+        s.register("ghost", fired.append, grace_seconds=1800)
+        s.autostart = False
+        s.start()
+        try:
+            assert s.stats()["dropped_stale"] == 1
+            clock.advance(1)
+            s.run_due()
+            assert fired == ["q"]
+        finally:
+            s.shutdown()
+
+
+@pytest.mark.unit
+class TestWebhookTimers:
+
+    def test_inbound_message_arms_both_timers(self, client, mock_whatsapp, mock_agent):
+        from webhook_server_revised import timer_scheduler
+        payload = build_webhook_payload(phone="919900001111", text="need a fridge")
+        client.post("/webhook", data=json.dumps(payload), content_type="application/json")
+        assert timer_scheduler.is_pending("ghost", "919900001111")
+        assert timer_scheduler.is_pending("followup", "919900001111")
+
+    def test_bye_keeps_only_followup(self, client, mock_whatsapp, mock_agent):
+        from webhook_server_revised import timer_scheduler
+        payload = build_webhook_payload(phone="919900002222", text="bye")
+        client.post("/webhook", data=json.dumps(payload), content_type="application/json")
+        assert not timer_scheduler.is_pending("ghost", "919900002222")
+        assert timer_scheduler.is_pending("followup", "919900002222")
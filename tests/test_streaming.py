@@ -0,0 +1,180 @@
+"""
+Streaming Reply Tests for RentBasket WhatsApp Bot.
+
+With on_segment, route_and_run / run_agent stream the model's tokens and hand
+each "|||" part of the reply off as soon as it closes (agents.streaming); the
+webhook sends those parts right away and keeps the typing indicator alive.
+These tests use a fake streaming chat model.
+"""
+
+import threading
+from typing import Any, List
+
+import pytest
+from unittest.mock import call, patch
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import agents.recommendation_agent as recommendation_agent
+import agents.sales_agent as sales_agent
+import webhook_server_revised as server
+from agents.registry import agent_registry
+from agents.state import create_initial_state
+from agents.streaming import SegmentStream, stream_agent
+
+
+class FakeStreamingLLM(BaseChatModel):
+    """Replies with the queued AIMessages, streaming their text a few characters at a time."""
+
+    replies: List[AIMessage]
+    events: List[Any] = []
+    chunk_chars: int = 4
+    token_seconds: float = 0.005     # like a network stream: the consumer runs in between
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self.replies.pop(0))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self.replies.pop(0)
+        text = reply.content
+        for i in range(0, len(text), self.chunk_chars):
+            piece = text[i:i + self.chunk_chars]
+            threading.Event().wait(self.token_seconds)    # time.sleep is patched in tests
+            self.events.append(("token", piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        if reply.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": tc["name"], "args": "{}", "id": tc["id"], "index": n}
+                for n, tc in enumerate(reply.tool_calls)]))
+        self.events.append(("done", text))
+
+
+@pytest.fixture
+def fake_llm(real_threads):
+    """
+    Build the sales and recommendation graphs around a fake streaming model.
+    LangGraph consumes a "messages" stream on executor threads, so these need real ones.
+    """
+    llm = FakeStreamingLLM(replies=[], events=[])
+    with patch.object(sales_agent, "get_chat_model", return_value=llm), \
+         patch.object(recommendation_agent, "get_chat_model", return_value=llm):
+        agent_registry.reset("sales")
+        agent_registry.reset("recommendation")
+        yield llm
+    agent_registry.reset("sales")
+    agent_registry.reset("recommendation")
+
+
+@pytest.mark.unit
+class TestSegmentStream:
+
+    def test_segments_close_across_token_boundaries(self):
+        sent = []
+        stream = SegmentStream(sent.append)
+        for token in ["Your cart is ", "ready.|", "||https://", "cart|||", "Anything else?"]:
+            stream.feed(token)
+        assert sent == ["Your cart is ready.", "https://cart"]
+        assert stream.flushed == 2
+
+    def test_new_message_restarts_the_count(self):
+        sent = []
+        stream = SegmentStream(sent.append)
+        stream.feed("Let me check.|||partial")
+        stream.new_message()
+        stream.feed("Done|||")
+        assert sent == ["Let me check.", "Done"] and stream.flushed == 1
+
+    def test_discarded_message_sends_nothing_more(self):
+        sent = []
+        stream = SegmentStream(sent.append)
+        stream.feed("Checking")
+        stream.discard_message()
+        stream.feed(" stock.|||")
+        assert sent == [] and stream.flushed == 0
+
+
+@pytest.mark.unit
+def test_text_of_a_tool_calling_message_is_not_streamed():
+    class FakeAgent:
+        def stream(self, state, stream_mode):
+            tool_call = [{"name": "search_products_tool", "args": "{}", "id": "call_1", "index": 0}]
+            yield "messages", (AIMessageChunk(id="m1", content="", tool_call_chunks=tool_call), {})
+            yield "messages", (AIMessageChunk(id="m1", content="Let me check.|||"), {})
+            yield "values", {"messages": []}
+            yield "messages", (AIMessageChunk(id="m2", content="We have 3 sofas.|||Which one?"), {})
+            yield "values", {"messages": ["final"]}
+
+    sent = []
+    state = stream_agent(FakeAgent(), {"messages": []}, sent.append)
+    assert sent == ["We have 3 sofas."]
+    assert state["_streamed_segments"] == 1 and state["messages"] == ["final"]
+
+
+@pytest.mark.unit
+def test_sales_agent_flushes_first_part_before_the_reply_is_finished(fake_llm):
+    final = "Since you completed the discussion with our Bot Ku, here is 5% off.|||https://testqr.rentbasket.com/cart"
+    fake_llm.replies = [
+        AIMessage(content="", tool_calls=[{"name": "get_office_location_tool", "args": {}, "id": "call_1"}]),
+        AIMessage(content=final),
+    ]
+    received = []
+    response, state = sales_agent.run_agent(
+        "send me the cart", create_initial_state(),
+        on_segment=lambda segment: received.append((segment, list(fake_llm.events))))
+
+    assert response == final
+    assert [segment for segment, _ in received] == ["Since you completed the discussion with our Bot Ku, here is 5% off."]
+    events_at_flush = received[0][1]
+    assert ("done", final) not in events_at_flush           # the model was still writing part 2
+    assert state["_streamed_segments"] == 1
+    assert state["messages"][-1].content == final
+
+
+@pytest.mark.unit
+def test_route_and_run_reports_streamed_segments(fake_llm):
+    from agents.orchestrator import route_and_run
+
+    fake_llm.replies = [AIMessage(content="We have 3 sofas.|||Which one do you like?|||Budget?")]
+    state = create_initial_state()
+    state["collected_info"].update({"customer_status": "active_customer", "is_verified_customer": True})
+    state["active_agent"] = "recommendation"
+    received, progress = [], []
+    with patch("agents.orchestrator.classify_intent", return_value="recommendation"):
+        response, new_state = route_and_run("show me sofas", state, on_segment=received.append,
+                                            on_progress=lambda: progress.append(1))
+    assert received == ["We have 3 sofas.", "Which one do you like?"]
+    assert new_state["_routing_meta"]["streamed_segments"] == 2
+    assert response.split("|||")[2] == "Budget?"
+    assert progress                                         # called after each graph step
+
+
+@pytest.mark.unit
+def test_webhook_sends_streamed_parts_once_with_typing_between(conversation, mock_whatsapp, mock_agent, monkeypatch):
+    monkeypatch.setattr(server, "STREAM_REPLIES", True)
+
+    def streaming_agent(text, state, on_segment=None, on_progress=None):
+        on_segment("Here are two **sofas**.")
+        on_progress()
+        state["_routing_meta"] = {"intent": "recommendation", "agent_used": "recommendation", "streamed_segments": 1}
+        return "Here are two **sofas**.|||Which one do you like?", state
+
+    mock_agent.side_effect = streaming_agent
+    conversation.send("show me sofas for 6 months")
+
+    sends = [c for c in mock_whatsapp.mock_calls if c[0] in ("send_text_message", "send_typing_indicator")]
+    phone = conversation.phone
+    assert sends == [
+        call.send_text_message(phone, "Here are two *sofas*.", preview_url=False),
+        call.send_typing_indicator(phone),
+        call.send_text_message(phone, "Which one do you like?", preview_url=False),
+    ]
@@ -0,0 +1,141 @@
+"""
+Tool Runner Tests for RentBasket WhatsApp Bot.
+
+The sales and recommendation agents' tool nodes run one step's tool calls
+concurrently through agents.tool_runner. These tests cover concurrency,
+result order, declared dependencies, per-tool timeouts, the latency stats
+and the saving over running the calls one after another.
+"""
+
+import threading
+import time
+import pytest
+
+from agents.tool_runner import ToolRunner
+
+
+class FakeTool:
+    """Stands in for a LangChain tool: invoke(args) -> result."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def invoke(self, args):
+        return self.fn(**args)
+
+
+def _busy(seconds):
+    # time.sleep is patched in tests
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        pass
+
+
+def _call(name, i, **args):
+    return {"name": name, "id": f"call_{i}", "args": args}
+
+
+@pytest.fixture
+def runner(real_threads):
+    runner = ToolRunner(workers=4, timeout_seconds=2)
+    yield runner
+    runner.shutdown()
+
+
+@pytest.mark.unit
+class TestToolRunner:
+
+    def test_independent_calls_run_concurrently_in_call_order(self, runner):
+        barrier = threading.Barrier(3, timeout=2)      # only passes if all three run at once
+
+        def slow(label, delay):
+            barrier.wait()
+            _busy(delay)
+            return label
+
+        tools = {"check_serviceability_tool": FakeTool(slow), "sync_lead_data_tool": FakeTool(slow),
+                 "generate_cart_link_tool": FakeTool(slow)}
+        calls = [_call("check_serviceability_tool", 0, label="serviceable", delay=0.05),
+                 _call("sync_lead_data_tool", 1, label="synced", delay=0.0),
+                 _call("generate_cart_link_tool", 2, label="https://cart", delay=0.02)]
+        results = runner.run(calls, tools)
+        assert [(m.tool_call_id, m.name, m.content) for m in results] == [
+            ("call_0", "check_serviceability_tool", "serviceable"),
+            ("call_1", "sync_lead_data_tool", "synced"),
+            ("call_2", "generate_cart_link_tool", "https://cart")]
+
+    def test_dependent_calls_keep_their_order(self, runner):
+        events = []
+
+        def write(stage, delay):
+            events.append(f"start {stage}")
+            _busy(delay)
+            events.append(f"end {stage}")
+            return stage
+
+        tools = {"sync_lead_data_tool": FakeTool(write), "search_products_tool": FakeTool(write)}
+        calls = [_call("sync_lead_data_tool", 0, stage="interested", delay=0.05),
+                 _call("search_products_tool", 1, stage="search", delay=0.0),
+                 _call("sync_lead_data_tool", 2, stage="cart", delay=0.0)]
+        assert [m.content for m in runner.run(calls, tools)] == ["interested", "search", "cart"]
+        assert events.index("end interested") < events.index("start cart")
+        assert events.index("start search") < events.index("end interested")   # not held back
+
+    def test_timeouts_and_errors_become_tool_messages(self, runner):
+        release = threading.Event()
+
+        def hang():
+            release.wait(5)
+            return "late"
+
+        def broken():
+            raise ValueError("pincode API down")
+
+        tools = {"check_serviceability_tool": FakeTool(hang), "create_quote_tool": FakeTool(broken),
+                 "get_office_location_tool": FakeTool(lambda: "Gurgaon office")}
+        calls = [_call("check_serviceability_tool", 0), _call("create_quote_tool", 1),
+                 _call("get_office_location_tool", 2), _call("missing_tool", 3)]
+        started = time.perf_counter()
+        results = [m.content for m in runner.run(calls, tools, timeout_seconds=0.2)]
+        release.set()
+        assert time.perf_counter() - started < 2
+        assert results == [
+            "Error executing check_serviceability_tool: timed out after 0.2s",
+            "Error executing create_quote_tool: pincode API down",
+            "Gurgaon office",
+            "Tool 'missing_tool' not found.",
+        ]
+        stats = runner.stats()
+        assert stats["timeouts"] == 1 and stats["errors"] == 1
+        assert stats["tools"]["check_serviceability_tool"]["timeouts"] == 1
+
+    def test_synchronous_mode_runs_inline(self):
+        runner = ToolRunner()
+        runner.synchronous = True
+        seen = []
+        tools = {"a": FakeTool(lambda: seen.append(threading.current_thread().name) or "ok")}
+        assert [m.content for m in runner.run([_call("a", 0), _call("a", 1)], tools)] == ["ok", "ok"]
+        assert seen == [threading.current_thread().name] * 2
+        assert runner.stats()["tools"]["a"]["calls"] == 2
+
+    def test_stats_record_per_tool_latency(self, runner):
+        tools = {"slow": FakeTool(lambda: _busy(0.03) or "done"), "fast": FakeTool(lambda: "done")}
+        runner.run([_call("slow", 0), _call("fast", 1)], tools)
+        stats = runner.stats()
+        assert stats["steps"] == 1 and stats["calls"] == 2
+        assert stats["tools"]["slow"]["max_ms"] >= 30 > stats["tools"]["fast"]["max_ms"]
+
+
+@pytest.mark.load
+def test_parallel_step_takes_the_slowest_call_not_the_sum(runner):
+    # I/O-bound like the real tools (an API call, a Firestore write): waiting releases the GIL
+    tools = {name: FakeTool(lambda delay: threading.Event().wait(delay) or "ok")
+             for name in ("check_serviceability_tool", "sync_lead_data_tool", "generate_cart_link_tool")}
+    calls = [_call(name, i, delay=0.1) for i, name in enumerate(tools)]
+    started = time.perf_counter()
+    runner.run(calls, tools)
+    parallel_ms = (time.perf_counter() - started) * 1000
+    stats = runner.stats()
+    print(f"\n  3 x 100 ms tools: step {parallel_ms:.0f} ms, serial {stats['serial_ms']:.0f} ms, "
+          f"saved {stats['saved_ms']:.0f} ms")
+    assert parallel_ms < stats["serial_ms"] / 2
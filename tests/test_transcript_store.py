@@ -0,0 +1,244 @@
+"""
+Transcript Store Tests for RentBasket WhatsApp Bot.
+
+Session transcripts moved from an ArrayUnion'd live_transcript array on the
+session document to fixed-size chunk documents. These tests cover chunk
+rollover, cursor recovery after a restart, reading legacy transcripts,
+that get_conversation_history streams the chunks in order and that history
+pages read only the chunks they need, walking back across sessions.
+"""
+
+import pytest
+from unittest.mock import patch
+
+import utils.db_logger as db_logger
+from utils.transcript_store import TranscriptStore
+from utils.write_behind import WriteBehindQueue
+
+
+class FakeFirestore:
+    """Path-addressed documents with merge-set, point reads and ordered collection reads."""
+
+    def __init__(self, docs=None):
+        self.docs = docs or {}
+        self.reads = 0
+
+    def document(self, path):
+        return _FakeDoc(self, path)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+    def collection(self, path):
+        return _FakeQuery(self, path)
+
+
+class _FakeSnapshot:
+    def __init__(self, path, data):
+        self.id = path.rsplit("/", 1)[1]
+        self._data, self.exists = data, data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _FakeDoc:
+    def __init__(self, db, path):
+        self._db, self.path = db, path
+
+    def get(self):
+        self._db.reads += 1
+        return _FakeSnapshot(self.path, self._db.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        current = dict(self._db.docs.get(self.path, {})) if merge else {}
+        for key, value in data.items():
+            if merge and isinstance(value, dict) and isinstance(current.get(key), dict):
+                value = {**current[key], **value}
+            current[key] = value
+        self._db.docs[self.path] = current
+
+
+class _FakeBatch:
+    def __init__(self, db):
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append((ref, data, merge))
+
+    def commit(self):
+        for ref, data, merge in self._writes:
+            ref.set(data, merge=merge)
+
+
+class _FakeQuery:
+    def __init__(self, db, path, descending=False, limit=None):
+        self._db, self._path = db, path
+        self._descending, self._limit = descending, limit
+
+    def document(self, doc_id):
+        return _FakeDoc(self._db, f"{self._path}/{doc_id}")
+
+    def order_by(self, field, direction=None):
+        return _FakeQuery(self._db, self._path, descending=direction == "DESCENDING", limit=self._limit)
+
+    def limit(self, n):
+        return _FakeQuery(self._db, self._path, self._descending, n)
+
+    def stream(self):
+        self._db.reads += 1
+        depth = self._path.count("/") + 1
+        paths = sorted((p for p in self._db.docs if p.startswith(self._path + "/") and p.count("/") == depth),
+                       reverse=self._descending)
+        for path in paths[:self._limit]:
+            yield _FakeSnapshot(path, self._db.docs[path])
+
+    def get(self):
+        return list(self.stream())
+
+
+class _FakeSessions(_FakeQuery):
+    """sessions where(phone_number ==) ordered by last_active_at, newest first, with start_after."""
+
+    def __init__(self, db, path, phone=None, after=None, limit=None):
+        super().__init__(db, path, limit=limit)
+        self._phone, self._after = phone, after
+
+    def where(self, field, op, value):
+        return _FakeSessions(self._db, self._path, value, self._after, self._limit)
+
+    def order_by(self, field, direction=None):
+        return self
+
+    def start_after(self, snapshot):
+        return _FakeSessions(self._db, self._path, self._phone, snapshot.to_dict()["last_active_at"], self._limit)
+
+    def limit(self, n):
+        return _FakeSessions(self._db, self._path, self._phone, self._after, n)
+
+    def stream(self):
+        self._db.reads += 1
+        found = [_FakeSnapshot(p, d) for p, d in self._db.docs.items()
+                 if p.count("/") == 1 and p.startswith("sessions/") and d.get("phone_number") == self._phone
+                 and (self._after is None or d["last_active_at"] < self._after)]
+        found.sort(key=lambda snap: snap.to_dict()["last_active_at"], reverse=True)
+        return iter(found[:self._limit])
+
+
+def _with_sessions(db):
+    plain = db.collection
+    db.collection = lambda path: _FakeSessions(db, path) if path == "sessions" else plain(path)
+    return db
+
+
+def _store(db, chunk_lines=3):
+    writer = WriteBehindQueue(lambda: db)
+    writer.autostart = False
+    return TranscriptStore(writer, lambda: db, chunk_lines=chunk_lines)
+
+
+@pytest.mark.unit
+class TestTranscriptStore:
+
+    def test_lines_roll_over_into_fixed_size_chunks(self):
+        db = FakeFirestore()
+        store = _store(db)
+        for i in range(7):
+            store.append("s1", f"line {i}", new_session=i == 0)
+        store.writer.flush()
+        assert sorted(db.docs) == [f"sessions/s1/transcript/{n:05d}" for n in range(3)]
+        assert db.docs["sessions/s1/transcript/00001"]["lines"] == {"3": "line 3", "4": "line 4", "5": "line 5"}
+        assert db.reads == 0
+
+    def test_cursor_recovered_after_restart(self):
+        db = FakeFirestore()
+        first = _store(db)
+        for i in range(4):
+            first.append("s1", f"line {i}", new_session=i == 0)
+        first.writer.flush()
+
+        restarted = _store(db)
+        assert restarted.append("s1", "line 4") == 4
+        assert restarted.append("s1", "line 5") == 5
+        assert db.reads == 1
+        assert list(restarted.iter_lines("s1")) == [f"line {i}" for i in range(6)]
+
+    def test_legacy_transcript_streams_first(self):
+        db = FakeFirestore({"sessions/old": {"live_transcript": ["a", "b"]}})
+        store = _store(db)
+        store.append("old", "c")
+        store.append("old", "d")
+        assert list(store.iter_lines("old")) == ["a", "b", "c", "d"]
+
+    def test_page_reads_only_the_chunks_it_needs(self):
+        db = FakeFirestore()
+        store = _store(db)
+        for i in range(8):
+            store.append("s1", f"line {i}", new_session=i == 0)
+        store.writer.flush()
+        assert store.read_page("s1", 4) == ([f"line {i}" for i in range(4, 8)], 4)
+        assert db.reads == 2                       # chunks 00001 and 00002
+        assert store.read_page("s1", 4, before=4) == ([f"line {i}" for i in range(4)], 0)
+        assert store.read_page("s1", 4, before=0) == ([], 0)
+
+    def test_page_spans_legacy_and_chunked_lines(self):
+        db = FakeFirestore()
+        store = _store(db)
+        store.append("old", "c")
+        store.append("old", "d")
+        assert store.read_page("old", 3, legacy=["a", "b"]) == (["b", "c", "d"], 1)
+        assert store.read_page("old", 3, before=1, legacy=["a", "b"]) == (["a"], 0)
+
+    def test_lines_sort_numerically_within_a_chunk(self):
+        db = FakeFirestore()
+        store = _store(db, chunk_lines=50)
+        for i in range(12):
+            store.append("s1", f"line {i}", new_session=i == 0)
+        assert list(store.iter_lines("s1")) == [f"line {i}" for i in range(12)]
+
+
+@pytest.mark.unit
+def test_conversation_history_streams_chunks():
+    db = _with_sessions(FakeFirestore({"sessions/s1": {"phone_number": "919800000001", "last_active_at": 1}}))
+    store = _store(db, chunk_lines=2)
+    store.append("s1", "[21/01/26, 02:02 pm] Ku: Hi, I'm Ku", new_session=True)
+    store.append("s1", "[21/01/26, 02:03 pm] Asha: price of fridge?")
+    store.append("s1", "[21/01/26, 02:03 pm] Ku: Rs. 700/mo")
+
+    with patch("utils.db_logger.get_db", return_value=db), \
+         patch("utils.db_logger.firestore_writer", store.writer), \
+         patch("utils.db_logger.transcript_store", store):
+        history = db_logger.get_conversation_history("919800000001")
+    assert history.splitlines() == [
+        "21/01/26, 02:02 pm - Ku: Hi, I'm Ku",
+        "21/01/26, 02:03 pm - Asha: price of fridge?",
+        "21/01/26, 02:03 pm - Ku: Rs. 700/mo",
+    ]
+
+
+@pytest.mark.unit
+def test_history_pages_walk_back_across_sessions():
+    db = _with_sessions(FakeFirestore({
+        "sessions/old": {"phone_number": "919800000001", "last_active_at": 1,
+                         "live_transcript": ["[20/01/26, 10:00 am] Asha: old 0", "[20/01/26, 10:01 am] Ku: old 1"]},
+        "sessions/new": {"phone_number": "919800000001", "last_active_at": 2},
+        "sessions/other": {"phone_number": "919811111111", "last_active_at": 3},
+    }))
+    store = _store(db)
+    for i in range(5):
+        store.append("new", f"[21/01/26, 02:0{i} pm] Asha: new {i}", new_session=i == 0)
+
+    with patch("utils.db_logger.get_db", return_value=db), \
+         patch("utils.db_logger.firestore_writer", store.writer), \
+         patch("utils.db_logger.transcript_store", store):
+        pages, cursor = [], None
+        while True:
+            page = db_logger.get_history_page("919800000001", limit=3, cursor=cursor)
+            pages.append([entry.split(": ", 1)[1] for entry in page["entries"]])
+            cursor = page["cursor"]
+            if cursor is None:
+                break
+        last_two = db_logger.get_conversation_history("919800000001", last_n=2)
+
+    assert pages == [["new 2", "new 3", "new 4"], ["old 1", "new 0", "new 1"], ["old 0"]]
+    assert last_two == "21/01/26, 02:03 pm - Asha: new 3\n21/01/26, 02:04 pm - Asha: new 4"
@@ -0,0 +1,185 @@
+"""
+Vector Index Tests for RentBasket WhatsApp Bot.
+
+Covers rag.vector_index.VectorIndex (top-k parity with brute force,
+category / price pre-filters, np.save + mmap round trip, lifting embeddings
+out of Chroma) and load_knowledge_index() reusing a saved index.
+
+Run the Chroma comparison with: pytest -m load tests/test_vector_index.py -s
+"""
+
+import hashlib
+import os
+import time
+
+import numpy as np
+import pytest
+
+from langchain_core.embeddings import Embeddings
+
+from rag.vector_index import VectorIndex, catalogue_documents, index_matches
+
+KB = "\n\n".join(
+    f"Section {i}. " + " ".join(f"policy-{i}-{j} applies to rentals in Gurgaon and Noida." for j in range(6))
+    for i in range(8)
+)
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic offline embeddings that count what gets embedded."""
+
+    def __init__(self, dim=32):
+        self.dim = dim
+        self.embedded = []
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).tolist()
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def catalogue():
+    ids, documents, metadatas = catalogue_documents()
+    return VectorIndex.from_texts(ids, documents, HashEmbeddings(), metadatas)
+
+
+@pytest.mark.unit
+class TestVectorIndex:
+
+    def test_top_k_matches_brute_force(self, catalogue):
+        query = np.random.default_rng(1).standard_normal(catalogue.dim)
+        hits = catalogue.search(query, k=5)
+
+        matrix = np.array(catalogue.vectors, dtype=np.float64)
+        scores = matrix @ (query / np.linalg.norm(query))
+        expected = [catalogue.ids[i] for i in np.argsort(-scores)[:5]]
+        assert [h["id"] for h in hits] == expected
+        assert all(a["score"] >= b["score"] for a, b in zip(hits, hits[1:]))
+
+    def test_exact_document_is_its_own_nearest_neighbour(self, catalogue):
+        hit = catalogue.search_text(catalogue.documents[7], k=1)[0]
+        assert hit["id"] == catalogue.ids[7]
+        assert hit["score"] == pytest.approx(1.0, abs=1e-5)
+
+    def test_category_and_price_prefilters(self, catalogue):
+        query = np.ones(catalogue.dim)
+        hits = catalogue.search(query, k=50, category="Sofa", max_price=1500)
+        assert hits
+        for hit in hits:
+            assert "sofa" in [c.strip() for c in hit["metadata"]["categories"].split(",")]
+            assert hit["metadata"]["price_12mo"] <= 1500
+        assert catalogue.search(query, k=5, category="no-such-category") == []
+
+    def test_save_and_mmap_load(self, catalogue, tmp_path):
+        catalogue.save(str(tmp_path))
+        loaded = VectorIndex.load(str(tmp_path), embed_query=HashEmbeddings().embed_query)
+        assert loaded.stats()["mmap"] and loaded.vectors.dtype == np.float32
+        query = "double door fridge"
+        assert loaded.search_text(query, k=5) == catalogue.search_text(query, k=5)
+        assert VectorIndex.saved_ids(str(tmp_path)) == catalogue.ids
+
+    def test_repriced_product_makes_saved_catalogue_stale(self, catalogue, tmp_path):
+        catalogue.save(str(tmp_path))
+        ids, documents, metadatas = catalogue_documents()
+        assert index_matches(str(tmp_path), ids, documents, metadatas)
+        assert index_matches(str(tmp_path), reversed(ids), documents[::-1], metadatas[::-1])
+
+        metadatas[3] = dict(metadatas[3], price_12mo=metadatas[3]["price_12mo"] + 100)
+        assert index_matches(str(tmp_path), ids)  # same products...
+        assert not index_matches(str(tmp_path), ids, documents, metadatas)  # ...but stale rows
+
+    def test_empty_index(self):
+        assert VectorIndex([], None).search([1.0, 0.0], k=3) == []
+
+    def test_from_chroma_reuses_stored_embeddings(self, tmp_path, real_threads):
+        from rag.vectorstore import sync_knowledge_vectorstore
+
+        store, report = sync_knowledge_vectorstore(str(tmp_path), text=KB, embeddings=HashEmbeddings())
+        index = VectorIndex.from_chroma(store, embed_query=HashEmbeddings().embed_query)
+        assert len(index) == report["chunks"]
+        chroma_top = store.similarity_search("policy-3-2 applies", k=1)[0].page_content
+        assert index.search_text("policy-3-2 applies", k=1)[0]["document"] == chroma_top
+
+
+@pytest.mark.unit
+class TestKnowledgeIndexLoader:
+
+    def test_saved_index_skips_chroma(self, tmp_path, real_threads):
+        from rag.vectorstore import load_knowledge_index, search_knowledge
+
+        index_dir, db_dir = str(tmp_path / "index"), str(tmp_path / "db")
+        first = load_knowledge_index(index_dir, db_dir, text=KB, embeddings=HashEmbeddings())
+        assert os.path.exists(os.path.join(index_dir, "vectors.npy"))
+
+        emb = HashEmbeddings()
+        second = load_knowledge_index(index_dir, str(tmp_path / "missing"), text=KB, embeddings=emb)
+        assert second.stats()["mmap"] and emb.embedded == []
+        assert not os.path.exists(tmp_path / "missing")
+        assert search_knowledge("policy-2-4", second, k=2) == search_knowledge("policy-2-4", first, k=2)
+
+    def test_edited_knowledge_base_rebuilds_index(self, tmp_path, real_threads):
+        from rag.vectorstore import load_knowledge_index
+
+        index_dir, db_dir = str(tmp_path / "index"), str(tmp_path / "db")
+        load_knowledge_index(index_dir, db_dir, text=KB, embeddings=HashEmbeddings())
+        edited = KB.replace("policy-5-3 applies", "policy-5-3 no longer applies")
+        emb = HashEmbeddings()
+        index = load_knowledge_index(index_dir, db_dir, text=edited, embeddings=emb)
+        assert 1 <= len(emb.embedded) <= 2
+        assert any("no longer" in doc for doc in index.documents)
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+@pytest.mark.load
+def test_numpy_index_vs_chroma(tmp_path, real_threads):
+    import chromadb
+
+    ids, documents, metadatas = catalogue_documents()
+    emb = HashEmbeddings(dim=1536)              # text-embedding-3-small dimension
+    vectors = emb.embed_documents(documents)
+    queries = [emb.embed_query(f"query {i}") for i in range(300)]
+
+    rss = _rss_bytes()
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+    collection.add(ids=ids, embeddings=vectors, documents=documents, metadatas=metadatas)
+    collection.query(query_embeddings=[queries[0]], n_results=5)
+    chroma_rss = _rss_bytes() - rss
+
+    index = VectorIndex.from_chroma(collection)
+    index.save(str(tmp_path / "np"))
+    index = VectorIndex.load(str(tmp_path / "np"))
+
+    def timed(fn):
+        samples = []
+        for q in queries:
+            started = time.perf_counter()
+            fn(q)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+    chroma = timed(lambda q: collection.query(query_embeddings=[q], n_results=5,
+                                              where={"price_12mo": {"$lte": 1500}}))
+    numpy_ = timed(lambda q: index.search(q, k=5, max_price=1500))
+
+    print(f"\n  {len(index)} rows x {index.dim} dims")
+    print(f"  Chroma: p50 {chroma[0]:.3f} ms, p99 {chroma[1]:.3f} ms, ~{chroma_rss / 1e6:.1f} MB RSS")
+    print(f"  NumPy:  p50 {numpy_[0]:.3f} ms, p99 {numpy_[1]:.3f} ms, {index.stats()['matrix_bytes'] / 1e6:.2f} MB matrix")
+    assert [h["id"] for h in index.search(queries[1], k=5)] == \
+        collection.query(query_embeddings=[queries[1]], n_results=5)["ids"][0]
+    assert numpy_[0] < chroma[0]
@@ -0,0 +1,216 @@
+"""
+WhatsApp Client Transport Tests for RentBasket WhatsApp Bot.
+
+Runs WhatsAppClient against a local mock Graph API server to check the pooled
+keep-alive session (connection reuse), jittered retries on 429 / 5xx,
+per-call timeouts and the per-endpoint latency histograms.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from whatsapp.client import WhatsAppClient, LatencyHistogram
+
+_sleep = time.sleep  # captured before conftest patches time.sleep
+
+
+class MockGraphAPI:
+    """Minimal HTTP/1.1 keep-alive server mimicking graph.facebook.com."""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = []
+        self.fail_queue = []   # status codes to return before succeeding
+        self.delay = 0.0
+        self.drop_next = 0     # requests to read and then hang up on without replying
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with api._lock:
+                    api.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, content_type="application/json"):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _drop(self):
+                with api._lock:
+                    drop, api.drop_next = api.drop_next > 0, max(0, api.drop_next - 1)
+                self.close_connection = self.close_connection or drop
+                return drop
+
+            def _next_failure(self):
+                with api._lock:
+                    return api.fail_queue.pop(0) if api.fail_queue else None
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                api.requests.append(("POST", self.path, json.loads(body or b"{}")))
+                if api.delay:
+                    _sleep(api.delay)
+                if self._drop():
+                    return
+                failure = self._next_failure()
+                if failure:
+                    return self._reply(failure, {"error": {"code": failure}})
+                self._reply(200, {"messages": [{"id": f"wamid.mock{len(api.requests)}"}]})
+
+            def do_GET(self):
+                api.requests.append(("GET", self.path, None))
+                if self._drop():
+                    return
+                failure = self._next_failure()
+                if failure:
+                    return self._reply(failure, {"error": {"code": failure}})
+                if self.path.startswith("/media/"):
+                    return self._reply(200, b"OggS-audio-bytes", "audio/ogg")
+                media_id = self.path.rsplit("/", 1)[-1]
+                self._reply(200, {"url": f"{api.url}/media/{media_id}.ogg"})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def graph_api(real_threads):
+    api = MockGraphAPI().start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def wa_client(graph_api):
+    c = WhatsAppClient(
+        phone_number_id="123456", access_token="test-token", demo_mode=False,
+        base_url=graph_api.url, read_timeout=2, max_retries=3,
+    )
+    yield c
+    c.close()
+
+
+@pytest.mark.unit
+class TestConnectionPooling:
+
+    def test_sequential_sends_reuse_one_connection(self, graph_api, wa_client):
+        for i in range(20):
+            result = wa_client.send_text_message("919900000001", f"msg {i}")
+            assert "messages" in result
+        assert graph_api.connections == 1
+        pool = wa_client.connection_stats()
+        assert pool == {"connections_opened": 1, "requests": 20, "reused": 19}
+
+    def test_concurrent_sends_bounded_by_pool(self, graph_api, wa_client):
+        def burst(n):
+            for i in range(10):
+                wa_client.send_text_message(f"91990000{n:04d}", f"hi {i}")
+
+        threads = [threading.Thread(target=burst, args=(n,)) for n in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        print(f"\n  50 concurrent sends used {graph_api.connections} connections")
+        assert len(graph_api.requests) == 50
+        assert graph_api.connections <= 5
+
+    def test_media_download_shares_session(self, graph_api, wa_client):
+        data = wa_client.download_media("media123")
+        assert data == b"OggS-audio-bytes"
+        assert graph_api.connections == 1
+        assert set(wa_client.stats()["endpoints"]) == {"media_url", "media_download"}
+
+
+@pytest.mark.unit
+class TestRetries:
+
+    def test_retries_on_429_then_succeeds(self, graph_api, wa_client):
+        graph_api.fail_queue = [429, 429]
+        result = wa_client.send_text_message("919900000001", "hello")
+        assert "messages" in result
+        stats = wa_client.stats()["endpoints"]["messages"]
+        assert stats["count"] == 3
+        assert stats["retries"] == 2
+        assert stats["status_codes"] == {"429": 2, "200": 1}
+
+    def test_gives_up_after_max_retries(self, graph_api, wa_client):
+        graph_api.fail_queue = [503] * 10
+        result = wa_client.send_text_message("919900000001", "hello")
+        assert "error" in result
+        assert len(graph_api.requests) == wa_client.max_retries + 1
+
+    def test_client_errors_are_not_retried(self, graph_api, wa_client):
+        graph_api.fail_queue = [400]
+        result = wa_client.send_text_message("919900000001", "hello")
+        assert "error" in result
+        assert len(graph_api.requests) == 1
+
+    def test_read_timeout_returns_error_without_retry(self, graph_api):
+        c = WhatsAppClient(phone_number_id="123456", access_token="t", demo_mode=False,
+                           base_url=graph_api.url, read_timeout=0.1)
+        graph_api.delay = 0.5
+        try:
+            result = c.send_text_message("919900000001", "hello")
+        finally:
+            c.close()
+        assert "error" in result
+        assert len(graph_api.requests) == 1
+        assert c.stats()["endpoints"]["messages"]["status_codes"] == {"exception": 1}
+
+    def test_post_dropped_after_sending_is_not_resent(self, graph_api, wa_client):
+        graph_api.drop_next = 1
+        result = wa_client.send_text_message("919900000001", "hello")
+        assert "error" in result
+        assert len(graph_api.requests) == 1          # the customer gets the message at most once
+
+    def test_get_dropped_after_sending_is_retried(self, graph_api, wa_client):
+        graph_api.drop_next = 1
+        assert wa_client.download_media("media123") == b"OggS-audio-bytes"
+        assert [r[0] for r in graph_api.requests] == ["GET", "GET", "GET"]
+
+    def test_unreachable_host_fails_fast(self):
+        c = WhatsAppClient(phone_number_id="123456", access_token="t", demo_mode=False,
+                           base_url="http://127.0.0.1:9", max_retries=1)
+        result = c.send_text_message("919900000001", "hello")
+        assert "error" in result
+        assert c.stats()["endpoints"]["messages"]["count"] == 2
+
+
+@pytest.mark.unit
+def test_latency_histogram_buckets():
+    h = LatencyHistogram()
+    for ms in (10, 20, 30, 60, 400):
+        h.observe(ms, 200)
+    snap = h.snapshot()
+    assert snap["count"] == 5
+    assert snap["buckets"]["le_25ms"] == 2
+    assert snap["buckets"]["le_500ms"] == 1
+    assert snap["p50_ms"] == 50.0
+    assert snap["p95_ms"] == 500.0
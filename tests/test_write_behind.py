@@ -0,0 +1,185 @@
+"""
+Write-Behind Firestore Tests for RentBasket WhatsApp Bot.
+
+Covers utils.write_behind (coalescing, batched commits, SQLite spool replay,
+per-write fallback when a batch fails) against an in-memory fake Firestore
+that counts round trips, and checks that one logged conversation turn now
+costs one batched commit instead of seven synchronous writes while leaving
+the same documents behind.
+"""
+
+import copy
+import pytest
+from unittest.mock import patch
+
+from google.cloud.firestore_v1 import transforms
+
+import utils.db_logger as db_logger
+from utils.transcript_store import TranscriptStore
+from utils.write_behind import WriteBehindQueue
+
+
+class FakeFirestore:
+    """Just enough of the Firestore client: document refs, batches, round-trip count."""
+
+    def __init__(self):
+        self.docs = {}
+        self.round_trips = 0
+
+    def document(self, path):
+        return _FakeRef(self, path)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+    def collection_docs(self, prefix):
+        return {p: d for p, d in self.docs.items() if p.startswith(prefix + "/") and p.count("/") == prefix.count("/") + 1}
+
+    def _apply(self, docs, kind, path, data):
+        if kind == "update" and path not in docs:
+            raise KeyError(f"No document to update: {path}")
+        current = {} if kind == "set" else docs.setdefault(path, {})
+        for key, value in data.items():
+            if isinstance(value, transforms.ArrayUnion):
+                current[key] = list(current.get(key, [])) + [v for v in value.values if v not in current.get(key, [])]
+            elif isinstance(value, transforms.Increment):
+                current[key] = current.get(key, 0) + value.value
+            elif kind == "merge" and isinstance(value, dict) and isinstance(current.get(key), dict):
+                current[key] = {**current[key], **value}
+            else:
+                current[key] = value
+        docs[path] = current
+
+
+class _FakeRef:
+    def __init__(self, db, path):
+        self._db, self.path = db, path
+
+    def set(self, data, merge=False):
+        self._db.round_trips += 1
+        self._db._apply(self._db.docs, "merge" if merge else "set", self.path, data)
+
+    def update(self, data):
+        self._db.round_trips += 1
+        self._db._apply(self._db.docs, "update", self.path, data)
+
+
+class _FakeBatch:
+    def __init__(self, db):
+        self._db, self._writes = db, []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(("merge" if merge else "set", ref.path, data))
+
+    def update(self, ref, data):
+        self._writes.append(("update", ref.path, data))
+
+    def commit(self):
+        self._db.round_trips += 1
+        docs = copy.deepcopy(self._db.docs)
+        for kind, path, data in self._writes:
+            self._db._apply(docs, kind, path, data)   # all or nothing
+        self._db.docs = docs
+
+
+def _writer(db, **kwargs):
+    writer = WriteBehindQueue(lambda: db, **kwargs)
+    writer.autostart = False
+    return writer
+
+
+@pytest.mark.unit
+class TestWriteBehindQueue:
+
+    def test_same_document_writes_coalesce(self):
+        db = FakeFirestore()
+        writer = _writer(db)
+        writer.set("sessions/s1", {"live_transcript": transforms.ArrayUnion(["a"]), "info": {"x": 1}})
+        writer.set("sessions/s1", {"live_transcript": transforms.ArrayUnion(["b"]), "info": {"y": 2}})
+        writer.update("analytics_totals/t", {"n": transforms.Increment(1)})
+        writer.update("analytics_totals/t", {"n": transforms.Increment(2)})
+        assert writer.stats()["pending"] == 2 and writer.stats()["coalesced"] == 2
+
+        db.docs["analytics_totals/t"] = {"n": 10}
+        assert writer.flush() == 2
+        assert db.round_trips == 1
+        assert db.docs["sessions/s1"] == {"live_transcript": ["a", "b"], "info": {"x": 1, "y": 2}}
+        assert db.docs["analytics_totals/t"] == {"n": 13}
+
+    def test_adds_get_distinct_ids_and_batches_split(self):
+        db = FakeFirestore()
+        writer = _writer(db, max_batch=3)
+        ids = [writer.add("analytics", {"i": i}) for i in range(7)]
+        assert len(set(ids)) == 7
+        assert writer.flush() == 7
+        assert db.round_trips == 3
+        assert sorted(d["i"] for d in db.collection_docs("analytics").values()) == list(range(7))
+
+    def test_failed_batch_falls_back_to_single_writes(self):
+        db = FakeFirestore()
+        writer = _writer(db, max_attempts=2)
+        writer.set("sessions/ok", {"a": 1})
+        writer.update("sessions/missing", {"b": 2})
+        writer.flush()
+        assert db.docs["sessions/ok"] == {"a": 1}
+        assert writer.stats()["pending"] == 1
+        writer.flush()
+        stats = writer.stats()
+        assert (stats["pending"], stats["dropped"]) == (0, 1)
+
+    def test_spool_replays_after_crash(self, tmp_path):
+        spool = str(tmp_path / "spool.sqlite3")
+        crashed = _writer(FakeFirestore(), spool_path=spool)
+        crashed.set("sessions/s1", {"live_transcript": transforms.ArrayUnion(["hello"])})
+        crashed.add("sessions/s1/messages", {"message": "hello"})
+        crashed.update("sessions/s1", {"total_messages": transforms.Increment(1)})
+        # process dies before the flush: nothing reached Firestore
+
+        db = FakeFirestore()
+        restarted = _writer(db, spool_path=spool)
+        restarted.set("sessions/s1", {"live_transcript": transforms.ArrayUnion(["again"])})
+        assert restarted.flush() == 4
+        assert restarted.stats()["replayed"] == 3
+        assert db.docs["sessions/s1"]["live_transcript"] == ["hello", "again"]
+        assert db.docs["sessions/s1"]["total_messages"] == 1
+        assert len(db.collection_docs("sessions/s1/messages")) == 1
+
+        again = _writer(FakeFirestore(), spool_path=spool)
+        again.set("sessions/s2", {"a": 1})
+        assert again.stats()["replayed"] == 0
+
+
+@pytest.mark.unit
+def test_conversation_turn_round_trips():
+    def run_turn(enabled):
+        db = FakeFirestore()
+        db.docs["sessions/s1"] = {"total_messages": 0, "transcript_lines": 1}
+        writer = _writer(db, enabled=enabled)
+        store = TranscriptStore(writer, lambda: db)
+        store._next["s1"] = 1   # session started by this process: cursor already known
+        with patch("utils.firebase_client.get_db", return_value=db), \
+             patch("utils.db_logger.get_db", return_value=db), \
+             patch("utils.firebase_client.firestore_writer", writer), \
+             patch("utils.db_logger.firestore_writer", writer), \
+             patch("utils.firebase_client.transcript_store", store), \
+             patch.object(db_logger, "file_logger"):
+            db_logger.log_conversation_turn("919800000001", "Asha", "price of fridge?", "Rs. 700/mo",
+                                            session_id="s1", agent_used="sales")
+            db_logger.update_session("s1", conversation_stage="quote", active_agent="sales")
+            db_logger.log_event("919800000001", "quote_sent", {"items": 1}, session_id="s1")
+            db_logger.log_event("919800000001", "cart_buttons", session_id="s1")
+            writer.flush()
+        return db
+
+    direct, batched = run_turn(enabled=False), run_turn(enabled=True)
+    assert (direct.round_trips, batched.round_trips) == (9, 1)
+
+    for db in (direct, batched):
+        session = db.docs["sessions/s1"]
+        chunk = db.docs["sessions/s1/transcript/00000"]["lines"]
+        assert {n: line.split("] ", 1)[1] for n, line in chunk.items()} == \
+            {"1": "Asha: price of fridge?", "2": "Ku: Rs. 700/mo"}
+        assert (session["total_messages"], session["transcript_lines"]) == (1, 3)
+        assert session["conversation_stage"] == "quote"
+        assert len(db.collection_docs("sessions/s1/messages")) == 2
+        assert len(db.collection_docs("analytics")) == 2
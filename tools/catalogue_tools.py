@@ -10,14 +10,13 @@ from langchain_core.tools import tool
 from typing import Optional
 from data.products import (
     id_to_name,
-    id_to_price,
     category_to_id,
     get_products_by_category,
     get_all_categories,
     get_product_by_id,
     calculate_rent,
-    apply_discount,
     format_price_comparison,
+    pricing,
     TRENDING_PRODUCTS,
 )
 
@@ -32,11 +31,7 @@ def _best_price(product_id: int) -> int:
     """
     Calculate the best display price: 30% flat + 10% additional upfront.
     """
-    prices = id_to_price.get(product_id)
-    if not prices:
-        return 0
-    twelve_month_rate = prices[-1]
-    return apply_discount(twelve_month_rate, upfront=True)
+    return pricing.best_price(product_id)
 
 
 def _format_price(amount: int, is_original: bool = False) -> str:
@@ -302,15 +297,15 @@ def filter_by_budget_tool(max_budget: int, min_budget: int = 0) -> str:
         return "Please provide a valid budget amount in rupees."
     
     results = {}  # category -> list of (product_name, best_price)
+    in_budget = set(pricing.filter_by_budget(min_budget, max_budget))
     
     for cat in get_all_categories():
         products = get_products_by_category(cat)
         for p in products:
-            best = _best_price(p["id"])
-            if min_budget <= best <= max_budget:
+            if p["id"] in in_budget:
                 if cat not in results:
                     results[cat] = []
-                results[cat].append((p["name"], best, p["id"]))
+                results[cat].append((p["name"], _best_price(p["id"]), p["id"]))
     
     if not results:
         return f"No products found in the {_format_price(min_budget)} - {_format_price(max_budget)}/month range. Try increasing your budget range."
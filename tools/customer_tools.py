@@ -11,6 +11,7 @@ from typing import Dict, Any, Optional
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.firebase_client import get_db
+from utils.doc_cache import document_cache
 from utils.phone_utils import normalize_phone
 
 def get_customer_profile(phone: str) -> Optional[Dict[str, Any]]:
@@ -27,12 +28,15 @@ def get_customer_profile(phone: str) -> Optional[Dict[str, Any]]:
         return None
 
     try:
-        # Match by phone number as Document ID
-        doc = db.collection("customers").document(normalized).get()
-        if doc.exists:
-            data = doc.to_dict()
+        # Match by phone number as Document ID (cached per process, see utils/doc_cache.py)
+        def load():
+            doc = db.collection("customers").document(normalized).get()
+            return doc.to_dict() if doc.exists else None
+
+        data = document_cache.get_or_load("customers", normalized, load)
+        if data is not None:
             return {
-                "id": doc.id,
+                "id": normalized,
                 "name": data.get("name"),
                 "email": data.get("email"),
                 "phone": data.get("phone_number") or normalized,
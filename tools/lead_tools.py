@@ -1,14 +1,35 @@
 from langchain_core.tools import tool
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timezone
+from firebase_admin import firestore
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.firebase_client import upsert_lead, get_lead
+from utils.firebase_client import upsert_lead
 from utils.phone_utils import normalize_phone
-from data.products import apply_discount, calculate_rent, id_to_name
+from data.products import id_to_name, pricing
+
+def _canonical_preference(pref: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Reduce a preference to its key so ArrayUnion dedupes it: {product_id, name}
+    for a product (name from the catalogue), else {category}. Qty, budget and
+    notes are dropped; they don't identify a preference.
+    """
+    pid = pref.get("product_id")
+    if pid not in (None, ""):
+        canonical = {"product_id": str(pid).strip()}
+        try:
+            name = id_to_name.get(int(pid))
+        except (TypeError, ValueError):
+            name = None
+        if name:
+            canonical["name"] = name
+        return canonical
+    category = str(pref.get("category") or "").strip().lower()
+    return {"category": category} if category else None
+
 
 @tool
 def sync_lead_data_tool(
@@ -50,21 +71,16 @@ def sync_lead_data_tool(
     if phone: lead_data["phone"] = phone
     if delivery_location: lead_data["delivery_location"] = delivery_location
 
-    # Accumulate product_preferences (merge with existing, don't overwrite)
+    # Accumulate product_preferences server-side: ArrayUnion skips ones already
+    # tracked, keyed by product_id (or category) like the old read-and-merge
     if product_preferences:
-        try:
-            normalized = normalize_phone(phone) if phone else phone
-            existing_lead = get_lead(normalized) if normalized else None
-            existing_prefs = existing_lead.get("product_preferences", []) if existing_lead else []
-            # Merge: add new prefs that aren't already tracked
-            existing_ids = {str(p.get("product_id", p.get("category", ""))) for p in existing_prefs}
-            for pref in product_preferences:
-                pref_key = str(pref.get("product_id", pref.get("category", "")))
-                if pref_key not in existing_ids:
-                    existing_prefs.append(pref)
-            lead_data["product_preferences"] = existing_prefs
-        except Exception:
-            lead_data["product_preferences"] = product_preferences
+        prefs = []
+        for pref in product_preferences:
+            canonical = _canonical_preference(pref)
+            if canonical and canonical not in prefs:
+                prefs.append(canonical)
+        if prefs:
+            lead_data["product_preferences"] = firestore.ArrayUnion(prefs)
 
     if lead_stage: lead_data["lead_stage"] = lead_stage
     if conversation_summary: lead_data["conversation_summary"] = conversation_summary
@@ -86,8 +102,7 @@ def sync_lead_data_tool(
             price = item.get("final_price")
             if not price:
                 try:
-                    orig_rent = calculate_rent(int(pid), duration)
-                    price = apply_discount(orig_rent) # 30% off standard
+                    price = pricing.discounted_rent(int(pid), duration) or 0 # 30% off standard
                 except:
                     price = 0
             
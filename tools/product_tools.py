@@ -15,13 +15,14 @@ from data.products import (
     search_products_by_name,
     calculate_rent,
     get_product_by_id,
-    apply_discount,
     format_price_comparison,
     id_to_name,
+    pricing,
     category_to_id,
     TRENDING_PRODUCTS
 )
 
+from utils.quote_cache import quote_cache
 from config import CART_LINK_BASE_URL, CART_LINK_REFERRAL_CODE, RENTBASKET_JWT
 
 @tool
@@ -45,8 +46,7 @@ def search_products_tool(query: str, category: Optional[str] = None) -> str:
         if cat_key in category_to_id:
             products = get_products_by_category(cat_key)
             for p in products[:8]:  # Limit to 8 items
-                orig_12mo = calculate_rent(p['id'], 12)
-                disc_12mo = apply_discount(orig_12mo) if orig_12mo else 0
+                disc_12mo = pricing.discounted_rent(p['id'], 12) or 0
                 
                 results.append(
                     f"• {p['name']} - Starting from ₹{disc_12mo:,}/mo"
@@ -56,8 +56,7 @@ def search_products_tool(query: str, category: Optional[str] = None) -> str:
     if query:
         name_results = search_products_by_name(query)
         for p in name_results[:8]:
-            orig_12mo = calculate_rent(p['id'], 12)
-            disc_12mo = apply_discount(orig_12mo) if orig_12mo else 0
+            disc_12mo = pricing.discounted_rent(p['id'], 12) or 0
             
             item = f"• {p['name']} - Starting from ₹{disc_12mo:,}/mo"
             
@@ -117,42 +116,40 @@ def create_quote_tool(product_ids: str, duration: int = 12, unit: str = "months"
     if not qty_map:
         return "No valid products found."
 
-    order_lines = []
-    total_original = 0
-    total_discounted = 0
-    total_savings = 0
-    unit_str = "/mo" if unit == "months" else ""
+    key = ("order_confirmation", tuple(sorted(qty_map.items())), duration, unit)
+    return quote_cache.get_or_render(key, pricing.version,
+                                     lambda: _render_order_confirmation(qty_map, duration, unit))
 
-    for pid, qty in qty_map.items():
-        orig_per_unit = calculate_rent(pid, duration, unit)
-        if orig_per_unit is None:
-            continue
-        disc_per_unit = apply_discount(orig_per_unit)
-        name = id_to_name[pid]
 
-        total_savings += (orig_per_unit - disc_per_unit) * qty
-        total_original += orig_per_unit * qty
-        total_discounted += disc_per_unit * qty
+def _render_order_confirmation(qty_map, duration: int, unit: str) -> str:
+    """Order Confirmation text for {product_id: qty} (memoized by create_quote_tool)."""
+    quote = pricing.quote(qty_map, duration, unit)
+    unit_str = "/mo" if unit == "months" else ""
 
+    order_lines = []
+    for line in quote["lines"]:
+        qty = line["qty"]
         qty_label = f"{qty}x" if qty > 1 else "1x"
         order_lines.append(
-            f"• {qty_label} {name} ({duration} {unit})\n"
-            f"  ~₹{orig_per_unit:,}{unit_str}~ *₹{disc_per_unit:,}{unit_str}* + GST"
+            f"• {qty_label} {id_to_name[line['product_id']]} ({duration} {unit})\n"
+            f"  ~₹{line['original_rent']:,}{unit_str}~ *₹{line['monthly_rent']:,}{unit_str}* + GST"
         )
 
     if not order_lines:
         return "No valid products found."
 
     # ── Monthly Rent section ──────────────────────────────
-    gst = int(round(total_discounted * 0.18))
-    net_monthly = total_discounted + gst
+    total_discounted = quote["total_discounted"]
+    total_savings = quote["total_savings"]
+    gst = quote["gst_amount"]
+    net_monthly = quote["grand_total"]
 
     # ── One Time section ──────────────────────────────────
     transport = 400
     transport_disc = -400          # Free delivery promo
     installation = 500
     installation_disc = -500       # Free installation promo
-    security = min(int(round(total_discounted * 2)), 15000)
+    security = quote["security_deposit"]
     net_first_month = security + net_monthly   # transport + installation net to 0
 
     sep = "━━━━━━━━━━━━━━━━━━━━"
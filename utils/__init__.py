@@ -5,6 +5,7 @@ from .logger import (
     log_system_message,
     log_demo_turn,
     get_conversation_history,
+    get_history_page,
     start_new_session,
 )
 
@@ -16,4 +17,5 @@ from .db_logger import (
     update_session,
     log_event,
     get_conversation_history as db_get_conversation_history,
+    get_history_page as db_get_history_page,
 )
@@ -5,6 +5,7 @@ Falls back to file-based logging if Firebase is not configured.
 """
 
 import os
+import re
 import sys
 import json
 from datetime import datetime, timezone, timedelta
@@ -13,12 +14,17 @@ from typing import Optional, List, Dict, Any
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import BOT_NAME
-from utils.firebase_client import get_db, log_session_msg, log_event as firebase_log_event
+from utils.firebase_client import (
+    get_db, log_session_msg, log_event as firebase_log_event, firestore_writer, transcript_store,
+)
 from google.cloud import firestore
 
 # Import file-based logger as fallback
 from utils import logger as file_logger
 
+# Transcript lines are stored as "[dd/mm/yy, hh:mm am] Sender: msg"
+_TRANSCRIPT_LINE = re.compile(r"^\[([^\]]*)\] ")
+
 def is_db_available() -> bool:
     """Check if Firestore is configured and reachable."""
     return get_db() is not None
@@ -54,8 +60,9 @@ def start_new_session(phone_number: str, user_name: str = None) -> Optional[str]
             "conversation_stage": "greeting",
             "active_agent": "orchestrator",
             "is_active": True,
-            "live_transcript": [start_line]
+            "transcript_lines": 1
         })
+        transcript_store.append(session_ref.id, start_line, new_session=True)
         return session_ref.id
     except Exception as e:
         print(f"⚠️  Firebase start_new_session error: {e}")
@@ -142,7 +149,7 @@ def update_session(
             if info_updates:
                 updates["collected_info"] = info_updates
 
-        db.collection("sessions").document(session_id).update(updates)
+        firestore_writer.update(f"sessions/{session_id}", updates)
     except Exception as e:
         print(f"⚠️  Firebase update_session error: {e}")
 
@@ -292,42 +299,92 @@ def log_event(
 # QUERY HELPERS
 # ========================================
 
-def get_conversation_history(phone_number: str) -> Optional[str]:
+def _sessions_newest_first(db, phone_number: str):
+    return db.collection("sessions") \
+             .where("phone_number", "==", phone_number) \
+             .order_by("last_active_at", direction=firestore.Query.DESCENDING)
+
+
+def _as_log_line(line: str) -> str:
+    """Transcript "[ts] Sender: msg" -> file-log "ts - Sender: msg"."""
+    return _TRANSCRIPT_LINE.sub(r"\1 - ", line, count=1)
+
+
+def get_conversation_history(phone_number: str, last_n: Optional[int] = None) -> Optional[str]:
     """
     Get formatted conversation history from Firestore.
+    last_n limits it to the newest N lines (across sessions); None returns the
+    whole latest session.
     """
+    if last_n is not None:
+        entries = get_history_page(phone_number, limit=last_n)["entries"]
+        return "\n".join(entries) if entries else None
+
     db = get_db()
     if not db:
         return file_logger.get_conversation_history(phone_number)
 
     try:
+        # Queued transcript writes first, so the history includes this turn
+        firestore_writer.flush()
+
         # 1. Find the latest session for this phone
-        query = db.collection("sessions") \
-                  .where("phone_number", "==", phone_number) \
-                  .order_by("last_active_at", direction=firestore.Query.DESCENDING) \
-                  .limit(1)
-        
-        sessions = query.get()
+        sessions = _sessions_newest_first(db, phone_number).limit(1).get()
         if not sessions:
             return file_logger.get_conversation_history(phone_number)
             
-        # 2. Get messages from sub-collection
-        session_id = sessions[0].id
-        messages = db.collection("sessions").document(session_id) \
-                     .collection("messages") \
-                     .order_by("timestamp", direction=firestore.Query.ASCENDING) \
-                     .get()
-        
-        if not messages:
+        # 2. Stream the transcript chunks
+        lines = [_as_log_line(line) for line in transcript_store.iter_lines(sessions[0].id)]
+        if not lines:
             return file_logger.get_conversation_history(phone_number)
-
-        lines = []
-        for m_doc in messages:
-            m = m_doc.to_dict()
-            ts = m.get("timestamp")
-            ts_str = ts.strftime("%d/%m/%y, %I:%M %p").lower() if ts else ""
-            lines.append(f"{ts_str} - {m.get('sender_name')}: {m.get('message')}")
         return "\n".join(lines)
     except Exception as e:
         print(f"⚠️  Firebase get_conversation_history error: {e}")
         return file_logger.get_conversation_history(phone_number)
+
+
+def get_history_page(phone_number: str, limit: int = 20, cursor: Any = None) -> Dict[str, Any]:
+    """
+    One page of conversation history, newest first, walking back through sessions.
+    
+    Returns {"entries": [...oldest to newest...], "cursor": ...}; pass the cursor
+    back for the next (older) page, None means there is nothing older. Each page
+    reads only the transcript chunks it needs plus one session query per session
+    boundary it crosses. Without Firestore (or for a file-log cursor) this pages
+    the local log file instead.
+    """
+    db = get_db()
+    if not db or isinstance(cursor, int):
+        return file_logger.get_history_page(phone_number, limit, cursor)
+
+    try:
+        firestore_writer.flush()
+        sessions = _sessions_newest_first(db, phone_number)
+        if cursor:
+            session_id, _, line = cursor.rpartition(":")
+            session = db.collection("sessions").document(session_id).get()
+            before = int(line) if line else None
+        else:
+            latest = sessions.limit(1).get()
+            if not latest:
+                return file_logger.get_history_page(phone_number, limit)
+            session, before = latest[0], None
+
+        entries: List[str] = []
+        while session.exists:
+            if len(entries) >= limit:
+                return {"entries": entries, "cursor": f"{session.id}:{'' if before is None else before}"}
+            legacy = (session.to_dict() or {}).get("live_transcript") or []
+            lines, start = transcript_store.read_page(session.id, limit - len(entries), before, legacy)
+            entries = [_as_log_line(line) for line in lines] + entries
+            if start > 0:
+                before = start
+                continue
+            older = sessions.start_after(session).limit(1).get()
+            if not older:
+                break
+            session, before = older[0], None
+        return {"entries": entries, "cursor": None}
+    except Exception as e:
+        print(f"⚠️  Firebase get_history_page error: {e}")
+        return file_logger.get_history_page(phone_number, limit)
@@ -0,0 +1,306 @@
+"""
+Bounded message dispatcher for the RentBasket WhatsApp Bot.
+
+Replaces the old thread-per-message + per_phone_locks pattern in the webhook
+server. A fixed pool of worker threads drains one FIFO lane per phone number,
+so messages from the same customer are still processed strictly in order while
+the total number of live threads stays flat no matter how much traffic arrives.
+
+Backpressure:
+- `submit()` refuses new work once the global or per-phone backlog is full.
+  The webhook then defers the message back to Meta (non-2xx), which
+  redelivers it later with its own backoff.
+- Work that was already acknowledged to Meta can't be deferred any more;
+  `submit_wait()` waits (bounded) for room instead of refusing.
+- Jobs that waited longer than `max_wait_seconds` are shed instead of run,
+  and `on_shed` is notified so the customer can be told to resend.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, Any, Optional
+
+
+DEFAULT_WORKERS = int(os.getenv("DISPATCHER_WORKERS", "8"))
+DEFAULT_MAX_PENDING = int(os.getenv("DISPATCHER_MAX_PENDING", "1000"))
+DEFAULT_MAX_PER_PHONE = int(os.getenv("DISPATCHER_MAX_PER_PHONE", "20"))
+DEFAULT_MAX_WAIT_SECONDS = float(os.getenv("DISPATCHER_MAX_WAIT_SECONDS", "300"))
+
+_WAIT_SAMPLES = 500  # rolling window for wait-time stats
+
+
+class _Job:
+    __slots__ = ("target", "args", "kwargs", "enqueued_at")
+
+    def __init__(self, target: Callable, args: tuple, kwargs: dict):
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+
+
+class MessageDispatcher:
+    """
+    Fixed-size worker pool with one FIFO queue per phone number.
+
+    Usage:
+        dispatcher = MessageDispatcher(workers=8)
+        if not dispatcher.submit(phone, process_webhook_async, phone, text, ...):
+            # saturated -> defer / reject
+            ...
+        dispatcher.stats()   # queue depth, wait times, counters
+
+    A phone is handed to at most one worker at a time, which is what gives the
+    per-customer ordering guarantee without any per-phone locks. After running
+    one job the worker puts the phone at the back of the ready queue, so a
+    chatty customer cannot starve everyone else.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        max_per_phone: int = DEFAULT_MAX_PER_PHONE,
+        max_wait_seconds: Optional[float] = DEFAULT_MAX_WAIT_SECONDS,
+        on_shed: Optional[Callable[[str], None]] = None,
+        name: str = "dispatcher",
+    ):
+        """
+        Args:
+            workers: Number of worker threads (fixed for the life of the process)
+            max_pending: Global cap on queued (not yet running) jobs
+            max_per_phone: Cap on queued jobs for a single phone
+            max_wait_seconds: Jobs older than this are shed; None disables shedding
+            on_shed: Callback(phone) invoked when a job is shed
+            name: Prefix for worker thread names
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_per_phone = max_per_phone
+        self.max_wait_seconds = max_wait_seconds
+        self.on_shed = on_shed
+        self.name = name
+
+        # When True, submit() runs the job inline on the caller thread.
+        # Used by the test-suite to keep webhook tests deterministic.
+        self.synchronous = False
+
+        self._lanes: Dict[str, deque] = {}   # phone -> deque[_Job]
+        self._ready: deque = deque()          # phones with work and no owner
+        self._busy: set = set()               # phones currently owned by a worker
+        self._pending = 0
+        lock = threading.RLock()
+        self._cond = threading.Condition(lock)    # workers: a phone became ready
+        self._room = threading.Condition(lock)    # submit_wait callers: a queued job was taken
+        self._threads = []
+        self._started = False
+        self._stopping = False
+
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "shed": 0}
+        self._wait_samples: deque = deque(maxlen=_WAIT_SAMPLES)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent; also called lazily by submit)."""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, name=f"{self.name}-{i}", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def shutdown(self, wait: bool = True, timeout: float = 10.0) -> None:
+        """Stop accepting work and let workers exit once their queues drain."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            self._room.notify_all()
+        if wait:
+            deadline = time.monotonic() + timeout
+            for t in self._threads:
+                t.join(max(0.0, deadline - time.monotonic()))
+        with self._cond:
+            self._threads = []
+            self._started = False
+
+    # ------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------
+
+    def submit(self, phone: str, target: Callable, *args, **kwargs) -> bool:
+        """
+        Queue `target(*args, **kwargs)` on the phone's FIFO lane.
+
+        Returns:
+            True if accepted, False if the dispatcher is saturated (caller
+            should defer or reject the message).
+        """
+        if self.synchronous:
+            with self._cond:
+                self._counters["submitted"] += 1
+                self._wait_samples.append(0.0)
+            self._run(_Job(target, args, kwargs))
+            return True
+
+        if not self._started:
+            self.start()
+
+        with self._cond:
+            if self._stopping or not self._has_room(phone):
+                self._counters["rejected"] += 1
+                return False
+            self._enqueue(phone, _Job(target, args, kwargs))
+        return True
+
+    def submit_wait(self, phone: str, timeout: float, target: Callable, *args, **kwargs) -> bool:
+        """
+        Like submit(), but when the backlog is full wait up to `timeout`
+        seconds for room instead of refusing right away. For messages Meta
+        already got a 200 for, which it will not redeliver.
+
+        Returns:
+            True if accepted, False if there was still no room after `timeout`.
+        """
+        if self.synchronous:
+            return self.submit(phone, target, *args, **kwargs)
+
+        if not self._started:
+            self.start()
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._stopping and not self._has_room(phone):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._room.wait(remaining)
+            if self._stopping or not self._has_room(phone):
+                self._counters["rejected"] += 1
+                return False
+            self._enqueue(phone, _Job(target, args, kwargs))
+        return True
+
+    def _has_room(self, phone: str) -> bool:
+        """Caller holds the lock."""
+        lane = self._lanes.get(phone)
+        return self._pending < self.max_pending and (lane is None or len(lane) < self.max_per_phone)
+
+    def _enqueue(self, phone: str, job: _Job) -> None:
+        """Caller holds the lock."""
+        lane = self._lanes.get(phone)
+        if lane is None:
+            lane = self._lanes[phone] = deque()
+        lane.append(job)
+        self._pending += 1
+        self._counters["submitted"] += 1
+
+        if phone not in self._busy and len(lane) == 1:
+            self._ready.append(phone)
+            self._cond.notify()
+
+    def is_saturated(self, phone: Optional[str] = None) -> bool:
+        """True when the global backlog (or, given a phone, that phone's lane) is at capacity."""
+        with self._cond:
+            if phone is not None:
+                return not self._has_room(phone)
+            return self._pending >= self.max_pending
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._ready and not self._stopping:
+                    self._cond.wait()
+                if not self._ready:
+                    return  # stopping and nothing left to do
+                phone = self._ready.popleft()
+                lane = self._lanes[phone]
+                job = lane.popleft()
+                self._pending -= 1
+                self._busy.add(phone)
+                self._room.notify_all()
+
+            waited = time.monotonic() - job.enqueued_at
+            with self._cond:
+                self._wait_samples.append(waited)
+
+            if self.max_wait_seconds is not None and waited > self.max_wait_seconds:
+                self._shed(phone, waited)
+            else:
+                self._run(job)
+
+            with self._cond:
+                self._busy.discard(phone)
+                if lane:
+                    self._ready.append(phone)
+                    self._cond.notify()
+                elif self._lanes.get(phone) is lane:
+                    del self._lanes[phone]
+
+    def _run(self, job: _Job) -> None:
+        try:
+            job.target(*job.args, **job.kwargs)
+            ok = True
+        except Exception as e:
+            ok = False
+            print(f"❌ Dispatcher job {getattr(job.target, '__name__', job.target)} failed: {e}")
+            import traceback
+            traceback.print_exc()
+        with self._cond:
+            self._counters["completed" if ok else "failed"] += 1
+
+    def _shed(self, phone: str, waited: float) -> None:
+        with self._cond:
+            self._counters["shed"] += 1
+        print(f"   ⚠️ Dispatcher shed a job for {phone} after waiting {waited:.1f}s")
+        if self.on_shed:
+            try:
+                self.on_shed(phone)
+            except Exception as e:
+                print(f"   Dispatcher on_shed callback failed for {phone}: {e}")
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def queue_depth(self, phone: Optional[str] = None) -> int:
+        """Queued (not yet running) jobs, globally or for one phone."""
+        with self._cond:
+            if phone is None:
+                return self._pending
+            lane = self._lanes.get(phone)
+            return len(lane) if lane else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool size, backlog, wait times and counters."""
+        with self._cond:
+            waits = sorted(self._wait_samples)
+            deepest = max((len(l) for l in self._lanes.values()), default=0)
+            snapshot = {
+                "workers": self.workers,
+                "alive_workers": sum(1 for t in self._threads if t.is_alive()),
+                "queued": self._pending,
+                "max_pending": self.max_pending,
+                "active_phones": len(self._busy),
+                "waiting_phones": len(self._ready),
+                "deepest_phone_queue": deepest,
+                **self._counters,
+            }
+        n = len(waits)
+        snapshot["wait_ms"] = {
+            "avg": round(sum(waits) / n * 1000, 2) if n else 0.0,
+            "p95": round(waits[min(n - 1, int(n * 0.95))] * 1000, 2) if n else 0.0,
+            "max": round(waits[-1] * 1000, 2) if n else 0.0,
+        }
+        return snapshot
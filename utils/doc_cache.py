@@ -0,0 +1,223 @@
+"""
+Read-through document cache for the RentBasket WhatsApp Bot.
+
+One inbound message used to read the same lead document up to five times
+(lead creation, stage-transition check, sync_lead_data_tool, upsert_lead's
+existence check, is_hot_lead for the cart buttons) and the customer profile
+on every orchestrator pass. This per-process cache keeps `leads` and
+`customers` documents for a short TTL:
+
+- read-through: get_or_load() hits Firestore once per document per TTL,
+  including "document does not exist" answers
+- write-through: merge() applies our own set(merge=True) writes to the
+  cached copy, so a read after an upsert does not go back to Firestore
+- optional cross-instance freshness: listen() attaches a Firestore
+  on_snapshot listener and refreshes cached documents changed elsewhere
+
+Callers always get a deep copy, so mutating a returned dict never changes
+the cache. Hit rate is exposed via stats().
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google.cloud.firestore_v1 import transforms
+
+DEFAULT_TTL_SECONDS = float(os.getenv("DOC_CACHE_TTL_SECONDS", "30"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("DOC_CACHE_SIZE", "10000"))
+
+_MISSING = object()
+
+
+def merge_document(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    set(merge=True) semantics applied locally: nested maps merge, ArrayUnion
+    appends the values not already present, everything else overwrites.
+    """
+    merged = dict(old)
+    for key, value in new.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_document(merged[key], value)
+        elif isinstance(value, transforms.ArrayUnion):
+            current = merged.get(key)
+            current = list(current) if isinstance(current, list) else []
+            merged[key] = current + [v for v in value.values if v not in current]
+        else:
+            merged[key] = value
+    return merged
+
+
+def _has_transform(data: Dict[str, Any]) -> bool:
+    """Server-side transforms other than ArrayUnion (Increment, SERVER_TIMESTAMP...) can't be applied locally."""
+    for value in data.values():
+        if isinstance(value, dict):
+            if _has_transform(value):
+                return True
+        elif isinstance(value, transforms.ArrayUnion):
+            continue
+        elif type(value).__module__.startswith("google.cloud.firestore"):
+            return True
+    return False
+
+
+class DocumentCache:
+    """
+    TTL + LRU cache of Firestore documents keyed by (collection, document ID).
+
+    Usage:
+        cache = DocumentCache()
+        lead = cache.get_or_load("leads", phone, lambda: fetch_lead(phone))
+        cache.merge("leads", phone, data_written)   # after set(merge=True)
+        cache.invalidate("leads", phone)
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            ttl_seconds: How long a read (or our own write) is trusted
+            max_entries: Capacity (least recently used evicted first)
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[dict], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners: Dict[str, Any] = {}
+        self._counters = {"hits": 0, "misses": 0, "write_through": 0, "invalidations": 0,
+                          "remote_updates": 0, "evictions": 0, "expirations": 0}
+
+    def get_or_load(self, collection: str, doc_id: str, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """
+        Cached document (None = does not exist), calling loader() on a miss.
+        Loader exceptions propagate and nothing is cached.
+        """
+        key = (collection, doc_id)
+        cached = self._lookup(key)
+        if cached is not _MISSING:
+            return copy.deepcopy(cached)
+        data = loader()
+        self._store(key, copy.deepcopy(data))
+        return data
+
+    def merge(self, collection: str, doc_id: str, data: Dict[str, Any], created: bool = False) -> None:
+        """
+        Apply a set(merge=True) we just wrote. Only documents already cached are
+        updated (the rest of an uncached document is unknown) unless created=True,
+        meaning data is the whole new document.
+        """
+        key = (collection, doc_id)
+        if _has_transform(data):
+            self.invalidate(collection, doc_id)
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and not created:
+                return
+            current = entry[0] if entry is not None and entry[0] is not None else {}
+            self._entries[key] = (merge_document(current, copy.deepcopy(data)), self._clock())
+            self._entries.move_to_end(key)
+            self._counters["write_through"] += 1
+            self._evict()
+
+    def exists(self, collection: str, doc_id: str) -> Optional[bool]:
+        """What the cache knows without loading: True / False (cached as missing) / None (not cached)."""
+        with self._lock:
+            entry = self._entries.get((collection, doc_id))
+            if entry is None or self._clock() - entry[1] > self.ttl_seconds:
+                return None
+            return entry[0] is not None
+
+    def invalidate(self, collection: str, doc_id: str) -> None:
+        with self._lock:
+            if self._entries.pop((collection, doc_id), None) is not None:
+                self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def listen(self, collection: str, query) -> None:
+        """
+        Keep cached documents of a collection fresh from a Firestore query listener
+        (e.g. leads updated since boot). Only documents already cached are touched.
+        """
+        if collection in self._listeners:
+            return
+
+        def on_snapshot(docs, changes, read_time):
+            for change in changes:
+                doc = change.document
+                with self._lock:
+                    key = (collection, doc.id)
+                    if key not in self._entries:
+                        continue
+                    if change.type.name == "REMOVED":
+                        self._entries.pop(key, None)
+                    else:
+                        self._entries[key] = (doc.to_dict(), self._clock())
+                    self._counters["remote_updates"] += 1
+
+        self._listeners[collection] = query.on_snapshot(on_snapshot)
+
+    def stop_listening(self) -> None:
+        for watch in self._listeners.values():
+            try:
+                watch.unsubscribe()
+            except Exception:
+                pass
+        self._listeners.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "listeners": sorted(self._listeners),
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _lookup(self, key: Tuple[str, str]):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                data, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return data
+                del self._entries[key]
+                self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+            return _MISSING
+
+    def _store(self, key: Tuple[str, str], data: Optional[dict]) -> None:
+        with self._lock:
+            self._entries[key] = (data, self._clock())
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Caller holds the lock."""
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+
+document_cache = DocumentCache()
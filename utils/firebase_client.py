@@ -5,13 +5,30 @@ Designed for coherence and evolvability in a Customer Support context.
 """
 
 import os
+import sys
 import json
+import atexit
+import threading
+from contextlib import contextmanager
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1.field_path import FieldPath
 from datetime import datetime, timezone
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import FIRESTORE_SPOOL_PATH, FIRESTORE_WRITE_BEHIND, FIRESTORE_FLUSH_SECONDS
+from utils.write_behind import WriteBehindQueue, FoldConflict, fold_fields
+from utils.doc_cache import document_cache, merge_document
+from utils.transcript_store import TranscriptStore
+
 _db = None
 
+# Open lead_update_batch() blocks: phone -> {"data": pending fields, "depth": nesting}
+_lead_batches = {}
+_lead_batch_lock = threading.Lock()
+
 def initialize_firebase():
     """Initializes Firebase Admin SDK if not already initialized."""
     global _db
@@ -37,6 +54,34 @@ def initialize_firebase():
 def get_db():
     return initialize_firebase()
 
+
+# Transcript, session-metadata and analytics writes are queued and committed in
+# batches by one background thread (utils/write_behind.py). Lead and customer
+# writes stay synchronous because they are read straight back.
+firestore_writer = WriteBehindQueue(
+    get_db,
+    spool_path=FIRESTORE_SPOOL_PATH,
+    flush_seconds=FIRESTORE_FLUSH_SECONDS,
+    enabled=FIRESTORE_WRITE_BEHIND,
+)
+atexit.register(firestore_writer.shutdown)
+
+# Session transcripts: fixed-size chunk documents under sessions/{id}/transcript
+transcript_store = TranscriptStore(firestore_writer, get_db)
+
+
+def watch_lead_updates() -> bool:
+    """
+    Refresh cached leads written by other instances (Firestore listener on
+    leads updated since now). Returns False when Firebase is not configured.
+    """
+    db = get_db()
+    if not db:
+        return False
+    query = db.collection("leads").where("updated_at", ">", datetime.now(timezone.utc))
+    document_cache.listen("leads", query)
+    return True
+
 # ==========================================
 # FIRESTORE HELPERS
 # ==========================================
@@ -46,6 +91,7 @@ def upsert_customer(phone: str, customer_data: dict):
     db = get_db()
     if not db: return
     db.collection("customers").document(phone).set(customer_data, merge=True)
+    document_cache.merge("customers", phone, customer_data)
 
 def log_session_msg(session_id: str, message_data: dict):
     """Logs a message into a session's sub-collection."""
@@ -53,29 +99,31 @@ def log_session_msg(session_id: str, message_data: dict):
     if not db: return
 
     # Update main session metadata
-    session_ref = db.collection("sessions").document(session_id)
+    session_path = f"sessions/{session_id}"
     ts = datetime.now(timezone.utc)
     sender_label = message_data.get("sender_name", "Unknown")
     msg_text = message_data.get("message", "")
     transcript_line = f"[{ts.strftime('%d/%m/%y, %I:%M %p').lower()}] {sender_label}: {msg_text}"
 
-    session_ref.set({
+    firestore_writer.set(session_path, {
         "last_active_at": ts,
         "phone_number": message_data.get("phone"),
         "user_name": message_data.get("user_name"),
-        "live_transcript": firestore.ArrayUnion([transcript_line])
+        "transcript_lines": firestore.Increment(1)
     }, merge=True)
-    
-    session_ref.collection("messages").add({
+
+    firestore_writer.add(f"{session_path}/messages", {
         **message_data,
         "timestamp": datetime.now(timezone.utc)
     })
 
+    transcript_store.append(session_id, transcript_line)
+
 def log_event(phone: str, event_type: str, event_data: dict = None, session_id: str = None):
     """Logs a business event for analytics."""
     db = get_db()
     if not db: return
-    db.collection("analytics").add({
+    firestore_writer.add("analytics", {
         "phone": phone,
         "session_id": session_id,
         "event_type": event_type,
@@ -101,39 +149,126 @@ def upsert_lead(phone: str, lead_data: dict):
     - extracted_name: string (Name mentioned in chat)
     - phone: string
     - delivery_location: {address, city, pincode}
-    - product_preferences: [{category, product_id}]
+    - product_preferences: [{product_id, name} | {category}]
     - final_cart: [{product_id, quantity, duration, final_price}]
     - lead_stage: new | qualified | cart_created | reserved | converted
     - updated_at: timestamp
+
+    One round trip: a precondition update for existing leads, a create (with
+    created_at and the default lead_stage) only when that update finds no
+    document, or straight away when the cache says it is missing. A create
+    that finds the lead already there falls back to the update. lead_data may hold server-side transforms such as
+    firestore.ArrayUnion. Inside lead_update_batch(phone) the write is
+    deferred and merged with the turn's other updates.
     """
     db = get_db()
     if not db:
         print(f"CRITICAL: Firebase not initialized -- lead {phone} NOT saved!")
         return
 
-    try:
-        data_to_save = {
-            **lead_data,
-            "updated_at": datetime.now(timezone.utc)
-        }
+    with _lead_batch_lock:
+        pending = _lead_batches.get(phone)
+        if pending is not None:
+            try:
+                pending["data"] = fold_fields(pending["data"], lead_data, deep=True)
+                return
+            except FoldConflict:
+                data, pending["data"] = pending["data"], dict(lead_data)
+        else:
+            data = lead_data
+    if pending is not None:
+        _write_lead(db, phone, data)    # fields that can't fold: write the earlier ones first
+        return
+    _write_lead(db, phone, lead_data)
+
 
+def _write_lead(db, phone: str, lead_data: dict) -> None:
+    try:
+        now = datetime.now(timezone.utc)
+        data_to_save = {**lead_data, "updated_at": now}
+        created_fields = {"created_at": now, "lead_stage": lead_data.get("lead_stage", "new")}
         doc_ref = db.collection("leads").document(phone)
-        doc = doc_ref.get()
-        if not doc.exists:
-            data_to_save["created_at"] = datetime.now(timezone.utc)
-            data_to_save["lead_stage"] = lead_data.get("lead_stage", "new")
 
-        doc_ref.set(data_to_save, merge=True)
+        def create() -> bool:
+            try:
+                doc_ref.create({**data_to_save, **created_fields})
+                return True
+            except AlreadyExists:   # created by another instance in between
+                doc_ref.update(_field_paths(data_to_save))
+                return False
+
+        if document_cache.exists("leads", phone) is False:
+            # the cached "missing" may be up to a TTL old: never overwrite created_at / lead_stage
+            is_new = create()
+        else:
+            try:
+                doc_ref.update(_field_paths(data_to_save))
+                is_new = False
+            except NotFound:
+                is_new = create()
+
+        if is_new:
+            data_to_save.update(created_fields)
+        document_cache.merge("leads", phone, data_to_save, created=is_new)
     except Exception as e:
         print(f"CRITICAL: Failed to write lead {phone} to Firestore: {e}")
         import traceback; traceback.print_exc()
 
+
+def _field_paths(data: dict, prefix: tuple = ()) -> dict:
+    """Flatten nested maps into field paths so update() merges them like set(merge=True)."""
+    flat = {}
+    for key, value in data.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and value:
+            flat.update(_field_paths(value, path))
+        else:
+            flat[FieldPath(*path).to_api_repr()] = value
+    return flat
+
+
+@contextmanager
+def lead_update_batch(phone: str):
+    """
+    Coalesce every upsert_lead(phone, ...) made inside the block (from any
+    thread; the dispatcher runs one job per phone at a time) into a single
+    write when the outermost block exits. get_lead sees the pending fields.
+    """
+    with _lead_batch_lock:
+        pending = _lead_batches.setdefault(phone, {"data": {}, "depth": 0})
+        pending["depth"] += 1
+    try:
+        yield
+    finally:
+        with _lead_batch_lock:
+            pending["depth"] -= 1
+            done = pending["depth"] == 0
+            if done:
+                _lead_batches.pop(phone, None)
+        if done and pending["data"]:
+            db = get_db()
+            if db:
+                _write_lead(db, phone, pending["data"])
+
+
+def _load_lead(db, phone: str):
+    """Lead document through the per-process cache (utils/doc_cache.py)."""
+    def load():
+        doc = db.collection("leads").document(phone).get()
+        return doc.to_dict() if doc.exists else None
+    lead = document_cache.get_or_load("leads", phone, load)
+    with _lead_batch_lock:
+        pending = _lead_batches.get(phone)
+        if pending and pending["data"]:
+            lead = merge_document(lead or {}, pending["data"])
+    return lead
+
+
 def get_lead(phone: str):
     """Retrieve lead data from Firestore."""
     db = get_db()
     if not db: return None
-    doc = db.collection("leads").document(phone).get()
-    return doc.to_dict() if doc.exists else None
+    return _load_lead(db, phone)
 
 
 def is_hot_lead(phone: str) -> bool:
@@ -149,10 +284,9 @@ def is_hot_lead(phone: str) -> bool:
     if not db:
         return False
     try:
-        doc = db.collection("leads").document(phone).get()
-        if not doc.exists:
+        data = _load_lead(db, phone)
+        if not data:
             return False
-        data = doc.to_dict()
         stage = data.get("lead_stage", "new")
         if stage not in ("cart_created", "qualified", "browsing"):
             return False
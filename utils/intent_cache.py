@@ -0,0 +1,225 @@
+"""
+Intent cache for the RentBasket WhatsApp Bot orchestrator.
+
+classify_intent() sends every non-sticky message to gpt-4o-mini, although
+customers keep sending the same phrasings ("price of fridge", "my AC is not
+working"). This cache remembers the classifier's answer keyed on the
+normalized message text plus the routing-relevant state (customer status,
+active agent, conversation stage). Short replies ("yes", "2") depend on
+the conversation rather than the text and are left to the classifier
+(is_short_reply):
+
+- exact tier: normalized text -> intent, LRU with TTL (deterministic)
+- optional embedding tier: cosine similarity against recent entries with the
+  same routing state, for near-duplicate phrasings
+
+Hit rate and the classifier latency saved are exposed via stats().
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("INTENT_CACHE_SIZE", "5000"))
+DEFAULT_TTL_SECONDS = float(os.getenv("INTENT_CACHE_TTL_SECONDS", str(24 * 3600)))
+DEFAULT_SIMILARITY = float(os.getenv("INTENT_CACHE_SIMILARITY", "0.92"))
+MIN_CACHEABLE_WORDS = int(os.getenv("INTENT_CACHE_MIN_WORDS", "3"))
+MAX_VECTORS_PER_CONTEXT = 500
+
+_PUNCT_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, drop punctuation, collapse whitespace: 'Price of  fridge?' -> 'price of fridge'."""
+    text = _PUNCT_RE.sub(" ", (text or "").lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def is_short_reply(text: str, min_words: int = MIN_CACHEABLE_WORDS) -> bool:
+    """
+    'yes', 'ok', '2', 'no thanks': replies that mean whatever Ku just asked.
+    Their intent depends on the conversation, not on the text, so they are
+    not cached.
+    """
+    return len(normalize_message(text).split()) < min_words
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+class IntentCache:
+    """
+    LRU + TTL cache of classifier decisions.
+
+    Usage:
+        cache = IntentCache()
+        context = (status, active_agent, stage)
+        intent = cache.get(message, context)
+        if intent is None:
+            intent = call_llm(...)
+            cache.put(message, context, intent, latency_ms)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        embedder: Optional[Callable[[str], List[float]]] = None,
+        similarity_threshold: float = DEFAULT_SIMILARITY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_entries: Exact-tier capacity (least recently used evicted first)
+            ttl_seconds: Entry lifetime, so prompt / routing changes age out
+            embedder: Optional callable(text) -> vector enabling the similarity tier
+            similarity_threshold: Minimum cosine similarity for a near-duplicate hit
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self._clock = clock
+
+        self._entries: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()  # key -> (intent, stored_at)
+        self._vectors: Dict[Tuple, deque] = {}  # context -> deque[(vector, intent, stored_at)]
+        self._lock = threading.Lock()
+        self._miss_latency_ms = deque(maxlen=200)
+        self._counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0,
+                          "expirations": 0, "embedding_errors": 0}
+        self._saved_ms = 0.0
+        self._last_embedding: Optional[Tuple[str, List[float]]] = None
+
+    @staticmethod
+    def _key(normalized: str, context: Tuple) -> Tuple:
+        return (normalized,) + tuple(context)
+
+    def get(self, message: str, context: Tuple) -> Optional[str]:
+        """Return the cached intent for (message, context), or None on a miss."""
+        normalized = normalize_message(message)
+        if not normalized:
+            return None
+        key = self._key(normalized, context)
+        now = self._clock()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                intent, stored_at = hit
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._record_hit("hits")
+                    return intent
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+        intent = self._similar(normalized, tuple(context), now)
+        with self._lock:
+            if intent is not None:
+                self._record_hit("semantic_hits")
+            else:
+                self._counters["misses"] += 1
+        return intent
+
+    def put(self, message: str, context: Tuple, intent: str, latency_ms: Optional[float] = None) -> None:
+        """Store a classifier decision; latency_ms is the LLM call it took (for saved-time stats)."""
+        normalized = normalize_message(message)
+        if not normalized:
+            return
+        key = self._key(normalized, context)
+        now = self._clock()
+        with self._lock:
+            self._entries[key] = (intent, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+            if latency_ms is not None:
+                self._miss_latency_ms.append(latency_ms)
+
+        if self.embedder is not None:
+            vector = self._embed(normalized)
+            if vector is not None:
+                with self._lock:
+                    bucket = self._vectors.setdefault(tuple(context), deque(maxlen=MAX_VECTORS_PER_CONTEXT))
+                    bucket.append((vector, intent, now))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._counters["hits"] + self._counters["semantic_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "embedding_tier": self.embedder is not None,
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "avg_classifier_ms": round(self._avg_miss_ms(), 1),
+                "saved_ms": round(self._saved_ms, 1),
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _avg_miss_ms(self) -> float:
+        samples = self._miss_latency_ms
+        return sum(samples) / len(samples) if samples else 0.0
+
+    def _record_hit(self, counter: str) -> None:
+        """Caller holds the lock."""
+        self._counters[counter] += 1
+        self._saved_ms += self._avg_miss_ms()
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        # A miss embeds the message in get() and again in put(): reuse the last vector
+        memo = self._last_embedding
+        if memo is not None and memo[0] == text:
+            return memo[1]
+        try:
+            vector = list(self.embedder(text))
+            self._last_embedding = (text, vector)
+            return vector
+        except Exception as e:
+            with self._lock:
+                self._counters["embedding_errors"] += 1
+            print(f"  ⚠️ Intent cache embedding failed: {e}")
+            return None
+
+    def _similar(self, normalized: str, context: Tuple, now: float) -> Optional[str]:
+        if self.embedder is None:
+            return None
+        with self._lock:
+            bucket = list(self._vectors.get(context, ()))
+        candidates = [(v, i) for v, i, stored_at in bucket if now - stored_at <= self.ttl_seconds]
+        if not candidates:
+            return None
+        vector = self._embed(normalized)
+        if vector is None:
+            return None
+        best_score, best_intent = 0.0, None
+        for candidate, intent in candidates:
+            score = _cosine(vector, candidate)
+            if score > best_score:
+                best_score, best_intent = score, intent
+        return best_intent if best_score >= self.similarity_threshold else None
+
+
+def openai_embedder() -> Callable[[str], List[float]]:
+    """Embedding function for the similarity tier (same model as the RAG store)."""
+    from rag.embedding_cache import cached_openai_embeddings
+
+    return cached_openai_embeddings().embed_query
@@ -0,0 +1,235 @@
+"""
+Local intent classifier for the RentBasket WhatsApp Bot.
+
+A small linear model over TF-IDF weighted character n-grams and word
+unigrams, answering in well under a millisecond. classify_intent() asks it
+first and only falls back to the gpt-4o-mini classifier when the model's
+confidence is below a threshold. It is opt-in (INTENT_MODEL_ENABLED) and is
+not asked about short replies or answers to a question Ku just asked.
+
+Pure Python (no numpy / scikit-learn at runtime): the feature space is tiny
+and sparse, so dict lookups beat array setup for single-message prediction.
+
+Train / retrain with scripts/train_intent_classifier.py; the artifact is a
+versioned JSON file loaded once at startup.
+"""
+
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from utils.intent_cache import normalize_message
+
+FORMAT_VERSION = 1
+CHAR_NGRAMS = (3, 4)
+
+
+def extract_features(text: str) -> Counter:
+    """Character 3-4 grams (per word, boundary-padded) plus word unigrams."""
+    normalized = normalize_message(text)
+    features: Counter = Counter()
+    for word in normalized.split():
+        features["w:" + word] += 1
+        padded = f"<{word}>"
+        for n in CHAR_NGRAMS:
+            for i in range(len(padded) - n + 1):
+                features[padded[i:i + n]] += 1
+    if not features and text.strip():
+        features["raw:" + text.strip()[:8]] += 1  # emoji-only / symbol-only messages
+    return features
+
+
+class IntentModel:
+    """
+    Multinomial logistic regression over sparse TF-IDF features.
+
+    Usage:
+        model = IntentModel.load("data/models/intent_classifier_v1.json")
+        intent, confidence = model.predict("my AC is not working")
+    """
+
+    def __init__(self, labels: List[str], idf: Dict[str, float],
+                 weights: Dict[str, Dict[str, float]], bias: Dict[str, float],
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.labels = labels
+        self.idf = idf
+        self.weights = weights      # feature -> {label: weight}
+        self.bias = bias
+        self.metadata = metadata or {}
+
+    @property
+    def version(self) -> str:
+        return str(self.metadata.get("model_version", "unversioned"))
+
+    def _vectorize(self, text: str) -> Dict[str, float]:
+        vec = {}
+        for feature, count in extract_features(text).items():
+            idf = self.idf.get(feature)
+            if idf is not None:
+                vec[feature] = (1 + math.log(count)) * idf
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        if norm:
+            for feature in vec:
+                vec[feature] /= norm
+        return vec
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        scores = dict(self.bias)
+        for feature, value in self._vectorize(text).items():
+            for label, weight in self.weights.get(feature, {}).items():
+                scores[label] += weight * value
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: e / total for label, e in exp.items()}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return (intent, confidence)."""
+        proba = self.predict_proba(text)
+        label = max(proba, key=proba.get)
+        return label, proba[label]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        payload = {
+            "format_version": FORMAT_VERSION,
+            "metadata": self.metadata,
+            "labels": self.labels,
+            "bias": self.bias,
+            "idf": self.idf,
+            "weights": self.weights,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentModel":
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported intent model format: {payload.get('format_version')}")
+        return cls(payload["labels"], payload["idf"], payload["weights"], payload["bias"], payload.get("metadata"))
+
+
+def train(
+    examples: Iterable[Tuple[str, str]],
+    epochs: int = 60,
+    learning_rate: float = 0.5,
+    l2: float = 1e-4,
+    min_df: int = 1,
+    seed: int = 13,
+    prune_below: float = 5e-3,
+) -> IntentModel:
+    """
+    Fit the model with plain SGD on softmax cross-entropy.
+
+    Args:
+        examples: (text, intent) pairs
+        epochs: Passes over the data
+        learning_rate: Initial SGD step (decays linearly)
+        l2: L2 regularisation strength
+        min_df: Drop features seen in fewer documents
+        seed: Shuffle seed (training is deterministic for a given dataset)
+        prune_below: Drop weights smaller than this from the artifact
+    """
+    data = [(text, label) for text, label in examples if text and label]
+    if not data:
+        raise ValueError("No training examples")
+    labels = sorted({label for _, label in data})
+
+    doc_freq: Counter = Counter()
+    for text, _ in data:
+        doc_freq.update(set(extract_features(text)))
+    n_docs = len(data)
+    idf = {f: math.log((1 + n_docs) / (1 + df)) + 1 for f, df in doc_freq.items() if df >= min_df}
+
+    model = IntentModel(labels, idf, {}, {label: 0.0 for label in labels})
+    vectors = [(model._vectorize(text), label) for text, label in data]
+
+    rng = random.Random(seed)
+    weights: Dict[str, Dict[str, float]] = {}
+    bias = model.bias
+    total_steps = epochs * len(vectors)
+    step = 0
+    for _ in range(epochs):
+        rng.shuffle(vectors)
+        for vec, gold in vectors:
+            lr = learning_rate * (1 - step / total_steps) + 1e-3
+            step += 1
+            scores = dict(bias)
+            for feature, value in vec.items():
+                for label, weight in weights.get(feature, {}).items():
+                    scores[label] += weight * value
+            top = max(scores.values())
+            exp = {label: math.exp(s - top) for label, s in scores.items()}
+            total = sum(exp.values())
+            for label in labels:
+                grad = exp[label] / total - (1.0 if label == gold else 0.0)
+                bias[label] -= lr * grad
+                if abs(grad) < 1e-6:
+                    continue
+                for feature, value in vec.items():
+                    row = weights.setdefault(feature, {})
+                    w = row.get(label, 0.0)
+                    row[label] = w - lr * (grad * value + l2 * w)
+
+    pruned = {}
+    for feature, row in weights.items():
+        kept = {label: round(w, 5) for label, w in row.items() if abs(w) >= prune_below}
+        if kept:
+            pruned[feature] = kept
+    model.weights = pruned
+    model.idf = {f: round(v, 5) for f, v in idf.items()}  # all of them: keeps the L2 norm as trained
+    model.bias = {label: round(b, 5) for label, b in bias.items()}
+    model.metadata = {
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "examples": len(data),
+        "label_counts": dict(Counter(label for _, label in data)),
+        "features": len(pruned),
+    }
+    return model
+
+
+def evaluate(model: IntentModel, examples: Iterable[Tuple[str, str]], threshold: float = 0.0) -> Dict[str, Any]:
+    """Accuracy, coverage above threshold, and per-message latency."""
+    total = correct = confident = confident_correct = 0
+    latencies = []
+    for text, gold in examples:
+        started = time.perf_counter()
+        label, confidence = model.predict(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+        total += 1
+        correct += label == gold
+        if confidence >= threshold:
+            confident += 1
+            confident_correct += label == gold
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "examples": total,
+        "accuracy": round(correct / total, 4) if total else 0.0,
+        "coverage": round(confident / total, 4) if total else 0.0,
+        "confident_accuracy": round(confident_correct / confident, 4) if confident else 0.0,
+        "p50_ms": round(latencies[n // 2], 4) if n else 0.0,
+        "p99_ms": round(latencies[min(n - 1, int(n * 0.99))], 4) if n else 0.0,
+    }
+
+
+def load_jsonl(path: str) -> List[Tuple[str, str]]:
+    """Read {"text": ..., "intent": ...} lines."""
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                pairs.append((row["text"], row["intent"]))
+    return pairs
@@ -0,0 +1,350 @@
+"""
+Segmented conversation log for the RentBasket WhatsApp Bot.
+
+The file logger used to open, append to and close logs/<phone>.txt for every
+line, and the /logs endpoints listed, read or zipped every file inside the
+request. Entries now go through one buffered writer thread into a few large
+append-only files:
+
+    logs/segments/seg-000001.log.gz     # gzip members, one per flush
+    logs/segments/index.sqlite3         # which member holds which phone's entries
+
+- append() only queues the entry; the writer thread flushes the queue every
+  flush_seconds (or when max_buffer entries wait) as ONE gzip member appended
+  to the active segment, then records it in the index in one transaction
+- segments rotate at max_segment_bytes; older segments are never rewritten
+- the index has one row per (phone, member) with the phone's entry numbers,
+  byte count and first/last timestamp, so reading a phone's log (or a time
+  range of it) decompresses only the members that hold its entries
+
+Entries are stored as JSON lines [phone, unix_ts, entry] inside the member.
+Counters are exposed via stats().
+"""
+
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_MAX_SEGMENT_BYTES = int(os.getenv("LOG_SEGMENT_MAX_BYTES", str(8 * 1024 * 1024)))
+DEFAULT_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", "1.0"))
+DEFAULT_MAX_BUFFER = 1000
+
+_SEGMENT_NAME = re.compile(r"^seg-(\d{6})\.log\.gz$")
+
+
+class _Index:
+    """SQLite sidecar: members(phone, first_n, count, segment, offset, length, bytes, first_ts, last_ts)."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS members ("
+            " phone TEXT NOT NULL, first_n INTEGER NOT NULL, count INTEGER NOT NULL,"
+            " segment INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL,"
+            " bytes INTEGER NOT NULL, first_ts REAL NOT NULL, last_ts REAL NOT NULL,"
+            " PRIMARY KEY (phone, first_n)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS members_by_time ON members (last_ts)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def insert(self, rows: List[Tuple]) -> None:
+        with self._lock:
+            self._conn.executemany("INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SegmentLog:
+    """
+    Buffered, rotating, compressed append-only log keyed by phone.
+
+    Usage:
+        log = SegmentLog("logs/segments")
+        log.append("919800000001", "21/01/26, 02:02 pm - Asha (919800000001): hi\\n")
+        for entry in log.iter_entries("919800000001"):
+            ...
+        log.shutdown()        # final flush (also registered at exit)
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        max_buffer: int = DEFAULT_MAX_BUFFER,
+        name: str = "log-writer",
+    ):
+        """
+        Args:
+            directory: Where segments and the index live (created on the first flush)
+            max_segment_bytes: Rotate to a new segment once the active one reaches this size
+            flush_seconds: Longest an entry waits in the buffer
+            max_buffer: Buffered entries that wake the writer early
+            name: Writer thread name
+        """
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.name = name
+
+        # When False, appends never start the writer thread (tests call flush()).
+        self.autostart = True
+
+        self._buffer: Deque[Tuple[str, float, str]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._index: Optional[_Index] = None
+        self._segment: Optional[int] = None
+        self._next_n: Dict[str, int] = {}
+        self._thread = None
+        self._stopping = False
+        self._counters = {"appended": 0, "flushes": 0, "members": 0, "rotations": 0,
+                          "raw_bytes": 0, "compressed_bytes": 0}
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, phone: str, entry: str, ts: Optional[float] = None) -> None:
+        """Queue one log entry (a formatted line, newline included)."""
+        if self.autostart and not self.running:
+            self.start()
+        with self._lock:
+            self._buffer.append((phone, time.time() if ts is None else ts, entry))
+            self._counters["appended"] += 1
+            if len(self._buffer) >= self.max_buffer:
+                self._wake.set()
+
+    def flush(self) -> int:
+        """Write everything buffered as one gzip member. Returns the number of entries written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+            if not batch:
+                return 0
+            index = self._open()
+
+            rows: Dict[str, list] = {}   # phone -> [first_n, count, bytes, first_ts, last_ts]
+            lines = []
+            for phone, ts, entry in batch:
+                if phone not in self._next_n:
+                    self._next_n[phone] = self._count_flushed(index, phone)
+                row = rows.get(phone)
+                if row is None:
+                    row = rows[phone] = [self._next_n[phone], 0, 0, ts, ts]
+                row[1] += 1
+                row[2] += len(entry.encode("utf-8"))
+                row[4] = ts
+                self._next_n[phone] += 1
+                lines.append(json.dumps([phone, ts, entry], ensure_ascii=False))
+
+            raw = ("\n".join(lines) + "\n").encode("utf-8")
+            member = gzip.compress(raw)
+            try:
+                with open(self._segment_path(self._segment), "ab") as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(member)
+                index.insert([(phone, first_n, count, self._segment, offset, len(member), size, first_ts, last_ts)
+                              for phone, (first_n, count, size, first_ts, last_ts) in rows.items()])
+            except Exception:
+                # Keep the entries for the next flush; a member written but not
+                # indexed is never read, so writing it again is harmless
+                for phone in rows:
+                    self._next_n.pop(phone, None)
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch))
+                raise
+            if offset + len(member) >= self.max_segment_bytes:
+                self._segment += 1
+                self._counters["rotations"] += 1
+
+            with self._lock:
+                self._counters["flushes"] += 1
+                self._counters["members"] += 1
+                self._counters["raw_bytes"] += len(raw)
+                self._counters["compressed_bytes"] += len(member)
+            return len(batch)
+
+    def start(self) -> None:
+        """Start the writer thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop the writer thread after a final flush."""
+        with self._lock:
+            thread = self._thread
+            self._stopping = True
+            self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Log writer final flush failed: {e}")
+        with self._lock:
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def count(self, phone: str) -> int:
+        """Entries logged for a phone, including ones still buffered."""
+        with self._lock:
+            pending = sum(1 for p, _, _ in self._buffer if p == phone)
+        index = self._open(create=False)
+        if index is None:
+            return pending
+        with self._flush_lock:
+            flushed = self._next_n.get(phone)
+            if flushed is None:
+                flushed = self._count_flushed(index, phone)
+        return flushed + pending
+
+    def phones(self, prefix: str = "") -> List[Dict[str, Any]]:
+        """One row per phone (optionally only those starting with prefix): entries, uncompressed bytes, first/last entry time."""
+        self.flush()
+        index = self._open(create=False)
+        if index is None:
+            return []
+        rows = index.query(
+            "SELECT phone, SUM(count), SUM(bytes), MIN(first_ts), MAX(last_ts) FROM members"
+            " WHERE substr(phone, 1, ?) = ? GROUP BY phone ORDER BY phone",
+            (len(prefix), prefix),
+        )
+        return [{"phone": phone, "entries": entries, "bytes": size, "first_ts": first_ts, "last_ts": last_ts}
+                for phone, entries, size, first_ts, last_ts in rows]
+
+    def read_page(self, phone: str, limit: int, before: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Entries [before - limit, before) of a phone and the number of the first one
+        (before=None ends at the newest entry). Decompresses only the members that
+        hold those entries, newest first.
+        """
+        self.flush()
+        index = self._open(create=False)
+        if index is None:
+            return [], 0
+        total = self.count(phone)
+        end = total if before is None else max(0, min(before, total))
+        start = max(0, end - max(0, limit))
+        if start == end:
+            return [], start
+
+        rows = index.query(
+            "SELECT first_n, count, segment, offset, length FROM members"
+            " WHERE phone = ? AND first_n < ? AND first_n + count > ? ORDER BY first_n",
+            (phone, end, start),
+        )
+        entries = []
+        for first_n, _, segment, offset, length in rows:
+            for n, (_, entry) in enumerate(self._read_member(phone, segment, offset, length), first_n):
+                if start <= n < end:
+                    entries.append(entry)
+        return entries, start
+
+    def iter_entries(self, phone: str, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[str]:
+        """Stream a phone's entries oldest first, optionally limited to [since, until) unix time."""
+        self.flush()
+        index = self._open(create=False)
+        if index is None:
+            return
+        rows = index.query(
+            "SELECT segment, offset, length FROM members WHERE phone = ? AND last_ts >= ? AND first_ts < ?"
+            " ORDER BY first_n",
+            (phone, float("-inf") if since is None else since, float("inf") if until is None else until),
+        )
+        for segment, offset, length in rows:
+            for ts, entry in self._read_member(phone, segment, offset, length):
+                if (since is None or ts >= since) and (until is None or ts < until):
+                    yield entry
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            raw, compressed = self._counters["raw_bytes"], self._counters["compressed_bytes"]
+            return {
+                "buffered": len(self._buffer),
+                "segment": self._segment,
+                **self._counters,
+                "compression_ratio": round(raw / compressed, 2) if compressed else 0.0,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _open(self, create: bool = True) -> Optional[_Index]:
+        """Index (and active segment number), created on first use only when create=True."""
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            index_path = os.path.join(self.directory, "index.sqlite3")
+            if not create and not os.path.exists(index_path):
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            self._index = _Index(index_path)
+            segments = [int(m.group(1)) for m in map(_SEGMENT_NAME.match, os.listdir(self.directory)) if m]
+            self._segment = max(segments, default=1)
+            if os.path.exists(self._segment_path(self._segment)) and \
+                    os.path.getsize(self._segment_path(self._segment)) >= self.max_segment_bytes:
+                self._segment += 1
+            return self._index
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"seg-{segment:06d}.log.gz")
+
+    @staticmethod
+    def _count_flushed(index: _Index, phone: str) -> int:
+        (count,) = index.query("SELECT COALESCE(MAX(first_n + count), 0) FROM members WHERE phone = ?", (phone,))[0]
+        return count
+
+    def _read_member(self, phone: str, segment: int, offset: int, length: int) -> Iterator[Tuple[float, str]]:
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            raw = gzip.decompress(f.read(length))
+        for line in raw.split(b"\n"):
+            if not line:
+                continue
+            entry_phone, ts, entry = json.loads(line)
+            if entry_phone == phone:
+                yield ts, entry
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Log writer flush error: {e}")
+            with self._lock:
+                if self._stopping:
+                    return
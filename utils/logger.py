@@ -1,14 +1,35 @@
 # Conversation Logger for RentBasket WhatsApp Bot
-# Logs conversations in WhatsApp-like format to .txt files
+# Logs conversations in WhatsApp-like format, to compressed segment files
+# (LOG_FORMAT=segments, see utils/log_segments.py) or per-phone .txt files
 
+import atexit
+import mmap
 import os
+import re
+import struct
+import threading
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import LOGS_DIRECTORY, BOT_NAME
+from config import LOGS_DIRECTORY, LOG_FORMAT, LOG_SEGMENTS_DIRECTORY, BOT_NAME
+from utils.log_segments import SegmentLog
+
+# One buffered writer thread for every conversation's log lines
+segment_log = SegmentLog(LOG_SEGMENTS_DIRECTORY)
+atexit.register(segment_log.shutdown)
+
+# Sidecar index: logs/<phone>.idx holds the byte offset of every entry in
+# logs/<phone>.txt as a little-endian uint64, so entry i is at idx[8*i] and
+# the newest entries can be found without reading the log itself.
+_OFFSET = struct.Struct("<Q")
+_write_lock = threading.Lock()
+
+# Entry starts when rebuilding an index for a log written without one:
+# timestamped lines, and session separators together with the line after them
+_ENTRY_START = re.compile(rb"^(?:\n-{50}\n)?\d\d/\d\d/\d\d, \d\d:\d\d [ap]m - ", re.MULTILINE)
 
 
 def ensure_logs_directory():
@@ -23,8 +44,7 @@ def get_log_file_path(phone_number: str) -> str:
     Standardizes on the 91 prefix for Indian numbers.
     """
     ensure_logs_directory()
-    # Clean the phone number (remove spaces, symbols)
-    clean = phone_number.replace(" ", "").replace("-", "").replace("+", "")
+    clean = log_key(phone_number)
     
     # # Standardize Indian numbers: if 10 digits, add 91. If 12 digits starting with 91, keep it.
     # if len(clean) == 10:
@@ -35,6 +55,57 @@ def get_log_file_path(phone_number: str) -> str:
     return os.path.join(LOGS_DIRECTORY, f"{clean}.txt")
 
 
+def log_key(phone_number: str) -> str:
+    """Phone number as logs are keyed (spaces and symbols removed)."""
+    return phone_number.replace(" ", "").replace("-", "").replace("+", "")
+
+
+def get_log_location(phone_number: str) -> str:
+    """Where a phone's log is written, for display."""
+    if LOG_FORMAT == "segments":
+        return f"{LOG_SEGMENTS_DIRECTORY} ({log_key(phone_number)})"
+    return get_log_file_path(phone_number)
+
+
+def _segment_count(phone_number: str) -> int:
+    """Entries in the segment log (0 when logging to .txt files)."""
+    return segment_log.count(log_key(phone_number)) if LOG_FORMAT == "segments" else 0
+
+
+def _legacy_count(phone_number: str) -> int:
+    """
+    Entries in the phone's .txt log. With LOG_FORMAT=segments that file is the
+    history from before the switch: it is read first, the segments after it.
+    """
+    if not os.path.exists(get_log_file_path(phone_number)):
+        return 0
+    with _write_lock:
+        return _ensure_index(phone_number)
+
+
+def get_index_file_path(phone_number: str) -> str:
+    """Path of the byte-offset index that sits next to the log file."""
+    return os.path.splitext(get_log_file_path(phone_number))[0] + ".idx"
+
+
+def _append_entry(phone_number: str, entry: str, truncate: bool = False) -> None:
+    """Append one entry to the log and its offset to the index."""
+    if LOG_FORMAT == "segments":
+        segment_log.append(log_key(phone_number), entry)
+        return
+    log_path = get_log_file_path(phone_number)
+    index_path = get_index_file_path(phone_number)
+    with _write_lock:
+        with open(log_path, "wb" if truncate else "ab") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(entry.encode("utf-8"))
+        # A log that predates the index gets one built on its first read instead
+        if offset == 0 or os.path.exists(index_path):
+            with open(index_path, "wb" if offset == 0 else "ab") as ix:
+                ix.write(_OFFSET.pack(offset))
+
+
 def format_timestamp() -> str:
     """Get current timestamp in WhatsApp format: DD/MM/YY, HH:MM am/pm"""
     now = datetime.now()
@@ -53,7 +124,6 @@ def log_message(
     """
     Log a single message to the conversation file.
     """
-    log_path = get_log_file_path(phone_number)
     timestamp = format_timestamp()
     
     # Ensure phone number is clean for display
@@ -76,8 +146,7 @@ def log_message(
     # Format: DD/MM/YY, HH:MM am - Sender: Message
     log_entry = f"{timestamp} - {sender}: {message}\n"
     
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(log_entry)
+    _append_entry(phone_number, log_entry)
 
 
 def log_conversation_turn(
@@ -115,33 +184,126 @@ def log_system_message(phone_number: str, message: str) -> None:
         phone_number: User's phone number
         message: System message content
     """
-    log_path = get_log_file_path(phone_number)
     timestamp = format_timestamp()
     
     # System messages in WhatsApp don't have a sender prefix
     log_entry = f"{timestamp} - {message}\n"
     
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(log_entry)
+    _append_entry(phone_number, log_entry)
 
 
-def get_conversation_history(phone_number: str) -> Optional[str]:
+def get_conversation_history(phone_number: str, last_n: Optional[int] = None) -> Optional[str]:
     """
-    Read the full conversation history for a phone number.
+    Read the conversation history for a phone number.
     
     Args:
         phone_number: User's phone number
+        last_n: Only the newest N log entries (two per turn); None for everything
         
     Returns:
-        Full conversation log or None if not found
+        Conversation log or None if not found
     """
     log_path = get_log_file_path(phone_number)
+    in_segments = _segment_count(phone_number) > 0
     
-    if not os.path.exists(log_path):
+    if not in_segments and not os.path.exists(log_path):
         return None
     
-    with open(log_path, "r", encoding="utf-8") as f:
-        return f.read()
+    if last_n is not None:
+        return "".join(_read_combined(phone_number, last_n, None)[0])
+    
+    history = ""
+    if os.path.exists(log_path):
+        with open(log_path, "r", encoding="utf-8") as f:
+            history = f.read()
+    if in_segments:
+        history += "".join(segment_log.iter_entries(log_key(phone_number)))
+    return history
+
+
+def get_history_page(phone_number: str, limit: int = 20, before: Optional[int] = None) -> Dict[str, Any]:
+    """
+    One page of log entries, newest page first, read from the end of the file.
+    
+    Args:
+        phone_number: User's phone number
+        limit: Entries per page
+        before: Cursor from the previous page (None starts at the newest entry)
+        
+    Returns:
+        {"entries": [...oldest to newest...], "cursor": int or None when there is nothing older}
+    """
+    entries, start = _read_combined(phone_number, limit, before)
+    return {"entries": [e.rstrip("\n") for e in entries], "cursor": start or None}
+
+
+def _read_combined(phone_number: str, limit: int, before: Optional[int]):
+    """
+    Entries [before - limit, before) of the legacy .txt log followed by the
+    segment log, numbered as one sequence (the .txt stops growing once
+    segments are on, so cursors stay valid), and the index of the first one.
+    """
+    legacy = _legacy_count(phone_number)
+    total = legacy + _segment_count(phone_number)
+    end = total if before is None else max(0, min(before, total))
+    start = max(0, end - max(0, limit))
+    entries: List[str] = []
+    if start < legacy:
+        entries += _read_entries(phone_number, min(end, legacy) - start, min(end, legacy))[0]
+    if end > legacy:
+        entries += segment_log.read_page(log_key(phone_number), end - max(start, legacy), end - legacy)[0]
+    return entries, start
+
+
+def _read_entries(phone_number: str, limit: int, before: Optional[int]):
+    """
+    Entries [before - limit, before) and the index of the first one. Offsets come
+    from the sidecar index (two seeks into it), the text from an mmap of the log,
+    so the cost depends on the page size and not on how long the log has grown.
+    """
+    log_path = get_log_file_path(phone_number)
+    with _write_lock:
+        count = _ensure_index(phone_number)
+    end = count if before is None else max(0, min(before, count))
+    start = max(0, end - max(0, limit))
+    if start == end:
+        return [], start
+    
+    with open(get_index_file_path(phone_number), "rb") as ix:
+        ix.seek(start * _OFFSET.size)
+        offsets = [o for (o,) in _OFFSET.iter_unpack(ix.read((end - start + 1) * _OFFSET.size))]
+    
+    with open(log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if len(offsets) == end - start:
+            offsets.append(len(m))   # the page ends at the newest entry
+        entries = [m[offsets[i]:offsets[i + 1]].decode("utf-8", errors="replace")
+                   for i in range(end - start)]
+    return entries, start
+
+
+def _ensure_index(phone_number: str) -> int:
+    """Entry count, (re)building the index if it is missing or does not match the log. Caller holds _write_lock."""
+    log_path = get_log_file_path(phone_number)
+    index_path = get_index_file_path(phone_number)
+    size = os.path.getsize(log_path)
+    if os.path.exists(index_path):
+        index_size = os.path.getsize(index_path)
+        if index_size and index_size % _OFFSET.size == 0:
+            with open(index_path, "rb") as ix:
+                ix.seek(index_size - _OFFSET.size)
+                (last,) = _OFFSET.unpack(ix.read(_OFFSET.size))
+            if last < size:
+                return index_size // _OFFSET.size
+    
+    offsets: List[int] = []
+    if size:
+        with open(log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            offsets = [match.start() for match in _ENTRY_START.finditer(m)]
+        if not offsets or offsets[0] != 0:
+            offsets.insert(0, 0)   # "Conversation with ..." header
+    with open(index_path, "wb") as ix:
+        ix.write(b"".join(_OFFSET.pack(o) for o in offsets))
+    return len(offsets)
 
 
 def start_new_session(phone_number: str, user_name: str = None) -> None:
@@ -156,16 +318,12 @@ def start_new_session(phone_number: str, user_name: str = None) -> None:
     timestamp = format_timestamp()
     
     # Add a session separator if file already exists
-    if os.path.exists(log_path):
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(f"\n{'-'*50}\n")
-            f.write(f"{timestamp} - New session started\n")
+    if os.path.exists(log_path) or _segment_count(phone_number):
+        _append_entry(phone_number, f"\n{'-'*50}\n{timestamp} - New session started\n")
     else:
         # First message in a new file
-        with open(log_path, "w", encoding="utf-8") as f:
-            name_display = user_name if user_name else phone_number
-            f.write(f"Conversation with {name_display}\n")
-            f.write(f"{'='*50}\n")
+        name_display = user_name if user_name else phone_number
+        _append_entry(phone_number, f"Conversation with {name_display}\n{'='*50}\n", truncate=True)
 
 
 # Demo helper for terminal mode
@@ -0,0 +1,80 @@
+"""
+Prompt-token usage for the RentBasket WhatsApp Bot.
+
+OpenAI caches prompt prefixes (1024+ tokens, byte-identical) and reports how
+many prompt tokens were served from that cache. The agents keep their large
+static parts (system prompt, tool schemas, catalogue text) as a stable prefix
+and put the per-customer context last; this records, per LLM call site, how
+many prompt tokens each call used and how many of them were cached, so a
+change that breaks the prefix shows up as a falling hit ratio on /stats.
+
+Usage:
+    response = llm_with_tools.invoke(prompt)
+    prompt_usage.record_message("sales", response)          # LangChain AIMessage
+    prompt_usage.record_openai("item_extraction", response)  # raw openai client response
+"""
+
+import threading
+from typing import Any, Dict
+
+
+class PromptUsage:
+    """Per call site: calls, prompt tokens, cached prompt tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites: Dict[str, Dict[str, int]] = {}
+
+    def _site(self, site: str) -> Dict[str, int]:
+        """Counters for a call site (caller holds the lock)."""
+        return self._sites.setdefault(site, {"calls": 0, "unreported": 0, "prompt_tokens": 0, "cached_tokens": 0})
+
+    def record(self, site: str, prompt_tokens: int, cached_tokens: int = 0) -> None:
+        with self._lock:
+            counters = self._site(site)
+            counters["calls"] += 1
+            counters["prompt_tokens"] += int(prompt_tokens or 0)
+            counters["cached_tokens"] += int(cached_tokens or 0)
+
+    def _unreported(self, site: str) -> None:
+        """A call whose response carried no usage (e.g. a stream without stream_usage)."""
+        with self._lock:
+            self._site(site)["unreported"] += 1
+
+    def record_message(self, site: str, message: Any) -> None:
+        """From a LangChain AIMessage's usage_metadata (input_token_details.cache_read)."""
+        usage = getattr(message, "usage_metadata", None)
+        if not isinstance(usage, dict) or not usage:
+            self._unreported(site)
+            return
+        details = usage.get("input_token_details") or {}
+        self.record(site, usage.get("input_tokens", 0), details.get("cache_read", 0))
+
+    def record_openai(self, site: str, response: Any) -> None:
+        """From an openai client response's usage (prompt_tokens_details.cached_tokens)."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            self._unreported(site)
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.record(site, getattr(usage, "prompt_tokens", 0), getattr(details, "cached_tokens", 0) if details else 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sites = {site: dict(counters) for site, counters in self._sites.items()}
+        totals = {"calls": 0, "unreported": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        for counters in sites.values():
+            for key in totals:
+                totals[key] += counters[key]
+        for counters in list(sites.values()) + [totals]:
+            counters["uncached_tokens"] = counters["prompt_tokens"] - counters["cached_tokens"]
+            counters["cache_hit_ratio"] = (
+                round(counters["cached_tokens"] / counters["prompt_tokens"], 3) if counters["prompt_tokens"] else 0.0)
+        return {**totals, "sites": sites}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sites.clear()
+
+
+prompt_usage = PromptUsage()
@@ -0,0 +1,93 @@
+"""
+Rendered-quote cache for the RentBasket WhatsApp Bot.
+
+create_quote_tool and the browse-flow estimate rebuild the same quote text
+for the same carts over and over (the agent re-quotes after every "ok", the
+browse flow re-renders when the customer changes duration and back). Both
+renders are pure functions of the cart, the duration and the pricing
+config, so the finished output is memoized here:
+
+- key: canonical cart (merged quantities) + duration + unit, chosen by the caller
+- version: PricingEngine.version; a new version (prices or GLOBAL_DISCOUNT
+  changed, see data.products.refresh_pricing) drops every entry
+- bounded LRU, hit rate exposed via stats() on /stats
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("QUOTE_CACHE_SIZE", "2048"))
+
+
+class QuoteCache:
+    """
+    LRU cache of rendered quotes, invalidated by pricing version.
+
+    Usage:
+        key = ("order_confirmation", tuple(qty_map.items()), duration, unit)
+        text = quote_cache.get_or_render(key, pricing.version, lambda: render(...))
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, version: str) -> Optional[Any]:
+        """Cached render for key under this pricing version, or None on a miss."""
+        with self._lock:
+            self._check_version(version)
+            value = self._entries.get(key)
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, version: str, value: Any) -> None:
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get_or_render(self, key: Hashable, version: str, render: Callable[[], Any]) -> Any:
+        """Return the cached render or call render() and store it (renders run outside the lock)."""
+        value = self.get(key, version)
+        if value is None:
+            value = render()
+            self.put(key, version, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "pricing_version": self._version,
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+    def _check_version(self, version: str) -> None:
+        """Caller holds the lock."""
+        if version != self._version:
+            if self._entries:
+                self._entries.clear()
+                self._counters["invalidations"] += 1
+            self._version = version
+
+
+quote_cache = QuoteCache()
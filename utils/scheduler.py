@@ -0,0 +1,332 @@
+"""
+Single-thread timer scheduler for the RentBasket WhatsApp Bot.
+
+Replaces the per-user threading.Timer pairs (30-min ghost + 19-hour follow-up)
+with one hashed timing wheel driven by a single thread:
+- schedule / reschedule / cancel are O(1) per (kind, phone)
+- pending deadlines are persisted to a local SQLite file so they survive
+  deploys and restarts
+- pending and fired counts are exposed via stats()
+
+Timers are keyed by (kind, phone); scheduling the same key again simply moves
+its deadline, which is exactly what "reset on every inbound message" needs.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+
+
+class _TimerStore:
+    """Tiny SQLite table of pending deadlines (wall-clock epoch seconds)."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS timers ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, phone TEXT NOT NULL, deadline REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def upsert(self, key: str, kind: str, phone: str, deadline: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO timers (key, kind, phone, deadline) VALUES (?, ?, ?, ?)",
+                (key, kind, phone, deadline),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM timers WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def load_all(self):
+        with self._lock:
+            return self._conn.execute("SELECT kind, phone, deadline FROM timers").fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _Entry:
+    __slots__ = ("kind", "phone", "tick", "deadline")
+
+    def __init__(self, kind: str, phone: str, tick: int, deadline: float):
+        self.kind = kind
+        self.phone = phone
+        self.tick = tick          # absolute wheel tick at which the timer fires
+        self.deadline = deadline  # wall-clock epoch, used for persistence
+
+
+class TimerScheduler:
+    """
+    Hashed timing wheel with one driver thread.
+
+    Usage:
+        scheduler = TimerScheduler(store_path="data/timers.sqlite3")
+        scheduler.register("ghost", send_ghost_message, grace_seconds=1800)
+        scheduler.schedule("ghost", phone, 30 * 60)   # (re)arm
+        scheduler.cancel("ghost", phone)
+        scheduler.stats()
+
+    Each timer lives in slot `tick % wheel_size` and carries its absolute fire
+    tick, so timers longer than one wheel revolution (e.g. 19 hours with a
+    1-hour wheel) just stay put until their revolution comes round.
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float = 1.0,
+        wheel_size: int = 3600,
+        store_path: Optional[str] = None,
+        executor: Optional[Callable] = None,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "timer-wheel",
+    ):
+        """
+        Args:
+            tick_seconds: Wheel resolution
+            wheel_size: Number of slots in the wheel
+            store_path: SQLite file for persisted deadlines (None = in-memory only)
+            executor: Callable(phone, handler, phone) used to run fired timers
+                      (returning False means refused); defaults to calling the
+                      handler on the scheduler thread
+            clock: Monotonic clock (injectable for tests)
+            name: Scheduler thread name
+        """
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        self.store_path = store_path
+        self.executor = executor
+        self.name = name
+
+        # When False, schedule() never starts the driver thread (tests call run_due()).
+        self.autostart = True
+
+        self._clock = clock
+        self._origin = clock()
+        self._cursor = self._now_tick()     # next tick to process
+        self._slots = [dict() for _ in range(wheel_size)]  # slot -> {key: _Entry}
+        self._index: Dict[str, _Entry] = {}  # key -> _Entry
+        self._handlers: Dict[str, tuple] = {}  # kind -> (handler, grace_seconds)
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._store: Optional[_TimerStore] = None
+        self._thread = None
+        self._stopping = False
+
+        self._counters = {"scheduled": 0, "cancelled": 0, "fired": 0, "dropped_stale": 0, "failed": 0}
+
+    # ------------------------------------------------------------------
+    # Registration / lifecycle
+    # ------------------------------------------------------------------
+
+    def register(self, kind: str, handler: Callable[[str], None], grace_seconds: Optional[float] = None) -> None:
+        """
+        Register the handler for a timer kind.
+
+        Args:
+            kind: Timer kind (e.g. "ghost", "followup")
+            handler: Callable(phone) run when the timer fires
+            grace_seconds: When restoring after downtime, timers overdue by more
+                           than this are dropped instead of fired (None = always fire)
+        """
+        self._handlers[kind] = (handler, grace_seconds)
+
+    def start(self) -> None:
+        """Open the store, restore persisted timers and start the driver thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            if self.store_path and self._store is None:
+                try:
+                    self._store = _TimerStore(self.store_path)
+                    self._restore()
+                except Exception as e:
+                    print(f"⚠️ Timer store unavailable ({self.store_path}), timers will not persist: {e}")
+                    self._store = None
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop the driver thread. Pending timers stay in the store for the next start."""
+        with self._lock:
+            thread = self._thread
+            self._stopping = True
+            self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            self._thread = None
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _restore(self) -> None:
+        now = time.time()
+        restored = 0
+        for kind, phone, deadline in self._store.load_all():
+            grace = self._handlers.get(kind, (None, None))[1]
+            overdue = now - deadline
+            if grace is not None and overdue > grace:
+                self._store.delete(self._key(kind, phone))
+                self._counters["dropped_stale"] += 1
+                continue
+            self._arm(kind, phone, max(0.0, deadline - now), deadline, persist=False)
+            restored += 1
+        if restored:
+            print(f"   Restored {restored} pending timers from {self.store_path}")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def schedule(self, kind: str, phone: str, delay_seconds: float) -> None:
+        """(Re)arm the (kind, phone) timer to fire after delay_seconds."""
+        if self.autostart and not self.running:
+            self.start()
+        self._arm(kind, phone, delay_seconds, time.time() + delay_seconds, persist=True)
+
+    def cancel(self, kind: str, phone: str) -> bool:
+        """Cancel the (kind, phone) timer. Returns True if one was pending."""
+        key = self._key(kind, phone)
+        with self._lock:
+            entry = self._index.pop(key, None)
+            if entry is None:
+                return False
+            self._slots[entry.tick % self.wheel_size].pop(key, None)
+            self._counters["cancelled"] += 1
+            if self._store is not None:
+                self._store.delete(key)
+        return True
+
+    def cancel_all(self, phone: str) -> None:
+        """Cancel every registered kind of timer for this phone."""
+        for kind in list(self._handlers):
+            self.cancel(kind, phone)
+
+    def is_pending(self, kind: str, phone: str) -> bool:
+        with self._lock:
+            return self._key(kind, phone) in self._index
+
+    def pending(self, kind: Optional[str] = None) -> int:
+        """Number of armed timers, optionally for a single kind."""
+        with self._lock:
+            if kind is None:
+                return len(self._index)
+            return sum(1 for e in self._index.values() if e.kind == kind)
+
+    def clear(self) -> None:
+        """Drop every pending timer (memory and store)."""
+        with self._lock:
+            for slot in self._slots:
+                slot.clear()
+            keys = list(self._index)
+            self._index.clear()
+            if self._store is not None:
+                for key in keys:
+                    self._store.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_kind: Dict[str, int] = {}
+            for e in self._index.values():
+                by_kind[e.kind] = by_kind.get(e.kind, 0) + 1
+            return {
+                "pending": len(self._index),
+                "pending_by_kind": by_kind,
+                "persistent": self._store is not None,
+                "running": self._thread is not None and self._thread.is_alive(),
+                **self._counters,
+            }
+
+    def run_due(self) -> int:
+        """Fire every timer whose tick has passed. Returns the number fired."""
+        due = []
+        with self._lock:
+            now_tick = self._now_tick()
+            # Walk at most one revolution: after that every slot has been visited.
+            start = max(self._cursor, now_tick - self.wheel_size + 1)
+            for tick in range(start, now_tick + 1):
+                slot = self._slots[tick % self.wheel_size]
+                if not slot:
+                    continue
+                for key, entry in list(slot.items()):
+                    if entry.tick <= now_tick:
+                        del slot[key]
+                        del self._index[key]
+                        due.append(entry)
+            self._cursor = now_tick + 1
+            if self._store is not None:
+                for entry in due:
+                    self._store.delete(self._key(entry.kind, entry.phone))
+
+        for entry in due:
+            self._fire(entry)
+        return len(due)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _key(kind: str, phone: str) -> str:
+        return f"{kind}:{phone}"
+
+    def _now_tick(self) -> int:
+        return int((self._clock() - self._origin) / self.tick_seconds)
+
+    def _arm(self, kind: str, phone: str, delay_seconds: float, deadline: float, persist: bool) -> None:
+        key = self._key(kind, phone)
+        ticks = max(1, math.ceil(delay_seconds / self.tick_seconds))
+        with self._lock:
+            old = self._index.get(key)
+            if old is not None:
+                self._slots[old.tick % self.wheel_size].pop(key, None)
+            entry = _Entry(kind, phone, self._now_tick() + ticks, deadline)
+            self._slots[entry.tick % self.wheel_size][key] = entry
+            self._index[key] = entry
+            self._counters["scheduled"] += 1
+            if persist and self._store is not None:
+                self._store.upsert(key, kind, phone, deadline)
+
+    def _fire(self, entry: _Entry) -> None:
+        handler = self._handlers.get(entry.kind, (None, None))[0]
+        if handler is None:
+            print(f"   ⚠️ No handler registered for timer kind '{entry.kind}'")
+            return
+        try:
+            if self.executor is not None:
+                if self.executor(entry.phone, handler, entry.phone) is False:
+                    raise RuntimeError("executor refused the job")
+            else:
+                handler(entry.phone)
+            with self._lock:
+                self._counters["fired"] += 1
+        except Exception as e:
+            with self._lock:
+                self._counters["failed"] += 1
+            print(f"   ❌ Timer {entry.kind} for {entry.phone} failed: {e}")
+
+    def _run(self) -> None:
+        while not self._stopping:
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"   ❌ Timer wheel tick failed: {e}")
+            self._wake.wait(self.tick_seconds)
+            self._wake.clear()
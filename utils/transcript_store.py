@@ -0,0 +1,145 @@
+"""
+Segmented session transcripts for the RentBasket WhatsApp Bot.
+
+Transcript lines used to be appended to sessions/{id}.live_transcript with
+ArrayUnion, so every turn rewrote an ever-growing session document that
+drifts toward Firestore's 1 MiB limit. Lines now go to fixed-size chunk
+documents:
+
+    sessions/{id}/transcript/{chunk:05d}  ->  {"lines": {"<n>": line}, "updated_at": ts}
+
+Line n lives in chunk n // chunk_lines, so an append is one merge-set of a
+single map entry into a document that never holds more than chunk_lines
+lines. The next line number per session is kept in memory; after a restart
+it is recovered with one read of the newest chunk.
+
+iter_lines() streams the chunks back in order (legacy live_transcript
+arrays first, for sessions written before the split). read_page() returns
+the lines just before a cursor by reading only the chunks that hold them.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from google.cloud import firestore
+
+DEFAULT_CHUNK_LINES = int(os.getenv("TRANSCRIPT_CHUNK_LINES", "50"))
+MAX_TRACKED_SESSIONS = 10000
+
+
+class TranscriptStore:
+    """
+    Append-only, chunked transcript per session.
+
+    Usage:
+        store = TranscriptStore(firestore_writer, get_db)
+        store.append(session_id, "[21/01/26, 02:02 pm] Asha: hi")
+        for line in store.iter_lines(session_id):
+            ...
+    """
+
+    def __init__(self, writer, db_factory: Callable[[], Any], chunk_lines: int = DEFAULT_CHUNK_LINES):
+        """
+        Args:
+            writer: WriteBehindQueue (or anything with set(path, data, merge) / flush())
+            db_factory: Returns the Firestore client (or None when not configured)
+            chunk_lines: Lines per chunk document
+        """
+        self.writer = writer
+        self.db_factory = db_factory
+        self.chunk_lines = chunk_lines
+        self._next: "OrderedDict[str, int]" = OrderedDict()   # session_id -> next line number
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chunk_path(session_id: str, chunk: int) -> str:
+        return f"sessions/{session_id}/transcript/{chunk:05d}"
+
+    def append(self, session_id: str, line: str, new_session: bool = False) -> int:
+        """Queue one transcript line; returns its line number. new_session skips the recovery read."""
+        with self._lock:
+            n = 0 if new_session else self._next.get(session_id)
+        if n is None:
+            n = self._recover_next(session_id)
+        with self._lock:
+            self._next[session_id] = n + 1
+            self._next.move_to_end(session_id)
+            while len(self._next) > MAX_TRACKED_SESSIONS:
+                self._next.popitem(last=False)
+
+        self.writer.set(self.chunk_path(session_id, n // self.chunk_lines), {
+            "lines": {str(n): line},
+            "updated_at": datetime.now(timezone.utc),
+        }, merge=True)
+        return n
+
+    def iter_lines(self, session_id: str) -> Iterator[str]:
+        """Stream the whole transcript, oldest line first."""
+        db = self.db_factory()
+        if db is None:
+            return
+        self.writer.flush()
+        legacy = db.collection("sessions").document(session_id).get()
+        if legacy.exists:
+            yield from (legacy.to_dict() or {}).get("live_transcript") or []
+        for chunk in db.collection(f"sessions/{session_id}/transcript").stream():
+            lines = (chunk.to_dict() or {}).get("lines") or {}
+            for key in sorted(lines, key=int):
+                yield lines[key]
+
+    def read_page(
+        self,
+        session_id: str,
+        limit: int,
+        before: Optional[int] = None,
+        legacy: Sequence[str] = (),
+    ) -> Tuple[List[str], int]:
+        """
+        Lines [before - limit, before) and the number of the first one. Line numbers
+        count the legacy live_transcript lines first, then the chunked ones; before=None
+        ends at the newest line. Reads one document per chunk the page touches.
+        """
+        db = self.db_factory()
+        if db is None:
+            return [], 0
+        self.writer.flush()
+        with self._lock:
+            chunked = self._next.get(session_id)
+        if chunked is None:
+            chunked = self._recover_next(session_id)
+        total = len(legacy) + chunked
+        end = total if before is None else max(0, min(before, total))
+        start = max(0, end - max(0, limit))
+
+        lines = list(legacy[start:min(end, len(legacy))])
+        first, last = max(start - len(legacy), 0), end - len(legacy)
+        if last > first:
+            transcript = db.collection(f"sessions/{session_id}/transcript")
+            for chunk in range(first // self.chunk_lines, (last - 1) // self.chunk_lines + 1):
+                snapshot = transcript.document(f"{chunk:05d}").get()
+                stored = ((snapshot.to_dict() or {}) if snapshot.exists else {}).get("lines") or {}
+                for n in range(max(first, chunk * self.chunk_lines), min(last, (chunk + 1) * self.chunk_lines)):
+                    if str(n) in stored:
+                        lines.append(stored[str(n)])
+        return lines, start
+
+    def _recover_next(self, session_id: str) -> int:
+        """Next line number from the newest chunk in Firestore (0 for a new transcript)."""
+        db = self.db_factory()
+        if db is None:
+            return 0
+        self.writer.flush()   # lines still queued from before are part of the answer
+        # Errors propagate: guessing 0 would overwrite the first chunk's lines
+        newest = db.collection(f"sessions/{session_id}/transcript") \
+                   .order_by("__name__", direction=firestore.Query.DESCENDING) \
+                   .limit(1) \
+                   .get()
+        for chunk in newest:
+            lines = (chunk.to_dict() or {}).get("lines") or {}
+            if lines:
+                return max(int(key) for key in lines) + 1
+            return int(chunk.id) * self.chunk_lines
+        return 0
@@ -0,0 +1,473 @@
+"""
+Write-behind Firestore pipeline for the RentBasket WhatsApp Bot.
+
+One conversation turn used to cost about seven synchronous Firestore round
+trips on the worker thread (two transcript set+add pairs, update_session,
+analytics adds). Logging writes are now queued here and committed by one
+background thread:
+
+- writes to the same document coalesce (ArrayUnion values concatenate,
+  Increments add up, merge-set maps deep-merge) while they wait
+- pending writes go out as Firestore batched writes, flushed when
+  max_batch writes are waiting or every flush_seconds
+- every queued write is spooled to a local SQLite file first and deleted
+  once committed, so a crash or deploy replays what was not yet written
+
+Collection adds get their document ID at enqueue time, which makes a replay
+after a crash idempotent for them (Increment transforms are not, so a
+session's total_messages may over-count by one turn after a crash).
+Counters are exposed via stats().
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import string
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from google.cloud.firestore_v1 import transforms
+
+DEFAULT_MAX_BATCH = 400          # Firestore allows 500 writes per batch
+DEFAULT_FLUSH_SECONDS = 1.0
+DEFAULT_MAX_ATTEMPTS = 5
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def auto_id() -> str:
+    """20-character document ID, same shape as Firestore's client-side auto IDs."""
+    return "".join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+
+# ----------------------------------------------------------------------
+# Spool encoding (sentinels and datetimes are not JSON)
+# ----------------------------------------------------------------------
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, transforms.ArrayUnion):
+        return {"$union": [_encode(v) for v in value.values]}
+    if isinstance(value, transforms.Increment):
+        return {"$inc": value.value}
+    if value is transforms.SERVER_TIMESTAMP:
+        return {"$server_ts": True}
+    if value is transforms.DELETE_FIELD:
+        return {"$delete": True}
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1:
+            (tag, inner), = value.items()
+            if tag == "$union":
+                return transforms.ArrayUnion([_decode(v) for v in inner])
+            if tag == "$inc":
+                return transforms.Increment(inner)
+            if tag == "$server_ts":
+                return transforms.SERVER_TIMESTAMP
+            if tag == "$delete":
+                return transforms.DELETE_FIELD
+            if tag == "$dt":
+                return datetime.fromisoformat(inner)
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+# ----------------------------------------------------------------------
+# Coalescing
+# ----------------------------------------------------------------------
+
+class FoldConflict(Exception):
+    """Two writes to one field that cannot be folded into a single write."""
+
+
+def _fold(old: Any, new: Any, deep: bool) -> Any:
+    """The value a field ends up with after writing old, then new."""
+    if isinstance(new, transforms.ArrayUnion):
+        if isinstance(old, transforms.ArrayUnion):
+            return transforms.ArrayUnion(list(old.values) + [v for v in new.values if v not in old.values])
+        if isinstance(old, list):
+            return old + [v for v in new.values if v not in old]
+        raise FoldConflict
+    if isinstance(new, transforms.Increment):
+        if isinstance(old, transforms.Increment):
+            return transforms.Increment(old.value + new.value)
+        if isinstance(old, (int, float)) and not isinstance(old, bool):
+            return old + new.value
+        raise FoldConflict
+    if deep and isinstance(old, dict) and isinstance(new, dict):
+        return fold_fields(old, new, deep)
+    return new
+
+
+def fold_fields(old: Dict[str, Any], new: Dict[str, Any], deep: bool) -> Dict[str, Any]:
+    """One write equivalent to writing old then new (deep=True for merge-sets); raises FoldConflict."""
+    merged = dict(old)
+    for key, value in new.items():
+        merged[key] = _fold(old[key], value, deep) if key in old else value
+    return merged
+
+
+class _Write:
+    __slots__ = ("kind", "path", "data", "seqs", "attempts")
+
+    def __init__(self, kind: str, path: str, data: Dict[str, Any], seqs: List[int]):
+        self.kind = kind          # "merge" (set, merge=True) | "set" (new document) | "update"
+        self.path = path
+        self.data = data
+        self.seqs = seqs          # spool rows folded into this write
+        self.attempts = 0
+
+
+class _Spool:
+    """SQLite file of queued writes (deleted once committed)."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, path TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def append(self, kind: str, path: str, data: Dict[str, Any]) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO writes (kind, path, data) VALUES (?, ?, ?)",
+                (kind, path, json.dumps(_encode(data), default=str)),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def delete(self, seqs: List[int]) -> None:
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM writes WHERE seq = ?", [(s,) for s in seqs])
+            self._conn.commit()
+
+    def load_all(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT seq, kind, path, data FROM writes ORDER BY seq").fetchall()
+        return [(seq, kind, path, _decode(json.loads(data))) for seq, kind, path, data in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class WriteBehindQueue:
+    """
+    Coalescing, batching, spooled Firestore writer.
+
+    Usage:
+        writer = WriteBehindQueue(get_db, spool_path="data/firestore_spool.sqlite3")
+        writer.set("sessions/abc", {"live_transcript": firestore.ArrayUnion([line])})
+        writer.add("sessions/abc/messages", {...})
+        writer.update("sessions/abc", {"total_messages": firestore.Increment(1)})
+        writer.flush()            # or let the writer thread do it
+
+    With enabled=False every call is written straight through (one round trip
+    each), which is the behaviour before this pipeline existed.
+    """
+
+    def __init__(
+        self,
+        db_factory: Callable[[], Any],
+        spool_path: Optional[str] = None,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        enabled: bool = True,
+        name: str = "firestore-writer",
+    ):
+        """
+        Args:
+            db_factory: Returns the Firestore client (or None when not configured)
+            spool_path: SQLite file for queued writes (None = memory only, lost on crash)
+            max_batch: Writes per batched commit; reaching it wakes the writer early
+            flush_seconds: Longest a write waits before being committed
+            max_attempts: Commits a single write may fail before it is dropped
+            enabled: False writes every call through synchronously
+            name: Writer thread name
+        """
+        self.db_factory = db_factory
+        self.spool_path = spool_path
+        self.max_batch = max_batch
+        self.flush_seconds = flush_seconds
+        self.max_attempts = max_attempts
+        self.enabled = enabled
+        self.name = name
+
+        # When False, writes never start the writer thread (tests call flush()).
+        self.autostart = True
+
+        self._pending: Deque[_Write] = deque()
+        self._open: Dict[str, _Write] = {}      # path -> newest pending write it can fold into
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._spool: Optional[_Spool] = None
+        self._spool_opened = False
+        self._thread = None
+        self._stopping = False
+        self._backoff = False
+        self._counters = {"enqueued": 0, "coalesced": 0, "batches": 0, "written": 0,
+                          "direct_writes": 0, "failures": 0, "dropped": 0, "replayed": 0}
+
+    # ------------------------------------------------------------------
+    # Public API (same shapes as DocumentReference.set / update, Collection.add)
+    # ------------------------------------------------------------------
+
+    def set(self, path: str, data: Dict[str, Any], merge: bool = True) -> None:
+        self._enqueue("merge" if merge else "set", path, data)
+
+    def update(self, path: str, data: Dict[str, Any]) -> None:
+        self._enqueue("update", path, data)
+
+    def add(self, collection_path: str, data: Dict[str, Any]) -> str:
+        """Queue a new document in a collection; returns its (pre-assigned) ID."""
+        doc_id = auto_id()
+        self._enqueue("set", f"{collection_path}/{doc_id}", data)
+        return doc_id
+
+    def flush(self) -> int:
+        """Commit everything queued right now. Returns the number of writes committed."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    self._open_spool()
+                    batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                    for write in batch:
+                        if self._open.get(write.path) is write:
+                            del self._open[write.path]
+                if not batch:
+                    return written
+                committed = self._commit(batch)
+                written += committed
+                self._backoff = committed < len(batch)
+                if self._backoff:
+                    return written   # Firestore unavailable; retry on the next flush
+
+    def start(self) -> None:
+        """Replay the spool and start the writer thread (idempotent)."""
+        with self._lock:
+            self._open_spool()
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop the writer thread after a final flush; unwritten writes stay spooled."""
+        with self._lock:
+            thread = self._thread
+            self._stopping = True
+            self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Firestore writer final flush failed: {e}")
+        with self._lock:
+            self._thread = None
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+                self._spool_opened = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            round_trips = self._counters["batches"] + self._counters["direct_writes"]
+            return {
+                "enabled": self.enabled,
+                "pending": len(self._pending),
+                "spooled": self._spool is not None,
+                **self._counters,
+                "writes_per_round_trip": round(self._counters["written"] / round_trips, 2) if round_trips else 0.0,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, kind: str, path: str, data: Dict[str, Any]) -> None:
+        if not self.enabled:
+            if self._write_direct(_Write(kind, path, data, [])):
+                with self._lock:
+                    self._counters["written"] += 1
+            return
+
+        if self.autostart and not self.running:
+            self.start()
+        with self._lock:
+            self._open_spool()
+            seq = self._spool_append(kind, path, data)
+            self._counters["enqueued"] += 1
+            self._queue(kind, path, data, [seq] if seq is not None else [])
+            wake = len(self._pending) >= self.max_batch
+        if wake:
+            self._wake.set()
+
+    def _queue(self, kind: str, path: str, data: Dict[str, Any], seqs: List[int]) -> None:
+        """Caller holds the lock. Folds into the newest pending write for path when possible."""
+        target = self._open.get(path)
+        if target is not None and target.kind == kind and kind != "set":
+            try:
+                target.data = fold_fields(target.data, data, deep=(kind == "merge"))
+                target.seqs.extend(seqs)
+                self._counters["coalesced"] += 1
+                return
+            except FoldConflict:
+                pass
+        write = _Write(kind, path, dict(data), seqs)
+        self._pending.append(write)
+        self._open[path] = write
+
+    def _open_spool(self) -> None:
+        """Caller holds the lock. Opens the spool once and replays leftover writes."""
+        if self._spool_opened or not self.spool_path:
+            return
+        self._spool_opened = True
+        try:
+            self._spool = _Spool(self.spool_path)
+            leftover = self._spool.load_all()
+        except Exception as e:
+            print(f"⚠️ Firestore spool unavailable ({self.spool_path}), queued writes will not survive a crash: {e}")
+            self._spool = None
+            return
+        for seq, kind, path, data in leftover:
+            self._queue(kind, path, data, [seq])
+        if leftover:
+            self._counters["replayed"] += len(leftover)
+            print(f"   Replaying {len(leftover)} unwritten Firestore writes from {self.spool_path}")
+
+    def _spool_append(self, kind: str, path: str, data: Dict[str, Any]) -> Optional[int]:
+        if self._spool is None:
+            return None
+        try:
+            return self._spool.append(kind, path, data)
+        except Exception as e:
+            print(f"⚠️ Firestore spool write failed: {e}")
+            return None
+
+    def _commit(self, batch: List[_Write]) -> int:
+        """Commit one batch; on failure retry write by write so one bad write can't block the rest."""
+        db = self.db_factory()
+        if db is None:
+            self._requeue(batch)
+            return 0
+        try:
+            wb = db.batch()
+            for write in batch:
+                self._apply(wb, db, write)
+            wb.commit()
+        except Exception as e:
+            print(f"⚠️ Firestore batch commit failed ({len(batch)} writes), retrying one by one: {e}")
+            with self._lock:
+                self._counters["failures"] += 1
+            return self._commit_individually(batch)
+
+        self._done(batch)
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["written"] += len(batch)
+        return len(batch)
+
+    def _commit_individually(self, batch: List[_Write]) -> int:
+        committed, retry = 0, []
+        for write in batch:
+            if self._write_direct(write):
+                self._done([write])
+                committed += 1
+                continue
+            write.attempts += 1
+            if write.attempts >= self.max_attempts:
+                print(f"⚠️ Dropping Firestore {write.kind} on {write.path} after {write.attempts} attempts")
+                self._done([write])
+                with self._lock:
+                    self._counters["dropped"] += 1
+            else:
+                retry.append(write)
+        with self._lock:
+            self._counters["written"] += committed
+        self._requeue(retry)
+        return committed
+
+    def _write_direct(self, write: _Write) -> bool:
+        db = self.db_factory()
+        if db is None:
+            return False
+        try:
+            ref = db.document(write.path)
+            if write.kind == "update":
+                ref.update(write.data)
+            else:
+                ref.set(write.data, merge=(write.kind == "merge"))
+        except Exception as e:
+            print(f"⚠️ Firestore {write.kind} on {write.path} failed: {e}")
+            with self._lock:
+                self._counters["failures"] += 1
+            return False
+        with self._lock:
+            self._counters["direct_writes"] += 1
+        return True
+
+    @staticmethod
+    def _apply(wb, db, write: _Write) -> None:
+        ref = db.document(write.path)
+        if write.kind == "update":
+            wb.update(ref, write.data)
+        else:
+            wb.set(ref, write.data, merge=(write.kind == "merge"))
+
+    def _requeue(self, writes: List[_Write]) -> None:
+        """Put failed writes back at the front, oldest first (new writes no longer fold into them)."""
+        with self._lock:
+            self._pending.extendleft(reversed(writes))
+
+    def _done(self, writes: List[_Write]) -> None:
+        if self._spool is None:
+            return
+        try:
+            self._spool.delete([seq for write in writes for seq in write.seqs])
+        except Exception as e:
+            print(f"⚠️ Firestore spool cleanup failed: {e}")
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Firestore writer flush error: {e}")
+            with self._lock:
+                if self._stopping:
+                    return
+            if self._backoff:
+                time.sleep(min(self.flush_seconds * 5, 30))   # back off while Firestore is failing
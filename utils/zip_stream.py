@@ -0,0 +1,53 @@
+"""
+Streaming zip archives for the RentBasket WhatsApp Bot.
+
+zipfile can write to an unseekable stream (sizes go into data descriptors
+after each member), so an archive can be produced chunk by chunk while its
+members are still being read: nothing is buffered beyond the current chunk,
+and the first bytes reach the client before the last member is opened.
+"""
+
+import time
+import zipfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+class _Sink:
+    """Write-only file object that hands the bytes written so far to the generator."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def stream_zip(
+    members: Iterable[Tuple[str, Iterable[bytes], Optional[float]]],
+    compression: int = zipfile.ZIP_DEFLATED,
+) -> Iterator[bytes]:
+    """
+    Yield a zip archive of (name, chunks, mtime) members, one compressed chunk at a time.
+    mtime is a unix timestamp (None = now).
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression) as zf:
+        for name, chunks, mtime in members:
+            info = zipfile.ZipInfo(name, time.localtime(mtime)[:6])
+            info.compress_type = compression
+            with zf.open(info, "w") as dest:
+                for chunk in chunks:
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
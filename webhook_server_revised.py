@@ -17,7 +17,8 @@ import tempfile
 import argparse
 import threading
 import time
-from flask import Flask, request, jsonify, send_file
+from datetime import datetime
+from flask import Flask, Response, g, request, jsonify, send_file
 from dotenv import load_dotenv
 from typing import List, Dict, Tuple, Optional
 from openai import OpenAI
@@ -31,7 +32,7 @@ load_dotenv()
 
 from config import (
     BOT_NAME, SALES_PHONE_GURGAON, SALES_PHONE_NOIDA, KU_REFERRAL_LINK, RENTBASKET_JWT,
-    GLOBAL_DISCOUNT, RETAINED_FACTOR, UPFRONT_EXTRA_DISCOUNT, UPFRONT_RETAINED_FACTOR,
+    GLOBAL_DISCOUNT, UPFRONT_EXTRA_DISCOUNT,
 )
 
 # Shorthand percentages for user-facing strings
@@ -60,12 +61,22 @@ def _step_header(n: int) -> str:
     label = _STEP_LABELS.get(n, "")
     return f"*Step {n} of {_STEPS_TOTAL}: {label}*"
 from tools.location_tools import _extract_pincode, _identify_city_from_pincode, _call_distance_api
-from agents.orchestrator import route_and_run
+from agents.orchestrator import route_and_run, intent_cache, classifier_stats, warm_agents
+from agents.registry import agent_registry
+from agents.context_window import context_window
+from agents.tool_runner import tool_runner
+from rag.embedding_cache import embedding_cache
+from utils.quote_cache import quote_cache
 from agents.state import create_initial_state
 from whatsapp.client import WhatsAppClient
+from whatsapp.outbound import OutboundQueue
 from utils.phone_utils import normalize_phone
 from utils.session_cache import SessionCache, update_user_facts
+from utils.dispatcher import MessageDispatcher
+from utils.scheduler import TimerScheduler
 from utils.logger import log_conversation_turn as file_log_turn, start_new_session as file_start_session
+from utils.logger import segment_log
+from utils.zip_stream import stream_zip
 from utils.db_logger import (
     log_conversation_turn,
     start_new_session,
@@ -73,7 +84,9 @@ from utils.db_logger import (
     update_session,
     log_event,
 )
-from utils.firebase_client import upsert_lead, get_lead
+from utils.firebase_client import upsert_lead, get_lead, firestore_writer, watch_lead_updates, lead_update_batch
+from utils.doc_cache import document_cache
+from utils.prompt_usage import prompt_usage
 
 
 def restore_lead_to_state(normalized_phone: str, state: dict) -> dict:
@@ -659,7 +672,7 @@ def _handle_checkout_location(phone: str, text: str, sender_name: str) -> bool:
             f"Get an *additional {_UPFRONT_PCT}% discount* by completing your order through this link:",
             preview_url=False,
         )
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
         # Send cart link as a separate message so WhatsApp renders the preview
         whatsapp_client.send_text_message(phone, cart_link, preview_url=True)
         # Clear checkout step, keep browse mode for further browsing
@@ -677,7 +690,7 @@ def _handle_checkout_location(phone: str, text: str, sender_name: str) -> bool:
             preview_url=False,
         )
         # Let them browse more
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
         buttons = [
             {"id": "BROWSE_PRODUCTS", "title": "Browse More"},
         ]
@@ -799,7 +812,7 @@ def _send_variant_list(phone: str, room_id: str, subcat_id: str) -> None:
     lines = [f"*{subcat_title} — {room_title}*", f"Duration: {duration} months", ""]
     for idx, (pid, name) in enumerate(variants, 1):
         price = calculate_rent(pid, duration) or 0
-        discounted = int(round(price * RETAINED_FACTOR)) if price else 0
+        discounted = pricing.discount(price)
         if discounted:
             lines.append(f"{idx}. {name} — from Rs. {discounted:,}/mo")
         else:
@@ -809,7 +822,7 @@ def _send_variant_list(phone: str, room_id: str, subcat_id: str) -> None:
     lines.append("Reply with the item number or name to add to cart.")
 
     whatsapp_client.send_text_message(phone, "\n".join(lines), preview_url=False)
-    time.sleep(0.3)
+    whatsapp_client.pause(phone, 0.3)
 
     # Navigation buttons
     has_cart = bool(ctx.get("last_browse_quote", {}).get("items"))
@@ -847,7 +860,7 @@ def _handle_1bhk_package_selection(phone: str, package_id: str, sender_name: str
         if not product:
             continue
         mrp = calculate_rent(pid, duration) or 0
-        discounted = int(round(mrp * RETAINED_FACTOR)) if mrp else 0
+        discounted = pricing.discount(mrp)
         items.append({
             "product_id": pid,
             "product_name": product.get("name", "Product"),
@@ -869,7 +882,7 @@ def _handle_1bhk_package_selection(phone: str, package_id: str, sender_name: str
         f"*{pkg['title']}* package selected.\n{pkg['description']}\n\nPreparing your quote...",
         preview_url=False,
     )
-    time.sleep(0.3)
+    whatsapp_client.pause(phone, 0.3)
 
     _send_browse_quote(phone, sender_name, pkg["title"], items, duration)
 
@@ -915,7 +928,7 @@ def _handle_browse_item_selection(phone: str, sender_name: str, product_id: int)
         return True
 
     mrp = calculate_rent(product_id, duration) or 0
-    discounted = int(round(mrp * RETAINED_FACTOR)) if mrp else 0
+    discounted = pricing.discount(mrp)
     product_name = product.get("name", "Product")
 
     new_item = {
@@ -959,12 +972,12 @@ def _handle_browse_item_selection(phone: str, sender_name: str, product_id: int)
         f"After {_DISCOUNT_PCT}% discount: Rs. {discounted:,}/mo",
     ]
     if duration >= 12 and discounted:
-        upfront_price = int(round(discounted * UPFRONT_RETAINED_FACTOR))
+        upfront_price = pricing.apply_upfront(discounted)
         upfront_save = (mrp - upfront_price) * duration
         pricing_lines.append(f"Pay upfront: Rs. {upfront_price:,}/mo (extra {_UPFRONT_PCT}% off, save Rs. {upfront_save:,} total)")
 
     whatsapp_client.send_text_message(phone, "\n".join(pricing_lines), preview_url=False)
-    time.sleep(0.4)
+    whatsapp_client.pause(phone, 0.4)
 
     # Send the full updated quote with checkout option
     _send_browse_quote(phone, sender_name, product_name, existing_items, duration)
@@ -1034,7 +1047,7 @@ def _try_direct_product_request(phone: str, sender_name: str, text: str) -> bool
             f"I found options for: {', '.join(segment_names)}.\nLet me show you the best options with pricing.",
             preview_url=False,
         )
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
         _send_duration_buttons(phone)
 
     return True
@@ -1057,7 +1070,7 @@ def _send_direct_request_options(phone: str) -> None:
         if len(matches) == 1:
             p = matches[0]
             mrp = calculate_rent(p["id"], duration) or 0
-            disc = int(round(mrp * RETAINED_FACTOR)) if mrp else 0
+            disc = pricing.discount(mrp)
             idx = len(option_list) + 1
             option_list.append((p["id"], p["name"]))
             lines.append(f"{idx}. {p['name']} -- ~Rs. {mrp:,}~ Rs. {disc:,}/mo +GST")
@@ -1065,7 +1078,7 @@ def _send_direct_request_options(phone: str) -> None:
             lines.append(f"*{query_title}:*")
             for p in matches:
                 mrp = calculate_rent(p["id"], duration) or 0
-                disc = int(round(mrp * RETAINED_FACTOR)) if mrp else 0
+                disc = pricing.discount(mrp)
                 idx = len(option_list) + 1
                 option_list.append((p["id"], p["name"]))
                 lines.append(f"{idx}. {p['name']} -- ~Rs. {mrp:,}~ Rs. {disc:,}/mo +GST")
@@ -1125,7 +1138,7 @@ def _handle_direct_selection(phone: str, text: str, sender_name: str) -> bool:
         if not product:
             continue
         mrp = calculate_rent(pid, duration) or 0
-        discounted = int(round(mrp * RETAINED_FACTOR)) if mrp else 0
+        discounted = pricing.discount(mrp)
         items.append({
             "product_id": pid,
             "product_name": product.get("name", pname),
@@ -1331,7 +1344,7 @@ def _handle_share_item_list_input(phone: str, sender_name: str, text: str) -> bo
         if unmatched_names:
             ack += f"\n(Could not match: {', '.join(unmatched_names)})"
         whatsapp_client.send_text_message(phone, ack, preview_url=False)
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
 
         # Ask duration using same buttons as Browse Products
         ctx["browse_step"] = "share_await_duration"
@@ -1373,7 +1386,7 @@ def _build_share_item_list_cart(phone: str, sender_name: str) -> None:
         if not product:
             continue
         mrp = calculate_rent(pid, duration) or 0
-        discounted = int(round(mrp * RETAINED_FACTOR)) if mrp else 0
+        discounted = pricing.discount(mrp)
         cart_items.append({
             "product_id": pid,
             "product_name": product.get("name", it["product_name"]),
@@ -1396,15 +1409,14 @@ def _build_share_item_list_cart(phone: str, sender_name: str) -> None:
             f"Note: I could not find a match for: {', '.join(unmatched_names)}. Showing the items I found.",
             preview_url=False,
         )
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
 
     # Build cart link
     cart_link = _build_browse_cart_link(cart_items, duration)
 
     # Save quote in context (same structure as Browse Products)
     original_monthly = sum(int(it.get("original_rent", 0)) * int(it.get("qty", 1)) for it in cart_items)
-    discounted_monthly = int(round(original_monthly * RETAINED_FACTOR))
-    savings_total = max(0, (original_monthly - discounted_monthly) * duration)
+    discounted_monthly, savings_total = pricing.cart_totals(original_monthly, duration)
 
     ctx["last_browse_quote"] = {
         "items": cart_items,
@@ -1434,7 +1446,7 @@ def _build_share_item_list_cart(phone: str, sender_name: str) -> None:
     # Send the cart estimate (same format as Browse Products)
     quote_text, _, _, _ = _format_browse_estimate(cart_items, duration)
     whatsapp_client.send_text_message(phone, quote_text, preview_url=False)
-    time.sleep(0.4)
+    whatsapp_client.pause(phone, 0.4)
 
     # 3 action buttons (same as Browse Products quote)
     buttons = [
@@ -1492,7 +1504,7 @@ def _apply_browse_cart_modification(phone: str, text: str, sender_name: str) ->
             ctx.pop("last_browse_quote", None)
             ctx.pop("browse_modify_mode", None)
             ctx["browse_step"] = "await_room"
-            time.sleep(0.3)
+            whatsapp_client.pause(phone, 0.3)
             buttons = [
                 {"id": "BROWSE_PRODUCTS", "title": "Browse Products"},
             ]
@@ -1505,7 +1517,7 @@ def _apply_browse_cart_modification(phone: str, text: str, sender_name: str) ->
             return True
 
         whatsapp_client.send_text_message(phone, f"Removed *{removed_name}* from your cart.", preview_url=False)
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
         ctx.pop("browse_modify_mode", None)
         _send_browse_quote(phone, sender_name, "modified cart", new_items, duration)
         return True
@@ -1526,7 +1538,7 @@ def _apply_browse_cart_modification(phone: str, text: str, sender_name: str) ->
             item["duration"] = duration
             mrp = calculate_rent(item["product_id"], duration) or int(item.get("original_rent") or 0)
             item["original_rent"] = mrp
-            item["rent"] = int(round(mrp * RETAINED_FACTOR)) if mrp else 0
+            item["rent"] = pricing.discount(mrp)
 
         existing_pids = {it.get("product_id") for it in items if it.get("product_id")}
         for item in matched_new:
@@ -1553,7 +1565,7 @@ def _apply_browse_cart_modification(phone: str, text: str, sender_name: str) ->
                 ctx.pop("last_browse_quote", None)
                 ctx.pop("browse_modify_mode", None)
                 ctx["browse_step"] = "await_room"
-                time.sleep(0.3)
+                whatsapp_client.pause(phone, 0.3)
                 buttons = [{"id": "BROWSE_PRODUCTS", "title": "Browse Products"}]
                 whatsapp_client.send_interactive_buttons(
                     to_phone=phone, body_text="Would you like to start fresh?",
@@ -1561,7 +1573,7 @@ def _apply_browse_cart_modification(phone: str, text: str, sender_name: str) ->
                 )
                 return True
             whatsapp_client.send_text_message(phone, f"Removed *{removed_name}* from your cart.", preview_url=False)
-            time.sleep(0.3)
+            whatsapp_client.pause(phone, 0.3)
             ctx.pop("browse_modify_mode", None)
             _send_browse_quote(phone, sender_name, "modified cart", items, duration)
             return True
@@ -1604,11 +1616,21 @@ def _build_browse_cart_link(items: List[dict], duration: int) -> str:
 def _format_browse_estimate(items: List[dict], duration: int) -> Tuple[str, int, int, int]:
     # Only calculate on matched items with real prices
     matched_items = [it for it in items if it.get("matched", True) and (it.get("original_rent") or it.get("rent"))]
-    original_monthly = 0
-    for item in matched_items:
-        original_monthly += int(item.get("original_rent") or item.get("rent") or 0) * int(item.get("qty", 1))
-    discounted_monthly = int(round(original_monthly * RETAINED_FACTOR))
-    savings_total = max(0, (original_monthly - discounted_monthly) * int(duration))
+    # The render only reads these fields, so they (in cart order) are the cache key
+    cart = tuple(
+        (item.get("product_id"),
+         item.get("product_name") or item.get("name") or "Product",
+         int(item.get("qty", 1)),
+         int(item.get("original_rent") or item.get("rent") or 0))
+        for item in matched_items
+    )
+    return quote_cache.get_or_render(("browse_estimate", cart, int(duration)), pricing.version,
+                                     lambda: _render_browse_estimate(cart, duration))
+
+
+def _render_browse_estimate(cart: Tuple[tuple, ...], duration: int) -> Tuple[str, int, int, int]:
+    original_monthly = sum(per_unit_mrp * qty for _, _, qty, per_unit_mrp in cart)
+    discounted_monthly, savings_total = pricing.cart_totals(original_monthly, duration)
 
     if original_monthly == 0:
         message = (
@@ -1619,11 +1641,8 @@ def _format_browse_estimate(items: List[dict], duration: int) -> Tuple[str, int,
 
     # Per-item breakdown
     lines = [_step_header(3), "", f"*Your Draft Cart: {duration} Month Rental*", ""]
-    for item in matched_items:
-        name = item.get("product_name") or item.get("name") or "Product"
-        qty = int(item.get("qty", 1))
-        per_unit_mrp = int(item.get("original_rent") or item.get("rent") or 0)
-        per_unit_disc = int(round(per_unit_mrp * RETAINED_FACTOR)) if per_unit_mrp else 0
+    for _, name, qty, per_unit_mrp in cart:
+        per_unit_disc = pricing.discount(per_unit_mrp)
         if qty > 1:
             line_total = per_unit_disc * qty
             lines.append(f"- {name} x{qty}:  Rs. {per_unit_disc:,} x {qty} = Rs. {line_total:,}/mo")
@@ -1637,7 +1656,7 @@ def _format_browse_estimate(items: List[dict], duration: int) -> Tuple[str, int,
 
     # Upfront option for 12+ month rentals
     if duration >= 12:
-        upfront_monthly = int(round(discounted_monthly * UPFRONT_RETAINED_FACTOR))
+        upfront_monthly = pricing.apply_upfront(discounted_monthly)
         upfront_total_saving = max(0, (original_monthly - upfront_monthly) * int(duration))
         lines.append(f"\nPay upfront: Rs. {upfront_monthly:,}/mo  (extra {_UPFRONT_PCT}% off — save Rs. {upfront_total_saving:,} total)")
 
@@ -1696,10 +1715,10 @@ def _send_browse_quote(phone: str, sender_name: str, source_text: str, items: Li
             f"Note: I could not find a match for: {unmatched_names}. Showing the items I found.",
             preview_url=False,
         )
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
 
     whatsapp_client.send_text_message(phone, quote_text, preview_url=False)
-    time.sleep(0.4)
+    whatsapp_client.pause(phone, 0.4)
 
     buttons = [
         {"id": "BROWSE_CHECKOUT", "title": "Checkout"},
@@ -1747,7 +1766,7 @@ def _send_browse_full_details(phone: str, sender_name: str, send_buttons: bool =
         product_name = item.get("product_name") or item.get("name") or "Product"
         qty = int(item.get("qty", 1))
         per_unit_mrp = int(item.get("original_rent") or item.get("rent") or 0)
-        per_unit_disc = int(item.get("rent") or int(round(per_unit_mrp * RETAINED_FACTOR)) if per_unit_mrp else 0)
+        per_unit_disc = int(item.get("rent") or pricing.discount(per_unit_mrp) if per_unit_mrp else 0)
         line_rent = per_unit_disc * qty
         line_mrp = per_unit_mrp * qty
         total_rent += line_rent
@@ -1758,7 +1777,7 @@ def _send_browse_full_details(phone: str, sender_name: str, send_buttons: bool =
         lines.append(f"  ~Rs. {per_unit_mrp:,}/mo~ *Rs. {per_unit_disc:,}/mo* + GST")
 
     # Monthly rent breakdown
-    gst = int(round(total_rent * 0.18))
+    gst = pricing.gst(total_rent)
     net_monthly = total_rent + gst
 
     lines.append("")
@@ -1806,7 +1825,7 @@ def _send_browse_full_details(phone: str, sender_name: str, send_buttons: bool =
     })
 
     whatsapp_client.send_text_message(phone, "\n".join(lines), preview_url=False)
-    time.sleep(0.4)
+    whatsapp_client.pause(phone, 0.4)
 
     # Action buttons (suppressed when called as part of a larger flow, e.g. Checkout)
     if send_buttons:
@@ -1966,7 +1985,7 @@ def _handle_browse_products_text(phone: str, sender_name: str, text: str, messag
                 original_rent = calculate_rent(item["product_id"], duration) or int(item.get("original_rent") or item.get("rent") or 0)
                 item["duration"] = duration
                 item["original_rent"] = original_rent
-                item["rent"] = int(round(original_rent * RETAINED_FACTOR)) if original_rent else 0
+                item["rent"] = pricing.discount(original_rent)
                 if isinstance(product, dict):
                     item["product_name"] = product.get("name") or item.get("product_name")
 
@@ -2052,16 +2071,25 @@ def is_bye(text: str) -> bool:
 
 
 # ── Ghost Timer & 19-Hour Follow-up System ────────────────────────────
-# Track last message timestamp per user.  Two timers per user:
+# Two timers per user, both re-armed on every inbound message:
 #   1) 30-min ghost timer  — if user goes silent for 30 min, send a farewell
 #   2) 19-hour follow-up   — gentle nudge the next day
 #
-# Both are cancelled whenever the user sends a new message.
+# All timers live on one hashed timing wheel (utils/scheduler.py) driven by a
+# single thread and persisted to TIMER_STORE_PATH, so they survive restarts.
+# Fired timers are queued on the phone's dispatcher lane.
 
-_user_timers = {}        # phone -> {"ghost": Timer, "followup": Timer}
-_user_timers_lock = threading.Lock()
 GHOST_TIMEOUT_SECONDS = 30 * 60       # 30 minutes
 FOLLOWUP_DELAY_SECONDS = 19 * 60 * 60  # 19 hours
+TIMER_STORE_PATH = os.getenv(
+    "TIMER_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "timers.sqlite3"),
+)
+
+timer_scheduler = TimerScheduler(
+    store_path=TIMER_STORE_PATH,
+    executor=lambda phone, handler, *args: message_dispatcher.submit(phone, handler, *args),
+)
 
 
 def _send_ghost_message(phone: str):
@@ -2111,37 +2139,21 @@ def _send_followup_message(phone: str):
         print(f"   Error sending 19hr follow-up to {phone}: {e}")
 
 
-def _reset_user_timers(phone: str):
-    """Cancel existing timers and start fresh ghost + follow-up timers for this user."""
-    with _user_timers_lock:
-        existing = _user_timers.get(phone, {})
-        # Cancel any running timers
-        for key in ("ghost", "followup"):
-            timer = existing.get(key)
-            if timer:
-                timer.cancel()
-
-        # Start new ghost timer (30 min)
-        ghost_timer = threading.Timer(GHOST_TIMEOUT_SECONDS, _send_ghost_message, args=(phone,))
-        ghost_timer.daemon = True
-        ghost_timer.start()
+# Overdue timers found at startup are still sent if the outage was shorter
+# than the grace window; otherwise they are dropped as stale.
+timer_scheduler.register("ghost", _send_ghost_message, grace_seconds=GHOST_TIMEOUT_SECONDS)
+timer_scheduler.register("followup", _send_followup_message, grace_seconds=6 * 60 * 60)
 
-        # Start new follow-up timer (19 hours)
-        followup_timer = threading.Timer(FOLLOWUP_DELAY_SECONDS, _send_followup_message, args=(phone,))
-        followup_timer.daemon = True
-        followup_timer.start()
 
-        _user_timers[phone] = {"ghost": ghost_timer, "followup": followup_timer}
+def _reset_user_timers(phone: str):
+    """Re-arm the ghost + follow-up timers for this user (O(1) on the timer wheel)."""
+    timer_scheduler.schedule("ghost", phone, GHOST_TIMEOUT_SECONDS)
+    timer_scheduler.schedule("followup", phone, FOLLOWUP_DELAY_SECONDS)
 
 
 def _cancel_user_timers(phone: str):
     """Cancel all timers for this user (called on bye/exit)."""
-    with _user_timers_lock:
-        existing = _user_timers.pop(phone, {})
-        for key in ("ghost", "followup"):
-            timer = existing.get(key)
-            if timer:
-                timer.cancel()
+    timer_scheduler.cancel_all(phone)
 
 # ========================================
 # SPECIAL CUSTOMER HANDLER
@@ -2168,15 +2180,13 @@ def handle_greeting(phone: str, sender_name: str):
     action_type = "greeting"
 
     try:
-        result = whatsapp_client.send_interactive_buttons(
+        # Falls back to plain text if the interactive message is rejected
+        whatsapp_client.send_interactive_buttons(
             to_phone=phone,
             body_text=greeting_text,
-            buttons=buttons
+            buttons=buttons,
+            fallback_text=greeting_text,
         )
-        if "error" in result:
-            print(f"   \u26a0\ufe0f Interactive buttons failed: {result['error']}")
-            print(f"   \u21a9\ufe0f Falling back to plain text...")
-            whatsapp_client.send_text_message(phone, greeting_text, preview_url=True)
     except Exception as e:
         print(f"   \u274c Error sending greeting buttons: {e}")
         import traceback
@@ -2263,11 +2273,7 @@ def handle_bye(phone: str, sender_name: str):
     _cancel_user_timers(phone)
 
     # Start ONLY the 19hr follow-up (no ghost timer — they said bye explicitly)
-    followup_timer = threading.Timer(FOLLOWUP_DELAY_SECONDS, _send_followup_message, args=(phone,))
-    followup_timer.daemon = True
-    followup_timer.start()
-    with _user_timers_lock:
-        _user_timers[phone] = {"ghost": None, "followup": followup_timer}
+    timer_scheduler.schedule("followup", phone, FOLLOWUP_DELAY_SECONDS)
 
     # Log
     try:
@@ -2313,16 +2319,15 @@ def get_next_fallback_examples() -> str:
 from data.products import (
     search_products_by_name,
     calculate_rent,
-    apply_discount,
     get_product_by_id,
     id_to_name,
+    pricing,
 )
 
 # ---------------------------
 # CONFIG
 # ---------------------------
 
-GST_RATE = 0.18
 DEFAULT_DURATION = 12
 MAX_DURATION = 36
 
@@ -2332,8 +2337,7 @@ openai_client = OpenAI()
 
 # Optional shared state expected by your app
 # session_context = {}
-# per_phone_locks = {}
-# per_phone_locks_lock = threading.Lock()
+# message_dispatcher = ...
 # whatsapp_client = ...
 # normalize_phone = ...
 # get_or_create_session = ...
@@ -2539,7 +2543,7 @@ def parse_cart_items(text: str) -> List[dict]:
         if matches:
             product = matches[0]
             original_rent = calculate_rent(product["id"], duration) or 0
-            final_rent = apply_discount(original_rent) if original_rent else 0
+            final_rent = pricing.discount(original_rent)
 
             items.append({
                 "name": item_text,
@@ -2604,7 +2608,7 @@ def format_sales_cart(items: list, duration: int = DEFAULT_DURATION) -> str:
 
         total_monthly += item_monthly
 
-    gst = int(round(total_monthly * GST_RATE))
+    gst = pricing.gst(total_monthly)
     grand_total = total_monthly + gst
 
     lines.append(
@@ -2768,6 +2772,8 @@ def extract_items_with_llm(user_text: str) -> List[dict]:
                 {"role": "user", "content": user_text.strip()},
             ],
         )
+        # the catalogue prompt is static (sorted catalogue), so it is served from the prompt cache
+        prompt_usage.record_openai("item_extraction", response)
         raw = (response.choices[0].message.content or "").strip()
 
         # Clean markdown fencing if present
@@ -2846,7 +2852,7 @@ def _handle_share_item_list_input_llm(phone: str, sender_name: str, text: str) -
             item_names = [f"{it['qty']}x {it['product_name']}" for it in llm_items]
             ack = f"Got it! I found: {', '.join(item_names)}."
             whatsapp_client.send_text_message(phone, ack, preview_url=False)
-            time.sleep(0.3)
+            whatsapp_client.pause(phone, 0.3)
 
             # Ask duration
             ctx["browse_step"] = "share_await_duration"
@@ -2877,7 +2883,6 @@ def _send_browse_more_preview(phone: str, items: list) -> None:
     adding them to the existing Draft Cart.
     """
     PREVIEW_DURATION = 12
-    UPFRONT_DISCOUNT = UPFRONT_RETAINED_FACTOR  # extra 10% off for 12m+ upfront
 
     lines = ["*Great choice! Here's the Max Savings price (12-month upfront):*", ""]
     any_priced = False
@@ -2893,8 +2898,8 @@ def _send_browse_more_preview(phone: str, items: list) -> None:
         if not mrp:
             lines.append(f"- {qty}x {name}  (pricing on confirmation)")
             continue
-        discounted = int(round(mrp * RETAINED_FACTOR))           # 30% off MRP
-        upfront = int(round(discounted * UPFRONT_DISCOUNT))  # extra 10% off upfront
+        discounted = pricing.discount(mrp)           # 30% off MRP
+        upfront = pricing.apply_upfront(discounted)  # extra 10% off upfront
         line_total = upfront * qty
         any_priced = True
         if qty > 1:
@@ -2907,7 +2912,7 @@ def _send_browse_more_preview(phone: str, items: list) -> None:
         lines.append("_Shown at 12-month upfront rate — the maximum savings._")
 
     whatsapp_client.send_text_message(phone, "\n".join(lines), preview_url=False)
-    time.sleep(0.3)
+    whatsapp_client.pause(phone, 0.3)
 
     buttons = [
         {"id": "BROWSE_MORE_ADD_YES", "title": "Add to Draft Cart"},
@@ -2966,7 +2971,7 @@ def _merge_browse_more_into_cart(phone: str, sender_name: str) -> None:
             mrp = calculate_rent(pid, duration) or 0
         except Exception:
             mrp = 0
-        discounted = int(round(mrp * RETAINED_FACTOR)) if mrp else 0
+        discounted = pricing.discount(mrp)
         name = (product or {}).get("name") or it.get("product_name") or "Product"
         existing_items.append({
             "product_id": pid,
@@ -2992,13 +2997,12 @@ def _merge_browse_more_into_cart(phone: str, sender_name: str) -> None:
             f"Added to your cart: {', '.join(added_names)}.",
             preview_url=False,
         )
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
 
     # Recompute totals + cart link, re-render the draft cart view
     matched_items = [it for it in existing_items if it.get("matched", True) and it.get("product_id")]
     original_monthly = sum(int(it.get("original_rent") or 0) * int(it.get("qty", 1)) for it in matched_items)
-    discounted_monthly = int(round(original_monthly * RETAINED_FACTOR))
-    savings_total = max(0, (original_monthly - discounted_monthly) * duration)
+    discounted_monthly, savings_total = pricing.cart_totals(original_monthly, duration)
     cart_link = _build_browse_cart_link(matched_items, duration)
 
     ctx["last_browse_quote"] = {
@@ -3025,7 +3029,7 @@ def _merge_browse_more_into_cart(phone: str, sender_name: str) -> None:
 
     quote_text, _, _, _ = _format_browse_estimate(matched_items, duration)
     whatsapp_client.send_text_message(phone, quote_text, preview_url=False)
-    time.sleep(0.4)
+    whatsapp_client.pause(phone, 0.4)
 
     buttons = [
         {"id": "BROWSE_CHECKOUT", "title": "Checkout"},
@@ -3062,7 +3066,7 @@ def build_and_send_sales_cart(phone: str, sender_name: str, text: str, source: s
             phone,
             f"Could not find: {unmatched_names}. Try more specific names (e.g. 'single door fridge' instead of 'fridge').",
         )
-        time.sleep(0.3)
+        whatsapp_client.pause(phone, 0.3)
 
     # Build cart text with only matched items (or show "no matches" message)
     cart_text = format_sales_cart(matched, duration)
@@ -3077,7 +3081,7 @@ def build_and_send_sales_cart(phone: str, sender_name: str, text: str, source: s
     session_context[phone] = ctx
 
     whatsapp_client.send_text_message(phone, cart_text)
-    time.sleep(0.5)
+    whatsapp_client.pause(phone, 0.5)
 
     # Only show action buttons if we have matched items
     if matched:
@@ -3197,7 +3201,7 @@ def _apply_cart_modification(phone: str, text: str) -> bool:
         # Rebuild and resend the cart with remaining items
         cart_text = format_sales_cart(new_cart, duration)
         whatsapp_client.send_text_message(phone, cart_text)
-        time.sleep(0.5)
+        whatsapp_client.pause(phone, 0.5)
 
         cart_buttons = [
             {"id": "UPFRONT_PAYMENT", "title": "Upfront Payment"},
@@ -3227,7 +3231,7 @@ def _apply_cart_modification(phone: str, text: str) -> bool:
 
         cart_text = format_sales_cart(combined_cart, duration)
         whatsapp_client.send_text_message(phone, cart_text)
-        time.sleep(0.5)
+        whatsapp_client.pause(phone, 0.5)
 
         cart_buttons = [
             {"id": "UPFRONT_PAYMENT", "title": "Upfront Payment"},
@@ -3246,123 +3250,105 @@ def _apply_cart_modification(phone: str, text: str) -> bool:
 
 def process_sales_text_async(phone: str, sender_name: str, text: str, message_id: str):
     """
-    Background thread: build cart from typed text in SALES mode.
+    Background job (dispatcher worker): build cart from typed text in SALES mode.
     If in modify mode, try to apply add/remove to existing cart first.
     """
-    with per_phone_locks_lock:
-        if phone not in per_phone_locks:
-            per_phone_locks[phone] = threading.Lock()
-        user_lock = per_phone_locks[phone]
+    try:
+        ctx = session_context.get(phone, {})
+        # If in modify mode, try to apply modification to existing cart
+        if ctx.get("sales_modify_mode") or ctx.get("last_cart"):
+            if _apply_cart_modification(phone, text):
+                print(f"Sales cart modified for {phone}")
+                return
 
-    with user_lock:
-        try:
-            ctx = session_context.get(phone, {})
-            # If in modify mode, try to apply modification to existing cart
-            if ctx.get("sales_modify_mode") or ctx.get("last_cart"):
-                if _apply_cart_modification(phone, text):
-                    print(f"Sales cart modified for {phone}")
-                    return
-
-            # Otherwise build fresh cart
-            build_and_send_sales_cart(phone, sender_name, text, source="text")
-            print(f"Sales cart sent to {phone} from text")
-        except Exception as e:
-            print(f"Error building sales cart for {phone}: {e}")
-            import traceback
-            traceback.print_exc()
-            whatsapp_client.send_text_message(
-                phone,
-                "Sorry, I couldn't process that. Please try again with product names like: bed, fridge, sofa, AC, washing machine."
-            )
+        # Otherwise build fresh cart
+        build_and_send_sales_cart(phone, sender_name, text, source="text")
+        print(f"Sales cart sent to {phone} from text")
+    except Exception as e:
+        print(f"Error building sales cart for {phone}: {e}")
+        import traceback
+        traceback.print_exc()
+        whatsapp_client.send_text_message(
+            phone,
+            "Sorry, I couldn't process that. Please try again with product names like: bed, fridge, sofa, AC, washing machine."
+        )
 
 
 def process_sales_audio_async(phone: str, sender_name: str, media_id: str, message_id: str):
     """
-    Background thread: download audio, transcribe it, then build cart.
+    Background job (dispatcher worker): download audio, transcribe it, then build cart.
     """
-    with per_phone_locks_lock:
-        if phone not in per_phone_locks:
-            per_phone_locks[phone] = threading.Lock()
-        user_lock = per_phone_locks[phone]
-
-    with user_lock:
-        try:
-            # Step 1: Download audio
-            audio_bytes = whatsapp_client.download_media(media_id)
-            if not audio_bytes:
-                whatsapp_client.send_text_message(
-                    phone,
-                    "Sorry, I couldn't download your voice message. Please type your cart items instead."
-                )
-                return
-
-            # Step 2: Transcribe
-            transcribed_text = transcribe_audio_bytes(audio_bytes, filename="voice_note.ogg")
-            if not transcribed_text:
-                whatsapp_client.send_text_message(
-                    phone,
-                    "I couldn't understand the voice message. Please try again or type your cart items."
-                )
-                return
-
-            # Step 3: Confirm what was heard
-            whatsapp_client.send_text_message(phone, f'You said: "{transcribed_text}"')
-            time.sleep(0.3)
-
-            # Step 4: Build real cart from transcript
-            build_and_send_sales_cart(phone, sender_name, transcribed_text, source="voice")
-            print(f"Sales cart sent to {phone} from voice note")
+    try:
+        # Step 1: Download audio
+        audio_bytes = whatsapp_client.download_media(media_id)
+        if not audio_bytes:
+            whatsapp_client.send_text_message(
+                phone,
+                "Sorry, I couldn't download your voice message. Please type your cart items instead."
+            )
+            return
 
-        except Exception as e:
-            print(f"Error processing sales audio for {phone}: {e}")
-            import traceback
-            traceback.print_exc()
+        # Step 2: Transcribe
+        transcribed_text = transcribe_audio_bytes(audio_bytes, filename="voice_note.ogg")
+        if not transcribed_text:
             whatsapp_client.send_text_message(
                 phone,
-                "Sorry, I couldn't process your voice message. Please type your cart items instead."
+                "I couldn't understand the voice message. Please try again or type your cart items."
             )
+            return
 
+        # Step 3: Confirm what was heard
+        whatsapp_client.send_text_message(phone, f'You said: "{transcribed_text}"')
+        whatsapp_client.pause(phone, 0.3)
 
-def process_browse_audio_async(phone: str, sender_name: str, media_id: str, message_id: str):
-    """
-    Background thread: download audio, transcribe it, then continue the browse flow.
-    """
-    with per_phone_locks_lock:
-        if phone not in per_phone_locks:
-            per_phone_locks[phone] = threading.Lock()
-        user_lock = per_phone_locks[phone]
+        # Step 4: Build real cart from transcript
+        build_and_send_sales_cart(phone, sender_name, transcribed_text, source="voice")
+        print(f"Sales cart sent to {phone} from voice note")
 
-    with user_lock:
-        try:
-            audio_bytes = whatsapp_client.download_media(media_id)
-            if not audio_bytes:
-                whatsapp_client.send_text_message(
-                    phone,
-                    "Sorry, I couldn't download your voice message. Please type the duration or the product list instead."
-                )
-                return
+    except Exception as e:
+        print(f"Error processing sales audio for {phone}: {e}")
+        import traceback
+        traceback.print_exc()
+        whatsapp_client.send_text_message(
+            phone,
+            "Sorry, I couldn't process your voice message. Please type your cart items instead."
+        )
 
-            transcribed_text = transcribe_audio_bytes(audio_bytes, filename="browse_voice_note.ogg")
-            if not transcribed_text:
-                whatsapp_client.send_text_message(
-                    phone,
-                    "I couldn't understand the voice message. Please try again or type the duration/product list."
-                )
-                return
 
-            whatsapp_client.send_text_message(phone, f'You said: "{transcribed_text}"')
-            time.sleep(0.3)
-            _handle_browse_products_text(phone, sender_name, transcribed_text, message_id)
-            print(f"Browse flow handled for {phone} from voice note")
+def process_browse_audio_async(phone: str, sender_name: str, media_id: str, message_id: str):
+    """
+    Background job (dispatcher worker): download audio, transcribe it, then continue the browse flow.
+    """
+    try:
+        audio_bytes = whatsapp_client.download_media(media_id)
+        if not audio_bytes:
+            whatsapp_client.send_text_message(
+                phone,
+                "Sorry, I couldn't download your voice message. Please type the duration or the product list instead."
+            )
+            return
 
-        except Exception as e:
-            print(f"Error processing browse audio for {phone}: {e}")
-            import traceback
-            traceback.print_exc()
+        transcribed_text = transcribe_audio_bytes(audio_bytes, filename="browse_voice_note.ogg")
+        if not transcribed_text:
             whatsapp_client.send_text_message(
                 phone,
-                "Sorry, I couldn't process your voice message. Please type the duration or product list instead."
+                "I couldn't understand the voice message. Please try again or type the duration/product list."
             )
+            return
+
+        whatsapp_client.send_text_message(phone, f'You said: "{transcribed_text}"')
+        whatsapp_client.pause(phone, 0.3)
+        _handle_browse_products_text(phone, sender_name, transcribed_text, message_id)
+        print(f"Browse flow handled for {phone} from voice note")
+
+    except Exception as e:
+        print(f"Error processing browse audio for {phone}: {e}")
+        import traceback
+        traceback.print_exc()
+        whatsapp_client.send_text_message(
+            phone,
+            "Sorry, I couldn't process your voice message. Please type the duration or product list instead."
+        )
 
 # FLASK APP
 # ========================================
@@ -3381,17 +3367,113 @@ processed_ids_dict = {}  # message_id -> timestamp
 MAX_CACHE_SIZE = 500
 CACHE_EXPIRY_SECONDS = 300  # 5 minutes
 
-# THREAD SAFETY: Global lock for shared dictionaries and per-phone processing
+# THREAD SAFETY: Global lock for shared dictionaries.
+# Per-phone ordering is provided by message_dispatcher (one FIFO lane per phone).
 conversations_lock = threading.Lock()
-per_phone_locks = {}  # phone_number -> threading.Lock
-per_phone_locks_lock = threading.Lock() # Lock for the per_phone_locks dict itself
 
 # Initialize WhatsApp client
-whatsapp_client = WhatsAppClient(
+whatsapp_api = WhatsAppClient(
     phone_number_id=PHONE_NUMBER_ID,
     access_token=ACCESS_TOKEN,
     demo_mode=False  # Real mode!
 )
+# All handler sends go through the outbound queue: send_* enqueue and return
+# immediately, pacing uses whatsapp_client.pause(phone, s) instead of time.sleep.
+whatsapp_client = OutboundQueue(whatsapp_api)
+
+
+def _notify_shed(phone: str) -> None:
+    """Tell the customer their message was dropped while we were overloaded."""
+    whatsapp_client.send_text_message(
+        phone,
+        "Sorry, we're handling a lot of messages right now and couldn't get to yours in time. "
+        "Could you please send it again?"
+    )
+
+
+# Fixed-size worker pool with one FIFO queue per phone (replaces thread-per-message).
+message_dispatcher = MessageDispatcher(on_shed=_notify_shed, name="webhook-worker")
+
+
+# How long a message Meta was already sent a 200 for waits for dispatcher room.
+ACKED_DISPATCH_WAIT_SECONDS = float(os.getenv("ACKED_DISPATCH_WAIT_SECONDS", "30"))
+
+
+def _dispatch(phone: str, message_id: str, reply: dict, target, *args):
+    """
+    Queue a background job on the phone's FIFO lane and return the webhook reply.
+    When the dispatcher is saturated the message is deferred: we forget its ID
+    and answer 503 so Meta redelivers it later instead of us dropping it.
+
+    The async front end acknowledges before processing (g.delivery_acked), so
+    Meta will not redeliver: there we wait for room, and if none frees up the
+    message is dropped, the customer asked to resend, and 503 returned.
+    """
+    if g.get("delivery_acked"):
+        if message_dispatcher.submit_wait(phone, ACKED_DISPATCH_WAIT_SECONDS, target, *args):
+            return jsonify(reply), 200
+        print(f"   ❌ Dispatcher still full after {ACKED_DISPATCH_WAIT_SECONDS:g}s, dropping {message_id} for {phone}")
+        _notify_shed(phone)
+        return jsonify({"status": "dropped", "reason": "dispatcher_saturated"}), 503
+
+    if message_dispatcher.submit(phone, target, *args):
+        return jsonify(reply), 200
+
+    print(f"   ⚠️ Dispatcher saturated, deferring {message_id} for {phone}")
+    if message_id:
+        with conversations_lock:
+            processed_ids_dict.pop(message_id, None)
+    return jsonify({"status": "deferred", "reason": "dispatcher_saturated"}), 503
+
+
+# Open the persisted knowledge index in the background after boot, so the first
+# policy question does not pay for loading (or refreshing) it.
+PRELOAD_KNOWLEDGE_INDEX = os.getenv("PRELOAD_KNOWLEDGE_INDEX", "true").lower() == "true"
+_knowledge_preload_started = False
+
+
+def _preload_knowledge_index():
+    try:
+        from agents.sales_agent import get_vectorstore
+        get_vectorstore()
+    except Exception as e:
+        print(f"⚠️ Knowledge index preload failed: {e}")
+    try:
+        from rag.embedding_cache import cached_openai_embeddings, top_logged_queries
+        log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+        report = cached_openai_embeddings().warm_up(top_logged_queries(log_dir, segment_log=segment_log))
+        print(f"Embedding cache warm: {report['loaded']} loaded, {report['embedded']} embedded")
+    except Exception as e:
+        print(f"⚠️ Embedding cache warm-up failed: {e}")
+
+
+# Compile the agent graphs and build the LLM clients once at boot, instead of
+# on the first customer message (or, before, on every recommendation turn).
+WARM_AGENTS = os.getenv("WARM_AGENTS", "true").lower() == "true"
+_agent_warmup_started = False
+
+
+def _warm_agents():
+    report = warm_agents()
+    failed = {name: result for name, result in report.items() if isinstance(result, str)}
+    if failed:
+        print(f"⚠️ Agent warm-up failed for: {failed}")
+    print(f"Agents warm: {len(report) - len(failed)}/{len(report)} built")
+
+
+@app.before_request
+def _start_timer_scheduler():
+    """Start the timer wheel (and restore persisted timers) on the first request after boot."""
+    global _knowledge_preload_started, _agent_warmup_started
+    if timer_scheduler.autostart and not timer_scheduler.running:
+        timer_scheduler.start()
+    if PRELOAD_KNOWLEDGE_INDEX and not _knowledge_preload_started:
+        _knowledge_preload_started = True
+        threading.Thread(target=_preload_knowledge_index, name="knowledge-preload", daemon=True).start()
+    if WARM_AGENTS and not _agent_warmup_started:
+        _agent_warmup_started = True
+        threading.Thread(target=_warm_agents, name="agent-warmup", daemon=True).start()
+
 
 # Verify Firebase connectivity at startup
 try:
@@ -3399,6 +3481,9 @@ try:
     _fb_db = _startup_get_db()
     if _fb_db:
         print("Firebase: Connected")
+        # Multi-instance deployments: refresh cached leads other instances update
+        if os.getenv("LEAD_CACHE_LISTENER", "false").lower() == "true" and watch_lead_updates():
+            print("   Lead cache listener attached")
     else:
         print("CRITICAL: Firebase NOT initialized -- leads will NOT be saved!")
         print("   Check that FIREBASE_CONFIG environment variable is set correctly.")
@@ -3425,81 +3510,203 @@ def home():
     })
 
 
+# name -> zero-arg callable returning a JSON-able dict, reported by /stats
+_stats_providers = {
+    "dispatcher": lambda: message_dispatcher.stats(),
+    "timers": lambda: timer_scheduler.stats(),
+    "whatsapp": lambda: whatsapp_api.stats(),
+    "outbound": lambda: whatsapp_client.stats(),
+    "intent_cache": lambda: intent_cache.stats(),
+    "intent_classifier": classifier_stats,
+    "embedding_cache": lambda: embedding_cache.stats(),
+    "quote_cache": lambda: quote_cache.stats(),
+    "firestore_writer": lambda: firestore_writer.stats(),
+    "document_cache": lambda: document_cache.stats(),
+    "log_writer": lambda: segment_log.stats(),
+    "agents": lambda: agent_registry.stats(),
+    "context_window": lambda: context_window.stats(),
+    "tools": lambda: tool_runner.stats(),
+    "prompt_cache": lambda: prompt_usage.stats(),
+}
+
+
+def register_stats_provider(name: str, provider) -> None:
+    """Expose another subsystem's counters on the /stats endpoint."""
+    _stats_providers[name] = provider
+
+
+@app.route("/stats", methods=["GET"])
+def runtime_stats():
+    """Runtime counters (queue depth, wait times, ...). Auth: ?secret=YOUR_VERIFY_TOKEN"""
+    if request.args.get("secret") != VERIFY_TOKEN:
+        return "Forbidden", 403
+    report = {"threads": threading.active_count()}
+    for name, provider in list(_stats_providers.items()):
+        try:
+            report[name] = provider()
+        except Exception as e:
+            report[name] = {"error": str(e)}
+    return jsonify(report)
+
+
 # ========================================
 # LOG DOWNLOAD ENDPOINTS (for production testing)
 # ========================================
 
 LOGS_SECRET = VERIFY_TOKEN  # Reuse the webhook verify token as auth
 
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+_LOG_CHUNK_BYTES = 64 * 1024
+# A sync cursor is handed out this far in the past, so lines that were being
+# appended while the listing was taken are picked up again by the next sync
+_LOG_CURSOR_OVERLAP_SECONDS = 5.0
+
+
+class _LogFilter:
+    """
+    Query-string filters shared by the /logs endpoints:
+      prefix=9198       only phones starting with these digits
+      from=2026-01-01   only entries on or after this (server-local) date
+      to=2026-01-31     only entries on or before this date
+      since=<cursor>    only logs changed since a previous response's cursor
+    Raises ValueError on malformed values.
+    """
+
+    def __init__(self, args):
+        self.prefix = args.get("prefix", "")
+        if self.prefix and not self.prefix.isdigit():
+            raise ValueError("prefix must be digits")
+        self.start = self._day(args.get("from"))
+        end = self._day(args.get("to"))
+        self.end = end + 86400 if end is not None else None
+        self.changed_since = float(args["since"]) if args.get("since") else None
+        # Taken before the listing flushes the log writer
+        self.cursor = f"{time.time() - _LOG_CURSOR_OVERLAP_SECONDS:.3f}"
+
+    @staticmethod
+    def _day(value):
+        return datetime.strptime(value, "%Y-%m-%d").timestamp() if value else None
+
+    def wants(self, first_ts, last_ts):
+        if self.changed_since is not None and last_ts < self.changed_since:
+            return False
+        if self.start is not None and last_ts < self.start:
+            return False
+        return self.end is None or first_ts < self.end
+
+
+def _log_files(log_filter):
+    """
+    {filename: (size_bytes, mtime)} for the conversation logs a filter selects:
+    phones in the segment log (from its index) and legacy logs/<phone>.txt files
+    (history from before segments were switched on). A phone with both is one
+    log: the .txt followed by its segment entries. Legacy files have no per-line
+    times, so their modification time stands in for both ends.
+    """
+    logs = {}   # name -> [size, first_ts, last_ts]
+    for row in segment_log.phones(log_filter.prefix):
+        logs[f"{row['phone']}.txt"] = [row["bytes"], row["first_ts"], row["last_ts"]]
+    if os.path.exists(LOG_DIR):
+        with os.scandir(LOG_DIR) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.endswith(".txt") or not name.startswith(log_filter.prefix) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                size, first_ts, last_ts = logs.get(name, (0, stat.st_mtime, stat.st_mtime))
+                logs[name] = [size + stat.st_size, min(first_ts, stat.st_mtime), max(last_ts, stat.st_mtime)]
+    return {name: (size, last_ts) for name, (size, first_ts, last_ts) in logs.items()
+            if log_filter.wants(first_ts, last_ts)}
+
+
+def _log_chunks(filename, log_filter=None):
+    """
+    Stream one whole log (a `since` filter selects logs, not lines): the legacy
+    .txt file if there is one, then the phone's segment entries. from / to
+    limit the segment entries by time and drop a legacy file last written
+    before `from`.
+    """
+    phone = filename[:-len(".txt")]
+    since, until = (log_filter.start, log_filter.end) if log_filter else (None, None)
+    legacy = os.path.join(LOG_DIR, filename)
+    if os.path.exists(legacy) and (since is None or os.path.getmtime(legacy) >= since):
+        with open(legacy, "rb") as f:
+            while True:
+                chunk = f.read(_LOG_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    if segment_log.count(phone):
+        for entry in segment_log.iter_entries(phone, since, until):
+            yield entry.encode("utf-8")
+
+
 @app.route("/logs", methods=["GET"])
 def list_logs():
-    """List all log files. Auth: ?secret=YOUR_VERIFY_TOKEN"""
+    """List log files (filters: prefix, from, to, since). Auth: ?secret=YOUR_VERIFY_TOKEN"""
     if request.args.get("secret") != LOGS_SECRET:
         return "Forbidden", 403
-    
-    log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-    if not os.path.exists(log_dir):
-        return jsonify({"files": []})
+    try:
+        log_filter = _LogFilter(request.args)
+    except ValueError as e:
+        return f"Bad request: {e}", 400
     
     files = []
-    for f in sorted(os.listdir(log_dir)):
-        if f.endswith(".txt"):
-            path = os.path.join(log_dir, f)
-            files.append({
-                "name": f,
-                "size_bytes": os.path.getsize(path),
-                "url": f"/logs/{f}?secret={LOGS_SECRET}"
-            })
-    return jsonify({"files": files})
+    for name, (size, mtime) in sorted(_log_files(log_filter).items()):
+        files.append({
+            "name": name,
+            "size_bytes": size,
+            "modified_at": mtime,
+            "url": f"/logs/{name}?secret={LOGS_SECRET}"
+        })
+    return jsonify({"files": files, "cursor": log_filter.cursor})
 
 
 @app.route("/logs/<filename>", methods=["GET"])
 def download_log(filename):
-    """Download a specific log file. Auth: ?secret=YOUR_VERIFY_TOKEN"""
+    """Download a specific log file (filters: from, to). Auth: ?secret=YOUR_VERIFY_TOKEN"""
     if request.args.get("secret") != LOGS_SECRET:
         return "Forbidden", 403
     
     # Sanitize filename to prevent directory traversal
-    if ".." in filename or "/" in filename:
+    if ".." in filename or "/" in filename or not filename.endswith(".txt"):
         return "Bad request", 400
+    try:
+        log_filter = _LogFilter(request.args)
+    except ValueError as e:
+        return f"Bad request: {e}", 400
     
-    log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-    log_path = os.path.join(log_dir, filename)
-    
-    if not os.path.exists(log_path):
+    if not segment_log.count(filename[:-len(".txt")]) and not os.path.exists(os.path.join(LOG_DIR, filename)):
         return "Not found", 404
     
-    with open(log_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    
-    from flask import Response
-    return Response(content, mimetype="text/plain",
+    return Response(_log_chunks(filename, log_filter), mimetype="text/plain",
                     headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 @app.route("/logs/download-all", methods=["GET"])
 def download_all_logs():
-    """Download ALL log files as a single zip. Auth: ?secret=YOUR_VERIFY_TOKEN"""
+    """
+    Download log files as a single zip, streamed as it is built (filters: prefix,
+    from, to, since). The X-Log-Cursor header is the `since` for the next
+    incremental download. Auth: ?secret=YOUR_VERIFY_TOKEN
+    """
     if request.args.get("secret") != LOGS_SECRET:
         return "Forbidden", 403
+    try:
+        log_filter = _LogFilter(request.args)
+    except ValueError as e:
+        return f"Bad request: {e}", 400
     
-    import zipfile
-    import io
-    
-    log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-    if not os.path.exists(log_dir):
+    files = _log_files(log_filter)
+    if not files:
+        if log_filter.changed_since is not None:
+            return "", 204, {"X-Log-Cursor": log_filter.cursor}   # nothing changed
         return "No logs yet", 404
     
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for f in sorted(os.listdir(log_dir)):
-            if f.endswith(".txt"):
-                zf.write(os.path.join(log_dir, f), f)
-    
-    buf.seek(0)
-    from flask import send_file
-    return send_file(buf, mimetype="application/zip",
-                     as_attachment=True, download_name="rentbasket_logs.zip")
+    members = ((name, _log_chunks(name, log_filter), mtime) for name, (_, mtime) in sorted(files.items()))
+    return Response(stream_zip(members), mimetype="application/zip",
+                    headers={"Content-Disposition": "attachment; filename=rentbasket_logs.zip",
+                             "X-Log-Cursor": log_filter.cursor})
 
 
 @app.route("/webhook", methods=["GET"])
@@ -3525,6 +3732,10 @@ def verify_webhook():
     return "Forbidden", 403
 
 
+# Stream agent replies: send each "|||" part as soon as the model has written it
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "true").lower() == "true"
+
+
 def format_bot_response(text: str) -> str:
     """
     Apply formatting rules to bot response.
@@ -3536,263 +3747,307 @@ def format_bot_response(text: str) -> str:
     return text.replace("**", "*")
 
 
-def process_webhook_async(phone, text, sender_name, message_id, message_type, interactive_response, quoted_message_id=None, reaction=None):
+def _send_reply_part(phone: str, msg: str) -> bool:
     """
-    Process the message logic in a background thread.
-    Uses a per-phone lock to ensure messages from the same user are processed sequentially.
+    Send one "|||" part of an agent reply, rendering the support list / button
+    and cart / handoff markers. Returns True when split messages should be
+    paced after it.
     """
-    # 1. Get or create a lock for this specific phone number
-    with per_phone_locks_lock:
-        if phone not in per_phone_locks:
-            per_phone_locks[phone] = threading.Lock()
-        user_lock = per_phone_locks[phone]
-
-    # 2. Acquire user_lock to ensure FIFO processing for this user
-    with user_lock:
-        print(f"   🔒 Processing message {message_id} for {phone} (Lock acquired)")
+    # --- CUSTOM UX HANDLER FOR NEW SUPPORT STRUCTURE ---
+    import utils.support_menus as sm_menus
+
+    # Handling structured Support Lists
+    if msg.startswith("[SEND_SUPPORT_LIST:"):
+        menu_key = msg.replace("[SEND_SUPPORT_LIST:", "").replace("]", "").strip()
+        menu_dict = getattr(sm_menus, menu_key, None)
+        if menu_dict:
+            whatsapp_client.send_list_message(
+                to_phone=phone,
+                body_text=menu_dict.get("body_text", "Options:"),
+                button_text=menu_dict.get("button_text", "Select"),
+                sections=menu_dict.get("sections", []),
+                header=menu_dict.get("header")
+            )
+        return False
+
+    # Handling structured Support Buttons
+    elif msg.startswith("[SEND_SUPPORT_BUTTONS:"):
+        # Format: [SEND_SUPPORT_BUTTONS:VAR_NAME|Header text|Body text|Footer text]
+        raw_data = msg.replace("[SEND_SUPPORT_BUTTONS:", "").replace("]", "").split("|")
+        var_name = raw_data[0].strip()
+        buttons_list = getattr(sm_menus, var_name, [])
+
+        if buttons_list:
+            head = raw_data[1].strip() if len(raw_data) > 1 and raw_data[1].strip() else None
+            body = raw_data[2].strip() if len(raw_data) > 2 and raw_data[2].strip() else "Please choose an option:"
+            foot = raw_data[3].strip() if len(raw_data) > 3 and raw_data[3].strip() else None
+
+            whatsapp_client.send_interactive_buttons(
+                to_phone=phone, body_text=body, buttons=buttons_list, header=head, footer=foot
+            )
+        return False
+
+    # ── Cart Confirmation Buttons ──────────────────────────────
+    elif "[SEND_CART_BUTTONS]" in msg:
+        # Send the cart text first, then send the action buttons separately
+        cart_text = msg.replace("[SEND_CART_BUTTONS]", "").strip()
+        if cart_text:
+            whatsapp_client.send_text_message(phone, cart_text, preview_url=False)
+            whatsapp_client.pause(phone, 0.6)
+
+        # Hot-lead detection → swap primary button + add footer
         try:
-            # 10-Digit Normalization for RentBasket
-            normalized_phone = normalize_phone(phone)
+            from utils.firebase_client import is_hot_lead
+            _hot = is_hot_lead(normalize_phone(phone))
+        except Exception:
+            _hot = False
+
+        if _hot:
+            primary_btn = {"id": "RESERVE_SETUP", "title": "Reserve Now"}
+            cart_footer = "Free delivery locked in for you!"
+        else:
+            primary_btn = {"id": "RESERVE_SETUP", "title": "Reserve Now"}
+            cart_footer = None
+
+        cart_action_buttons = [
+            primary_btn,
+            {"id": "TALK_TO_EXPERT", "title": "Talk to Expert"},
+        ]
+        whatsapp_client.send_interactive_buttons(
+            to_phone=phone,
+            body_text="What would you like to do?",
+            buttons=cart_action_buttons,
+            footer=cart_footer,
+        )
+        return False
+
+    # Standard handoff handler
+    elif "[SEND_HANDOFF_BUTTONS]" in msg:
+        clean_msg = msg.replace("[SEND_HANDOFF_BUTTONS]", "").strip()
+        handoff_buttons = [
+            {"id": "CALL_ME", "title": "Call me"},
+            {"id": "WHATSAPP", "title": "Chat here"}
+        ]
+        whatsapp_client.send_interactive_buttons(
+            to_phone=phone,
+            body_text=clean_msg,
+            buttons=handoff_buttons
+        )
+    else:
+        # Plain text
+        whatsapp_client.send_text_message(phone, msg, preview_url="http" in msg)
+
+    return True
+
+
+# WhatsApp drops the "typing…" indicator after ~25 s or when a message arrives
+TYPING_REFRESH_SECONDS = 20.0
+
+
+class _ReplyStream:
+    """
+    Sends a streamed reply's parts as soon as the agent closes them, and keeps
+    the typing indicator showing while the rest is still being written.
+    """
+
+    def __init__(self, phone: str):
+        self.phone = phone
+        self._typing_at = time.monotonic()
+
+    def send(self, segment: str) -> None:
+        msg = format_bot_response(segment).strip()
+        if msg:
+            paced = _send_reply_part(self.phone, msg)
+            self.keep_typing(force=True)   # the part just sent cleared it
+            if paced:
+                whatsapp_client.pause(self.phone, 0.5)
+
+    def keep_typing(self, force: bool = False) -> None:
+        if force or time.monotonic() - self._typing_at >= TYPING_REFRESH_SECONDS:
+            whatsapp_client.send_typing_indicator(self.phone)
+            self._typing_at = time.monotonic()
+
+
+def process_webhook_async(phone, text, sender_name, message_id, message_type, interactive_response, quoted_message_id=None, reaction=None):
+    """
+    Process the message logic on a dispatcher worker.
+    The dispatcher runs one job per phone at a time, so messages from the same
+    user are processed sequentially (FIFO) without a per-phone lock.
+    Lead updates made during the turn are written once, when it finishes.
+    """
+    with lead_update_batch(normalize_phone(phone)):
+        _process_message(phone, text, sender_name, message_id, message_type, interactive_response,
+                         quoted_message_id, reaction)
+
+
+def _process_message(phone, text, sender_name, message_id, message_type, interactive_response, quoted_message_id=None, reaction=None):
+    print(f"   Processing message {message_id} for {phone}")
+    try:
+        # 10-Digit Normalization for RentBasket
+        normalized_phone = normalize_phone(phone)
             
-            # Check for pricing negotiation intent
-            if is_pricing_negotiation(text):
-                print(f"   💰 Pricing negotiation detected!")
-                handle_pricing_negotiation(phone, sender_name, text, message_id)
-                return
+        # Check for pricing negotiation intent
+        if is_pricing_negotiation(text):
+            print(f"   💰 Pricing negotiation detected!")
+            handle_pricing_negotiation(phone, sender_name, text, message_id)
+            return
 
-            # Get state within the global conversations lock
-            with conversations_lock:
-                if phone not in conversations:
-                    conversations[phone] = create_initial_state()
-                    # Restore persisted lead data (duration, name, location) from Firestore
-                    conversations[phone] = restore_lead_to_state(normalized_phone, conversations[phone])
-                    start_new_session(normalized_phone, sender_name)
-                    print(f"   New conversation started for {normalized_phone}")
-                state = conversations[phone]
+        # Get state within the global conversations lock
+        with conversations_lock:
+            if phone not in conversations:
+                conversations[phone] = create_initial_state()
+                # Restore persisted lead data (duration, name, location) from Firestore
+                conversations[phone] = restore_lead_to_state(normalized_phone, conversations[phone])
+                start_new_session(normalized_phone, sender_name)
+                print(f"   New conversation started for {normalized_phone}")
+            state = conversations[phone]
             
-            # Get or create DB session (use normalized phone for consistency)
-            session_id = get_or_create_session(normalized_phone, sender_name)
+        # Get or create DB session (use normalized phone for consistency)
+        session_id = get_or_create_session(normalized_phone, sender_name)
             
-            # Ensure customer name and phone are in state
-            if sender_name and not state["collected_info"].get("customer_name"):
-                state["collected_info"]["customer_name"] = sender_name
+        # Ensure customer name and phone are in state
+        if sender_name and not state["collected_info"].get("customer_name"):
+            state["collected_info"]["customer_name"] = sender_name
             
-            # Always use normalized phone for state consistency
-            state["collected_info"]["phone"] = normalized_phone
+        # Always use normalized phone for state consistency
+        state["collected_info"]["phone"] = normalized_phone
 
-            # --- EARLY LEAD CREATION (safety net — runs before agent processing) ---
-            try:
-                if not get_lead(normalized_phone):
-                    upsert_lead(normalized_phone, {
-                        "name": sender_name or "New Lead",
-                        "phone": normalized_phone,
-                        "push_name": sender_name,
-                        "lead_stage": "new"
-                    })
-                    print(f"   Lead created for {normalized_phone}")
-            except Exception as e:
-                print(f"   CRITICAL: Early lead creation failed for {normalized_phone}: {e}")
+        # --- EARLY LEAD CREATION (safety net — runs before agent processing) ---
+        try:
+            if not get_lead(normalized_phone):
+                upsert_lead(normalized_phone, {
+                    "name": sender_name or "New Lead",
+                    "phone": normalized_phone,
+                    "push_name": sender_name,
+                    "lead_stage": "new"
+                })
+                print(f"   Lead created for {normalized_phone}")
+        except Exception as e:
+            print(f"   CRITICAL: Early lead creation failed for {normalized_phone}: {e}")
 
-            # Capture Session Cache Facts
-            is_frustrated = any(kw in text.lower() for kw in ["angry", "bad", "worst", "slow", "pathetic", "help", "not working"])
-            has_media = message_type in ("image", "video", "document")
+        # Capture Session Cache Facts
+        is_frustrated = any(kw in text.lower() for kw in ["angry", "bad", "worst", "slow", "pathetic", "help", "not working"])
+        has_media = message_type in ("image", "video", "document")
             
-            update_user_facts(
-                normalized_phone, 
-                customer_name=sender_name,
-                frustration_flag=is_frustrated,
-                media_presence=has_media,
-                last_msg_timestamp=time.time()
-            )
+        update_user_facts(
+            normalized_phone, 
+            customer_name=sender_name,
+            frustration_flag=is_frustrated,
+            media_presence=has_media,
+            last_msg_timestamp=time.time()
+        )
             
-            # Simple pincode extraction from incoming message
-            import re
-            pincode_match = re.search(r'\b\d{6}\b', text)
-            if pincode_match:
-                state["collected_info"]["pincode"] = pincode_match.group()
-                print(f"   📍 Pincode {state['collected_info']['pincode']} extracted")
-
-            # Duration extraction from incoming message
-            duration_match = re.search(r'(\d+)\s*(?:months?|mo\b)', text.lower())
-            if duration_match:
-                dur = int(duration_match.group(1))
-                if 1 <= dur <= 36:
-                    state["collected_info"]["duration_months"] = dur
-                    print(f"   📅 Duration {dur} months extracted")
-
-            # Process message with the agent
-            print(f"   🤖 Processing with {BOT_NAME}...")
+        # Simple pincode extraction from incoming message
+        import re
+        pincode_match = re.search(r'\b\d{6}\b', text)
+        if pincode_match:
+            state["collected_info"]["pincode"] = pincode_match.group()
+            print(f"   📍 Pincode {state['collected_info']['pincode']} extracted")
+
+        # Duration extraction from incoming message
+        duration_match = re.search(r'(\d+)\s*(?:months?|mo\b)', text.lower())
+        if duration_match:
+            dur = int(duration_match.group(1))
+            if 1 <= dur <= 36:
+                state["collected_info"]["duration_months"] = dur
+                print(f"   📅 Duration {dur} months extracted")
+
+        # Process message with the agent
+        print(f"   🤖 Processing with {BOT_NAME}...")
+        if STREAM_REPLIES:
+            # Reply parts go out as the model writes them (the last one below)
+            reply_stream = _ReplyStream(phone)
+            response, new_state = route_and_run(text, state, on_segment=reply_stream.send,
+                                                on_progress=reply_stream.keep_typing)
+        else:
             response, new_state = route_and_run(text, state)
             
-            # Extract routing metadata for DB logging
-            routing_meta = new_state.pop("_routing_meta", {})
-            intent = routing_meta.get("intent")
-            agent_used = routing_meta.get("agent_used")
+        # Extract routing metadata for DB logging
+        routing_meta = new_state.pop("_routing_meta", {})
+        intent = routing_meta.get("intent")
+        agent_used = routing_meta.get("agent_used")
+        streamed_segments = routing_meta.get("streamed_segments", 0)
             
-            # Update state within global lock
-            with conversations_lock:
-                conversations[phone] = new_state
+        # Update state within global lock
+        with conversations_lock:
+            conversations[phone] = new_state
             
-            # Update session in DB with latest state info
-            update_session(
-                session_id,
-                conversation_stage=new_state.get("conversation_stage"),
-                active_agent=agent_used,
-                collected_info=new_state.get("collected_info"),
-                needs_human=new_state.get("needs_human"),
-            )
+        # Update session in DB with latest state info
+        update_session(
+            session_id,
+            conversation_stage=new_state.get("conversation_stage"),
+            active_agent=agent_used,
+            collected_info=new_state.get("collected_info"),
+            needs_human=new_state.get("needs_human"),
+        )
             
-            # --- ANALYTICS EVENTS ---
-            workflow_stage = new_state.get("collected_info", {}).get("workflow_stage")
-            if workflow_stage == "ticket_logged":
-                log_event(normalized_phone, "support_ticket_created", {"issue": new_state.get("support_context", {}).get("issue_type")}, session_id=session_id)
-            elif workflow_stage == "escalated":
-                log_event(normalized_phone, "support_escalation", {"context": new_state.get("support_context", {})}, session_id=session_id)
-
-            # Lead stage transitions
-            prev_stage = state.get("collected_info", {}).get("_last_lead_stage")
-            new_lead_stage = new_state.get("collected_info", {}).get("_last_lead_stage")
-            # Check Firestore lead for actual stage (set by sync_lead_data_tool)
-            try:
-                from utils.firebase_client import get_lead
-                lead_doc = get_lead(normalized_phone)
-                if lead_doc:
-                    current_lead_stage = lead_doc.get("lead_stage")
-                    if current_lead_stage == "qualified" and prev_stage not in ("qualified", "cart_created", "reserved", "converted"):
-                        log_event(normalized_phone, "lead_qualified", {"stage": current_lead_stage}, session_id=session_id)
-                    elif current_lead_stage == "cart_created" and prev_stage not in ("cart_created", "reserved", "converted"):
-                        log_event(normalized_phone, "cart_created", {
-                            "cart": lead_doc.get("final_cart", []),
-                            "stage": current_lead_stage,
-                        }, session_id=session_id)
-                    # Persist observed stage into state for next turn comparison
-                    new_state["collected_info"]["_last_lead_stage"] = current_lead_stage
-            except Exception as _e:
-                pass  # Analytics failure must never affect bot response
+        # --- ANALYTICS EVENTS ---
+        workflow_stage = new_state.get("collected_info", {}).get("workflow_stage")
+        if workflow_stage == "ticket_logged":
+            log_event(normalized_phone, "support_ticket_created", {"issue": new_state.get("support_context", {}).get("issue_type")}, session_id=session_id)
+        elif workflow_stage == "escalated":
+            log_event(normalized_phone, "support_escalation", {"context": new_state.get("support_context", {})}, session_id=session_id)
+
+        # Lead stage transitions
+        prev_stage = state.get("collected_info", {}).get("_last_lead_stage")
+        new_lead_stage = new_state.get("collected_info", {}).get("_last_lead_stage")
+        # Check Firestore lead for actual stage (set by sync_lead_data_tool)
+        try:
+            from utils.firebase_client import get_lead
+            lead_doc = get_lead(normalized_phone)
+            if lead_doc:
+                current_lead_stage = lead_doc.get("lead_stage")
+                if current_lead_stage == "qualified" and prev_stage not in ("qualified", "cart_created", "reserved", "converted"):
+                    log_event(normalized_phone, "lead_qualified", {"stage": current_lead_stage}, session_id=session_id)
+                elif current_lead_stage == "cart_created" and prev_stage not in ("cart_created", "reserved", "converted"):
+                    log_event(normalized_phone, "cart_created", {
+                        "cart": lead_doc.get("final_cart", []),
+                        "stage": current_lead_stage,
+                    }, session_id=session_id)
+                # Persist observed stage into state for next turn comparison
+                new_state["collected_info"]["_last_lead_stage"] = current_lead_stage
+        except Exception as _e:
+            pass  # Analytics failure must never affect bot response
 
             
-            # Apply formatting
-            response = format_bot_response(response)
+        # Apply formatting
+        response = format_bot_response(response)
             
-            # Split and send messages
-            messages_to_send = []
-            if "|||" in response:
-                messages_to_send = response.split("|||")
-            elif "How can I help you in making your living space more comfortable?😊" in response and "We offer Quality furniture" in response:
-                temp_response = response.replace("How can I help you in making your living space more comfortable?😊", "How can I help you in making your living space more comfortable?😊|||")
-                temp_response = temp_response.replace("powered by customer service which is best in the market.", "powered by customer service which is best in the market.|||")
-                messages_to_send = temp_response.split("|||")
-            else:
-                messages_to_send = [response]
+        # Split and send messages
+        messages_to_send = []
+        if "|||" in response:
+            messages_to_send = response.split("|||")
+        elif "How can I help you in making your living space more comfortable?😊" in response and "We offer Quality furniture" in response:
+            temp_response = response.replace("How can I help you in making your living space more comfortable?😊", "How can I help you in making your living space more comfortable?😊|||")
+            temp_response = temp_response.replace("powered by customer service which is best in the market.", "powered by customer service which is best in the market.|||")
+            messages_to_send = temp_response.split("|||")
+        else:
+            messages_to_send = [response]
             
-            # --- CUSTOM UX HANDLER FOR NEW SUPPORT STRUCTURE ---
-            import utils.support_menus as sm_menus
+        # Parts already sent while the reply was streaming are skipped
+        for msg in messages_to_send[streamed_segments:]:
+            msg = msg.strip()
+            if not msg: continue
+            if _send_reply_part(phone, msg) and len(messages_to_send) > 1:
+                whatsapp_client.pause(phone, 0.5) # Slight delay between split messages
             
-            for i, msg in enumerate(messages_to_send):
-                msg = msg.strip()
-                if not msg: continue
-                
-                # Handling structured Support Lists
-                if msg.startswith("[SEND_SUPPORT_LIST:"):
-                    menu_key = msg.replace("[SEND_SUPPORT_LIST:", "").replace("]", "").strip()
-                    menu_dict = getattr(sm_menus, menu_key, None)
-                    if menu_dict:
-                        whatsapp_client.send_list_message(
-                            to_phone=phone,
-                            body_text=menu_dict.get("body_text", "Options:"),
-                            button_text=menu_dict.get("button_text", "Select"),
-                            sections=menu_dict.get("sections", []),
-                            header=menu_dict.get("header")
-                        )
-                    continue
-
-                # Handling structured Support Buttons
-                elif msg.startswith("[SEND_SUPPORT_BUTTONS:"):
-                    # Format: [SEND_SUPPORT_BUTTONS:VAR_NAME|Header text|Body text|Footer text]
-                    raw_data = msg.replace("[SEND_SUPPORT_BUTTONS:", "").replace("]", "").split("|")
-                    var_name = raw_data[0].strip()
-                    buttons_list = getattr(sm_menus, var_name, [])
-                    
-                    if buttons_list:
-                        head = raw_data[1].strip() if len(raw_data) > 1 and raw_data[1].strip() else None
-                        body = raw_data[2].strip() if len(raw_data) > 2 and raw_data[2].strip() else "Please choose an option:"
-                        foot = raw_data[3].strip() if len(raw_data) > 3 and raw_data[3].strip() else None
-                        
-                        whatsapp_client.send_interactive_buttons(
-                            to_phone=phone, body_text=body, buttons=buttons_list, header=head, footer=foot
-                        )
-                    continue
-                
-                # ── Cart Confirmation Buttons ──────────────────────────────
-                elif "[SEND_CART_BUTTONS]" in msg:
-                    # Send the cart text first, then send the action buttons separately
-                    cart_text = msg.replace("[SEND_CART_BUTTONS]", "").strip()
-                    if cart_text:
-                        whatsapp_client.send_text_message(phone, cart_text, preview_url=False)
-                        time.sleep(0.6)
-
-                    # Hot-lead detection → swap primary button + add footer
-                    try:
-                        from utils.firebase_client import is_hot_lead
-                        _hot = is_hot_lead(normalize_phone(phone))
-                    except Exception:
-                        _hot = False
-
-                    if _hot:
-                        primary_btn = {"id": "RESERVE_SETUP", "title": "Reserve Now"}
-                        cart_footer = "Free delivery locked in for you!"
-                    else:
-                        primary_btn = {"id": "RESERVE_SETUP", "title": "Reserve Now"}
-                        cart_footer = None
-
-                    cart_action_buttons = [
-                        primary_btn,
-                        {"id": "TALK_TO_EXPERT", "title": "Talk to Expert"},
-                    ]
-                    whatsapp_client.send_interactive_buttons(
-                        to_phone=phone,
-                        body_text="What would you like to do?",
-                        buttons=cart_action_buttons,
-                        footer=cart_footer,
-                    )
-                    continue
-
-                # Standard handoff handler
-                elif "[SEND_HANDOFF_BUTTONS]" in msg:
-                    clean_msg = msg.replace("[SEND_HANDOFF_BUTTONS]", "").strip()
-                    handoff_buttons = [
-                        {"id": "CALL_ME", "title": "Call me"},
-                        {"id": "WHATSAPP", "title": "Chat here"}
-                    ]
-                    whatsapp_client.send_interactive_buttons(
-                        to_phone=phone,
-                        body_text=clean_msg,
-                        buttons=handoff_buttons
-                    )
-                else:
-                    # Plain text
-                    whatsapp_client.send_text_message(phone, msg, preview_url="http" in msg)
-                    
-                if len(messages_to_send) > 1:
-                    time.sleep(0.5) # Slight delay between split messages
-            
-            # Log turn with metadata (DB + file)
-            log_response = response.replace("|||", "\n")
-            log_conversation_turn(
-                normalized_phone, sender_name, text, log_response,
-                session_id=session_id,
-                agent_used=agent_used,
-                intent=intent,
-                wa_message_id=message_id,
-                quoted_message_id=quoted_message_id,
-                reaction_emoji=reaction.get("emoji") if reaction else None
-            )
-            print(f"   ✅ Response sent successfully for {phone}")
+        # Log turn with metadata (DB + file)
+        log_response = response.replace("|||", "\n")
+        log_conversation_turn(
+            normalized_phone, sender_name, text, log_response,
+            session_id=session_id,
+            agent_used=agent_used,
+            intent=intent,
+            wa_message_id=message_id,
+            quoted_message_id=quoted_message_id,
+            reaction_emoji=reaction.get("emoji") if reaction else None
+        )
+        print(f"   ✅ Response sent successfully for {phone}")
 
-        except Exception as e:
-            print(f"❌ Error in background process for {phone}: {e}")
-            import traceback
-            traceback.print_exc()
+    except Exception as e:
+        print(f"❌ Error in background process for {phone}: {e}")
+        import traceback
+        traceback.print_exc()
 
 
 @app.route("/webhook", methods=["POST"])
@@ -3808,137 +4063,14 @@ def handle_webhook():
         
         if not message_data:
             # Not a message event (could be status update, etc.)
+            record_delivery_statuses(payload)
             return jsonify({"status": "no_message"}), 200
         
-        phone = message_data["from_phone"]
-        text = message_data.get("text", "")
-        message_id = message_data.get("message_id")
-        sender_name = message_data.get("sender_name", phone)
-        message_type = message_data.get("type")
-        interactive_response = message_data.get("interactive")
-        
         # 1. Deduplication check (Thread-safe)
-        with conversations_lock:
-            now = time.time()
-            if message_id in processed_ids_dict:
-                print(f"   Skipping duplicate message: {message_id}")
-                return jsonify({"status": "duplicate"}), 200
-
-            # Add to cache
-            processed_ids_dict[message_id] = now
-
-            # Prune expired entries
-            if len(processed_ids_dict) > MAX_CACHE_SIZE:
-                expired = [k for k, v in processed_ids_dict.items() if now - v > CACHE_EXPIRY_SECONDS]
-                for k in expired:
-                    processed_ids_dict.pop(k, None)
-
-        print(f"\n💬 Message from {sender_name} ({phone}):")
-        print(f"   Type: {message_type}")
-        print(f"   Text: {text}")
-        
-        # Send read receipt first (marks message with blue ticks)
-        if message_id:
-            whatsapp_client.send_read_and_typing_indicator(message_id)
-
-        # Reset ghost & follow-up timers on every incoming message
-        _reset_user_timers(phone)
-
-        # Handle simple interactive button responses synchronously if quick
-        if message_type == "interactive" and interactive_response:
-            return handle_interactive_response(phone, sender_name, interactive_response, message_id)
-
-        if message_type == "audio":
-            browse_active = session_context.get(phone, {}).get("browse_mode")
-            sales_active = session_context.get(phone, {}).get("sales_mode")
-            media_id = message_data.get("media_id")
-            if sales_active:
-                thread = threading.Thread(
-                    target=process_sales_audio_async,
-                    args=(phone, sender_name, media_id, message_id)
-                )
-                thread.start()
-                return jsonify({"status": "processing_sales_audio"}), 200
-            if browse_active:
-                thread = threading.Thread(
-                    target=process_browse_audio_async,
-                    args=(phone, sender_name, media_id, message_id)
-                )
-                thread.start()
-                return jsonify({"status": "processing_browse_audio"}), 200
-
-        if not text and message_type in ("image", "video", "document"):
-            return handle_media_message(
-                phone, sender_name, message_type,
-                message_data.get("media_id"),
-                message_data.get("media_caption", ""),
-                message_id
-            )
-
-        if not text:
-            print("   ⚠️ Skipping unsupported message type")
-            return jsonify({"status": "non_text_message"}), 200
-            
-        # 2. START BACKGROUND PROCESSING
-        # We start a thread to do the heavy lifting (AI + multiple tool calls)
-        # and return 200 OK to WhatsApp immediately to stop retries.
-        
-        # Check for Fallback before background thread
-        if text.lower() in ["help", "option", "options", "menu"]:
-             return handle_fallback(phone, sender_name)
-
-        # Check for Greeting — send interactive buttons directly, skip the LLM
-        if is_greeting(text):
-            return handle_greeting(phone, sender_name)
-
-        # Check for Bye / Exit — send farewell with sales contact
-        if is_bye(text):
-            return handle_bye(phone, sender_name)
-
-        # Check for SALES keyword — activate sales team cart-building mode
-        if text.strip().upper() == "SALES":
-            session_context[phone] = {"sales_mode": True, "sender_name": sender_name}
-            whatsapp_client.send_text_message(
-                phone,
-                "Share me the cart on voice message or just type it, I will create a tentative cart message for you!"
-            )
-            # Log activation
-            normalized_phone = normalize_phone(phone)
-            session_id = get_or_create_session(normalized_phone, sender_name)
-            log_event(normalized_phone, "sales_mode_activated", {}, session_id=session_id)
-            return jsonify({"status": "ok", "action": "sales_mode_activated"}), 200
-
-        browse_ctx = session_context.get(phone, {})
-        if browse_ctx.get("browse_mode"):
-            if _handle_browse_products_text(phone, sender_name, text, message_id):
-                return jsonify({"status": "processing_browse_text"}), 200
-
-        # SALES mode text input — build cart from text instead of routing to LLM
-        if session_context.get(phone, {}).get("sales_mode"):
-            thread = threading.Thread(
-                target=process_sales_text_async,
-                args=(phone, sender_name, text, message_id)
-            )
-            thread.start()
-            return jsonify({"status": "processing_sales_text"}), 200
-
-        # ── Direct product request interception ──────────────────
-        # If user sends "Study Chair and table I want" (product keywords detected),
-        # enter a direct-request flow instead of routing to the LLM agent.
-        if _try_direct_product_request(phone, sender_name, text):
-            return jsonify({"status": "processing_direct_request"}), 200
-
-        thread = threading.Thread(
-            target=process_webhook_async,
-            args=(
-                phone, text, sender_name, message_id, message_type,
-                interactive_response, message_data.get("quoted_message_id"),
-                message_data.get("reaction")
-            )
-        )
-        thread.start()
+        if not claim_message_id(message_data.get("message_id")):
+            return jsonify({"status": "duplicate"}), 200
 
-        return jsonify({"status": "processing"}), 200
+        return handle_inbound_message(message_data)
         
     except Exception as e:
         print(f"❌ Error handling webhook: {e}")
@@ -3947,6 +4079,134 @@ def handle_webhook():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def claim_message_id(message_id: str) -> bool:
+    """
+    Record a message ID as seen. Returns False if it was already processed
+    (Meta retries deliveries it thinks were not acknowledged in time).
+    """
+    with conversations_lock:
+        now = time.time()
+        if message_id in processed_ids_dict:
+            print(f"   Skipping duplicate message: {message_id}")
+            return False
+
+        # Add to cache
+        processed_ids_dict[message_id] = now
+
+        # Prune expired entries
+        if len(processed_ids_dict) > MAX_CACHE_SIZE:
+            expired = [k for k, v in processed_ids_dict.items() if now - v > CACHE_EXPIRY_SECONDS]
+            for k in expired:
+                processed_ids_dict.pop(k, None)
+    return True
+
+
+def handle_inbound_message(message_data: dict):
+    """
+    Process a parsed, de-duplicated inbound message: read receipt, timer
+    reset, then routing to the deterministic handlers or the dispatcher.
+    Shared by the Flask route and the async front end (asgi_server.py).
+    Must run inside a Flask app context (handlers return jsonify responses).
+    """
+    phone = message_data["from_phone"]
+    text = message_data.get("text", "")
+    message_id = message_data.get("message_id")
+    sender_name = message_data.get("sender_name", phone)
+    message_type = message_data.get("type")
+    interactive_response = message_data.get("interactive")
+
+    print(f"\n💬 Message from {sender_name} ({phone}):")
+    print(f"   Type: {message_type}")
+    print(f"   Text: {text}")
+
+    # Send read receipt first (marks message with blue ticks)
+    if message_id:
+        whatsapp_client.send_read_and_typing_indicator(message_id)
+
+    # Reset ghost & follow-up timers on every incoming message
+    _reset_user_timers(phone)
+
+    # Handle simple interactive button responses synchronously if quick
+    if message_type == "interactive" and interactive_response:
+        return handle_interactive_response(phone, sender_name, interactive_response, message_id)
+
+    if message_type == "audio":
+        browse_active = session_context.get(phone, {}).get("browse_mode")
+        sales_active = session_context.get(phone, {}).get("sales_mode")
+        media_id = message_data.get("media_id")
+        if sales_active:
+            return _dispatch(phone, message_id, {"status": "processing_sales_audio"},
+                             process_sales_audio_async, phone, sender_name, media_id, message_id)
+        if browse_active:
+            return _dispatch(phone, message_id, {"status": "processing_browse_audio"},
+                             process_browse_audio_async, phone, sender_name, media_id, message_id)
+
+    if not text and message_type in ("image", "video", "document"):
+        return handle_media_message(
+            phone, sender_name, message_type,
+            message_data.get("media_id"),
+            message_data.get("media_caption", ""),
+            message_id
+        )
+
+    if not text:
+        print("   ⚠️ Skipping unsupported message type")
+        return jsonify({"status": "non_text_message"}), 200
+
+    # 2. START BACKGROUND PROCESSING
+    # We queue the heavy lifting (AI + multiple tool calls) on the dispatcher
+    # and return 200 OK to WhatsApp immediately to stop retries.
+
+    # Check for Fallback before queueing background work
+    if text.lower() in ["help", "option", "options", "menu"]:
+         return handle_fallback(phone, sender_name)
+
+    # Check for Greeting — send interactive buttons directly, skip the LLM
+    if is_greeting(text):
+        return handle_greeting(phone, sender_name)
+
+    # Check for Bye / Exit — send farewell with sales contact
+    if is_bye(text):
+        return handle_bye(phone, sender_name)
+
+    # Check for SALES keyword — activate sales team cart-building mode
+    if text.strip().upper() == "SALES":
+        session_context[phone] = {"sales_mode": True, "sender_name": sender_name}
+        whatsapp_client.send_text_message(
+            phone,
+            "Share me the cart on voice message or just type it, I will create a tentative cart message for you!"
+        )
+        # Log activation
+        normalized_phone = normalize_phone(phone)
+        session_id = get_or_create_session(normalized_phone, sender_name)
+        log_event(normalized_phone, "sales_mode_activated", {}, session_id=session_id)
+        return jsonify({"status": "ok", "action": "sales_mode_activated"}), 200
+
+    browse_ctx = session_context.get(phone, {})
+    if browse_ctx.get("browse_mode"):
+        if _handle_browse_products_text(phone, sender_name, text, message_id):
+            return jsonify({"status": "processing_browse_text"}), 200
+
+    # SALES mode text input — build cart from text instead of routing to LLM
+    if session_context.get(phone, {}).get("sales_mode"):
+        return _dispatch(phone, message_id, {"status": "processing_sales_text"},
+                         process_sales_text_async, phone, sender_name, text, message_id)
+
+    # ── Direct product request interception ──────────────────
+    # If user sends "Study Chair and table I want" (product keywords detected),
+    # enter a direct-request flow instead of routing to the LLM agent.
+    if _try_direct_product_request(phone, sender_name, text):
+        return jsonify({"status": "processing_direct_request"}), 200
+
+    return _dispatch(
+        phone, message_id, {"status": "processing"}, process_webhook_async,
+        phone, text, sender_name, message_id, message_type,
+        interactive_response, message_data.get("quoted_message_id"),
+        message_data.get("reaction")
+    )
+
+
+
 def handle_pricing_negotiation(phone: str, sender_name: str, text: str, message_id: str):
     """
     Handle pricing negotiation by sending interactive buttons.
@@ -4039,39 +4299,33 @@ Thank you for choosing RentBasket!"""
             _text = "Show me more affordable alternatives and budget-friendly options"
 
             def _route_budget_options():
-                with per_phone_locks_lock:
-                    if phone not in per_phone_locks:
-                        per_phone_locks[phone] = threading.Lock()
-                    user_lock = per_phone_locks[phone]
-                with user_lock:
-                    try:
-                        normalized_phone = normalize_phone(phone)
-                        with conversations_lock:
-                            if phone not in conversations:
-                                conversations[phone] = create_initial_state()
-                                conversations[phone] = restore_lead_to_state(normalized_phone, conversations[phone])
-                            state = conversations[phone]
-                        state["collected_info"]["phone"] = normalized_phone
-                        if sender_name and not state["collected_info"].get("customer_name"):
-                            state["collected_info"]["customer_name"] = sender_name
-
-                        response, new_state = route_and_run(_text, state)
-                        new_state.pop("_routing_meta", None)
-                        with conversations_lock:
-                            conversations[phone] = new_state
-                        response = format_bot_response(response)
-                        for msg in response.split("|||"):
-                            msg = msg.strip()
-                            if msg:
-                                whatsapp_client.send_text_message(phone, msg, preview_url="http" in msg)
-                                time.sleep(0.3)
-                    except Exception as e:
-                        print(f"Error routing budget options for {phone}: {e}")
-                        whatsapp_client.send_text_message(phone, "Let me find budget-friendly options for you. What items are you looking for?")
-
-            thread = threading.Thread(target=_route_budget_options)
-            thread.start()
-            return jsonify({"status": "ok", "action": "route_to_agent_budget"}), 200
+                try:
+                    normalized_phone = normalize_phone(phone)
+                    with conversations_lock:
+                        if phone not in conversations:
+                            conversations[phone] = create_initial_state()
+                            conversations[phone] = restore_lead_to_state(normalized_phone, conversations[phone])
+                        state = conversations[phone]
+                    state["collected_info"]["phone"] = normalized_phone
+                    if sender_name and not state["collected_info"].get("customer_name"):
+                        state["collected_info"]["customer_name"] = sender_name
+
+                    response, new_state = route_and_run(_text, state)
+                    new_state.pop("_routing_meta", None)
+                    with conversations_lock:
+                        conversations[phone] = new_state
+                    response = format_bot_response(response)
+                    for msg in response.split("|||"):
+                        msg = msg.strip()
+                        if msg:
+                            whatsapp_client.send_text_message(phone, msg, preview_url="http" in msg)
+                            whatsapp_client.pause(phone, 0.3)
+                except Exception as e:
+                    print(f"Error routing budget options for {phone}: {e}")
+                    whatsapp_client.send_text_message(phone, "Let me find budget-friendly options for you. What items are you looking for?")
+
+            return _dispatch(phone, message_id, {"status": "ok", "action": "route_to_agent_budget"},
+                             _route_budget_options)
             
         elif button_id == "LONGER_TENURE":
             # Route directly to agent — bypass pricing negotiation check
@@ -4079,39 +4333,33 @@ Thank you for choosing RentBasket!"""
             _text = "Show me prices for longer rental durations like 6 months and 12 months"
 
             def _route_longer_tenure():
-                with per_phone_locks_lock:
-                    if phone not in per_phone_locks:
-                        per_phone_locks[phone] = threading.Lock()
-                    user_lock = per_phone_locks[phone]
-                with user_lock:
-                    try:
-                        normalized_phone = normalize_phone(phone)
-                        with conversations_lock:
-                            if phone not in conversations:
-                                conversations[phone] = create_initial_state()
-                                conversations[phone] = restore_lead_to_state(normalized_phone, conversations[phone])
-                            state = conversations[phone]
-                        state["collected_info"]["phone"] = normalized_phone
-                        if sender_name and not state["collected_info"].get("customer_name"):
-                            state["collected_info"]["customer_name"] = sender_name
-
-                        response, new_state = route_and_run(_text, state)
-                        new_state.pop("_routing_meta", None)
-                        with conversations_lock:
-                            conversations[phone] = new_state
-                        response = format_bot_response(response)
-                        for msg in response.split("|||"):
-                            msg = msg.strip()
-                            if msg:
-                                whatsapp_client.send_text_message(phone, msg, preview_url="http" in msg)
-                                time.sleep(0.3)
-                    except Exception as e:
-                        print(f"Error routing longer tenure for {phone}: {e}")
-                        whatsapp_client.send_text_message(phone, "Let me check the best prices for longer durations. Please share how many months you need (e.g. 6 or 12 months).")
-
-            thread = threading.Thread(target=_route_longer_tenure)
-            thread.start()
-            return jsonify({"status": "ok", "action": "route_to_agent_tenure"}), 200
+                try:
+                    normalized_phone = normalize_phone(phone)
+                    with conversations_lock:
+                        if phone not in conversations:
+                            conversations[phone] = create_initial_state()
+                            conversations[phone] = restore_lead_to_state(normalized_phone, conversations[phone])
+                        state = conversations[phone]
+                    state["collected_info"]["phone"] = normalized_phone
+                    if sender_name and not state["collected_info"].get("customer_name"):
+                        state["collected_info"]["customer_name"] = sender_name
+
+                    response, new_state = route_and_run(_text, state)
+                    new_state.pop("_routing_meta", None)
+                    with conversations_lock:
+                        conversations[phone] = new_state
+                    response = format_bot_response(response)
+                    for msg in response.split("|||"):
+                        msg = msg.strip()
+                        if msg:
+                            whatsapp_client.send_text_message(phone, msg, preview_url="http" in msg)
+                            whatsapp_client.pause(phone, 0.3)
+                except Exception as e:
+                    print(f"Error routing longer tenure for {phone}: {e}")
+                    whatsapp_client.send_text_message(phone, "Let me check the best prices for longer durations. Please share how many months you need (e.g. 6 or 12 months).")
+
+            return _dispatch(phone, message_id, {"status": "ok", "action": "route_to_agent_tenure"},
+                             _route_longer_tenure)
             
         elif button_id in ("BROWSE_FURNITURE", "BROWSE_APPLIANCES"):
             # Legacy greeting buttons — route into the browse flow
@@ -4142,12 +4390,8 @@ Thank you for choosing RentBasket!"""
             category_text = cat_query_map.get(button_id, f"Show me {button_title} options with prices")
             print(f"   List item selected: {button_title}. Routing to agent.")
 
-            thread = threading.Thread(
-                target=process_webhook_async,
-                args=(phone, category_text, sender_name, message_id, "text", None)
-            )
-            thread.start()
-            return jsonify({"status": "ok", "action": "list_route_to_agent"}), 200
+            return _dispatch(phone, message_id, {"status": "ok", "action": "list_route_to_agent"},
+                             process_webhook_async, phone, category_text, sender_name, message_id, "text", None)
 
         # ── Cart Confirmation Buttons ──────────────────────────────────────────
 
@@ -4168,12 +4412,8 @@ Thank you for choosing RentBasket!"""
 
             # Route to the agent so it can ask for pincode -> check serviceability -> send cart link
             print(f"   Reserve requested by {phone}. Routing to agent for location check.")
-            thread = threading.Thread(
-                target=process_webhook_async,
-                args=(phone, "I want to reserve and proceed with the order", sender_name, message_id, "text", None)
-            )
-            thread.start()
-            return jsonify({"status": "ok", "action": "reserved"}), 200
+            return _dispatch(phone, message_id, {"status": "ok", "action": "reserved"},
+                             process_webhook_async, phone, "I want to reserve and proceed with the order", sender_name, message_id, "text", None)
 
         elif button_id == "TALK_TO_EXPERT":
             # 👨‍💼  High-intent human handoff
@@ -4225,7 +4465,7 @@ Thank you for choosing RentBasket!"""
                 pid_str = f"#{item['product_id']}" if item['product_id'] else "(not found)"
                 regular_rent = item['rent']
                 if item['original_rent']:
-                    upfront_rent = apply_discount(item['original_rent'], upfront=True, upfront_percent=upfront_pct)
+                    upfront_rent = pricing.upfront_price(item['original_rent'], upfront_pct)
                 else:
                     upfront_rent = 0
                 lines.append(f"{i}. {item['product_name']} {pid_str}")
@@ -4233,8 +4473,8 @@ Thank you for choosing RentBasket!"""
                 total_monthly += regular_rent * item['qty']
                 total_upfront_monthly += upfront_rent * item['qty']
 
-            gst_regular = int(round(total_monthly * 0.18))
-            gst_upfront = int(round(total_upfront_monthly * 0.18))
+            gst_regular = pricing.gst(total_monthly)
+            gst_upfront = pricing.gst(total_upfront_monthly)
             grand_regular = total_monthly + gst_regular
             grand_upfront = total_upfront_monthly + gst_upfront
             total_upfront_total = grand_upfront * duration
@@ -4333,7 +4573,7 @@ Thank you for choosing RentBasket!"""
                 image_url=CATALOGUE_IMAGE_URL,
                 caption=f"{_step_header(1)}\n\nHere's our full product catalogue. Ask for any product, and we'll share the pricing instantly.",
             )
-            time.sleep(0.4)
+            whatsapp_client.pause(phone, 0.4)
 
             ctx = _set_browse_context(phone, browse_mode=True, browse_step="share_await_items")
             ctx["share_item_list_flow"] = True
@@ -4382,7 +4622,7 @@ Thank you for choosing RentBasket!"""
                 "No problem — your Draft Cart is unchanged.",
                 preview_url=False,
             )
-            time.sleep(0.3)
+            whatsapp_client.pause(phone, 0.3)
             buttons = [
                 {"id": "BROWSE_CHECKOUT", "title": "Checkout"},
                 {"id": "BROWSE_CUSTOMER_REVIEWS", "title": "Reviews"},
@@ -4409,12 +4649,8 @@ Thank you for choosing RentBasket!"""
             return jsonify({"status": "ok", "action": "subcategory_selected"}), 200
 
         elif button_id.startswith("PKG_"):
-            thread = threading.Thread(
-                target=_handle_1bhk_package_selection,
-                args=(phone, button_id, sender_name),
-            )
-            thread.start()
-            return jsonify({"status": "ok", "action": "package_selected"}), 200
+            return _dispatch(phone, message_id, {"status": "ok", "action": "package_selected"},
+                             _handle_1bhk_package_selection, phone, button_id, sender_name)
 
         elif button_id == "BROWSE_BACK_ROOM":
             _send_room_selection(phone)
@@ -4437,12 +4673,8 @@ Thank you for choosing RentBasket!"""
             except (ValueError, IndexError):
                 whatsapp_client.send_text_message(phone, "Could not identify that product. Please try again.")
                 return jsonify({"status": "ok", "action": "browse_item_invalid"}), 200
-            thread = threading.Thread(
-                target=_handle_browse_item_selection,
-                args=(phone, sender_name, product_id),
-            )
-            thread.start()
-            return jsonify({"status": "ok", "action": "browse_item_selected"}), 200
+            return _dispatch(phone, message_id, {"status": "ok", "action": "browse_item_selected"},
+                             _handle_browse_item_selection, phone, sender_name, product_id)
 
         elif button_id in ("BROWSE_SHOW_DETAILS", "SHOW_FULL_DETAILS"):
             _send_browse_full_details(phone, sender_name)
@@ -4458,7 +4690,7 @@ Thank you for choosing RentBasket!"""
 
             # First message: full Order Confirmation details (no trailing buttons)
             _send_browse_full_details(phone, sender_name, send_buttons=False)
-            time.sleep(0.4)
+            whatsapp_client.pause(phone, 0.4)
 
             # Second message: Step 4 location prompt
             whatsapp_client.send_text_message(
@@ -4474,7 +4706,7 @@ Thank you for choosing RentBasket!"""
         elif button_id in ("BROWSE_CUSTOMER_REVIEWS", "CUSTOMER_REVIEWS"):
             # Send reviews as plain text (exceeds 1024 char interactive limit)
             whatsapp_client.send_text_message(phone, LATEST_REVIEWS_TEXT, preview_url=True)
-            time.sleep(0.3)
+            whatsapp_client.pause(phone, 0.3)
             has_cart = bool(_browse_context(phone).get("last_browse_quote", {}).get("items"))
             if has_cart:
                 follow_buttons = [
@@ -4520,7 +4752,7 @@ Thank you for choosing RentBasket!"""
         elif button_id == "LATEST_REVIEWS":
             # Send reviews as plain text (exceeds 1024 char interactive limit)
             whatsapp_client.send_text_message(phone, LATEST_REVIEWS_TEXT, preview_url=True)
-            time.sleep(0.3)
+            whatsapp_client.pause(phone, 0.3)
             follow_buttons = [
                 {"id": "BROWSE_PRODUCTS", "title": "Browse Products"},
             ]
@@ -4535,11 +4767,8 @@ Thank you for choosing RentBasket!"""
             # Unknown button — route to the LLM agent with the button title as context
             print(f"   Unknown button ID: {button_id}. Routing to agent with title: {button_title}")
             if button_title:
-                thread = threading.Thread(
-                    target=process_webhook_async,
-                    args=(phone, button_title, sender_name, message_id, "text", None)
-                )
-                thread.start()
+                return _dispatch(phone, message_id, {"status": "ok", "button": button_id},
+                                 process_webhook_async, phone, button_title, sender_name, message_id, "text", None)
             else:
                 whatsapp_client.send_text_message(phone, "How can I help you today? Tell me what you are looking to rent.")
             return jsonify({"status": "ok", "button": button_id}), 200
@@ -4651,6 +4880,24 @@ Or choose how you'd like to proceed:"""
     return jsonify({"status": "ok", "action": "fallback"}), 200
 
 
+def record_delivery_statuses(payload: dict) -> int:
+    """
+    Feed Meta delivery status callbacks (sent / delivered / read / failed)
+    into the outbound queue's delivery tracking. Returns statuses seen.
+    """
+    seen = 0
+    try:
+        for entry in payload.get("entry", []):
+            for change in entry.get("changes", []):
+                for status in change.get("value", {}).get("statuses", []):
+                    errors = status.get("errors") or [{}]
+                    whatsapp_client.record_status(status.get("id"), status.get("status"), errors[0].get("title"))
+                    seen += 1
+    except Exception as e:
+        print(f"⚠️ Could not record delivery statuses: {e}")
+    return seen
+
+
 def parse_whatsapp_webhook(payload: dict) -> dict:
     """
     Parse incoming WhatsApp webhook payload.
@@ -3,12 +3,87 @@
 
 import os
 import sys
+import bisect
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
 from typing import Optional, Dict, Any
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import WHATSAPP_PHONE_NUMBER_ID, WHATSAPP_ACCESS_TOKEN, WHATSAPP_VERSION
+from config import (
+    WHATSAPP_PHONE_NUMBER_ID, WHATSAPP_ACCESS_TOKEN, WHATSAPP_VERSION,
+    WHATSAPP_POOL_SIZE, WHATSAPP_CONNECT_TIMEOUT, WHATSAPP_READ_TIMEOUT, WHATSAPP_MAX_RETRIES,
+)
+
+# Graph API answers these when throttled / temporarily unavailable
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 8.0
+# Safe to resend after any connection error; anything else (POST /messages)
+# only if the request can't have gone out
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD"})
+
+
+def _never_sent(exc: requests.exceptions.ConnectionError) -> bool:
+    """True when the connection was never established (timeout, refused, DNS)."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError; NewConnectionError subclasses ConnectTimeoutError
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds) for one endpoint."""
+
+    BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)  # last bucket = overflow
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+        self.retries = 0
+        self.status_codes: Dict[str, int] = {}
+
+    def observe(self, ms: float, status: Optional[int]) -> None:
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        code = str(status) if status is not None else "exception"
+        self.status_codes[code] = self.status_codes.get(code, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return float(self.BUCKETS_MS[i]) if i < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b}ms" for b in self.BUCKETS_MS] + ["overflow"]
+        return {
+            "count": self.total,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max_ms, 2),
+            "status_codes": dict(self.status_codes),
+            "buckets": dict(zip(labels, self.counts)),
+        }
 
 
 class WhatsAppClient:
@@ -30,7 +105,12 @@ class WhatsAppClient:
         self, 
         phone_number_id: str = None, 
         access_token: str = None,
-        demo_mode: bool = True
+        demo_mode: bool = True,
+        base_url: str = None,
+        pool_size: int = WHATSAPP_POOL_SIZE,
+        connect_timeout: float = WHATSAPP_CONNECT_TIMEOUT,
+        read_timeout: float = WHATSAPP_READ_TIMEOUT,
+        max_retries: int = WHATSAPP_MAX_RETRIES
     ):
         """
         Initialize WhatsApp client.
@@ -39,14 +119,118 @@ class WhatsAppClient:
             phone_number_id: WhatsApp Business Phone Number ID
             access_token: Meta Access Token
             demo_mode: If True, print messages instead of sending
+            base_url: Graph API base URL (defaults to BASE_URL; tests point it at a mock server)
+            pool_size: Keep-alive connections kept per host
+            connect_timeout: Seconds to wait for a TCP/TLS connection
+            read_timeout: Seconds to wait for the response
+            max_retries: Jittered retries on 429 / 5xx and failed connects
         """
         self.phone_number_id = phone_number_id or WHATSAPP_PHONE_NUMBER_ID
         self.access_token = access_token or WHATSAPP_ACCESS_TOKEN
         self.demo_mode = demo_mode or not (self.phone_number_id and self.access_token)
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+
+        # One pooled keep-alive session: reuses TLS connections to graph.facebook.com
+        # (and the media CDN) instead of a new handshake per message.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+
+        self._latency: Dict[str, LatencyHistogram] = {}
+        self._stats_lock = threading.Lock()
         
         if self.demo_mode:
             print("📱 WhatsApp Client running in DEMO mode (messages printed to console)")
     
+    # ========================================
+    # HTTP TRANSPORT (pooled session + retries)
+    # ========================================
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Full-jitter exponential backoff; honours Retry-After when Meta sends one."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), BACKOFF_CAP_SECONDS)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+    def _record(self, endpoint: str, started: float, status: Optional[int], retried: bool = False) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            hist = self._latency.setdefault(endpoint, LatencyHistogram())
+            hist.observe(elapsed_ms, status)
+            if status is None or status >= 400:
+                hist.errors += 1
+            if retried:
+                hist.retries += 1
+
+    def _send(self, method: str, url: str, endpoint: str, **kwargs) -> requests.Response:
+        """
+        Issue one request through the pooled session.
+
+        Retries (with jittered backoff) on 429 / 5xx responses and on connections
+        that could not be established. Read timeouts, and for POSTs any
+        connection lost after connecting ("connection aborted"), are not
+        retried: the message may already have been delivered.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                retry = attempt < self.max_retries and (method in IDEMPOTENT_METHODS or _never_sent(e))
+                self._record(endpoint, started, None, retried=retry)
+                if not retry:
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            except requests.exceptions.RequestException:
+                self._record(endpoint, started, None)
+                raise
+
+            retry = response.status_code in RETRY_STATUSES and attempt < self.max_retries
+            self._record(endpoint, started, response.status_code, retried=retry)
+            if not retry:
+                return response
+            delay = self._backoff(attempt, response)
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def connection_stats(self) -> Dict[str, int]:
+        """New connections opened vs requests sent, summed over the session's pools."""
+        opened = requests_sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                requests_sent += pool.num_requests
+        return {
+            "connections_opened": opened,
+            "requests": requests_sent,
+            "reused": max(0, requests_sent - opened),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-endpoint latency histograms plus connection reuse counters."""
+        with self._stats_lock:
+            endpoints = {name: hist.snapshot() for name, hist in self._latency.items()}
+        return {"endpoints": endpoints, "pool": self.connection_stats()}
+
+    def close(self) -> None:
+        self.session.close()
+    
     def _get_headers(self) -> Dict[str, str]:
         """Get API request headers."""
         return {
@@ -60,8 +244,12 @@ class WhatsAppClient:
             print(f"  [API] Would send to {endpoint}: {payload.get('type', 'message')}")
             return {"success": True, "demo": True}
         
-        url = f"{self.BASE_URL}/{self.phone_number_id}/{endpoint}"
-        response = requests.post(url, headers=self._get_headers(), json=payload)
+        url = f"{self.base_url}/{self.phone_number_id}/{endpoint}"
+        try:
+            response = self._send("POST", url, endpoint, headers=self._get_headers(), json=payload)
+        except requests.exceptions.RequestException as e:
+            print(f"API Error: {endpoint} request failed - {e}")
+            return {"error": str(e)}
         
         if response.status_code == 200:
             return response.json()
@@ -80,9 +268,9 @@ class WhatsAppClient:
 
         try:
             # Step 1: Get the media URL
-            url = f"{self.BASE_URL}/{media_id}"
+            url = f"{self.base_url}/{media_id}"
             headers = {"Authorization": f"Bearer {self.access_token}"}
-            resp = requests.get(url, headers=headers)
+            resp = self._send("GET", url, "media_url", headers=headers)
             if resp.status_code != 200:
                 print(f"Media URL fetch failed: {resp.status_code} - {resp.text}")
                 return None
@@ -93,7 +281,7 @@ class WhatsAppClient:
                 return None
 
             # Step 2: Download the actual binary
-            resp2 = requests.get(media_url, headers=headers)
+            resp2 = self._send("GET", media_url, "media_download", headers=headers)
             if resp2.status_code != 200:
                 print(f"Media download failed: {resp2.status_code}")
                 return None
@@ -196,8 +384,8 @@ class WhatsAppClient:
         }
         
         try:
-            url = f"{self.BASE_URL}/{self.phone_number_id}/messages"
-            response = requests.post(url, headers=self._get_headers(), json=payload)
+            url = f"{self.base_url}/{self.phone_number_id}/messages"
+            response = self._send("POST", url, "typing", headers=self._get_headers(), json=payload)
             if response.status_code == 200:
                 return response.json()
             # Silently ignore errors — typing indicator works on WhatsApp 
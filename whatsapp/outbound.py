@@ -0,0 +1,392 @@
+# Outbound send queue for RentBasket Bot
+# Hands WhatsApp sends off to a small pool of sender threads so that message
+# handlers never block on the Graph API or on pacing delays.
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, Callable
+
+# WhatsApp Cloud API default throughput tier is 80 messages/second per phone
+# number (Meta raises it to 1,000 mps automatically for eligible numbers).
+DEFAULT_SEND_RATE = float(os.getenv("WHATSAPP_SEND_RATE", "80"))
+DEFAULT_SENDER_WORKERS = int(os.getenv("WHATSAPP_SENDER_WORKERS", "4"))
+DELIVERY_LOG_SIZE = 5000
+
+
+class TokenBucket:
+    """Global send-rate limiter. Thread-safe; never sleeps."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = burst if burst is not None else rate
+        self._tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class _Send:
+    __slots__ = ("id", "phone", "method", "args", "kwargs", "fallback_text", "enqueued_at")
+
+    def __init__(self, send_id, phone, method, args, kwargs, fallback_text):
+        self.id = send_id
+        self.phone = phone
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.fallback_text = fallback_text
+        self.enqueued_at = time.monotonic()
+
+
+class _Gap:
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+
+class OutboundQueue:
+    """
+    Queued, rate-aware front for WhatsAppClient.
+
+    Exposes the same send_* methods as WhatsAppClient, but each call only
+    enqueues the send and returns {"queued": True, "outbound_id": ...}.
+
+    - Per-recipient ordering: one FIFO lane per phone, at most one in-flight
+      send per phone.
+    - Global token bucket at the Cloud API throughput tier (WHATSAPP_SEND_RATE).
+    - pause(phone, seconds) inserts a pacing gap into that phone's lane instead
+      of sleeping the caller's thread; sender threads don't sleep on it either,
+      the lane is simply not eligible until the gap has elapsed.
+    - Delivery outcomes (sent / failed, plus Meta status callbacks) are kept
+      in a bounded log and summarised by stats().
+
+    Usage:
+        outbound = OutboundQueue(WhatsAppClient(...))
+        outbound.send_text_message(phone, "Hi")
+        outbound.pause(phone, 0.5)
+        outbound.send_interactive_buttons(to_phone=phone, body_text="...", buttons=[...])
+    """
+
+    def __init__(
+        self,
+        client,
+        rate: float = DEFAULT_SEND_RATE,
+        workers: int = DEFAULT_SENDER_WORKERS,
+        name: str = "wa-sender",
+    ):
+        """
+        Args:
+            client: WhatsAppClient doing the actual HTTP calls
+            rate: Global sends per second (token bucket refill rate and burst)
+            workers: Sender threads
+            name: Thread name prefix
+        """
+        self.client = client
+        self.workers = workers
+        self.name = name
+        self.bucket = TokenBucket(rate)
+
+        self._lanes: Dict[str, deque] = {}
+        self._ready: list = []            # heap of (not_before, seq, phone)
+        self._scheduled = set()           # phones currently in _ready
+        self._busy = set()                # phones with a send in flight
+        self._last_done: "OrderedDict[str, float]" = OrderedDict()  # phone -> last send finished
+        self._not_before: Dict[str, float] = {}  # phone -> pacing gap still to honour
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._threads = []
+        self._stopping = False
+
+        self._deliveries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_wamid: Dict[str, int] = {}
+        self._counters = {"queued": 0, "sent": 0, "failed": 0, "fallbacks": 0, "throttled": 0,
+                          "delivered": 0, "read": 0, "undelivered": 0}
+        self._latency_ms = deque(maxlen=1000)  # enqueue -> API response
+
+    # ------------------------------------------------------------------
+    # Public send API (mirrors WhatsAppClient)
+    # ------------------------------------------------------------------
+
+    def send_text_message(self, to_phone: str, message: str, preview_url: bool = False) -> Dict[str, Any]:
+        return self._enqueue(to_phone, "send_text_message", (to_phone, message), {"preview_url": preview_url})
+
+    def send_interactive_buttons(self, to_phone: str, body_text: str, buttons: list,
+                                 header: str = None, footer: str = None,
+                                 fallback_text: str = None) -> Dict[str, Any]:
+        """fallback_text: sent as plain text if the interactive message is rejected."""
+        return self._enqueue(
+            to_phone, "send_interactive_buttons", (),
+            {"to_phone": to_phone, "body_text": body_text, "buttons": buttons, "header": header, "footer": footer},
+            fallback_text=fallback_text,
+        )
+
+    def send_list_message(self, to_phone: str, body_text: str, button_text: str, sections: list,
+                          header: str = None, footer: str = None) -> Dict[str, Any]:
+        return self._enqueue(
+            to_phone, "send_list_message", (),
+            {"to_phone": to_phone, "body_text": body_text, "button_text": button_text,
+             "sections": sections, "header": header, "footer": footer},
+        )
+
+    def send_image(self, to_phone: str, *args, **kwargs) -> Dict[str, Any]:
+        return self._enqueue(to_phone, "send_image", (to_phone,) + args, kwargs)
+
+    def send_template_message(self, to_phone: str, *args, **kwargs) -> Dict[str, Any]:
+        return self._enqueue(to_phone, "send_template_message", (to_phone,) + args, kwargs)
+
+    def send_typing_indicator(self, to_phone: str) -> Dict[str, Any]:
+        return self._enqueue(to_phone, "send_typing_indicator", (to_phone,), {})
+
+    def pause(self, phone: str, seconds: float) -> None:
+        """Keep `seconds` between the previous and next send to this phone, without blocking."""
+        if not self._threads:
+            self.start()
+        with self._cond:
+            self._lanes.setdefault(phone, deque()).append(_Gap(seconds))
+            self._schedule(phone, 0.0)
+
+    # Reads, receipts and media go straight to the client (not ordered sends)
+
+    def send_read_and_typing_indicator(self, message_id: str) -> Dict[str, Any]:
+        return self.client.send_read_and_typing_indicator(message_id)
+
+    def download_media(self, media_id: str) -> Optional[bytes]:
+        return self.client.download_media(media_id)
+
+    # ------------------------------------------------------------------
+    # Delivery tracking
+    # ------------------------------------------------------------------
+
+    def record_status(self, wamid: str, status: str, error: Optional[str] = None) -> bool:
+        """
+        Apply a Meta status callback (sent / delivered / read / failed) to a
+        tracked send. Returns False for message IDs we did not send (or evicted).
+        """
+        with self._cond:
+            send_id = self._by_wamid.get(wamid)
+            record = self._deliveries.get(send_id) if send_id is not None else None
+            if record is None:
+                return False
+            record["status"] = status
+            if error:
+                record["error"] = error
+            if status in ("delivered", "read"):
+                self._counters[status] += 1
+            elif status == "failed":
+                self._counters["undelivered"] += 1
+            return True
+
+    def delivery(self, outbound_id: int) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            record = self._deliveries.get(outbound_id)
+            return dict(record) if record else None
+
+    # ------------------------------------------------------------------
+    # Lifecycle / stats
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every queued send has been attempted. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._lanes or self._busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for t in threads:
+            t.join(timeout)
+
+    def queue_depth(self, phone: Optional[str] = None) -> int:
+        with self._cond:
+            if phone is not None:
+                return sum(1 for item in self._lanes.get(phone, ()) if isinstance(item, _Send))
+            return sum(1 for lane in self._lanes.values() for item in lane if isinstance(item, _Send))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            latencies = sorted(self._latency_ms)
+            depth = sum(1 for lane in self._lanes.values() for item in lane if isinstance(item, _Send))
+            n = len(latencies)
+            return {
+                "queued_now": depth,
+                "active_recipients": len(self._lanes),
+                "rate_per_second": self.bucket.rate,
+                **self._counters,
+                "send_ms": {
+                    "p50": round(latencies[n // 2], 2) if n else 0.0,
+                    "p95": round(latencies[min(n - 1, int(n * 0.95))], 2) if n else 0.0,
+                    "max": round(latencies[-1], 2) if n else 0.0,
+                },
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, phone: str, method: str, args: tuple, kwargs: dict,
+                 fallback_text: Optional[str] = None) -> Dict[str, Any]:
+        if not self._threads:
+            self.start()
+        send = _Send(next(self._ids), phone, method, args, kwargs, fallback_text)
+        with self._cond:
+            self._lanes.setdefault(phone, deque()).append(send)
+            self._deliveries[send.id] = {"phone": phone, "type": method, "status": "queued"}
+            while len(self._deliveries) > DELIVERY_LOG_SIZE:
+                self._deliveries.popitem(last=False)
+            self._counters["queued"] += 1
+            self._schedule(phone, self._not_before.pop(phone, 0.0))
+        return {"queued": True, "outbound_id": send.id}
+
+    def _schedule(self, phone: str, not_before: float) -> None:
+        """Make a lane eligible for a worker (caller holds the lock)."""
+        if phone in self._busy or phone in self._scheduled or not self._lanes.get(phone):
+            return
+        heapq.heappush(self._ready, (not_before, next(self._seq), phone))
+        self._scheduled.add(phone)
+        self._cond.notify()
+
+    def _mark_done(self, phone: str) -> None:
+        """Remember when the last send to phone finished (caller holds the lock)."""
+        now = time.monotonic()
+        self._last_done[phone] = now
+        self._last_done.move_to_end(phone)
+        # Pacing gaps are sub-second; anything older than a minute is irrelevant
+        while self._last_done:
+            oldest_phone, finished = next(iter(self._last_done.items()))
+            if now - finished < 60:
+                break
+            self._last_done.popitem(last=False)
+            if self._not_before.get(oldest_phone, now) < now:
+                self._not_before.pop(oldest_phone, None)
+
+    def _next_send(self) -> Optional[_Send]:
+        """Wait for the next eligible send, claiming its lane. None when stopping."""
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                if not self._ready:
+                    self._cond.wait()
+                    continue
+                not_before, _, phone = self._ready[0]
+                now = time.monotonic()
+                if not_before > now:
+                    self._cond.wait(not_before - now)
+                    continue
+                heapq.heappop(self._ready)
+                self._scheduled.discard(phone)
+                lane = self._lanes.get(phone)
+                if lane and isinstance(lane[0], _Gap):
+                    # Gaps are measured from the previous send to this phone
+                    gap_until = self._last_done.get(phone, now)
+                    while lane and isinstance(lane[0], _Gap):
+                        gap_until += lane.popleft().seconds
+                    if not lane:
+                        self._not_before[phone] = gap_until
+                    elif gap_until > now:
+                        self._schedule(phone, gap_until)
+                        continue
+                if not lane:
+                    self._lanes.pop(phone, None)
+                    self._cond.notify_all()
+                    continue
+                wait = self.bucket.try_acquire()
+                if wait:
+                    self._counters["throttled"] += 1
+                    self._schedule(phone, time.monotonic() + wait)
+                    continue
+                self._busy.add(phone)
+                return lane.popleft()
+
+    def _worker(self) -> None:
+        while True:
+            send = self._next_send()
+            if send is None:
+                return
+            try:
+                self._deliver(send)
+            finally:
+                with self._cond:
+                    self._busy.discard(send.phone)
+                    self._mark_done(send.phone)
+                    if self._lanes.get(send.phone):
+                        self._schedule(send.phone, time.monotonic())
+                    else:
+                        self._lanes.pop(send.phone, None)
+                    self._cond.notify_all()
+
+    def _deliver(self, send: _Send) -> None:
+        try:
+            result = getattr(self.client, send.method)(*send.args, **send.kwargs)
+            error = result.get("error") if isinstance(result, dict) else None
+        except Exception as e:
+            result, error = None, str(e)
+
+        if error and send.fallback_text:
+            print(f"   ⚠️ {send.method} to {send.phone} failed, falling back to plain text")
+            try:
+                result = self.client.send_text_message(send.phone, send.fallback_text, preview_url=True)
+                error = result.get("error") if isinstance(result, dict) else None
+            except Exception as e:
+                result, error = None, str(e)
+            with self._cond:
+                self._counters["fallbacks"] += 1
+
+        wamid = None
+        if isinstance(result, dict):
+            messages = result.get("messages") or [{}]
+            wamid = messages[0].get("id")
+
+        with self._cond:
+            self._latency_ms.append((time.monotonic() - send.enqueued_at) * 1000)
+            record = self._deliveries.get(send.id)
+            if error:
+                self._counters["failed"] += 1
+                print(f"   ❌ Outbound {send.method} to {send.phone} failed: {error}")
+            else:
+                self._counters["sent"] += 1
+            if record is not None:
+                record["status"] = "failed" if error else "sent"
+                if error:
+                    record["error"] = str(error)[:300]
+                if wamid:
+                    record["wamid"] = wamid
+                    self._by_wamid[wamid] = send.id
+                    if len(self._by_wamid) > DELIVERY_LOG_SIZE:
+                        self._by_wamid.pop(next(iter(self._by_wamid)))